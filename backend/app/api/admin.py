@@ -0,0 +1,45 @@
+"""
+管理 API endpoints
+用于运维查看 LLM 用量等内部数据，需要请求头 x-admin-token
+"""
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.config import get_settings
+from app.services.usage_tracker import get_usage_tracker
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: str | None = Header(None, alias="x-admin-token")):
+    """
+    校验管理令牌
+
+    未配置 ADMIN_TOKEN 时，只有开发模式允许访问
+    """
+    settings = get_settings()
+    if not settings.admin_token:
+        if settings.dev_mode:
+            return
+        raise HTTPException(status_code=403, detail="管理接口未启用（未配置 ADMIN_TOKEN）")
+
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="管理令牌无效")
+
+
+@router.get("/usage", dependencies=[Depends(require_admin)])
+async def get_usage():
+    """
+    获取 LLM 用量统计
+
+    返回按 (用户, 模型, 框架) 聚合的累计用量，以及最近的调用记录
+    """
+    return get_usage_tracker().snapshot()
+
+
+@router.post("/usage/flush", dependencies=[Depends(require_admin)])
+async def flush_usage():
+    """立即刷写待写出的用量聚合数据"""
+    flushed = await get_usage_tracker().flush()
+    return {"success": True, "flushed": flushed}
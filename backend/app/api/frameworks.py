@@ -1,13 +1,21 @@
 """
 Frameworks API endpoints
 """
+import time
+from collections import Counter
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from app.config import get_settings
+from app.services.attachment_processor import AttachmentError, get_attachment_processor
 from app.services.base_llm import BaseLLMService
+from app.services.batch_matcher import BatchMatcher
+from app.services.concurrency_limiter import priority_context
 from app.services.framework_matcher import FrameworkCandidate, FrameworkMatcher
 from app.services.llm_factory import LLMFactory
+from app.services.metrics import CACHE_REQUESTS_TOTAL
 
 router = APIRouter(prefix="/api/v1/frameworks", tags=["frameworks"])
 
@@ -27,7 +35,10 @@ def get_llm_service(model: str = "deepseek") -> BaseLLMService:
         BaseLLMService 实例
     """
     global _llm_services
-    if model not in _llm_services:
+    if model in _llm_services:
+        CACHE_REQUESTS_TOTAL.labels("llm_service", "hit").inc()
+    else:
+        CACHE_REQUESTS_TOTAL.labels("llm_service", "miss").inc()
         settings = get_settings()
         try:
             _llm_services[model] = LLMFactory.create_service(model, settings)
@@ -47,7 +58,10 @@ def get_framework_matcher(model: str = "deepseek") -> FrameworkMatcher:
         FrameworkMatcher 实例
     """
     global _framework_matchers
-    if model not in _framework_matchers:
+    if model in _framework_matchers:
+        CACHE_REQUESTS_TOTAL.labels("framework_matcher", "hit").inc()
+    else:
+        CACHE_REQUESTS_TOTAL.labels("framework_matcher", "miss").inc()
         _framework_matchers[model] = FrameworkMatcher(get_llm_service(model))
     return _framework_matchers[model]
 
@@ -55,7 +69,9 @@ def get_framework_matcher(model: str = "deepseek") -> FrameworkMatcher:
 class MatchRequest(BaseModel):
     """框架匹配请求"""
     input: str = Field(..., min_length=10, description="用户输入（至少10个字符）")
-    attachment: str | None = Field(None, description="附件内容（base64编码）")
+    attachment: str | None = Field(
+        None, description="附件内容（base64编码，支持 .txt/.md/.docx）"
+    )
     user_type: str = Field("free", description="用户类型（free/pro）")
     model: str = Field("deepseek", description="使用的模型（deepseek/gemini）")
 
@@ -87,14 +103,26 @@ async def match_frameworks(request: MatchRequest):
                 detail=f"不支持的模型类型: {request.model}"
             )
 
+        # 附件只取与输入最相关的一小段摘录参与意图分析
+        try:
+            attachment = await get_attachment_processor().aprocess(
+                query=request.input,
+                budget_tokens=get_settings().attachment_match_budget_tokens,
+                data=request.attachment,
+            )
+        except AttachmentError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
         # 获取对应模型的匹配器
         matcher = get_framework_matcher(request.model)
 
-        # 匹配框架
-        candidates = await matcher.match_frameworks(
-            user_input=request.input,
-            user_type=request.user_type
-        )
+        # 匹配框架（LLM 调用按用户类型排队）
+        with priority_context(request.user_type):
+            candidates = await matcher.match_frameworks(
+                user_input=request.input,
+                user_type=request.user_type,
+                attachment_content=attachment.text if attachment else None,
+            )
 
         return MatchResponse(frameworks=candidates)
 
@@ -105,3 +133,85 @@ async def match_frameworks(request: MatchRequest):
             status_code=500,
             detail=f"框架匹配失败: {str(e)}"
         )
+
+
+class BatchMatchItem(BaseModel):
+    """批量匹配中的一条输入"""
+    id: str | None = Field(None, description="调用方的条目 ID（原样返回）")
+    input: str = Field(..., description="用户输入（至少10个字符，过短的条目单独返回错误）")
+
+
+class BatchMatchRequest(BaseModel):
+    """批量框架匹配请求"""
+    items: list[BatchMatchItem] = Field(..., min_length=1, description="待匹配的输入")
+    user_type: str = Field("free", description="用户类型（free/pro）")
+    model: str = Field("deepseek", description="使用的模型（deepseek/gemini）")
+    confidence_threshold: float | None = Field(
+        None, ge=0, description="本地打分置信度阈值，低于该值的条目调用 LLM（默认使用配置）"
+    )
+
+
+class BatchMatchSummary(BaseModel):
+    """批量匹配的汇总（NDJSON 的最后一行）"""
+    done: bool = True
+    total: int
+    keyword: int
+    llm: int
+    errors: int
+    elapsed_ms: float
+
+
+@router.post("/match/batch")
+async def match_frameworks_batch(request: BatchMatchRequest):
+    """
+    批量匹配框架（NDJSON 流式返回）
+
+    先用本地相似度为全部输入打分，置信度足够的条目直接返回，
+    其余条目以有限并发调用 LLM。每完成一条输出一行 BatchMatchResult
+    （按完成顺序，用 index / id 对应请求中的条目），最后一行为 BatchMatchSummary
+    """
+    settings = get_settings()
+    if len(request.items) > settings.batch_match_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多匹配 {settings.batch_match_max_items} 条输入"
+        )
+    if request.model not in LLMFactory.get_supported_models():
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的模型类型: {request.model}"
+        )
+
+    batch = BatchMatcher(
+        get_framework_matcher(request.model),
+        confidence_threshold=(
+            request.confidence_threshold
+            if request.confidence_threshold is not None
+            else settings.batch_match_confidence_threshold
+        ),
+        llm_concurrency=settings.batch_match_llm_concurrency,
+        deadline_seconds=settings.batch_match_deadline_seconds,
+        item_deadline_seconds=settings.batch_match_item_deadline_seconds,
+    )
+
+    async def lines():
+        start = time.perf_counter()
+        counts: Counter = Counter()
+        # LLM 调用按用户类型排队（上下文在创建调用任务时复制）
+        with priority_context(request.user_type):
+            async for result in batch.run(
+                [item.input for item in request.items], [item.id for item in request.items]
+            ):
+                counts[result.source.value] += 1
+                counts["errors"] += result.error is not None
+                yield result.model_dump_json() + "\n"
+        summary = BatchMatchSummary(
+            total=len(request.items),
+            keyword=counts["keyword"],
+            llm=counts["llm"],
+            errors=counts["errors"],
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 1),
+        )
+        yield summary.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
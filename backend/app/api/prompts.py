@@ -1,15 +1,31 @@
 """
 Prompts API endpoints
 """
-import glob
 import logging
-import os
+from collections.abc import Awaitable, Callable
+from datetime import datetime
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
 from app.api.frameworks import get_llm_service
+from app.services.attachment_processor import AttachmentError, get_attachment_processor
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.concurrency_limiter import ConcurrencyLimitError, priority_context
+from app.services.framework_docs import DocMode, get_framework_doc_store
+from app.services.job_runner import (
+    CallbackURLError,
+    GenerationJobRunner,
+    JobQueueFullError,
+    check_callback_url,
+)
+from app.services.job_store import GenerationJob, JobStatus, get_job_store
 from app.services.llm_factory import LLMFactory
+from app.services.match_log import get_match_log
+from app.services.prompt_builder import PromptBudgetError
+from app.services.retry_policy import iter_exception_chain
+from app.services.tracing import traced
+from app.services.usage_tracker import usage_context
 from app.services.version_manager import VersionManager, VersionType
 
 logger = logging.getLogger(__name__)
@@ -20,72 +36,22 @@ router = APIRouter(prefix="/api/v1/prompts", tags=["prompts"])
 version_manager = VersionManager()
 
 
-def _load_framework_doc(framework_id: str) -> str:
+@traced("prompts.load_framework_doc")
+def _load_framework_doc(framework_id: str, mode: DocMode = DocMode.FULL) -> str:
     """
     加载框架文档
 
     Args:
         framework_id: 框架 ID（例如：Chain of Thought）
+        mode: 渲染模式（full：原文；compact：只保留概述、框架构成和一个示例）
 
     Returns:
         框架文档内容
     """
-    try:
-        # 获取项目根目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-
-        # 构建框架目录路径
-        frameworks_dir = os.path.join(
-            project_root,
-            "skills-main",
-            "skills",
-            "prompt-optimizer",
-            "references",
-            "frameworks"
-        )
-
-        # 查找匹配的框架文件
-        # 文件名格式：XX_FrameworkName_Framework.md
-        pattern = os.path.join(frameworks_dir, f"*_{framework_id.replace(' ', '_')}_Framework.md")
-        matching_files = glob.glob(pattern)
-
-        if not matching_files:
-            logger.warning(f"Framework file not found for: {framework_id}")
-            # 返回一个基本的框架文档
-            return f"""# {framework_id} Framework
-
-## 概述
-这是 {framework_id} 框架的基本说明。
-
-## 应用场景
-适用于各种提示词优化场景。
-
-## 框架构成
-请根据用户需求和框架特点生成优化后的提示词。
-"""
-
-        # 读取第一个匹配的文件
-        framework_file = matching_files[0]
-        with open(framework_file, encoding="utf-8") as f:
-            content = f.read()
-
-        logger.info(f"Loaded framework doc from {framework_file}")
-        return content
-
-    except Exception as e:
-        logger.error(f"Error loading framework doc: {e}")
-        # 返回一个基本的框架文档作为后备
-        return f"""# {framework_id} Framework
-
-## 概述
-这是 {framework_id} 框架的基本说明。
-
-## 应用场景
-适用于各种提示词优化场景。
-"""
+    return get_framework_doc_store().render(framework_id, mode)
 
 
+@traced("prompts.generate_topic_label")
 def _generate_topic_label(user_input: str) -> str:
     """
     生成简洁的主题标签
@@ -176,9 +142,15 @@ class GenerateRequest(BaseModel):
     framework_id: str = Field(..., description="选择的框架 ID")
     clarification_answers: dict[str, str] = Field(..., description="追问问题的答案")
     attachment_content: str | None = Field(None, description="附件内容")
+    attachment: str | None = Field(
+        None, description="附件（base64编码，支持 .txt/.md/.docx；优先于 attachment_content）"
+    )
     user_id: str = Field("test_user", description="用户 ID")
     account_type: str = Field("free", description="账户类型（free/pro）")
     model: str = Field("deepseek", description="使用的模型（deepseek/gemini）")
+    doc_mode: DocMode | None = Field(
+        None, description="框架文档模式（full/compact），不传时使用服务端配置"
+    )
     api_key: str = Field(..., description="用户提供的 API 密钥")
     timezone_offset: int = Field(0, description="用户时区偏移量（分钟），例如 +480 表示 UTC+8")
 
@@ -190,6 +162,135 @@ class GenerateResponse(BaseModel):
     version_id: str
 
 
+def _validate_generate_request(request: GenerateRequest):
+    """校验模型类型和 API 密钥"""
+    # 验证模型类型
+    if request.model not in LLMFactory.get_supported_models():
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的模型类型: {request.model}"
+        )
+
+    # 验证 API 密钥
+    if not request.api_key:
+        raise HTTPException(
+            status_code=400,
+            detail="API 密钥不能为空"
+        )
+
+
+async def _run_generation(
+    request: GenerateRequest,
+    on_chunk: Callable[[str], Awaitable[None]] | None = None,
+) -> GenerateResponse:
+    """
+    生成提示词并保存版本（同步接口和后台任务共用）
+
+    Args:
+        request: 生成请求
+        on_chunk: 流式输出回调（后台任务用于记录部分输出），None 表示非流式生成
+
+    Returns:
+        生成结果
+    """
+    from app.config import get_settings
+    settings = get_settings()
+
+    # 附件只保留与用户需求最相关的部分
+    attachment = await get_attachment_processor().aprocess(
+        query=request.input,
+        budget_tokens=settings.attachment_generate_budget_tokens,
+        data=request.attachment,
+        text=request.attachment_content,
+    )
+    attachment_content = attachment.text if attachment else None
+
+    # 加载框架文档（未指定模式时使用 FRAMEWORK_DOC_MODE 配置）
+    framework_doc = _load_framework_doc(
+        request.framework_id, request.doc_mode or DocMode(settings.framework_doc_mode)
+    )
+
+    # 使用用户提供的 API 密钥创建 LLM 服务（框架文档加载成功后再创建，由下方 finally 关闭）
+    llm_service = LLMFactory.create_service_with_key(
+        model=request.model,
+        api_key=request.api_key,
+        settings=settings
+    )
+
+    # 生成提示词
+    try:
+        with (
+            usage_context(user_id=request.user_id, framework_id=request.framework_id),
+            priority_context(request.account_type),
+        ):
+            if on_chunk is None:
+                generated_output = await llm_service.generate_prompt(
+                    user_input=request.input,
+                    framework_doc=framework_doc,
+                    clarification_answers=request.clarification_answers,
+                    attachment_content=attachment_content
+                )
+            else:
+                chunks = []
+                async for chunk in llm_service.generate_prompt_stream(
+                    user_input=request.input,
+                    framework_doc=framework_doc,
+                    clarification_answers=request.clarification_answers,
+                    attachment_content=attachment_content
+                ):
+                    chunks.append(chunk)
+                    await on_chunk(chunk)
+                generated_output = "".join(chunks).strip()
+    finally:
+        await llm_service.close()
+
+    # 记录用户为该输入实际使用的框架（与 /match 的候选一起用于拟合框架先验）
+    match_log = get_match_log()
+    if match_log:
+        match_log.record_choice(request.input, request.framework_id)
+
+    # 计算版本号：查询该用户该主题的最新版本
+    # 生成简洁的主题标签（提取关键词）
+    topic = _generate_topic_label(request.input)
+
+    existing_versions = await version_manager.get_versions(
+        user_id=request.user_id,
+        limit=100  # 获取足够多的版本以便过滤
+    )
+
+    # 过滤出相同主题的版本
+    topic_versions = [v for v in existing_versions if v.topic == topic]
+
+    # 计算下一个版本号
+    if not topic_versions:
+        version_number = "1.0"
+    else:
+        # 获取最新版本号
+        latest_version = topic_versions[0]
+        major, minor = map(int, latest_version.version_number.split('.'))
+        # 优化生成：小版本号递增
+        version_number = f"{major}.{minor + 1}"
+
+    # 保存版本
+    version = await version_manager.save_version(
+        user_id=request.user_id,
+        content=generated_output,
+        version_type=VersionType.OPTIMIZE,
+        version_number=version_number,
+        description="初始生成版本" if version_number == "1.0" else "优化生成",
+        topic=topic,
+        framework_id=request.framework_id,
+        framework_name=request.framework_id,
+        original_input=request.input,
+    )
+
+    return GenerateResponse(
+        output=generated_output,
+        framework_used=request.framework_id,
+        version_id=version.id
+    )
+
+
 @router.post("/generate", response_model=GenerateResponse)
 async def generate_prompt(request: GenerateRequest):
     """
@@ -198,92 +299,169 @@ async def generate_prompt(request: GenerateRequest):
     根据用户输入、选择的框架和追问答案，生成优化后的提示词
     """
     try:
-        # 验证模型类型
-        if request.model not in LLMFactory.get_supported_models():
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的模型类型: {request.model}"
-            )
+        _validate_generate_request(request)
+        return await _run_generation(request)
 
-        # 验证 API 密钥
-        if not request.api_key:
-            raise HTTPException(
-                status_code=400,
-                detail="API 密钥不能为空"
-            )
+    except HTTPException:
+        raise
+    except AttachmentError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except Exception as e:
+        for cause in iter_exception_chain(e):
+            if isinstance(cause, PromptBudgetError):
+                raise HTTPException(status_code=400, detail=str(cause)) from e
+            if isinstance(cause, ConcurrencyLimitError):
+                # 本地并发已满，快速拒绝，让客户端稍后重试
+                raise HTTPException(
+                    status_code=503,
+                    detail=str(cause),
+                    headers={"Retry-After": str(int(cause.retry_after))},
+                ) from e
+        logger.error(f"Error generating prompt: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"提示词生成失败: {str(e)}"
+        )
 
-        # 使用用户提供的 API 密钥创建 LLM 服务
+
+class GenerateJobRequest(GenerateRequest):
+    """后台生成任务请求"""
+    callback_url: str | None = Field(
+        None, pattern=r"^https?://", description="任务结束后推送结果的地址（可选）"
+    )
+
+
+class GenerateJobResponse(BaseModel):
+    """后台生成任务提交响应"""
+    job_id: str
+    status: JobStatus
+    status_url: str
+
+
+class GenerateJobStatusResponse(BaseModel):
+    """后台生成任务状态"""
+    job_id: str
+    status: JobStatus
+    partial_output: str = Field("", description="已生成的部分输出（流式写入）")
+    result: GenerateResponse | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+async def _execute_generation_job(
+    job: GenerationJob,
+    api_key: str | None,
+    on_chunk: Callable[[str], Awaitable[None]],
+) -> dict:
+    request = GenerateRequest(**job.request, api_key=api_key or "")
+    response = await _run_generation(request, on_chunk=on_chunk)
+    return response.model_dump()
+
+
+# 后台任务执行器（首次使用时创建）
+_job_runner: GenerationJobRunner | None = None
+
+
+def get_job_runner() -> GenerationJobRunner:
+    """获取后台生成任务执行器"""
+    global _job_runner
+    if _job_runner is None:
         from app.config import get_settings
         settings = get_settings()
-        
-        llm_service = LLMFactory.create_service_with_key(
-            model=request.model,
-            api_key=request.api_key,
-            settings=settings
+        _job_runner = GenerationJobRunner(
+            store=get_job_store(),
+            execute=_execute_generation_job,
+            workers=settings.job_workers,
+            max_pending=settings.job_max_pending,
+            deadline_seconds=settings.job_deadline_seconds,
+            ttl_seconds=settings.job_ttl_seconds,
+            callback_secret=settings.job_callback_secret,
+            callback_allowed_hosts=settings.job_callback_allowed_hosts,
         )
+    return _job_runner
 
-        # 加载框架文档
-        framework_doc = _load_framework_doc(request.framework_id)
 
-        # 生成提示词
-        generated_output = await llm_service.generate_prompt(
-            user_input=request.input,
-            framework_doc=framework_doc,
-            clarification_answers=request.clarification_answers,
-            attachment_content=request.attachment_content
-        )
+async def stop_job_runner():
+    """停止后台任务 worker（应用关闭时调用）"""
+    if _job_runner is not None:
+        await _job_runner.stop()
 
-        # 计算版本号：查询该用户该主题的最新版本
-        # 生成简洁的主题标签（提取关键词）
-        topic = _generate_topic_label(request.input)
-        
-        existing_versions = await version_manager.get_versions(
-            user_id=request.user_id,
-            limit=100  # 获取足够多的版本以便过滤
-        )
-        
-        # 过滤出相同主题的版本
-        topic_versions = [v for v in existing_versions if v.topic == topic]
-        
-        # 计算下一个版本号
-        if not topic_versions:
-            version_number = "1.0"
-        else:
-            # 获取最新版本号
-            latest_version = topic_versions[0]
-            major, minor = map(int, latest_version.version_number.split('.'))
-            # 优化生成：小版本号递增
-            version_number = f"{major}.{minor + 1}"
-
-        # 保存版本
-        version = await version_manager.save_version(
-            user_id=request.user_id,
-            content=generated_output,
-            version_type=VersionType.OPTIMIZE,
-            version_number=version_number,
-            description="初始生成版本" if version_number == "1.0" else "优化生成",
-            topic=topic,
-            framework_id=request.framework_id,
-            framework_name=request.framework_id,
-            original_input=request.input,
-        )
 
-        return GenerateResponse(
-            output=generated_output,
-            framework_used=request.framework_id,
-            version_id=version.id
-        )
+@router.post("/generate/jobs", response_model=GenerateJobResponse, status_code=202)
+async def submit_generate_job(request: GenerateJobRequest):
+    """
+    提交后台生成任务
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error generating prompt: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"提示词生成失败: {str(e)}"
+    立即返回任务 ID，生成和保存版本在后台执行；通过状态接口轮询进度，
+    或在请求中提供 callback_url 接收完成通知
+    """
+    _validate_generate_request(request)
+
+    from app.config import get_settings
+    if request.callback_url:
+        try:
+            await check_callback_url(
+                request.callback_url, get_settings().job_callback_allowed_hosts
+            )
+        except CallbackURLError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+    # 提交时就处理附件：格式错误立即返回 400，任务中只保存摘录而不是原始文件
+    try:
+        attachment = await get_attachment_processor().aprocess(
+            query=request.input,
+            budget_tokens=get_settings().attachment_generate_budget_tokens,
+            data=request.attachment,
+            text=request.attachment_content,
         )
+    except AttachmentError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    job_request = request.model_dump(exclude={"api_key", "callback_url", "attachment"})
+    job_request["attachment_content"] = attachment.text if attachment else None
+    job = GenerationJob(
+        user_id=request.user_id,
+        request=job_request,
+        callback_url=request.callback_url,
+    )
+    try:
+        await get_job_runner().submit(job, request.api_key)
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        ) from e
+
+    return GenerateJobResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"{router.prefix}/generate/jobs/{job.id}?user_id={request.user_id}",
+    )
 
 
+@router.get("/generate/jobs/{job_id}", response_model=GenerateJobStatusResponse)
+async def get_generate_job(job_id: str, user_id: str = Query(..., description="用户 ID")):
+    """
+    查询后台生成任务的状态、部分输出和结果
+    """
+    job = await get_job_runner().get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    return GenerateJobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        partial_output=job.partial_output,
+        result=GenerateResponse(**job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
 
 class GenerateSummaryRequest(BaseModel):
     """生成摘要请求"""
@@ -324,17 +502,13 @@ async def generate_summary(request: GenerateSummaryRequest):
 
 摘要："""
 
-        # 调用 LLM
-        response = await llm_service._call_api_with_retry({
-            "model": llm_service.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 50,
-        })
-        
-        summary = response["choices"][0]["message"]["content"].strip()
+        # 调用 LLM（服务商声明了小模型时使用小模型）
+        summary = await llm_service.complete(
+            prompt,
+            operation="generate_summary",
+            max_tokens=50,
+            temperature=0.3,
+        )
         
         # 清理摘要（移除引号、句号等）
         summary = summary.strip('"\'。！？')
@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     gemini_api_key: str | None = None
     gemini_base_url: str = "https://generativelanguage.googleapis.com"
 
+    # 额外的 LLM 服务商声明（JSON 文件，OpenAI 兼容接口，格式见 app/services/model_registry.py）
+    llm_providers_file: str | None = None
+
     # Supabase
     supabase_url: str | None = None
     supabase_key: str | None = None
@@ -39,6 +42,109 @@ class Settings(BaseSettings):
     # 开发模式（跳过数据库连接和认证）
     dev_mode: bool = False
     
+    # 管理接口令牌（/api/v1/admin/*，请求头 x-admin-token）
+    admin_token: str | None = None
+
+    # LLM 用量统计刷写（none / file / supabase）
+    usage_flush_target: str = "none"
+    usage_flush_interval: float = 60.0
+    usage_flush_path: str = "usage_records.jsonl"
+
+    # 按调用类型选择模型（default / small / cheapest / 模型名称 / 服务商:模型，未列出的用 default）
+    llm_operation_models: dict[str, str] = {
+        "analyze_intent": "small",
+        "generate_summary": "small",
+    }
+
+    # LLM 调用重试（全抖动退避 + 按服务商共享的重试预算）
+    llm_retry_max_attempts: int = 3
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 8.0
+    llm_retry_budget_ratio: float = 0.2
+    llm_retry_budget_min_per_second: float = 1.0
+
+    # LLM 服务商熔断（滚动窗口错误率）与故障转移
+    circuit_breaker_window_seconds: float = 30.0
+    circuit_breaker_min_requests: int = 10
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_open_seconds: float = 30.0
+    llm_failover_enabled: bool = False
+
+    # analyze_intent 请求对冲（same：同一服务商 / alternate：优先使用健康的备用服务商）
+    llm_hedge_enabled: bool = False
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_default_delay: float = 2.0
+    llm_hedge_max_ratio: float = 0.1
+    llm_hedge_target: str = "same"
+
+    # LLM 出站调用自适应并发限制（按服务商/模型，AIMD：成功加性增长，429/超时乘性减小）
+    llm_concurrency_initial: int = 8
+    llm_concurrency_min: int = 1
+    llm_concurrency_max: int = 64
+    llm_concurrency_max_queue: int = 100
+    llm_concurrency_max_wait: float = 10.0
+
+    # 排队时按账户等级加权公平分配名额；max_share 为该等级最多占用的上限比例
+    llm_priority_weights: dict[str, float] = {"pro": 4.0, "free": 1.0}
+    llm_priority_max_share: dict[str, float] = {"pro": 1.0, "free": 0.75}
+    llm_priority_starvation_seconds: float = 5.0
+
+    # 后台生成任务（job_store: memory / sqlite；memory 只适用于单进程部署）
+    job_store: str = "memory"
+    job_sqlite_path: str = "jobs.sqlite3"
+    job_workers: int = 4
+    job_max_pending: int = 100
+    job_deadline_seconds: float = 600.0
+    job_ttl_seconds: float = 86400.0
+    job_callback_secret: str | None = None
+    # 允许的回调主机（含子域名）；为空时允许任意解析到公网地址的主机
+    job_callback_allowed_hosts: list[str] = []
+
+    # 附件预处理：按与用户输入的相关度选取摘录，token 预算分别用于生成和框架匹配
+    attachment_max_bytes: int = 5 * 1024 * 1024
+    attachment_chunk_tokens: int = 300
+    attachment_generate_budget_tokens: int = 2000
+    attachment_match_budget_tokens: int = 500
+    attachment_cache_size: int = 128
+
+    # 生成提示词时框架文档的默认渲染模式（full：原文；compact：概述 + 框架构成 + 一个示例）
+    framework_doc_mode: str = "full"
+
+    # 框架匹配（analyze_intent）的框架上下文变体（full / compact / domain / top_n）
+    # 和 top_n 保留的框架数
+    intent_context_variant: str = "full"
+    intent_context_top_n: int = 15
+
+    # 本地相似度打分（FrameworkScorer）的最高匹配度达到该值时，/match 不调用 LLM
+    # 直接返回本地结果（> 1 表示总是调用 LLM）
+    match_local_confidence_threshold: float = 1.1
+
+    # 匹配反馈日志：/match 返回的候选和 /generate 使用的框架（JSONL 追加写入，空表示不记录）；
+    # 框架先验文件（scripts/fit_framework_priors.py 由日志拟合，空表示不使用）和先验强度
+    match_log_path: str = ""
+    framework_priors_path: str = ""
+    framework_prior_weight: float = 1.0
+
+    # 批量框架匹配：单次条目上限、本地打分置信度阈值（低于阈值的条目调用 LLM）、
+    # LLM 并发数、整批总时长和单条调用截止时间（秒）
+    batch_match_max_items: int = 500
+    batch_match_confidence_threshold: float = 0.7
+    batch_match_llm_concurrency: int = 4
+    batch_match_deadline_seconds: float = 600.0
+    batch_match_item_deadline_seconds: float = 60.0
+
+    # generate_prompt 的 token 预算：期望输出上限、最少保留的输出和上下文安全余量比例
+    prompt_max_output_tokens: int = 3000
+    prompt_min_output_tokens: int = 1024
+    prompt_context_margin_ratio: float = 0.05
+
+    # 请求默认截止时间（秒，0 表示不限制；可用 x-request-timeout 请求头缩短）
+    request_deadline_seconds: float = 110.0
+
+    # 请求链路追踪导出（none / console / file）
+    tracing_exporter: str = "none"
+    tracing_file_path: str = "traces.jsonl"
+
     # Resend 邮件服务
     resend_api_key: str | None = None
     resend_from_email: str = "onboarding@resend.dev"
@@ -1,20 +1,45 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-
-from app.api import email_auth, feedback, frameworks, prompts, versions
+from fastapi.responses import Response
+
+from app.api import admin, email_auth, feedback, frameworks, prompts, versions
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.services.gemini_service import close_shared_clients
+from app.services.llm_service import close_shared_clients as close_openai_compatible_clients
+from app.services.match_log import close_match_log
+from app.services.metrics import REGISTRY
+from app.services.tracing import get_tracer
+from app.services.usage_tracker import get_usage_tracker
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # 先停止后台任务 worker（被取消的任务仍会记录用量、反馈和追踪数据），再刷写剩余数据
+    await prompts.stop_job_runner()
+    await get_usage_tracker().flush()
+    close_match_log()
+    get_tracer().shutdown()
+    await close_shared_clients()
+    await close_openai_compatible_clients()
+
+
 app = FastAPI(
     title="Prompt Optimizer API",
     description="基于 57 个 Prompt 工程框架的智能提示词优化工具",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 default_origins = [
@@ -46,6 +71,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(TracingMiddleware)
+# 放在最外层，统计包含 CORS 处理在内的完整耗时
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(admin.router)
 app.include_router(email_auth.router)
 app.include_router(feedback.router)
 app.include_router(frameworks.router)
@@ -68,6 +99,11 @@ async def api_health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,36 @@
+"""
+请求截止时间中间件
+为每个请求设置截止时间，LLM 重试策略据此限制单次超时和重试等待
+"""
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+from app.services.retry_policy import request_deadline
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+class DeadlineMiddleware:
+    """纯 ASGI 中间件：按配置（或更短的 x-request-timeout 请求头，单位秒）设置截止时间"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        seconds = get_settings().request_deadline_seconds
+        for key, value in scope["headers"]:
+            if key == TIMEOUT_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    seconds = min(seconds, requested) if seconds > 0 else requested
+                break
+
+        with request_deadline(seconds):
+            await self.app(scope, receive, send)
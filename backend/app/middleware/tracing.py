@@ -0,0 +1,49 @@
+"""
+请求追踪中间件
+为每个请求分配请求 ID（沿用 x-request-id 请求头），并创建根 Span
+"""
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.tracing import get_tracer, request_context
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class TracingMiddleware:
+    """纯 ASGI 中间件：设置请求 ID 上下文，响应头回写 x-request-id"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope["headers"]:
+            if key == REQUEST_ID_HEADER:
+                incoming = value.decode("latin-1")[:128]
+                break
+
+        with request_context(incoming) as request_id:
+            tracer = get_tracer()
+            with tracer.start_as_current_span(
+                f"HTTP {scope['method']}",
+                {"http.method": scope["method"], "http.target": scope["path"]},
+            ) as span:
+
+                async def send_wrapper(message: Message):
+                    if message["type"] == "http.response.start":
+                        span.set_attribute("http.status_code", message["status"])
+                        headers = list(message.get("headers", []))
+                        headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                        message["headers"] = headers
+                    await send(message)
+
+                await self.app(scope, receive, send_wrapper)
+
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"HTTP {scope['method']} {route.path}")
+                    span.set_attribute("http.route", route.path)
@@ -0,0 +1,333 @@
+"""
+附件预处理
+把用户上传的附件转换成适合放进提示词的摘录，流水线：
+1. 解码 base64（兼容 data URL 前缀）
+2. 提取文本（.docx 用 python-docx，其余按 UTF-8 / GB18030 文本解码）
+3. 按段落切块（每块不超过 chunk_tokens）
+4. 按与用户输入的相关度（BM25，中文按字二元组、英文按单词）选块，
+   总量不超过 token 预算，按原文顺序拼接
+
+提取出的文本按内容哈希缓存，同一附件重复提交（追问、重新生成）不再解析
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import math
+import re
+import threading
+import zipfile
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+
+from pydantic import BaseModel
+
+from app.config import get_settings
+
+from .metrics import CACHE_REQUESTS_TOTAL
+from .token_estimator import estimate_tokens, split_by_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]{2,}")
+_SENTENCE_RE = re.compile(r"(?<=[。！？；!?;.\n])")
+
+# 被跳过的块之间的分隔
+CHUNK_SEPARATOR = "\n……\n"
+
+
+class AttachmentError(ValueError):
+    """附件无法解码或格式不支持"""
+
+
+class ProcessedAttachment(BaseModel):
+    """附件处理结果"""
+    content_hash: str
+    text: str  # 选中的摘录（按原文顺序）
+    total_chunks: int
+    selected_chunks: int
+    total_tokens: int
+    selected_tokens: int
+
+    @property
+    def truncated(self) -> bool:
+        return self.selected_chunks < self.total_chunks
+
+
+def decode_base64(data: str) -> bytes:
+    """
+    解码 base64 附件
+
+    Raises:
+        AttachmentError: 不是合法的 base64
+    """
+    if data.startswith("data:"):
+        _, _, data = data.partition(",")
+    try:
+        return base64.b64decode("".join(data.split()), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise AttachmentError("附件不是合法的 base64 编码") from e
+
+
+def extract_text(content: bytes) -> str:
+    """
+    从附件内容中提取纯文本
+
+    Raises:
+        AttachmentError: 格式不支持（如 PDF 或其他二进制文件）
+    """
+    if content.startswith(b"PK\x03\x04"):
+        return _extract_docx(content)
+    if content.startswith(b"%PDF"):
+        raise AttachmentError("暂不支持 PDF 附件，请转换为 .txt / .md / .docx 后上传")
+    if b"\x00" in content[:1024]:
+        raise AttachmentError("不支持的附件格式，请上传 .txt / .md / .docx 文件")
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode("utf-8", errors="replace")
+
+
+def _extract_docx(content: bytes) -> str:
+    from docx import Document
+
+    try:
+        document = Document(io.BytesIO(content))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise AttachmentError("无法解析 .docx 附件") from e
+
+    lines = [p.text for p in document.paragraphs if p.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells]
+            if any(cells):
+                lines.append(" | ".join(cells))
+    return "\n\n".join(lines)
+
+
+def iter_chunks(text: str, chunk_tokens: int = 300) -> Iterator[str]:
+    """
+    按段落切块，相邻短段落合并，超长段落按句子拆开
+
+    Args:
+        text: 附件文本
+        chunk_tokens: 每块的 token 上限（估算值）
+    """
+    buffer: list[str] = []
+    buffer_tokens = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_long(paragraph, chunk_tokens):
+            tokens = estimate_tokens(piece)
+            if buffer and buffer_tokens + tokens > chunk_tokens:
+                yield "\n\n".join(buffer)
+                buffer, buffer_tokens = [], 0
+            buffer.append(piece)
+            buffer_tokens += tokens
+    if buffer:
+        yield "\n\n".join(buffer)
+
+
+def _split_long(paragraph: str, chunk_tokens: int) -> Iterator[str]:
+    if estimate_tokens(paragraph) <= chunk_tokens:
+        yield paragraph
+        return
+    current, current_tokens = "", 0
+    for sentence in _SENTENCE_RE.split(paragraph):
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > chunk_tokens:
+            yield current.strip()
+            current, current_tokens = "", 0
+        if tokens > chunk_tokens:
+            # 没有标点的超长句子按 token 位置硬切，最后一段留给后续句子合并
+            *pieces, sentence = split_by_tokens(sentence, chunk_tokens)
+            for piece in pieces:
+                if piece.strip():
+                    yield piece.strip()
+            tokens = estimate_tokens(sentence)
+        current += sentence
+        current_tokens += tokens
+    if current.strip():
+        yield current.strip()
+
+
+def extract_terms(text: str) -> Counter:
+    """检索词：中文字二元组 + 英文/数字单词"""
+    text = text.lower()
+    terms = Counter(_WORD_RE.findall(text))
+    for run in re.findall(r"[㐀-鿿豈-﫿]+", text):
+        if len(run) == 1:
+            terms[run] += 1
+        for i in range(len(run) - 1):
+            terms[run[i:i + 2]] += 1
+    return terms
+
+
+def select_relevant_chunks(
+    chunks: list[str], query: str, budget_tokens: int
+) -> list[int]:
+    """
+    按与 query 的 BM25 相关度选块，总 token 不超过预算
+
+    同分时优先靠前的块（通常是文档的标题和引言）
+
+    Returns:
+        选中块的下标（升序）
+    """
+    k1, b = 1.2, 0.75
+    query_terms = set(extract_terms(query))
+    chunk_terms = [extract_terms(chunk) for chunk in chunks]
+    lengths = [sum(terms.values()) or 1 for terms in chunk_terms]
+    avg_length = sum(lengths) / max(len(lengths), 1)
+    df = Counter(term for terms in chunk_terms for term in query_terms & terms.keys())
+
+    def score(i: int) -> float:
+        total = 0.0
+        for term in query_terms:
+            tf = chunk_terms[i].get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(chunks) - df[term] + 0.5) / (df[term] + 0.5))
+            total += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[i] / avg_length))
+        return total
+
+    ranked = sorted(range(len(chunks)), key=lambda i: (-score(i), i))
+    selected, used = [], 0
+    for i in ranked:
+        tokens = estimate_tokens(chunks[i])
+        if used + tokens > budget_tokens:
+            continue
+        selected.append(i)
+        used += tokens
+    return sorted(selected)
+
+
+class AttachmentProcessor:
+    """附件处理器（提取出的文本按内容哈希做 LRU 缓存）"""
+
+    def __init__(
+        self,
+        max_bytes: int = 5 * 1024 * 1024,
+        chunk_tokens: int = 300,
+        cache_size: int = 128,
+    ):
+        self.max_bytes = max_bytes
+        self.chunk_tokens = chunk_tokens
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _extract_cached(self, content: bytes) -> tuple[str, str]:
+        content_hash = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            text = self._cache.get(content_hash)
+            if text is not None:
+                self._cache.move_to_end(content_hash)
+        if text is not None:
+            CACHE_REQUESTS_TOTAL.labels("attachment_text", "hit").inc()
+            return content_hash, text
+
+        CACHE_REQUESTS_TOTAL.labels("attachment_text", "miss").inc()
+        text = extract_text(content)
+        with self._lock:
+            self._cache[content_hash] = text
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return content_hash, text
+
+    def process(
+        self,
+        query: str,
+        budget_tokens: int,
+        data: str | None = None,
+        text: str | None = None,
+    ) -> ProcessedAttachment | None:
+        """
+        处理附件，返回与 query 最相关的摘录
+
+        Args:
+            query: 用户输入（用于相关度排序）
+            budget_tokens: 摘录的 token 预算
+            data: base64 编码的附件
+            text: 已经是纯文本的附件内容（data 为空时使用）
+
+        Returns:
+            处理结果，没有附件或附件为空时返回 None
+
+        Raises:
+            AttachmentError: 附件过大、无法解码或格式不支持
+        """
+        if data:
+            if len(data) * 3 // 4 > self.max_bytes:
+                raise AttachmentError(f"附件不能超过 {self.max_bytes // (1024 * 1024)}MB")
+            content_hash, text = self._extract_cached(decode_base64(data))
+        elif text:
+            content_hash = hashlib.sha256(text.encode()).hexdigest()
+        else:
+            return None
+
+        chunks = list(iter_chunks(text, self.chunk_tokens))
+        if not chunks:
+            return None
+        total_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+        if total_tokens <= budget_tokens:
+            selected = list(range(len(chunks)))
+        else:
+            selected = select_relevant_chunks(chunks, query, budget_tokens)
+
+        parts = []
+        for position, i in enumerate(selected):
+            if position and i != selected[position - 1] + 1:
+                parts.append(CHUNK_SEPARATOR)
+            elif position:
+                parts.append("\n\n")
+            parts.append(chunks[i])
+        result = ProcessedAttachment(
+            content_hash=content_hash,
+            text="".join(parts),
+            total_chunks=len(chunks),
+            selected_chunks=len(selected),
+            total_tokens=total_tokens,
+            selected_tokens=sum(estimate_tokens(chunks[i]) for i in selected),
+        )
+        if result.truncated:
+            logger.info(
+                f"Attachment {content_hash[:12]}: selected {result.selected_chunks}/"
+                f"{result.total_chunks} chunks, {result.selected_tokens}/{total_tokens} tokens"
+            )
+        return result
+
+    async def aprocess(
+        self,
+        query: str,
+        budget_tokens: int,
+        data: str | None = None,
+        text: str | None = None,
+    ) -> ProcessedAttachment | None:
+        """process 的异步版本（解析和打分在线程池中执行，不阻塞事件循环）"""
+        if not data and not text:
+            return None
+        return await asyncio.to_thread(self.process, query, budget_tokens, data, text)
+
+
+# 全局附件处理器实例
+_attachment_processor: AttachmentProcessor | None = None
+
+
+def get_attachment_processor() -> AttachmentProcessor:
+    """获取全局附件处理器实例"""
+    global _attachment_processor
+    if _attachment_processor is None:
+        settings = get_settings()
+        _attachment_processor = AttachmentProcessor(
+            max_bytes=settings.attachment_max_bytes,
+            chunk_tokens=settings.attachment_chunk_tokens,
+            cache_size=settings.attachment_cache_size,
+        )
+    return _attachment_processor
@@ -2,27 +2,66 @@
 基础 LLM 服务接口
 定义所有 LLM 服务必须实现的方法
 """
+import logging
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+from app.config import get_settings
+
+from .intent_output import IntentMatch
+from .metrics import LLM_MODEL_SELECTIONS_TOTAL
+from .model_registry import ModelSpec, ProviderSpec
+
+logger = logging.getLogger(__name__)
 
 
 class BaseLLMService(ABC):
     """LLM 服务的抽象基类"""
 
+    # 服务商声明（具体服务在 __init__ 中设置）
+    spec: ProviderSpec
+
+    def select_model(self, operation: str) -> ModelSpec:
+        """
+        按调用类型选择模型（LLM_OPERATION_MODELS 配置），并记录选择结果
+
+        选择结果与用量记录中的延迟、token 数一起，用于离线比较小模型的质量和延迟
+
+        Args:
+            operation: 调用类型（analyze_intent / generate_prompt / generate_summary 等）
+
+        Returns:
+            本次调用使用的模型
+        """
+        choice = get_settings().llm_operation_models.get(operation, "default")
+        model, reason = self.spec.resolve_model(choice)
+        if reason == "not_declared":
+            logger.warning(f"{self.spec.name} 未声明模型 {choice}，{operation} 使用默认模型")
+        LLM_MODEL_SELECTIONS_TOTAL.labels(self.spec.name, operation, model.name, reason).inc()
+        logger.info(
+            f"model_routing provider={self.spec.name} operation={operation} "
+            f"choice={choice} model={model.name} reason={reason}"
+        )
+        return model
+
     @abstractmethod
     async def analyze_intent(
         self,
         user_input: str,
         frameworks_context: str
-    ) -> list[str]:
+    ) -> list[IntentMatch]:
         """
-        分析用户意图并返回推荐的框架 ID
+        分析用户意图并返回推荐的框架
 
         Args:
             user_input: 用户输入的原始提示词或需求
-            frameworks_context: 框架映射表上下文（Frameworks_Summary.md）
+            frameworks_context: 框架上下文（Frameworks_Summary.md 原文或预先生成的精简变体）
 
         Returns:
-            1-3 个框架 ID 列表
+            1-3 个推荐框架（ID、模型给出的匹配度和推荐理由），按匹配度从高到低排序
+
+        Raises:
+            Exception: 调用失败或输出无法解析
         """
         pass
 
@@ -48,6 +87,49 @@ class BaseLLMService(ABC):
         """
         pass
 
+    async def complete(
+        self,
+        prompt: str,
+        operation: str,
+        max_tokens: int,
+        temperature: float = 0.3
+    ) -> str:
+        """
+        单轮文本补全（摘要等轻量调用）
+
+        Args:
+            prompt: 用户提示
+            operation: 调用类型（用于模型选择和用量统计）
+            max_tokens: 最大输出 token 数
+            temperature: 采样温度
+
+        Returns:
+            模型输出文本
+        """
+        raise NotImplementedError(f"{type(self).__name__} 不支持 complete")
+
+    async def generate_prompt_stream(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成优化后的提示词
+
+        默认实现一次性产出 generate_prompt 的完整结果，支持流式接口的服务商可覆盖
+
+        Yields:
+            生成的文本片段
+        """
+        yield await self.generate_prompt(
+            user_input=user_input,
+            framework_doc=framework_doc,
+            clarification_answers=clarification_answers,
+            attachment_content=attachment_content,
+        )
+
     @abstractmethod
     async def close(self):
         """关闭客户端连接"""
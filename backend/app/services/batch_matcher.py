@@ -0,0 +1,170 @@
+"""
+批量框架匹配
+批量导入历史提示词时一次提交 N 条输入：
+1. 全部输入先用本地相似度打分（FrameworkScorer，应用场景 + 领域 + 复杂度，
+   加载了框架先验时再按先验调整）一次算完
+2. 最高匹配度（校准后的概率）达到阈值的条目直接返回本地结果
+3. 其余条目以有限并发调用 LLM（滑动窗口：任一调用完成即开始下一条），
+   每条调用有独立的截止时间；整批超过总时长后尚未开始的条目直接返回本地结果
+结果按完成顺序逐条产出，由接口层以 NDJSON 流式返回
+"""
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from enum import Enum
+
+from pydantic import BaseModel
+
+from .framework_catalog import FrameworkEntry
+from .framework_matcher import FrameworkCandidate, FrameworkMatcher
+from .metrics import FRAMEWORK_BATCH_ITEMS_TOTAL
+from .retry_policy import request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class BatchMatchSource(str, Enum):
+    """批量匹配结果的来源"""
+    KEYWORD = "keyword"
+    LLM = "llm"
+    ERROR = "error"
+
+
+class BatchMatchResult(BaseModel):
+    """批量匹配中一条输入的结果（NDJSON 的一行）"""
+    index: int  # 在请求 items 中的下标
+    id: str | None = None  # 调用方提供的条目 ID
+    source: BatchMatchSource
+    confidence: float  # 本地打分的最高匹配度
+    frameworks: list[FrameworkCandidate] = []
+    error: str | None = None  # 输入无效，或 LLM 调用失败 / 超时（此时返回本地打分结果）
+
+
+def keyword_confidence(candidates: list[FrameworkCandidate]) -> float:
+    """本地候选（FrameworkMatcher.local_candidates）的置信度：最高的匹配度（0-1）"""
+    return candidates[0].match_score if candidates else 0.0
+
+
+class BatchMatcher:
+    """一次批量匹配请求"""
+
+    def __init__(
+        self,
+        matcher: FrameworkMatcher,
+        confidence_threshold: float = 0.7,
+        llm_concurrency: int = 4,
+        deadline_seconds: float = 600.0,
+        item_deadline_seconds: float = 60.0,
+        min_input_length: int = 10,
+    ):
+        """
+        Args:
+            matcher: 框架匹配器（提供框架目录和 LLM 意图分析）
+            confidence_threshold: 本地打分置信度达到该值时不调用 LLM（> 1 表示全部调用）
+            llm_concurrency: 同时进行的 LLM 调用数
+            deadline_seconds: 整批的总时长（超过后剩余条目只返回本地打分结果）
+            item_deadline_seconds: 单条 LLM 调用的截止时间
+            min_input_length: 输入的最小长度
+        """
+        self.matcher = matcher
+        self.confidence_threshold = confidence_threshold
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.deadline_seconds = deadline_seconds
+        self.item_deadline_seconds = item_deadline_seconds
+        self.min_input_length = min_input_length
+
+    def _keyword_result(
+        self,
+        index: int,
+        item_id: str | None,
+        local: list[FrameworkCandidate],
+        error: str | None = None,
+    ) -> BatchMatchResult:
+        return BatchMatchResult(
+            index=index,
+            id=item_id,
+            source=BatchMatchSource.KEYWORD,
+            confidence=keyword_confidence(local),
+            frameworks=local or [self.matcher.default_candidate()],
+            error=error,
+        )
+
+    async def run(
+        self, inputs: list[str], ids: list[str | None] | None = None
+    ) -> AsyncIterator[BatchMatchResult]:
+        """
+        匹配一批输入，按完成顺序产出结果
+
+        Args:
+            inputs: 用户输入列表
+            ids: 与 inputs 一一对应的调用方条目 ID（可选，原样返回）
+        """
+        ids = ids or [None] * len(inputs)
+        deadline = time.monotonic() + self.deadline_seconds
+        rankings = self.matcher.scorer.score_batch(inputs)
+
+        pending = []
+        for index, (item_id, text, ranked) in enumerate(zip(ids, inputs, rankings, strict=True)):
+            if len(text.strip()) < self.min_input_length:
+                FRAMEWORK_BATCH_ITEMS_TOTAL.labels("invalid").inc()
+                yield BatchMatchResult(
+                    index=index,
+                    id=item_id,
+                    source=BatchMatchSource.ERROR,
+                    confidence=0.0,
+                    error=f"输入至少需要 {self.min_input_length} 个字符",
+                )
+                continue
+            local = self.matcher.local_candidates(text, ranked)
+            if keyword_confidence(local) >= self.confidence_threshold:
+                FRAMEWORK_BATCH_ITEMS_TOTAL.labels("keyword").inc()
+                yield self._keyword_result(index, item_id, local)
+            else:
+                pending.append((index, item_id, text, ranked, local))
+
+        logger.info(
+            f"Batch match: {len(inputs)} items, {len(pending)} sent to LLM "
+            f"(threshold={self.confidence_threshold}, concurrency={self.llm_concurrency})"
+        )
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+
+        async def match_with_llm(
+            index: int,
+            item_id: str | None,
+            text: str,
+            ranked: list[tuple[FrameworkEntry, float]],
+            local: list[FrameworkCandidate],
+        ) -> BatchMatchResult:
+            async with semaphore:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    FRAMEWORK_BATCH_ITEMS_TOTAL.labels("deadline").inc()
+                    return self._keyword_result(
+                        index, item_id, local, error="批量匹配超时，未调用 LLM"
+                    )
+                try:
+                    # 整批的时长由 deadline_seconds 控制，单条调用不受请求截止时间限制
+                    with request_deadline(min(self.item_deadline_seconds, remaining), replace=True):
+                        frameworks = await self.matcher.match_with_llm(text, ranked)
+                except Exception as e:
+                    logger.warning(f"Batch match item {index} failed, using keyword result: {e}")
+                    FRAMEWORK_BATCH_ITEMS_TOTAL.labels("llm_failed").inc()
+                    return self._keyword_result(index, item_id, local, error=str(e))
+            FRAMEWORK_BATCH_ITEMS_TOTAL.labels("llm").inc()
+            return BatchMatchResult(
+                index=index,
+                id=item_id,
+                source=BatchMatchSource.LLM,
+                confidence=keyword_confidence(local),
+                frameworks=frameworks,
+            )
+
+        tasks = [asyncio.create_task(match_with_llm(*item)) for item in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端断开时取消尚未完成的调用
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,169 @@
+"""
+LLM 服务商熔断器
+按服务商统计滚动窗口内的错误率：
+- closed：正常放行，窗口内请求数达到下限且错误率超过阈值时打开
+- open：直接拒绝（CircuitOpenError），冷却时间过后进入 half_open
+- half_open：放行少量试探请求，成功则关闭，失败则重新打开
+"""
+import logging
+import time
+from collections import deque
+from collections.abc import Callable
+
+from app.config import get_settings
+
+from .concurrency_limiter import ConcurrencyLimitError
+from .metrics import LLM_CIRCUIT_STATE
+from .prompt_builder import PromptBudgetError
+from .retry_policy import LLMCallError, iter_exception_chain
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(LLMCallError):
+    """服务商熔断中，请求未发出"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} 服务暂时不可用（熔断中），请稍后重试", retryable=False)
+        self.provider = provider
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    判断异常是否代表服务商故障（计入熔断错误率、可触发故障转移）
+
+    服务层会把底层异常包装成通用 Exception，这里沿异常链查找 LLMCallError；
+    429 以外的 4xx（如密钥错误、请求不合法）是调用方的问题，不算服务商故障；
+    本地并发限制拒绝的请求、输入超出上下文窗口的请求没有发出，也不算。
+    """
+    for current in iter_exception_chain(error):
+        if isinstance(current, ConcurrencyLimitError | PromptBudgetError):
+            return False
+        if isinstance(current, CircuitOpenError):
+            return True
+        if isinstance(current, LLMCallError):
+            status = current.status_code
+            return not (status is not None and 400 <= status < 500 and status != 429)
+    return True
+
+
+class CircuitBreaker:
+    """单个服务商的熔断器（单事件循环内使用，无需加锁）"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 30.0,
+        min_requests: int = 10,
+        failure_rate_threshold: float = 0.5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.failure_rate_threshold = failure_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        # 每秒一个桶：[桶起始秒, 请求数, 失败数]
+        self._buckets: deque[list[int]] = deque()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        LLM_CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        logger.warning(f"LLM 熔断器 {self.name}: {self._state} -> {state}")
+        self._state = state
+        self._half_open_calls = 0
+        if state == self.OPEN:
+            self._opened_at = self._clock()
+        elif state == self.CLOSED:
+            self._buckets.clear()
+        LLM_CIRCUIT_STATE.labels(self.name).set(self._STATE_VALUES[state])
+
+    def _prune(self, now: float):
+        oldest = int(now - self.window_seconds)
+        while self._buckets and self._buckets[0][0] <= oldest:
+            self._buckets.popleft()
+
+    def _add(self, failed: bool):
+        now = self._clock()
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += 1 if failed else 0
+        self._prune(now)
+
+    def window_counts(self) -> tuple[int, int]:
+        """滚动窗口内的 (请求数, 失败数)"""
+        self._prune(self._clock())
+        total = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return total, failures
+
+    def allow_request(self) -> bool:
+        """是否放行一次请求（half_open 时会占用一个试探名额）"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def record_success(self):
+        if self._state == self.HALF_OPEN:
+            self._transition(self.CLOSED)
+        else:
+            self._add(failed=False)
+
+    def record_failure(self):
+        if self._state == self.HALF_OPEN:
+            self._transition(self.OPEN)
+            return
+        self._add(failed=True)
+        if self._state == self.CLOSED:
+            total, failures = self.window_counts()
+            if total >= self.min_requests and failures / total >= self.failure_rate_threshold:
+                self._transition(self.OPEN)
+
+    def record_ignored(self):
+        """请求被取消或因调用方错误失败：不计入错误率，释放试探名额"""
+        if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """获取服务商的进程级熔断器"""
+    if provider not in _circuit_breakers:
+        settings = get_settings()
+        _circuit_breakers[provider] = CircuitBreaker(
+            provider,
+            window_seconds=settings.circuit_breaker_window_seconds,
+            min_requests=settings.circuit_breaker_min_requests,
+            failure_rate_threshold=settings.circuit_breaker_failure_rate,
+            open_seconds=settings.circuit_breaker_open_seconds,
+        )
+    return _circuit_breakers[provider]
@@ -0,0 +1,370 @@
+"""
+LLM 出站调用的自适应并发限制（AIMD）
+按 (服务商, 模型) 在进程内共享：
+- 调用成功时加性增长：每完成约 limit 次成功调用，上限 +1
+- 调用最终以 429 或超时失败时乘性减小（冷却期内只减一次，避免一波 429 把上限压到底）
+- 超过上限的调用按账户等级排队（加权公平，Pro 优先）；队列已满时挤掉权重更低的等级
+  最新排队的请求，没有可挤掉的请求、等待超时或超过请求截止时间时立即拒绝
+  （ConcurrencyLimitError，接口返回 503）
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+from app.config import get_settings
+
+from .metrics import (
+    LLM_CONCURRENCY_IN_FLIGHT,
+    LLM_CONCURRENCY_LIMIT,
+    LLM_CONCURRENCY_QUEUE_DEPTH,
+    LLM_CONCURRENCY_QUEUE_WAIT,
+    LLM_CONCURRENCY_SHED_TOTAL,
+)
+from .model_registry import ModelSpec
+from .retry_policy import LLMCallError, iter_exception_chain, remaining_time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIER = "free"
+
+# 当前请求的账户等级，由 API 层设置
+_priority_tier: ContextVar[str] = ContextVar("priority_tier", default=DEFAULT_TIER)
+
+
+class ConcurrencyLimitError(LLMCallError):
+    """本地并发已满，请求未发出"""
+
+    def __init__(self, name: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{name} 当前请求过多，请稍后重试", retryable=False)
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def normalize_tier(tier: str | None) -> str:
+    """客户端提供的账户等级：不在 LLM_PRIORITY_WEIGHTS 中的值一律按 DEFAULT_TIER 处理"""
+    tier = (tier or DEFAULT_TIER).lower()
+    return tier if tier in get_settings().llm_priority_weights else DEFAULT_TIER
+
+
+@contextmanager
+def priority_context(tier: str | None) -> Iterator[None]:
+    """
+    设置当前请求的账户等级（free / pro），决定 LLM 调用排队时的优先级
+
+    等级来自客户端请求，未知等级按 DEFAULT_TIER 处理（不能借此绕过该等级的名额上限，
+    也不会产生新的排队队列和指标标签）
+
+    使用示例：
+        with priority_context(request.account_type):
+            await llm_service.generate_prompt(...)
+    """
+    token = _priority_tier.set(normalize_tier(tier))
+    try:
+        yield
+    finally:
+        _priority_tier.reset(token)
+
+
+def current_tier() -> str:
+    """当前请求的账户等级"""
+    return _priority_tier.get()
+
+
+def is_overload_signal(error: BaseException) -> bool:
+    """判断调用失败是否说明服务商过载（429 或超时）"""
+    for current in iter_exception_chain(error):
+        if isinstance(current, httpx.TimeoutException):
+            return True
+        if isinstance(current, LLMCallError) and current.status_code == 429:
+            return True
+    return False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发限制器（单事件循环内使用，无需加锁）
+
+    排队的请求按账户等级（tier）分队列，名额空出时按加权公平排队（WFQ）分配：
+    每个等级维护虚拟时间，每分到一个名额前进 1/weight，取虚拟时间最小的等级；
+    排队超过 starvation_seconds 的请求优先分配，避免低权重等级饿死。
+    每个等级占用的名额不超过上限的 max_share（给高等级预留余量）。
+    配置了 weights 时，不在其中的等级按 DEFAULT_TIER 处理；max_queue 是所有等级排队数之和的上限，
+    排满时挤掉权重最低（且低于新请求）的等级中最新排队的请求，低等级的突发不会挡住高等级。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+        max_queue: int = 100,
+        max_wait: float = 10.0,
+        weights: dict[str, float] | None = None,
+        max_share: dict[str, float] | None = None,
+        starvation_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.weights = weights or {}
+        self.max_share = max_share or {}
+        self.starvation_seconds = starvation_seconds
+        self._clock = clock
+        self._limit = float(min(max(initial_limit, min_limit), self.max_limit))
+        self._in_flight = 0
+        self._in_flight_by_tier: dict[str, int] = {}
+        self._waiters: dict[str, deque[tuple[asyncio.Future, float]]] = {}
+        self._virtual_time: dict[str, float] = {}
+        self._virtual_clock = 0.0
+        self._last_decrease = float("-inf")
+        self._labels = tuple(name.split(":", 1)) if ":" in name else (name, "")
+        self._report()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._waiters.values())
+
+    def _report(self, tier: str | None = None):
+        LLM_CONCURRENCY_LIMIT.labels(*self._labels).set(self.limit)
+        LLM_CONCURRENCY_IN_FLIGHT.labels(*self._labels).set(self._in_flight)
+        for name in ([tier] if tier else list(self._waiters)):
+            LLM_CONCURRENCY_QUEUE_DEPTH.labels(*self._labels, name).set(
+                len(self._waiters.get(name, ()))
+            )
+
+    def _tier(self, tier: str | None) -> str:
+        """调用方给出的等级（None 为当前请求的等级），未知等级按 DEFAULT_TIER 处理"""
+        tier = tier or current_tier()
+        return tier if not self.weights or tier in self.weights else DEFAULT_TIER
+
+    def _tier_cap(self, tier: str) -> int:
+        """该等级最多可占用的名额数（至少 1 个）"""
+        return max(1, int(self.limit * self.max_share.get(tier, 1.0)))
+
+    def _can_run(self, tier: str) -> bool:
+        return (
+            self._in_flight < self.limit
+            and self._in_flight_by_tier.get(tier, 0) < self._tier_cap(tier)
+        )
+
+    def _take(self, tier: str):
+        self._in_flight += 1
+        self._in_flight_by_tier[tier] = self._in_flight_by_tier.get(tier, 0) + 1
+
+    def _shed(self, reason: str, tier: str) -> ConcurrencyLimitError:
+        LLM_CONCURRENCY_SHED_TOTAL.labels(*self._labels, tier, reason).inc()
+        logger.warning(
+            f"{self.name} 并发已满，拒绝 {tier} 请求 ({reason}): "
+            f"in_flight={self._in_flight} limit={self.limit} queued={self.queued}"
+        )
+        return ConcurrencyLimitError(self.name, reason)
+
+    async def acquire(self, tier: str | None = None):
+        """
+        占用一个并发名额，必要时排队等待
+
+        Args:
+            tier: 账户等级，None 表示使用当前请求的等级（priority_context）
+
+        Raises:
+            ConcurrencyLimitError: 排队总数已满、排队时被更高等级的请求挤掉、
+                等待超时或超过请求截止时间
+        """
+        tier = self._tier(tier)
+        queue = self._waiters.setdefault(tier, deque())
+        if not queue and self._can_run(tier):
+            self._take(tier)
+            self._report()
+            return
+        if self.queued >= self.max_queue and not self._evict_lower_than(tier):
+            raise self._shed("queue_full", tier)
+
+        timeout = self.max_wait
+        remaining = remaining_time()
+        if remaining is not None:
+            if remaining <= 0:
+                raise self._shed("deadline", tier)
+            timeout = min(timeout, remaining)
+
+        if not queue:
+            # 重新进入排队的等级不能用空闲期间积累的虚拟时间插队
+            self._virtual_time[tier] = max(self._virtual_time.get(tier, 0.0), self._virtual_clock)
+        waiter = asyncio.get_running_loop().create_future()
+        start = self._clock()
+        entry = (waiter, start)
+        queue.append(entry)
+        self._report(tier)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except TimeoutError:
+            if self._granted(waiter):
+                # 超时的同时被唤醒，名额已经转交给本请求，归还
+                self._release_slot(tier)
+            raise self._shed("queue_timeout", tier) from None
+        except asyncio.CancelledError:
+            if self._granted(waiter):
+                self._release_slot(tier)
+            raise
+        finally:
+            if entry in queue:
+                queue.remove(entry)
+            if not waiter.done():
+                waiter.cancel()
+            self._report(tier)
+            LLM_CONCURRENCY_QUEUE_WAIT.labels(*self._labels, tier).observe(self._clock() - start)
+
+    @staticmethod
+    def _granted(waiter: asyncio.Future) -> bool:
+        """排队的请求是否已经分到名额（而不是被取消或挤掉）"""
+        return waiter.done() and not waiter.cancelled() and waiter.exception() is None
+
+    def _evict_lower_than(self, tier: str) -> bool:
+        """
+        排队已满时，挤掉权重低于 tier 的等级中权重最低者最新排队的请求
+
+        Returns:
+            是否腾出了一个排队位置
+        """
+        weight = self.weights.get(tier, 1.0)
+        lower = sorted(
+            (t for t, queue in self._waiters.items()
+             if queue and self.weights.get(t, 1.0) < weight),
+            key=lambda t: self.weights.get(t, 1.0),
+        )
+        for victim in lower:
+            queue = self._waiters[victim]
+            while queue:
+                waiter, _ = queue.pop()
+                if waiter.done():
+                    continue
+                waiter.set_exception(self._shed("evicted", victim))
+                self._report(victim)
+                return True
+        return False
+
+    def release(self, outcome: str = "success", tier: str | None = None):
+        """
+        归还名额并按调用结果调整上限
+
+        Args:
+            outcome: success（加性增长）/ overload（乘性减小）/ ignore（不调整）
+            tier: 占用名额时的账户等级
+        """
+        if outcome == "success":
+            self._limit = min(self.max_limit, self._limit + 1.0 / max(self._limit, 1.0))
+        elif outcome == "overload":
+            now = self._clock()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self._last_decrease = now
+                self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                logger.warning(f"{self.name} 过载，并发上限降至 {self.limit}")
+        self._release_slot(self._tier(tier))
+
+    def _release_slot(self, tier: str):
+        self._in_flight -= 1
+        self._in_flight_by_tier[tier] = self._in_flight_by_tier.get(tier, 1) - 1
+        self._dispatch()
+        self._report()
+
+    def _next_tier(self) -> str | None:
+        """选出下一个获得名额的等级：先看是否有饿死的请求，再按虚拟时间"""
+        ready = [
+            tier for tier, queue in self._waiters.items()
+            if queue and self._can_run(tier)
+        ]
+        if not ready:
+            return None
+        now = self._clock()
+        oldest = min(ready, key=lambda t: self._waiters[t][0][1])
+        if now - self._waiters[oldest][0][1] >= self.starvation_seconds:
+            return oldest
+        return min(ready, key=lambda t: self._virtual_time.get(t, 0.0))
+
+    def _dispatch(self):
+        """名额直接转交给排队的请求"""
+        while self._in_flight < self.limit:
+            tier = self._next_tier()
+            if tier is None:
+                return
+            waiter, _ = self._waiters[tier].popleft()
+            if waiter.done():
+                continue
+            self._take(tier)
+            self._virtual_clock = self._virtual_time.get(tier, 0.0)
+            self._virtual_time[tier] = self._virtual_clock + 1.0 / self.weights.get(tier, 1.0)
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, tier: str | None = None) -> AsyncIterator[None]:
+        """占用一个名额执行调用，按调用结果调整上限"""
+        tier = self._tier(tier)
+        await self.acquire(tier)
+        outcome = "ignore"
+        try:
+            yield
+            outcome = "success"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcome = "overload" if is_overload_signal(e) else "ignore"
+            raise
+        finally:
+            self.release(outcome, tier)
+
+
+# 按 (服务商, 模型) 的限制器，事件循环变化时重建
+_limiters: dict[tuple[str, str], tuple[AdaptiveLimiter, asyncio.AbstractEventLoop]] = {}
+
+
+def get_concurrency_limiter(provider: str, model: ModelSpec) -> AdaptiveLimiter:
+    """
+    获取 (服务商, 模型) 的共享并发限制器
+
+    上限在 [LLM_CONCURRENCY_MIN, LLM_CONCURRENCY_MAX] 内自适应，
+    模型声明了 max_concurrency 时以其作为上界
+    """
+    loop = asyncio.get_running_loop()
+    key = (provider, model.name)
+    entry = _limiters.get(key)
+    if entry is None or entry[1] is not loop:
+        settings = get_settings()
+        max_limit = settings.llm_concurrency_max
+        if model.max_concurrency:
+            max_limit = min(max_limit, model.max_concurrency)
+        limiter = AdaptiveLimiter(
+            f"{provider}:{model.name}",
+            initial_limit=settings.llm_concurrency_initial,
+            min_limit=settings.llm_concurrency_min,
+            max_limit=max_limit,
+            max_queue=settings.llm_concurrency_max_queue,
+            max_wait=settings.llm_concurrency_max_wait,
+            weights=settings.llm_priority_weights,
+            max_share=settings.llm_priority_max_share,
+            starvation_seconds=settings.llm_priority_starvation_seconds,
+        )
+        entry = (limiter, loop)
+        _limiters[key] = entry
+    return entry[0]
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 from supabase import Client, create_client
 from app.config import Settings
+from app.services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,7 @@ class EmailAuthService:
         """生成6位数字验证码"""
         return str(random.randint(100000, 999999))
     
+    @traced("EmailAuthService.send_verification_code")
     async def send_verification_code(
         self,
         email: str
@@ -129,6 +131,7 @@ class EmailAuthService:
             logger.error(f"Unexpected error sending verification code to {email}: {type(e).__name__}: {e}")
             return False, "发送验证码失败，请稍后重试"
     
+    @traced("EmailAuthService.verify_code_and_register")
     async def verify_code_and_register(
         self,
         email: str,
@@ -228,6 +231,7 @@ class EmailAuthService:
             
             return False, None, "注册失败，请稍后重试"
     
+    @traced("EmailAuthService.login_with_email")
     async def login_with_email(
         self,
         email: str,
@@ -294,6 +298,7 @@ class EmailAuthService:
             
             return False, None, "登录失败，请稍后重试"
     
+    @traced("EmailAuthService.login_with_username")
     async def login_with_username(
         self,
         username: str,
@@ -345,6 +350,7 @@ class EmailAuthService:
             logger.error(f"Error logging in with username {username}: {e}")
             return False, None, "登录失败，请稍后重试"
     
+    @traced("EmailAuthService.reset_password_with_code")
     async def reset_password_with_code(
         self,
         email: str,
@@ -401,6 +407,7 @@ class EmailAuthService:
             logger.error(f"Error resetting password for {email}: {e}")
             return False, "重置密码失败，请稍后重试"
     
+    @traced("EmailAuthService.create_user_profile")
     async def create_user_profile(
         self,
         user_id: str,
@@ -438,6 +445,7 @@ class EmailAuthService:
             logger.error(f"Error creating profile for {user_id}: {e}")
             return False, "创建资料失败"
     
+    @traced("EmailAuthService.get_user_profile")
     async def get_user_profile(self, user_id: str) -> Optional[dict]:
         """获取用户资料"""
         if self.dev_mode:
@@ -458,6 +466,7 @@ class EmailAuthService:
             logger.error(f"Error getting profile for {user_id}: {e}")
             return None
     
+    @traced("EmailAuthService.check_username_available")
     async def check_username_available(self, username: str) -> bool:
         """检查用户名是否可用"""
         if self.dev_mode:
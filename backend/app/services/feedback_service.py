@@ -8,6 +8,8 @@ from uuid import UUID
 import httpx
 
 from app.config import get_settings
+from app.services.metrics import SupabaseMetricsTransport
+from app.services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -15,19 +17,30 @@ logger = logging.getLogger(__name__)
 class FeedbackService:
     """反馈和投票服务"""
 
-    def __init__(self):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        """
+        Args:
+            transport: 自定义 httpx 传输层（如进程内 PostgREST 替身），
+                提供时总是走 Supabase REST 代码路径
+        """
         settings = get_settings()
         self.settings = settings
+        self._transport = transport
         self._client = None
     
     def _get_client(self) -> httpx.AsyncClient | None:
         """获取 HTTP 客户端"""
         if self._client is None:
-            if self.settings.dev_mode:
+            supabase_url = self.settings.supabase_url
+            supabase_key = self.settings.supabase_key
+            if self._transport is not None:
+                supabase_url = supabase_url or "http://supabase.local"
+                supabase_key = supabase_key or "local"
+            elif self.settings.dev_mode:
                 logger.warning("⚠️ 开发模式已启用 (DEV_MODE=true)，反馈功能将使用模拟数据")
                 return None
             
-            if not self.settings.supabase_url or not self.settings.supabase_key:
+            if not supabase_url or not supabase_key:
                 logger.error("❌ Supabase 配置不完整，反馈功能将使用模拟数据")
                 return None
             
@@ -36,14 +49,15 @@ class FeedbackService:
                 
                 # 使用 httpx 直接调用 Supabase REST API
                 self._client = httpx.AsyncClient(
-                    base_url=f"{self.settings.supabase_url}/rest/v1",
+                    base_url=f"{supabase_url}/rest/v1",
                     headers={
-                        "apikey": self.settings.supabase_key,
-                        "Authorization": f"Bearer {self.settings.supabase_key}",
+                        "apikey": supabase_key,
+                        "Authorization": f"Bearer {supabase_key}",
                         "Content-Type": "application/json",
                         "Prefer": "return=representation"
                     },
-                    timeout=30.0
+                    timeout=30.0,
+                    transport=SupabaseMetricsTransport(self._transport)
                 )
                 logger.info(f"✅ Supabase REST API 客户端初始化成功（反馈功能）")
             except Exception as e:
@@ -53,6 +67,7 @@ class FeedbackService:
         
         return self._client
 
+    @traced("FeedbackService.get_feature_options")
     async def get_feature_options(self, user_id: str | None = None) -> List[dict]:
         """
         获取所有功能选项及投票统计
@@ -136,6 +151,7 @@ class FeedbackService:
             logger.warning("回退到模拟数据模式")
             return self._get_mock_options()
 
+    @traced("FeedbackService.submit_vote")
     async def submit_vote(self, user_id: str, option_ids: List[UUID]) -> dict:
         """
         提交投票（覆盖之前的投票）
@@ -200,6 +216,7 @@ class FeedbackService:
             logger.error(f"提交投票失败: {e}")
             raise
 
+    @traced("FeedbackService.submit_feedback")
     async def submit_feedback(self, user_id: str, content: str) -> dict:
         """
         提交反馈意见
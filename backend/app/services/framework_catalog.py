@@ -0,0 +1,301 @@
+"""
+框架目录与意图分析上下文
+解析 Frameworks_Summary.md（框架表格 + 按复杂度 / 按应用领域的分类表），
+在 FrameworkMatcher 初始化时预先生成 analyze_intent 使用的框架上下文：
+- full：摘要原文（表格 + 分类参考，约 10KB）
+- compact：每个框架一行"ID：前几个应用场景［复杂度；领域］"
+- domain：按领域 / 复杂度分组的框架 ID，未分类的框架附带两个应用场景
+- top_n：按与用户输入的关键词重合度筛选出的前 N 个框架（compact 格式），
+  只有这一种需要按输入生成，检索用的词表在初始化时建好
+
+模型返回的框架 ID 通过 resolve 与目录核对：精确匹配、别名（缩写、括号中的全称）、
+相似度匹配（拼写差异）
+"""
+import difflib
+import logging
+import math
+import re
+from enum import Enum
+
+from pydantic import BaseModel
+
+from .attachment_processor import extract_terms
+from .framework_docs import normalize_framework_id
+
+logger = logging.getLogger(__name__)
+
+
+class ContextVariant(str, Enum):
+    """analyze_intent 的框架上下文变体"""
+    FULL = "full"
+    COMPACT = "compact"
+    DOMAIN = "domain"
+    TOP_N = "top_n"
+
+
+# 摘要中的名称与框架文档 / 分类表中的 ID 不一致的框架
+FRAMEWORK_ID_ALIASES = {
+    "Few-shot Prompting": "Few-shot",
+    "Zero-shot Prompting": "Zero-shot",
+}
+
+# 模型常用的缩写和别称 -> 框架 ID
+FRAMEWORK_ABBREVIATIONS = {
+    "CoT": "Chain of Thought",
+    "ToT": "Tree of Thought",
+    "5W1H": "Five Ws and One H",
+    "STAR": "CAR-PAR-STAR",
+    "Six Hats": "Six Thinking Hats",
+    "Bloom": "Bloom's Taxonomy",
+    "Socratic": "Socratic Method",
+    "3C": "3Cs Model",
+}
+
+# 相似度匹配的阈值（归一化 ID 的 difflib 相似度）和参与匹配的最短长度
+FUZZY_MATCH_CUTOFF = 0.85
+FUZZY_MATCH_MIN_LENGTH = 4
+
+# compact / top_n 每个框架保留的应用场景数
+COMPACT_SCENARIOS = 3
+
+_ROW_RE = re.compile(r"^\|\s*(\d+)\s*\|(.+?)\|(.+?)\|\s*$")
+_PAREN_RE = re.compile(r"\s*[（(][^）)]*[）)]")
+
+
+class FrameworkEntry(BaseModel):
+    """摘要表格中的一个框架"""
+    number: int
+    id: str  # 去掉 " Framework" 后缀和括号说明，与框架文档和分类表一致
+    name: str  # 摘要中的完整名称
+    scenarios: list[str]
+    complexity: str = ""
+    domains: list[str] = []
+    aliases: list[str] = []  # 名称中括号里的全称等
+
+    @property
+    def description(self) -> str:
+        return f"适用场景：{'、'.join(self.scenarios)}"
+
+    def render_line(self, max_scenarios: int = COMPACT_SCENARIOS) -> str:
+        """compact 格式的一行"""
+        line = f"- {self.id}：{'、'.join(self.scenarios[:max_scenarios])}"
+        tags = [tag for tag in (self.complexity, "/".join(self.domains)) if tag]
+        if tags:
+            line += f"［{'；'.join(tags)}］"
+        return line
+
+
+def framework_id_from_name(name: str) -> str:
+    """摘要中的框架名称 -> 框架 ID（例如 "HMW (How Might We) Framework" -> "HMW"）"""
+    name = name.strip()
+    framework_id = _PAREN_RE.sub("", name.removesuffix(" Framework")).strip()
+    return FRAMEWORK_ID_ALIASES.get(framework_id, framework_id)
+
+
+def _cells(line: str) -> list[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _label(cell: str) -> str:
+    """分类表第一列：去掉加粗和括号说明（"**简单（3要素以内）**" -> "简单"）"""
+    return _PAREN_RE.sub("", cell.replace("*", "")).strip()
+
+
+def parse_classifications(summary: str) -> list[tuple[str, str, list[str]]]:
+    """
+    解析摘要中的分类参考表
+
+    Returns:
+        [(分类方式 "complexity" / "domain", 类别, [框架 ID])]，按原文顺序
+    """
+    classifications = []
+    heading = ""
+    for line in summary.splitlines():
+        line = line.strip()
+        if line.startswith("#"):
+            heading = line
+            continue
+        if not line.startswith("|") or line.startswith(("|-", "|:")):
+            continue
+        cells = _cells(line)
+        if len(cells) < 2 or not cells[0].startswith("**"):
+            continue
+        kind = "complexity" if "复杂度" in heading else "domain" if "领域" in heading else ""
+        if kind:
+            framework_ids = [i.strip() for i in re.split(r"[、,，]", cells[1]) if i.strip()]
+            classifications.append((kind, _label(cells[0]), framework_ids))
+    return classifications
+
+
+def parse_frameworks_summary(summary: str) -> list[FrameworkEntry]:
+    """
+    解析 Frameworks_Summary.md
+
+    Args:
+        summary: 摘要原文
+
+    Returns:
+        按序号排列的框架列表（附带分类表中的复杂度和领域）
+    """
+    entries: dict[str, FrameworkEntry] = {}
+    for line in summary.splitlines():
+        match = _ROW_RE.match(line.strip())
+        if match:
+            name = match.group(2).strip()
+            entry = FrameworkEntry(
+                number=int(match.group(1)),
+                id=framework_id_from_name(name),
+                name=name,
+                scenarios=[s.strip() for s in match.group(3).split("、") if s.strip()],
+                aliases=[alias.strip("（）() ") for alias in _PAREN_RE.findall(name)],
+            )
+            entries[normalize_framework_id(entry.id)] = entry
+
+    for kind, label, framework_ids in parse_classifications(summary):
+        for framework_id in framework_ids:
+            entry = entries.get(normalize_framework_id(framework_id))
+            if entry is None:
+                logger.debug(f"Unknown framework in classification {label}: {framework_id}")
+            elif kind == "complexity":
+                entry.complexity = label
+            elif label not in entry.domains:
+                entry.domains.append(label)
+
+    return sorted(entries.values(), key=lambda entry: entry.number)
+
+
+class FrameworkCatalog:
+    """框架目录：按 ID 查找框架，渲染 analyze_intent 的各种上下文变体"""
+
+    def __init__(self, summary: str):
+        """
+        Args:
+            summary: Frameworks_Summary.md 原文
+        """
+        self.summary = summary
+        self.entries = parse_frameworks_summary(summary)
+        self.classifications = parse_classifications(summary)
+        self._by_id = {normalize_framework_id(entry.id): entry for entry in self.entries}
+        self._aliases: dict[str, FrameworkEntry] = {}
+        for entry in self.entries:
+            for alias in [entry.name, *entry.aliases]:
+                self._aliases.setdefault(normalize_framework_id(alias), entry)
+        for alias, framework_id in FRAMEWORK_ABBREVIATIONS.items():
+            entry = self._by_id.get(normalize_framework_id(framework_id))
+            if entry:
+                self._aliases.setdefault(normalize_framework_id(alias), entry)
+
+        # 关键词检索：词 -> 包含该词的框架下标（倒排表，即稀疏的 词 × 框架 矩阵）和 idf
+        entry_terms = [
+            set(extract_terms(" ".join(entry.scenarios + entry.domains)))
+            for entry in self.entries
+        ]
+        self._postings: dict[str, list[int]] = {}
+        for i, terms in enumerate(entry_terms):
+            for term in terms:
+                self._postings.setdefault(term, []).append(i)
+        self._idf = {
+            term: math.log(1 + len(self.entries) / len(postings))
+            for term, postings in self._postings.items()
+        }
+
+    def get(self, framework_id: str) -> FrameworkEntry | None:
+        """按框架 ID 或摘要名称查找（忽略大小写、标点和 Framework 后缀）"""
+        key = normalize_framework_id(framework_id_from_name(framework_id))
+        return self._by_id.get(key) or self._aliases.get(key)
+
+    def resolve(self, framework_id: str) -> tuple[FrameworkEntry | None, str]:
+        """
+        把模型返回的框架 ID 解析为目录中的框架
+
+        Args:
+            framework_id: 模型返回的 ID（可能带 Framework / Prompting 后缀、缩写或拼写差异）
+
+        Returns:
+            (框架, 匹配方式 exact / alias / fuzzy / unknown)
+        """
+        key = normalize_framework_id(framework_id_from_name(framework_id))
+        if key in self._by_id:
+            return self._by_id[key], "exact"
+        for candidate in (key, key.removesuffix("prompting")):
+            if candidate in self._aliases:
+                return self._aliases[candidate], "alias"
+            if candidate in self._by_id:
+                return self._by_id[candidate], "alias"
+        if len(key) >= FUZZY_MATCH_MIN_LENGTH:
+            close = difflib.get_close_matches(
+                key, list(self._by_id) + list(self._aliases), n=1, cutoff=FUZZY_MATCH_CUTOFF
+            )
+            if close:
+                return self._by_id.get(close[0]) or self._aliases[close[0]], "fuzzy"
+        return None, "unknown"
+
+    def rank(self, user_input: str) -> list[tuple[FrameworkEntry, float]]:
+        """
+        按与用户输入的关键词重合度（命中词的 idf 之和）对框架排序
+
+        Returns:
+            (框架, 得分) 列表，得分相同时按摘要中的序号
+        """
+        return self.rank_batch([user_input])[0]
+
+    def rank_batch(self, inputs: list[str]) -> list[list[tuple[FrameworkEntry, float]]]:
+        """
+        批量排序：每条输入只遍历命中词的倒排表（稀疏矩阵 × 向量），
+        与框架数无关的开销只有一次分词
+
+        Returns:
+            与 inputs 一一对应的排序结果（同 rank）
+        """
+        results = []
+        for user_input in inputs:
+            scores = [0.0] * len(self.entries)
+            for term in set(extract_terms(user_input)) & self._postings.keys():
+                idf = self._idf[term]
+                for i in self._postings[term]:
+                    scores[i] += idf
+            order = sorted(range(len(self.entries)), key=lambda i: (-scores[i], i))
+            results.append([(self.entries[i], scores[i]) for i in order])
+        return results
+
+    def render_compact(self, entries: list[FrameworkEntry] | None = None) -> str:
+        """compact 变体：每个框架一行"""
+        lines = ["框架列表（格式：框架 ID：典型应用场景［复杂度；适用领域］）："]
+        lines.extend(entry.render_line() for entry in entries or self.entries)
+        return "\n".join(lines)
+
+    def render_domain(self) -> str:
+        """domain 变体：分类表中按领域和复杂度分组的框架 ID，未分类到领域的框架附带应用场景"""
+        groups = {"domain": ["### 按领域"], "complexity": ["\n### 按复杂度"]}
+        for kind, label, framework_ids in self.classifications:
+            ids = [entry.id for entry in map(self.get, framework_ids) if entry]
+            if ids:
+                groups[kind].append(f"- {label}：{'、'.join(ids)}")
+        lines = groups["domain"] + groups["complexity"]
+        others = [entry for entry in self.entries if not entry.domains]
+        if others:
+            lines.append("\n### 其他框架")
+            lines.extend(entry.render_line(max_scenarios=2) for entry in others)
+        return "\n".join(lines)
+
+    def render_top_n(self, user_input: str, top_n: int) -> str:
+        """top_n 变体：与输入最相关的 N 个框架（没有命中的位置按摘要顺序补齐）"""
+        selected = [entry for entry, _ in self.rank(user_input)[:top_n]]
+        return self.render_compact(sorted(selected, key=lambda entry: entry.number))
+
+    def render(self, variant: ContextVariant, user_input: str = "", top_n: int = 15) -> str:
+        """
+        渲染 analyze_intent 的框架上下文
+
+        Args:
+            variant: 上下文变体
+            user_input: 用户输入（仅 top_n 使用）
+            top_n: top_n 保留的框架数
+        """
+        if not self.entries or variant == ContextVariant.FULL:
+            return self.summary
+        if variant == ContextVariant.COMPACT:
+            return self.render_compact()
+        if variant == ContextVariant.DOMAIN:
+            return self.render_domain()
+        return self.render_top_n(user_input, top_n)
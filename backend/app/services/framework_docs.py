@@ -0,0 +1,235 @@
+"""
+框架文档解析与渲染
+把 references/frameworks/*.md 解析成按章节（概述、框架构成、详细说明、最佳实践……）
+组织的结构，生成提示词时可按模式只渲染需要的章节：
+- full：原文
+- compact：标题 + 概述 + 框架构成 + 最佳实践（只保留前 N 个示例）
+
+文档在首次使用时全部解析并缓存在进程内
+"""
+import glob
+import logging
+import os
+import re
+from enum import Enum
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class DocMode(str, Enum):
+    """框架文档渲染模式"""
+    FULL = "full"
+    COMPACT = "compact"
+
+
+class SectionKind(str, Enum):
+    """框架文档章节类型"""
+    URL = "url"
+    SCENARIOS = "scenarios"
+    OVERVIEW = "overview"
+    COMPONENTS = "components"
+    DETAILS = "details"
+    PROS = "pros"
+    CONS = "cons"
+    BEST_PRACTICES = "best_practices"
+    OTHER = "other"
+
+
+SECTION_TITLES = {
+    "网址": SectionKind.URL,
+    "应用场景": SectionKind.SCENARIOS,
+    "概述": SectionKind.OVERVIEW,
+    "框架构成": SectionKind.COMPONENTS,
+    "详细说明": SectionKind.DETAILS,
+    "优点": SectionKind.PROS,
+    "缺点": SectionKind.CONS,
+    "最佳实践": SectionKind.BEST_PRACTICES,
+}
+
+# compact 模式保留的章节（系统提示要求模型参考"框架构成"和"最佳实践"）
+COMPACT_SECTIONS = (SectionKind.OVERVIEW, SectionKind.COMPONENTS, SectionKind.BEST_PRACTICES)
+
+
+class FrameworkSection(BaseModel):
+    """框架文档的一个二级章节"""
+    kind: SectionKind
+    title: str
+    intro: str = ""  # 第一个三级标题之前的内容
+    examples: list[str] = []  # 三级标题子章节（含标题行），最佳实践中即各个示例
+
+    def render(self, max_examples: int | None = None) -> str:
+        examples = self.examples if max_examples is None else self.examples[:max_examples]
+        parts = [f"## {self.title}"]
+        if self.intro:
+            parts.append(self.intro)
+        parts.extend(examples)
+        return "\n\n".join(parts)
+
+
+class FrameworkDoc(BaseModel):
+    """解析后的框架文档"""
+    id: str
+    title: str
+    sections: list[FrameworkSection]
+    raw: str
+
+    def section(self, kind: SectionKind) -> FrameworkSection | None:
+        return next((s for s in self.sections if s.kind == kind), None)
+
+    def render_sections(
+        self, kinds: tuple[SectionKind, ...], max_examples: int | None = None
+    ) -> str:
+        """
+        只渲染指定类型的章节（按文档原有顺序）
+
+        Args:
+            kinds: 要保留的章节类型
+            max_examples: 每个章节最多保留的子章节数（None 表示全部）
+        """
+        parts = [f"# {self.title}"]
+        parts.extend(s.render(max_examples) for s in self.sections if s.kind in kinds)
+        return "\n\n".join(parts)
+
+    def render(self, mode: DocMode = DocMode.FULL, max_examples: int = 1) -> str:
+        """按模式渲染文档"""
+        if mode == DocMode.COMPACT:
+            return self.render_sections(COMPACT_SECTIONS, max_examples)
+        return self.raw
+
+
+def _split_headings(lines: list[str], prefix: str) -> tuple[list[str], list[list[str]]]:
+    """按标题前缀切分（忽略代码块中的行），返回 (标题前的行, [各段的行])"""
+    head: list[str] = []
+    blocks: list[list[str]] = []
+    in_fence = False
+    for line in lines:
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        if not in_fence and line.startswith(prefix):
+            blocks.append([line])
+        elif blocks:
+            blocks[-1].append(line)
+        else:
+            head.append(line)
+    return head, blocks
+
+
+def parse_framework_doc(text: str, framework_id: str = "") -> FrameworkDoc:
+    """
+    解析框架文档
+
+    Args:
+        text: Markdown 原文（"# 标题"，"## 章节"，"### 子章节"）
+        framework_id: 框架 ID
+
+    Returns:
+        解析结果；没有二级标题时整篇作为一个 OTHER 章节
+    """
+    head, blocks = _split_headings(text.splitlines(), "## ")
+    title = next(
+        (line[2:].strip() for line in head if line.startswith("# ")),
+        f"{framework_id} Framework",
+    )
+
+    sections = []
+    for block in blocks:
+        section_title = block[0][3:].strip()
+        intro, examples = _split_headings(block[1:], "### ")
+        sections.append(FrameworkSection(
+            kind=SECTION_TITLES.get(section_title, SectionKind.OTHER),
+            title=section_title,
+            intro="\n".join(intro).strip(),
+            examples=["\n".join(example).strip() for example in examples],
+        ))
+    if not sections:
+        body = "\n".join(line for line in head if not line.startswith("# ")).strip()
+        sections.append(FrameworkSection(kind=SectionKind.OTHER, title="说明", intro=body))
+
+    return FrameworkDoc(id=framework_id, title=title, sections=sections, raw=text)
+
+
+def normalize_framework_id(framework_id: str) -> str:
+    """框架 ID 归一化：忽略大小写、空格/下划线/标点和 Framework 后缀"""
+    key = re.sub(r"[^0-9a-z]", "", framework_id.lower())
+    return key.removesuffix("framework") or key
+
+
+def find_references_dir() -> str | None:
+    """查找 prompt-optimizer 的 references 目录（frontend/skills-main 或 skills-main）"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+    for base in (os.path.join(project_root, "frontend"), project_root):
+        path = os.path.join(base, "skills-main", "skills", "prompt-optimizer", "references")
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+class FrameworkDocStore:
+    """按框架 ID 查找解析后的框架文档"""
+
+    def __init__(self, frameworks_dir: str | None = None):
+        """
+        Args:
+            frameworks_dir: 框架文档目录（None 表示自动查找 references/frameworks）
+        """
+        if frameworks_dir is None:
+            references_dir = find_references_dir()
+            frameworks_dir = os.path.join(references_dir, "frameworks") if references_dir else ""
+        self.frameworks_dir = frameworks_dir
+        self._docs: dict[str, FrameworkDoc] = {}
+        # 文件名格式：XX_FrameworkName_Framework.md
+        for path in sorted(glob.glob(os.path.join(frameworks_dir, "*_Framework.md"))):
+            stem = os.path.basename(path).removesuffix("_Framework.md")
+            framework_id = stem.split("_", 1)[1] if "_" in stem else stem
+            with open(path, encoding="utf-8") as f:
+                doc = parse_framework_doc(f.read(), framework_id.replace("_", " "))
+            self._docs[normalize_framework_id(framework_id)] = doc
+        if self._docs:
+            logger.info(f"Loaded {len(self._docs)} framework docs from {frameworks_dir}")
+        else:
+            logger.warning(f"No framework docs found in {frameworks_dir!r}")
+
+    def get(self, framework_id: str) -> FrameworkDoc | None:
+        return self._docs.get(normalize_framework_id(framework_id))
+
+    def all(self) -> list[FrameworkDoc]:
+        return list(self._docs.values())
+
+    def render(self, framework_id: str, mode: DocMode = DocMode.FULL) -> str:
+        """
+        渲染框架文档，找不到时返回基本说明
+
+        Args:
+            framework_id: 框架 ID（例如：Chain of Thought）
+            mode: 渲染模式
+        """
+        doc = self.get(framework_id)
+        if doc is None:
+            logger.warning(f"Framework file not found for: {framework_id}")
+            return f"""# {framework_id} Framework
+
+## 概述
+这是 {framework_id} 框架的基本说明。
+
+## 应用场景
+适用于各种提示词优化场景。
+
+## 框架构成
+请根据用户需求和框架特点生成优化后的提示词。
+"""
+        return doc.render(mode)
+
+
+# 全局文档库实例
+_doc_store: FrameworkDocStore | None = None
+
+
+def get_framework_doc_store() -> FrameworkDocStore:
+    """获取全局框架文档库实例"""
+    global _doc_store
+    if _doc_store is None:
+        _doc_store = FrameworkDocStore()
+    return _doc_store
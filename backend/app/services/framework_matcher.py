@@ -7,7 +7,17 @@ import os
 
 from pydantic import BaseModel
 
+from app.config import get_settings
+
 from .base_llm import BaseLLMService
+from .framework_catalog import ContextVariant, FrameworkCatalog, FrameworkEntry
+from .framework_priors import adjust_score, load_priors
+from .framework_scorer import FrameworkScorer, domain_hits
+from .intent_output import IntentMatch
+from .match_log import get_match_log
+from .metrics import FRAMEWORK_MATCH_IDS_TOTAL
+from .token_estimator import estimate_tokens
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +40,49 @@ class UserType:
 class FrameworkMatcher:
     """根据用户输入匹配最合适的 Prompt 框架"""
 
-    def __init__(self, llm_service: BaseLLMService):
+    def __init__(
+        self,
+        llm_service: BaseLLMService,
+        context_variant: ContextVariant | None = None
+    ):
+        """
+        Args:
+            llm_service: 用于意图分析的 LLM 服务
+            context_variant: analyze_intent 的框架上下文变体（None 表示使用配置）
+        """
+        settings = get_settings()
         self.llm_service = llm_service
         self.frameworks_summary = self._load_frameworks_summary()
-        self.frameworks_descriptions = self._load_frameworks_descriptions()
+        self.catalog = FrameworkCatalog(self.frameworks_summary)
+        self.scorer = FrameworkScorer(self.catalog)
+        self.local_confidence_threshold = settings.match_local_confidence_threshold
+        # 由匹配反馈日志离线拟合的按领域框架先验（scripts/fit_framework_priors.py）
+        self.priors = load_priors(settings.framework_priors_path)
+        self.prior_weight = settings.framework_prior_weight
+        self.context_variant = context_variant or ContextVariant(settings.intent_context_variant)
+        self.context_top_n = settings.intent_context_top_n
+
+        # 与输入无关的上下文变体只在初始化时生成一次
+        self.intent_contexts = {
+            variant: self.catalog.render(variant)
+            for variant in ContextVariant
+            if variant != ContextVariant.TOP_N
+        }
+        logger.info(
+            f"Intent context variant={self.context_variant.value}, estimated tokens: "
+            + ", ".join(
+                f"{variant.value}={estimate_tokens(context)}"
+                for variant, context in self.intent_contexts.items()
+            )
+        )
+
+    def intent_context(self, user_input: str) -> str:
+        """当前配置的变体下，analyze_intent 使用的框架上下文"""
+        if self.context_variant == ContextVariant.TOP_N:
+            return self.catalog.render_top_n(user_input, self.context_top_n)
+        return self.intent_contexts[self.context_variant]
 
+    @traced("FrameworkMatcher._load_frameworks_summary")
     def _load_frameworks_summary(self) -> str:
         """加载 Frameworks_Summary.md 表格"""
         try:
@@ -98,65 +146,6 @@ class FrameworkMatcher:
             logger.error(f"Error loading frameworks summary: {e}")
             raise
 
-    def _load_frameworks_descriptions(self) -> dict:
-        """
-        从 Frameworks_Summary.md 加载所有框架的应用场景描述
-        
-        Returns:
-            dict: 框架名称 -> 应用场景描述的映射
-        """
-        descriptions = {}
-        try:
-            # 解析 Frameworks_Summary.md 表格
-            lines = self.frameworks_summary.split('\n')
-            
-            # 查找表格内容（跳过标题行和分隔行）
-            in_table = False
-            for line in lines:
-                line = line.strip()
-                
-                # 检测表格开始
-                if line.startswith('|') and '框架名称' in line:
-                    in_table = True
-                    continue
-                
-                # 跳过分隔行
-                if line.startswith('|:---') or line.startswith('|---'):
-                    continue
-                
-                # 检测表格结束（遇到 --- 分隔线或空行后的非表格内容）
-                if in_table and line.startswith('---'):
-                    break
-                
-                # 解析表格行
-                if in_table and line.startswith('|'):
-                    parts = [p.strip() for p in line.split('|')]
-                    # parts 格式: ['', '序号', '框架名称', '应用场景', '']
-                    if len(parts) >= 4:
-                        framework_name = parts[2].strip()
-                        scenarios = parts[3].strip()
-                        
-                        if framework_name and scenarios and framework_name != '框架名称':
-                            # 添加说明文字，使描述更友好
-                            formatted_description = f"适用场景：{scenarios}"
-                            
-                            # 存储带 "Framework" 后缀的版本
-                            descriptions[framework_name] = formatted_description
-                            
-                            # 同时存储不带 "Framework" 后缀的版本
-                            if framework_name.endswith(' Framework'):
-                                base_name = framework_name.replace(' Framework', '')
-                                descriptions[base_name] = formatted_description
-                            
-                            logger.debug(f"Loaded description for {framework_name}: {scenarios[:50]}...")
-            
-            logger.info(f"Loaded {len(descriptions)} framework descriptions from Frameworks_Summary.md")
-            return descriptions
-
-        except Exception as e:
-            logger.error(f"Error loading framework descriptions: {e}")
-            return {}
-
     def _extract_framework_name(self, content: str) -> str:
         """从框架文档中提取框架名称"""
         lines = content.split('\n')
@@ -183,10 +172,12 @@ class FrameworkMatcher:
 
         return ' '.join(overview_lines) if overview_lines else ""
 
+    @traced("FrameworkMatcher.match_frameworks")
     async def match_frameworks(
         self,
         user_input: str,
-        user_type: str = UserType.FREE
+        user_type: str = UserType.FREE,
+        attachment_content: str | None = None
     ) -> list[FrameworkCandidate]:
         """
         匹配 1-3 个最合适的框架
@@ -194,65 +185,172 @@ class FrameworkMatcher:
         Args:
             user_input: 用户输入的原始提示词或需求
             user_type: 用户类型（Free/Pro）
+            attachment_content: 附件摘录（可选，作为意图分析的补充上下文）
 
         Returns:
             1-3 个框架候选，按匹配度排序
         """
+        query = user_input
+        if attachment_content:
+            query = f"{user_input}\n\n参考附件摘录：\n{attachment_content}"
         try:
-            # 调用 LLM 分析意图
-            framework_ids = await self.llm_service.analyze_intent(
-                user_input=user_input,
-                frameworks_context=self.frameworks_summary
+            scored = self.scorer.score(query)
+            candidates = self.local_candidates(query, scored)
+        except Exception as e:
+            logger.error(f"Error scoring frameworks locally: {e}")
+            scored, candidates = None, []
+
+        if candidates and candidates[0].match_score >= self.local_confidence_threshold:
+            logger.info(
+                f"Local match score {candidates[0].match_score} above threshold, skipping LLM"
+            )
+            source = "local"
+        else:
+            try:
+                candidates = await self.match_with_llm(query, scored)
+                source = "llm"
+                logger.info(f"Matched {len(candidates)} frameworks for user input")
+            except Exception as e:
+                # LLM 调用失败或输出无法解析时使用本地打分的候选
+                logger.error(f"Error matching frameworks with LLM, using local candidates: {e}")
+                source = "local"
+            if not candidates:
+                candidates, source = [self.default_candidate()], "default"
+
+        match_log = get_match_log()
+        if match_log:
+            match_log.record_match(
+                user_input, [(c.id, c.match_score) for c in candidates], source
             )
+        return candidates
+
+    async def match_with_llm(
+        self,
+        user_input: str,
+        scored: list[tuple[FrameworkEntry, float]] | None = None
+    ) -> list[FrameworkCandidate]:
+        """
+        调用 LLM 分析意图并与框架目录核对（模型推荐的框架都无法识别时按本地打分匹配）
+
+        Args:
+            user_input: 用户输入
+            scored: 本地打分结果（FrameworkScorer.score，None 表示在此计算）
 
-            # 构建框架候选列表
-            candidates = []
-            for idx, framework_id in enumerate(framework_ids):
-                # 尝试多种方式查找框架描述
-                description = None
-
-                # 1. 直接匹配
-                description = self.frameworks_descriptions.get(framework_id)
-
-                # 2. 添加 " Framework" 后缀尝试
-                if not description:
-                    description = self.frameworks_descriptions.get(f"{framework_id} Framework")
-
-                # 3. 移除 " Framework" 后缀尝试
-                if not description and framework_id.endswith(" Framework"):
-                    base_name = framework_id.replace(" Framework", "")
-                    description = self.frameworks_descriptions.get(base_name)
-
-                # 4. 使用默认描述
-                if not description:
-                    description = f"适用于用户需求的 {framework_id} 框架"
-                    logger.warning(f"No description found for framework: {framework_id}")
-
-                candidate = FrameworkCandidate(
-                    id=framework_id,
-                    name=framework_id,
-                    description=description,
-                    match_score=1.0 - (idx * 0.1),  # 第一个得分最高
-                    reasoning=f"基于用户输入分析，{framework_id} 最适合此场景"
-                )
-                candidates.append(candidate)
-
-            logger.info(f"Matched {len(candidates)} frameworks for user input")
+        Raises:
+            Exception: LLM 调用失败或输出无法解析
+        """
+        matches = await self.llm_service.analyze_intent(
+            user_input=user_input,
+            frameworks_context=self.intent_context(user_input)
+        )
+        scored = scored or self.scorer.score(user_input)
+        candidates = self._build_candidates(
+            matches, {entry.id: score for entry, score in scored}
+        )
+        if candidates:
+            return self.apply_priors(candidates, user_input)
+        logger.warning(
+            f"意图分析未返回有效框架 {[m.id for m in matches]}，按本地相似度打分匹配"
+        )
+        return self.local_candidates(user_input, scored) or [self.default_candidate()]
+
+    def _build_candidates(
+        self, matches: list[IntentMatch], local_scores: dict[str, float]
+    ) -> list[FrameworkCandidate]:
+        """
+        把模型推荐的框架与框架目录核对，丢弃无法识别的 ID 和重复项
+
+        Args:
+            matches: 模型推荐的框架
+            local_scores: 框架 ID -> 本地打分（模型没有给出匹配度时使用）
+        """
+        candidates: list[FrameworkCandidate] = []
+        for match in matches:
+            entry, result = self.catalog.resolve(match.id)
+            FRAMEWORK_MATCH_IDS_TOTAL.labels(result).inc()
+            if entry is None:
+                logger.warning(f"Unknown framework returned by intent analysis: {match.id}")
+                continue
+            if result != "exact":
+                logger.info(f"Resolved framework id {match.id!r} -> {entry.id} ({result})")
+            if any(candidate.id == entry.id for candidate in candidates):
+                continue
+            candidates.append(FrameworkCandidate(
+                id=entry.id,
+                name=entry.name,
+                description=entry.description,
+                match_score=(
+                    match.score if match.score is not None else local_scores.get(entry.id, 0.0)
+                ),
+                reasoning=match.reasoning or f"基于用户输入分析，{entry.id} 最适合此场景",
+            ))
+        return candidates
+
+    def apply_priors(
+        self, candidates: list[FrameworkCandidate], user_input: str
+    ) -> list[FrameworkCandidate]:
+        """按输入命中领域的框架先验调整匹配度并重新排序（没有加载先验时原样返回）"""
+        if self.priors is None:
             return candidates
+        domains = domain_hits(user_input)
+        for candidate in candidates:
+            lift = self.priors.lift(candidate.id, domains)
+            candidate.match_score = adjust_score(candidate.match_score, lift, self.prior_weight)
+        return sorted(candidates, key=lambda candidate: -candidate.match_score)
 
-        except Exception as e:
-            logger.error(f"Error matching frameworks: {e}")
-            # 返回一个默认框架作为后备
-            default_description = self.frameworks_descriptions.get(
-                "RACEF Framework",
-                "通用的头脑风暴和创意生成框架"
+    def local_candidates(
+        self,
+        user_input: str,
+        scored: list[tuple[FrameworkEntry, float]] | None = None,
+        limit: int = 3
+    ) -> list[FrameworkCandidate]:
+        """
+        不调用 LLM 的候选：本地打分经框架先验调整后的前 limit 个框架
+
+        Args:
+            user_input: 用户输入
+            scored: 本地打分结果（FrameworkScorer.score，None 表示在此计算）
+            limit: 最多保留的框架数
+        """
+        scored = scored or self.scorer.score(user_input)
+        if self.priors is None:
+            return self.keyword_candidates(scored, limit)
+        # 先验可能改变排序，先对所有匹配度大于 0 的框架调整再截取
+        candidates = self.keyword_candidates(scored, limit=None)
+        return self.apply_priors(candidates, user_input)[:limit]
+
+    def keyword_candidates(
+        self, ranked: list[tuple[FrameworkEntry, float]], limit: int | None = 3
+    ) -> list[FrameworkCandidate]:
+        """
+        由本地打分结果（FrameworkScorer.score / score_batch）生成候选
+
+        Args:
+            ranked: (框架, 校准后的匹配度) 列表，按匹配度降序
+            limit: 最多保留的框架数（None 表示不限）
+
+        Returns:
+            匹配度大于 0 的前 limit 个框架
+        """
+        return [
+            FrameworkCandidate(
+                id=entry.id,
+                name=entry.name,
+                description=entry.description,
+                match_score=score,
+                reasoning="按应用场景和领域相似度匹配",
             )
-            return [
-                FrameworkCandidate(
-                    id="RACEF",
-                    name="RACEF Framework",
-                    description=default_description,
-                    match_score=1.0,
-                    reasoning="默认推荐框架"
-                )
-            ]
+            for entry, score in ranked[:limit]
+            if score > 0
+        ]
+
+    def default_candidate(self) -> FrameworkCandidate:
+        """默认推荐框架"""
+        entry = self.catalog.get("RACEF")
+        return FrameworkCandidate(
+            id="RACEF",
+            name=entry.name if entry else "RACEF Framework",
+            description=entry.description if entry else "通用的头脑风暴和创意生成框架",
+            match_score=1.0,
+            reasoning="默认推荐框架"
+        )
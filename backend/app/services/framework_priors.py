@@ -0,0 +1,144 @@
+"""
+按领域的框架先验
+由匹配反馈日志（match_log）离线拟合：对每个领域统计每个框架被展示为候选的次数和被用户选用的次数，
+选用率向全局选用率平滑后除以全局选用率得到提升系数（> 1 表示该领域的用户更常选它）。
+只统计展示过的框架，避免"从未推荐所以从未被选"的偏差。
+
+FrameworkMatcher 启动时加载先验，按输入命中的领域把匹配度的几率乘以提升系数，
+对本地打分和 LLM 候选重新排序
+"""
+import json
+import logging
+import math
+import os
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# 没有命中任何领域的输入使用的全局先验
+GLOBAL_DOMAIN = "*"
+
+# 选用率平滑的伪计数（展示次数远小于该值时提升系数接近 1）
+DEFAULT_SMOOTHING = 20.0
+
+# 提升系数与 1 相差不到该值时不保存
+MIN_LIFT_DELTA = 0.01
+
+
+class FrameworkPriors(BaseModel):
+    """按领域的框架提升系数"""
+    generated_at: str
+    samples: int  # 拟合用到的（匹配, 选用）对数
+    base_rate: float  # 全局选用率：选用次数 / 展示次数
+    lifts: dict[str, dict[str, float]]  # 领域（"*" 为全局）-> 框架 ID -> 提升系数
+
+    def lift(self, framework_id: str, domains: dict[str, float]) -> float:
+        """
+        输入命中的各领域提升系数的加权几何平均
+
+        Args:
+            framework_id: 框架 ID
+            domains: 领域 -> 权重（framework_scorer.domain_hits；为空时用全局先验）
+        """
+        hits = domains or {GLOBAL_DOMAIN: 1.0}
+        total = sum(hits.values())
+        log_lift = sum(
+            weight * math.log(self.lifts.get(domain, {}).get(framework_id, 1.0))
+            for domain, weight in hits.items()
+        )
+        return math.exp(log_lift / total)
+
+
+def adjust_score(score: float, lift: float, weight: float = 1.0) -> float:
+    """把匹配度的几率乘以 lift ** weight（0 和 1 保持不变）"""
+    if score <= 0 or score >= 1:
+        return score
+    odds = score / (1 - score) * lift ** weight
+    return round(odds / (1 + odds), 3)
+
+
+def fit_priors(
+    events: Iterable[dict[str, Any]], smoothing: float = DEFAULT_SMOOTHING
+) -> FrameworkPriors:
+    """
+    由匹配反馈日志拟合框架先验
+
+    每个 choice 事件与同一输入最近一次 match 事件配对（一次匹配只配对一次），
+    没有对应 match 事件的选用无法得知领域，不参与拟合
+
+    Args:
+        events: match_log.read_events 读出的事件（按写入顺序）
+        smoothing: 选用率平滑的伪计数
+
+    Returns:
+        框架先验
+    """
+    latest_match: dict[str, dict[str, Any]] = {}
+    shown: dict[str, dict[str, float]] = {}
+    chosen: dict[str, dict[str, float]] = {}
+    samples = 0
+
+    for event in events:
+        key = event.get("key")
+        if event["event"] == "match":
+            latest_match[key] = event
+            continue
+        match = latest_match.pop(key, None)
+        framework_id = event.get("framework")
+        if match is None or not framework_id:
+            continue
+        samples += 1
+        domains = match.get("domains") or []
+        # 全局计数权重为 1，各领域平分权重 1
+        weights = {GLOBAL_DOMAIN: 1.0, **{d: 1.0 / len(domains) for d in domains}}
+        for candidate in {*match.get("candidates", []), framework_id}:
+            for domain, weight in weights.items():
+                shown.setdefault(domain, {}).setdefault(candidate, 0.0)
+                shown[domain][candidate] += weight
+                if candidate == framework_id:
+                    chosen.setdefault(domain, {}).setdefault(candidate, 0.0)
+                    chosen[domain][candidate] += weight
+
+    total_shown = sum(shown.get(GLOBAL_DOMAIN, {}).values())
+    base_rate = sum(chosen.get(GLOBAL_DOMAIN, {}).values()) / total_shown if total_shown else 0.0
+
+    lifts: dict[str, dict[str, float]] = {}
+    if base_rate > 0:
+        for domain, counts in shown.items():
+            for framework_id, shown_count in counts.items():
+                chosen_count = chosen.get(domain, {}).get(framework_id, 0.0)
+                rate = (chosen_count + smoothing * base_rate) / (shown_count + smoothing)
+                lift = rate / base_rate
+                if abs(lift - 1) >= MIN_LIFT_DELTA:
+                    lifts.setdefault(domain, {})[framework_id] = round(lift, 3)
+
+    return FrameworkPriors(
+        generated_at=datetime.now(UTC).isoformat(),
+        samples=samples,
+        base_rate=round(base_rate, 4),
+        lifts=lifts,
+    )
+
+
+def load_priors(path: str) -> FrameworkPriors | None:
+    """加载先验文件（未配置、不存在或格式错误时返回 None）"""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        logger.warning(f"Framework priors file not found: {path}")
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            priors = FrameworkPriors.model_validate(json.load(f))
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load framework priors from {path}: {e}")
+        return None
+    logger.info(
+        f"Loaded framework priors from {path}: {priors.samples} samples, "
+        f"{sum(len(lifts) for lifts in priors.lifts.values())} lifts"
+    )
+    return priors
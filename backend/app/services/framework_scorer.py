@@ -0,0 +1,165 @@
+"""
+框架相似度打分
+初始化时把每个框架表示为稀疏特征向量，组成 框架 × 特征 矩阵（按列存储）：
+- 应用场景：场景文本检索词（中文二元组 / 英文单词）的 tf-idf，按行 L2 归一化
+- 领域：分类表"按应用领域分类"中的领域；输入通过领域关键词映射到同一组特征
+- 复杂度：分类表"按复杂度分类"中的层级；输入的复杂度按长度和要求数估计
+
+每条输入只做一次稀疏矩阵 × 向量（只遍历输入非零特征对应的列），57 个框架的打分在 1ms 以内。
+原始得分（0-1，三部分按权重相加）经逻辑函数校准为匹配概率作为 match_score；
+校准参数由 benchmarks/eval_framework_scorer.py --fit 在标注数据集上拟合
+"""
+import math
+import re
+
+from .attachment_processor import extract_terms
+from .framework_catalog import FrameworkCatalog, FrameworkEntry
+from .token_estimator import estimate_tokens
+
+# 三部分特征在原始得分中的权重（各部分的相似度都在 0-1 之间）
+TEXT_WEIGHT = 0.6
+DOMAIN_WEIGHT = 0.3
+COMPLEXITY_WEIGHT = 0.1
+
+# 校准参数 (slope, intercept)：match_score = sigmoid(slope * 原始得分 + intercept)
+DEFAULT_CALIBRATION = (12.69, -4.31)
+
+COMPLEXITY_TIERS = ("简单", "中等", "复杂")
+
+# 领域（与分类表一致）-> 输入中提示该领域的关键词
+DOMAIN_KEYWORDS = {
+    "营销内容": ("营销", "推广", "广告", "文案", "品牌", "销售", "转化", "促销"),
+    "决策分析": ("决策", "利弊", "优先级", "权衡", "评估", "选择", "风险"),
+    "教育培训": ("教学", "学生", "课程", "培训", "教育", "学习", "讲解", "解释"),
+    "产品开发": ("产品", "功能", "创新", "需求", "用户体验", "改进", "竞争"),
+    "AI对话/助手": ("助手", "机器人", "客服", "系统提示词", "人设", "对话", "角色"),
+    "写作创作": ("写作", "文章", "博客", "故事", "小说", "创作", "报道", "段落"),
+    "图像生成": ("图像", "图片", "插画", "绘画", "海报", "摄影", "画面", "构图"),
+    "快速简单任务": ("翻译", "总结", "摘要", "改写", "润色"),
+    "复杂推理": ("推理", "计算", "数学", "证明", "一步步", "逐步", "求解"),
+}
+
+# 提示需求较复杂的词
+COMPLEX_CUES = ("全面", "详细", "系统性", "完整", "多角度", "分层次")
+
+_CLAUSE_RE = re.compile(r"[，,。；;、！!？?\n]")
+
+
+def estimate_complexity(user_input: str) -> str:
+    """按长度、分句数和提示词估计输入需求的复杂度层级"""
+    clauses = [clause for clause in _CLAUSE_RE.split(user_input) if clause.strip()]
+    tokens = estimate_tokens(user_input)
+    if len(clauses) >= 5 or tokens >= 120 or any(cue in user_input for cue in COMPLEX_CUES):
+        return "复杂"
+    if len(clauses) <= 1 and tokens < 30:
+        return "简单"
+    return "中等"
+
+
+def domain_hits(user_input: str) -> dict[str, float]:
+    """输入命中的领域 -> 命中的领域关键词数"""
+    text = user_input.lower()
+    hits = {
+        domain: float(sum(keyword in text for keyword in keywords))
+        for domain, keywords in DOMAIN_KEYWORDS.items()
+    }
+    return {domain: count for domain, count in hits.items() if count}
+
+
+def _normalized(vector: dict[str, float]) -> dict[str, float]:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {key: value / norm for key, value in vector.items()} if norm else {}
+
+
+class FrameworkScorer:
+    """框架 × 特征 稀疏矩阵，对输入计算所有框架的校准匹配度"""
+
+    def __init__(
+        self,
+        catalog: FrameworkCatalog,
+        calibration: tuple[float, float] = DEFAULT_CALIBRATION,
+    ):
+        """
+        Args:
+            catalog: 框架目录（应用场景、领域和复杂度来自 Frameworks_Summary.md）
+            calibration: 校准参数 (slope, intercept)
+        """
+        self.entries = catalog.entries
+        self.slope, self.intercept = calibration
+
+        entry_terms = [extract_terms(" ".join(entry.scenarios)) for entry in self.entries]
+        document_frequency: dict[str, int] = {}
+        for terms in entry_terms:
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        self._idf = {
+            term: math.log(1 + len(self.entries) / df)
+            for term, df in document_frequency.items()
+        }
+
+        # 按列存储：特征 -> [(框架下标, 权重)]；各部分先按行归一化再乘以权重
+        self._columns: dict[str, list[tuple[int, float]]] = {}
+        for i, (entry, terms) in enumerate(zip(self.entries, entry_terms, strict=True)):
+            row = {
+                f"t:{term}": TEXT_WEIGHT * value
+                for term, value in _normalized(
+                    {term: count * self._idf[term] for term, count in terms.items()}
+                ).items()
+            }
+            row.update(
+                (f"d:{domain}", DOMAIN_WEIGHT * value)
+                for domain, value in _normalized(dict.fromkeys(entry.domains, 1.0)).items()
+            )
+            if entry.complexity:
+                row[f"c:{entry.complexity}"] = COMPLEXITY_WEIGHT
+            for feature, weight in row.items():
+                self._columns.setdefault(feature, []).append((i, weight))
+
+    def input_vector(self, user_input: str) -> dict[str, float]:
+        """输入的稀疏特征向量（各部分分别归一化，与框架行向量的点积在 0-1 之间）"""
+        vector = {
+            f"t:{term}": value
+            for term, value in _normalized({
+                term: self._idf[term]
+                for term in extract_terms(user_input)
+                if term in self._idf
+            }).items()
+        }
+        vector.update(
+            (f"d:{domain}", value) for domain, value in _normalized(domain_hits(user_input)).items()
+        )
+        # 复杂度：估计的层级为 1，相邻层级为 0.5
+        tier = COMPLEXITY_TIERS.index(estimate_complexity(user_input))
+        for i, name in enumerate(COMPLEXITY_TIERS):
+            if abs(i - tier) <= 1:
+                vector[f"c:{name}"] = 1.0 if i == tier else 0.5
+        return vector
+
+    def raw_scores(self, user_input: str) -> list[float]:
+        """所有框架的原始得分（与 entries 顺序一致）：稀疏矩阵 × 输入向量"""
+        scores = [0.0] * len(self.entries)
+        for feature, value in self.input_vector(user_input).items():
+            for i, weight in self._columns.get(feature, ()):
+                scores[i] += weight * value
+        return scores
+
+    def calibrate(self, raw: float) -> float:
+        """原始得分 -> 匹配概率（得分不超过复杂度权重，即没有场景或领域证据时为 0）"""
+        if raw <= COMPLEXITY_WEIGHT:
+            return 0.0
+        return 1 / (1 + math.exp(-(self.slope * raw + self.intercept)))
+
+    def score(self, user_input: str) -> list[tuple[FrameworkEntry, float]]:
+        """
+        对所有框架打分
+
+        Returns:
+            (框架, 校准后的匹配度 0-1) 列表，按匹配度降序，相同时按摘要中的序号
+        """
+        scores = [self.calibrate(raw) for raw in self.raw_scores(user_input)]
+        order = sorted(range(len(self.entries)), key=lambda i: (-scores[i], i))
+        return [(self.entries[i], round(scores[i], 3)) for i in order]
+
+    def score_batch(self, inputs: list[str]) -> list[list[tuple[FrameworkEntry, float]]]:
+        """批量打分，结果与 inputs 一一对应（同 score）"""
+        return [self.score(user_input) for user_input in inputs]
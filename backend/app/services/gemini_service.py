@@ -1,43 +1,273 @@
 """
 Google Gemini API 服务
 """
+import asyncio
+import json
 import logging
+import time
+from collections.abc import AsyncIterator
+from typing import Any
 
 import httpx
 
 from .base_llm import BaseLLMService
+from .concurrency_limiter import get_concurrency_limiter
+from .intent_output import (
+    INTENT_MAX_OUTPUT_TOKENS,
+    INTENT_OUTPUT_FORMAT,
+    INTENT_RESPONSE_SCHEMA,
+    IntentMatch,
+    parse_intent_response,
+)
+from .metrics import LLM_TIME_TO_FIRST_TOKEN
+from .model_registry import ModelSpec, ProviderSpec, get_model_registry
+from .prompt_builder import build_generation_prompt
+from .retry_policy import RetryPolicy, attempt_timeout, get_retry_policy
+from .tracing import traced
+from .usage_tracker import get_usage_tracker, parse_gemini_usage
 
 logger = logging.getLogger(__name__)
 
+# 按 base_url 共享的连接池（API 密钥放在请求头中，不同密钥的请求可以复用同一批连接）
+_shared_clients: dict[str, tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+
+def _create_client(
+    base_url: str,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=True,
+        transport=transport,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        headers={"Content-Type": "application/json"},
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+    )
+
+
+def _get_shared_client(base_url: str) -> httpx.AsyncClient:
+    """按事件循环延迟创建共享客户端（HTTP/2 多路复用 + 连接池）"""
+    loop = asyncio.get_running_loop()
+    entry = _shared_clients.get(base_url)
+    if entry is None or entry[1] is not loop or entry[0].is_closed:
+        client = _create_client(base_url)
+        _shared_clients[base_url] = (client, loop)
+        return client
+    return entry[0]
+
+
+async def close_shared_clients():
+    """关闭当前事件循环创建的共享客户端（应用关闭时调用）"""
+    loop = asyncio.get_running_loop()
+    for base_url, (client, client_loop) in list(_shared_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            del _shared_clients[base_url]
+
 
 class GeminiService(BaseLLMService):
     """Google Gemini API 服务"""
 
-    def __init__(self, api_key: str, base_url: str = "https://generativelanguage.googleapis.com"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://generativelanguage.googleapis.com",
+        retry_policy: RetryPolicy | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        spec: ProviderSpec | None = None,
+    ):
+        """
+        Args:
+            api_key: Gemini API 密钥
+            base_url: API 地址
+            retry_policy: 重试策略（默认按配置创建）
+            transport: 自定义传输层（测试/基准测试使用），指定时使用独立客户端而非共享连接池
+            spec: 服务商声明（默认使用注册表中的 gemini）
+        """
+        self.spec = spec or get_model_registry().get("gemini").model_copy(
+            update={"base_url": base_url}
+        )
         self.api_key = api_key
-        self.base_url = base_url
-        self.model = "gemini-3-pro-preview"  # 使用 Gemini 3 Pro Preview 模型
-        self.client = httpx.AsyncClient(
-            timeout=60.0,
-            headers={
-                "Content-Type": "application/json"
-            }
+        self.provider = self.spec.name
+        self.base_url = self.spec.base_url
+        self.model = self.spec.default_model  # 默认 Gemini 3 Pro Preview，轻量调用用小模型
+        # 密钥通过请求头传递，避免出现在 URL（日志、代理）中
+        self.headers = {"x-goog-api-key": api_key}
+        self.retry_policy = retry_policy or get_retry_policy(self.provider)
+        self._client = _create_client(base_url, transport) if transport else None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or _get_shared_client(self.base_url)
+
+    def _select_model(
+        self, body: dict[str, Any], operation: str, model: ModelSpec | None = None
+    ) -> ModelSpec:
+        """按调用类型选择模型（已选定时沿用），并将 maxOutputTokens 限制在模型上限内"""
+        model = model or self.select_model(operation)
+        config = body.get("generationConfig")
+        if config and "maxOutputTokens" in config:
+            config["maxOutputTokens"] = model.clamp_output(config["maxOutputTokens"])
+        return model
+
+    def _record_usage(
+        self,
+        operation: str,
+        model: ModelSpec,
+        start: float,
+        result: dict[str, Any] | None,
+        success: bool = True,
+    ):
+        get_usage_tracker().record(
+            provider=self.provider,
+            model=(result or {}).get("modelVersion") or model.name,
+            operation=operation,
+            usage=parse_gemini_usage(result) if result else None,
+            latency_ms=(time.perf_counter() - start) * 1000,
+            success=success,
+        )
+
+    @traced("GeminiService._generate_content")
+    async def _generate_content(
+        self,
+        body: dict[str, Any],
+        operation: str,
+        model: ModelSpec | None = None
+    ) -> dict[str, Any]:
+        """
+        调用 generateContent 接口（按重试策略重试）并记录用量
+
+        Args:
+            body: 请求体
+            operation: 调用类型（用于用量统计）
+            model: 已选定的模型（None 表示按调用类型选择）
+
+        Returns:
+            API 响应 JSON
+        """
+        model = self._select_model(body, operation, model)
+        url = f"/v1beta/models/{model.name}:generateContent"
+
+        async def send(remaining: float | None) -> httpx.Response:
+            return await self.client.post(
+                url, json=body, headers=self.headers,
+                timeout=attempt_timeout(remaining, read=60.0),
+            )
+
+        start = time.perf_counter()
+        try:
+            async with get_concurrency_limiter(self.provider, model).slot():
+                response = await self.retry_policy.execute(send, provider=self.provider)
+            result = response.json()
+        except Exception:
+            self._record_usage(operation, model, start, None, success=False)
+            raise
+
+        self._record_usage(operation, model, start, result)
+        return result
+
+    async def _stream_generate_content(
+        self,
+        body: dict[str, Any],
+        operation: str,
+        model: ModelSpec | None = None
+    ) -> AsyncIterator[str]:
+        """
+        调用 streamGenerateContent 接口（SSE），逐块产出文本
+
+        只在收到首个数据块之前按重试策略重试；最后一个数据块中的
+        usageMetadata 用于记录用量
+
+        Args:
+            body: 请求体
+            operation: 调用类型（用于用量统计）
+            model: 已选定的模型（None 表示按调用类型选择）
+
+        Yields:
+            生成的文本片段
+        """
+        model = self._select_model(body, operation, model)
+        url = f"/v1beta/models/{model.name}:streamGenerateContent"
+
+        async def send(remaining: float | None) -> httpx.Response:
+            request = self.client.build_request(
+                "POST", url, params={"alt": "sse"}, json=body, headers=self.headers,
+                timeout=attempt_timeout(remaining, read=60.0),
+            )
+            response = await self.client.send(request, stream=True)
+            if response.is_error:
+                # 读取错误响应体，便于重试策略记录日志，同时释放连接
+                await response.aread()
+            return response
+
+        start = time.perf_counter()
+        last_chunk: dict[str, Any] | None = None
+        try:
+            async with get_concurrency_limiter(self.provider, model).slot():
+                response = await self.retry_policy.execute(send, provider=self.provider)
+                try:
+                    first = True
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        chunk = json.loads(line[5:])
+                        last_chunk = chunk
+                        for candidate in chunk.get("candidates") or []:
+                            for part in (candidate.get("content") or {}).get("parts") or []:
+                                text = part.get("text")
+                                if not text:
+                                    continue
+                                if first:
+                                    first = False
+                                    LLM_TIME_TO_FIRST_TOKEN.labels(
+                                        self.provider, operation
+                                    ).observe(time.perf_counter() - start)
+                                yield text
+                finally:
+                    await response.aclose()
+        except Exception:
+            self._record_usage(operation, model, start, None, success=False)
+            raise
+
+        self._record_usage(operation, model, start, last_chunk)
+
+    @traced("GeminiService.complete")
+    async def complete(
+        self,
+        prompt: str,
+        operation: str,
+        max_tokens: int,
+        temperature: float = 0.3
+    ) -> str:
+        """单轮文本补全"""
+        result = await self._generate_content(
+            {
+                "contents": [{"parts": [{"text": prompt}]}],
+                "generationConfig": {
+                    "temperature": temperature,
+                    "maxOutputTokens": max_tokens,
+                },
+            },
+            operation=operation,
         )
+        return result["candidates"][0]["content"]["parts"][0]["text"].strip()
 
+    @traced("GeminiService.analyze_intent")
     async def analyze_intent(
         self,
         user_input: str,
         frameworks_context: str
-    ) -> list[str]:
+    ) -> list[IntentMatch]:
         """
-        分析用户意图并返回推荐的框架 ID
+        分析用户意图并返回推荐的框架（JSON 输出，按 responseSchema 约束结构）
 
         Args:
             user_input: 用户输入的原始提示词或需求
-            frameworks_context: 框架映射表上下文（Frameworks_Summary.md）
+            frameworks_context: 框架上下文（Frameworks_Summary.md 原文或预先生成的精简变体）
 
         Returns:
-            1-3 个框架 ID 列表
+            1-3 个推荐框架（ID、匹配度和推荐理由）
         """
         try:
             prompt = f"""\
@@ -49,15 +279,11 @@ class GeminiService(BaseLLMService):
 用户需求：
 {user_input}
 
-请仅返回 1-3 个最合适的框架 ID（用逗号分隔），不要包含其他内容。
-例如：RACEF,Chain-of-Thought"""
+{INTENT_OUTPUT_FORMAT}"""
 
             # Gemini API 请求格式
-            url = f"{self.base_url}/v1beta/models/{self.model}:generateContent?key={self.api_key}"
-
-            response = await self.client.post(
-                url,
-                json={
+            result = await self._generate_content(
+                {
                     "contents": [{
                         "parts": [{
                             "text": prompt
@@ -65,27 +291,24 @@ class GeminiService(BaseLLMService):
                     }],
                     "generationConfig": {
                         "temperature": 0.3,
-                        "maxOutputTokens": 100,
+                        "maxOutputTokens": INTENT_MAX_OUTPUT_TOKENS,
+                        "responseMimeType": "application/json",
+                        "responseSchema": INTENT_RESPONSE_SCHEMA,
                     }
-                }
+                },
+                operation="analyze_intent",
             )
 
-            response.raise_for_status()
-            result = response.json()
-
             # 解析 Gemini 响应格式
-            content = result["candidates"][0]["content"]["parts"][0]["text"].strip()
-            framework_ids = [fid.strip() for fid in content.split(",")]
-
-            # 确保返回 1-3 个框架
-            framework_ids = framework_ids[:3]
+            content = result["candidates"][0]["content"]["parts"][0]["text"]
+            matches = parse_intent_response(content)
 
             logger.info(
                 "Gemini analyzed intent for input: %s... -> %s",
                 user_input[:50],
-                framework_ids,
+                [match.id for match in matches],
             )
-            return framework_ids
+            return matches
 
         except httpx.HTTPError as e:
             logger.error(f"Gemini HTTP error during intent analysis: {e}")
@@ -97,6 +320,39 @@ class GeminiService(BaseLLMService):
             logger.error(f"Gemini error during intent analysis: {e}")
             raise Exception(f"意图分析失败: {str(e)}")
 
+    def _build_generate_body(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None,
+        model: ModelSpec,
+    ) -> dict[str, Any]:
+        """构建 generate_prompt 的请求体（流式与非流式共用），按模型规划 token 预算"""
+        prompt = build_generation_prompt(
+            user_input, framework_doc, clarification_answers, attachment_content,
+            model=model, provider=self.provider,
+        )
+
+        # Gemini API 请求格式（带系统指令）
+        return {
+            "system_instruction": {
+                "parts": [{
+                    "text": prompt.system
+                }]
+            },
+            "contents": [{
+                "parts": [{
+                    "text": prompt.user
+                }]
+            }],
+            "generationConfig": {
+                "temperature": 0.7,
+                "maxOutputTokens": prompt.max_tokens,
+            }
+        }
+
+    @traced("GeminiService.generate_prompt")
     async def generate_prompt(
         self,
         user_input: str,
@@ -117,72 +373,15 @@ class GeminiService(BaseLLMService):
             优化后的 Markdown 格式提示词
         """
         try:
-            # 构建系统提示
-            system_instruction = f"""\
-你是一个专业的 Prompt 工程师。请根据以下框架文档和用户提供的信息，生成一个优化后的提示词。
-
-框架文档：
-{framework_doc}
-
-请严格按照框架文档中的结构和最佳实践来生成提示词：
-1. 仔细阅读框架的"框架构成"部分，了解每个组成部分的作用
-2. 参考"最佳实践"中的示例，学习如何应用框架
-3. 确保生成的提示词包含框架的所有必要组成部分
-4. 使用清晰的 Markdown 格式，包含适当的标题和结构
-5. 根据框架特点，生成具体、可执行的提示词
-
-生成的提示词应该：
-- 结构清晰，遵循框架的组成部分
-- 包含所有必要的上下文信息
-- 具体明确，避免模糊表述
-- 易于理解和执行
-- 符合框架的最佳实践"""
-
-            # 构建用户提示
-            user_prompt = f"""用户原始需求：
-{user_input}
-
-追问信息：
-- 目标清晰度：{clarification_answers.get('goalClarity', '未提供')}
-- 目标受众：{clarification_answers.get('targetAudience', '未提供')}
-- 上下文完整性：{clarification_answers.get('contextCompleteness', '未提供')}
-- 格式要求：{clarification_answers.get('formatRequirements', '未提供')}
-- 约束条件：{clarification_answers.get('constraints', '未提供')}"""
-
-            if attachment_content:
-                user_prompt += f"\n\n参考附件内容：\n{attachment_content}"
-
-            user_prompt += (
-                "\n\n请基于上述框架文档和用户信息，生成一个完整的、优化后的提示词"
-                "（使用 Markdown 格式）："
+            model = self.select_model("generate_prompt")
+            result = await self._generate_content(
+                self._build_generate_body(
+                    user_input, framework_doc, clarification_answers, attachment_content, model
+                ),
+                operation="generate_prompt",
+                model=model,
             )
 
-            # Gemini API 请求格式（带系统指令）
-            url = f"{self.base_url}/v1beta/models/{self.model}:generateContent?key={self.api_key}"
-
-            response = await self.client.post(
-                url,
-                json={
-                    "system_instruction": {
-                        "parts": [{
-                            "text": system_instruction
-                        }]
-                    },
-                    "contents": [{
-                        "parts": [{
-                            "text": user_prompt
-                        }]
-                    }],
-                    "generationConfig": {
-                        "temperature": 0.7,
-                        "maxOutputTokens": 3000,
-                    }
-                }
-            )
-
-            response.raise_for_status()
-            result = response.json()
-
             # 解析 Gemini 响应格式
             generated_prompt = result["candidates"][0]["content"]["parts"][0]["text"].strip()
 
@@ -198,6 +397,36 @@ class GeminiService(BaseLLMService):
             logger.error(f"Gemini error during prompt generation: {e}")
             raise Exception(f"提示词生成失败: {str(e)}")
 
+    async def generate_prompt_stream(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成优化后的提示词（streamGenerateContent）
+
+        Args:
+            user_input: 用户原始输入
+            framework_doc: 完整的框架文档
+            clarification_answers: 追问问题的答案
+            attachment_content: 附件内容（可选）
+
+        Yields:
+            生成的文本片段
+        """
+        model = self.select_model("generate_prompt")
+        body = self._build_generate_body(
+            user_input, framework_doc, clarification_answers, attachment_content, model
+        )
+        async for chunk in self._stream_generate_content(
+            body, operation="generate_prompt", model=model
+        ):
+            yield chunk
+        logger.info(f"Gemini streamed prompt for input: {user_input[:50]}...")
+
     async def close(self):
-        """关闭 HTTP 客户端"""
-        await self.client.aclose()
+        """关闭独立客户端（共享连接池由 close_shared_clients() 在应用关闭时统一关闭）"""
+        if self._client is not None:
+            await self._client.aclose()
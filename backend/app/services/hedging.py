@@ -0,0 +1,140 @@
+"""
+请求对冲（hedged requests）
+首个请求在 p95 延迟内没有返回时，再发出一个对冲请求（同一或备用服务商），
+采用先返回的结果并取消另一个，以少量额外调用换取更低的尾延迟
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.config import get_settings
+
+from .metrics import LLM_HEDGE_DELAY_SECONDS, LLM_HEDGE_REQUESTS_TOTAL
+from .retry_policy import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+Attempt = tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class RequestHedger:
+    """
+    按服务商的延迟分位数决定何时发出对冲请求
+
+    对冲次数受令牌桶限制（与重试预算相同的机制）：每个请求存入 max_ratio 个令牌，
+    每次对冲取出 1 个，对冲率不会长期超过 max_ratio
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        default_delay: float = 2.0,
+        min_samples: int = 20,
+        window: int = 200,
+        max_ratio: float = 0.1,
+        target: str = "same",
+    ):
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.target = target
+        self.budget = RetryBudget(ratio=max_ratio, min_retries_per_second=0.0, max_tokens=5.0)
+        self._window = window
+        self._latencies: dict[str, deque[float]] = {}
+
+    def observe(self, provider: str, seconds: float):
+        """记录一次调用的耗时（被取消的调用记录已耗时，作为实际耗时的下界）"""
+        if provider not in self._latencies:
+            self._latencies[provider] = deque(maxlen=self._window)
+        self._latencies[provider].append(seconds)
+
+    def delay(self, provider: str) -> float:
+        """对冲延迟：最近调用耗时的分位数（样本不足时使用默认值）"""
+        samples = self._latencies.get(provider)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+    async def _timed(self, provider: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # 输给对冲请求而被取消的主请求是最慢的一批，不记录的话样本缺少慢尾部，
+            # 分位数（对冲延迟）会越来越小；已耗时不小于对冲延迟，足以保持分位数
+            self.observe(provider, time.perf_counter() - start)
+            raise
+        self.observe(provider, time.perf_counter() - start)
+        return result
+
+    async def run(self, primary: Attempt, hedge: Attempt) -> Any:
+        """
+        执行一次带对冲的调用
+
+        Args:
+            primary: (服务商, 调用函数)
+            hedge: 对冲请求的 (服务商, 调用函数)
+
+        Returns:
+            先成功返回的结果；两个请求都失败时抛出主请求的异常
+        """
+        provider = primary[0]
+        delay = self.delay(provider)
+        LLM_HEDGE_DELAY_SECONDS.labels(provider).set(delay)
+        self.budget.deposit()
+
+        primary_task = asyncio.ensure_future(self._timed(*primary))
+        tasks = [primary_task]
+        # 无论正常返回、出错还是调用方被取消，都取消仍未结束的请求
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done:
+                LLM_HEDGE_REQUESTS_TOTAL.labels(provider, "not_needed").inc()
+                return primary_task.result()
+
+            if not self.budget.try_withdraw():
+                LLM_HEDGE_REQUESTS_TOTAL.labels(provider, "budget_exhausted").inc()
+                return await primary_task
+
+            logger.info(f"{provider} 请求 {delay:.2f}s 未返回，向 {hedge[0]} 发出对冲请求")
+            # 只记录主请求的耗时：对冲请求只在主请求慢时发出、赢了才完成，耗时样本有偏
+            hedge_task = asyncio.ensure_future(hedge[1]())
+            tasks.append(hedge_task)
+            labels = {primary_task: "primary_won", hedge_task: "hedge_won"}
+            pending = {primary_task, hedge_task}
+            while pending:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary_task, hedge_task):
+                    if task.done() and task not in pending and task.exception() is None:
+                        LLM_HEDGE_REQUESTS_TOTAL.labels(provider, labels[task]).inc()
+                        return task.result()
+            LLM_HEDGE_REQUESTS_TOTAL.labels(provider, "both_failed").inc()
+            hedge_task.exception()
+            return primary_task.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+_hedger: RequestHedger | None = None
+
+
+def get_request_hedger() -> RequestHedger | None:
+    """获取全局对冲器（LLM_HEDGE_ENABLED 未开启时返回 None）"""
+    global _hedger
+    settings = get_settings()
+    if not settings.llm_hedge_enabled:
+        return None
+    if _hedger is None:
+        _hedger = RequestHedger(
+            quantile=settings.llm_hedge_quantile,
+            default_delay=settings.llm_hedge_default_delay,
+            max_ratio=settings.llm_hedge_max_ratio,
+            target=settings.llm_hedge_target,
+        )
+    return _hedger
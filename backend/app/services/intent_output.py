@@ -0,0 +1,147 @@
+"""
+analyze_intent 的结构化输出
+要求模型以 JSON 返回推荐的框架、匹配度和推荐理由（OpenAI 兼容服务商使用
+response_format=json_object，Gemini 使用 responseMimeType + responseSchema），
+解析时兼容代码块包裹、前后多余文字和旧的逗号分隔格式
+"""
+import json
+import re
+from typing import Any
+
+from pydantic import BaseModel
+
+# JSON 输出带推荐理由，比只返回 ID 需要更多输出 token
+INTENT_MAX_OUTPUT_TOKENS = 400
+
+INTENT_OUTPUT_FORMAT = """\
+**输出格式：**
+只返回 JSON，不要包含其他内容：
+{"frameworks": [{"id": "框架 ID", "score": 0.85, "reasoning": "一句话推荐理由"}]}
+
+- frameworks 包含 1-3 个框架，按匹配度从高到低排序
+- id 必须是框架列表中的框架 ID（例如 RACEF、Chain of Thought、BAB）
+- score 为 0-1 之间的匹配度"""
+
+# Gemini responseSchema（OpenAPI 子集）
+INTENT_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "frameworks": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "id": {"type": "STRING"},
+                    "score": {"type": "NUMBER"},
+                    "reasoning": {"type": "STRING"},
+                },
+                "required": ["id", "score", "reasoning"],
+            },
+        },
+    },
+    "required": ["frameworks"],
+}
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_LIST_PREFIX_RE = re.compile(r"^\s*(?:\d+\s*[.)、:：]\s*|[-*•]\s*)")
+
+
+class IntentParseError(ValueError):
+    """意图分析结果无法解析"""
+
+
+class IntentMatch(BaseModel):
+    """意图分析推荐的一个框架（ID 尚未与框架目录核对）"""
+    id: str
+    score: float | None = None  # 模型给出的匹配度（0-1），旧格式输出时为空
+    reasoning: str = ""
+
+
+def _load_json(content: str) -> Any:
+    """解析 JSON，失败时从先出现的 { 或 [ 开始截取"""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    for left in sorted(i for i in (content.find("{"), content.find("[")) if i >= 0):
+        right = content.rfind("}" if content[left] == "{" else "]")
+        if left < right:
+            try:
+                return json.loads(content[left:right + 1])
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def _score(value: Any) -> float | None:
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    if 1 < score <= 100:  # 百分制
+        score /= 100
+    return min(1.0, max(0.0, score))
+
+
+def _from_json(data: Any) -> list[IntentMatch]:
+    if isinstance(data, dict):
+        if "id" in data or "name" in data:
+            data = [data]
+        else:
+            data = next(
+                (value for value in data.values() if isinstance(value, list)), []
+            )
+    if not isinstance(data, list):
+        return []
+
+    matches = []
+    for item in data:
+        if isinstance(item, str):
+            matches.append(IntentMatch(id=item))
+        elif isinstance(item, dict):
+            framework_id = item.get("id") or item.get("name") or item.get("framework")
+            if isinstance(framework_id, str):
+                matches.append(IntentMatch(
+                    id=framework_id,
+                    score=_score(item.get("score")),
+                    reasoning=str(item.get("reasoning") or ""),
+                ))
+    return matches
+
+
+def _from_text(content: str) -> list[IntentMatch]:
+    """旧格式：逗号 / 顿号 / 换行分隔的框架 ID，可能带编号、引号或加粗"""
+    matches = []
+    for piece in re.split(r"[,，、;；\n]", content):
+        piece = _LIST_PREFIX_RE.sub("", piece).strip().strip("*`\"'“”‘’ ")
+        if piece:
+            matches.append(IntentMatch(id=piece))
+    return matches
+
+
+def parse_intent_response(content: str, max_items: int = 3) -> list[IntentMatch]:
+    """
+    解析 analyze_intent 的输出
+
+    Args:
+        content: 模型输出
+        max_items: 最多保留的框架数
+
+    Returns:
+        推荐的框架（去重，保持模型给出的顺序）
+
+    Raises:
+        IntentParseError: 输出中没有任何框架 ID
+    """
+    content = _FENCE_RE.sub("", content.strip()).strip()
+    data = _load_json(content)
+    matches = _from_json(data) if data is not None else _from_text(content)
+
+    unique: dict[str, IntentMatch] = {}
+    for match in matches:
+        match.id = match.id.strip()
+        if match.id and match.id.lower() not in unique:
+            unique[match.id.lower()] = match
+    if not unique:
+        raise IntentParseError(f"无法解析意图分析结果: {content[:100]}")
+    return list(unique.values())[:max_items]
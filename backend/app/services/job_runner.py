@@ -0,0 +1,329 @@
+"""
+后台生成任务执行器
+提交后立即返回任务 ID，由进程内的 worker 池执行生成和保存版本：
+- 执行过程中按间隔把部分输出写入任务存储，供轮询读取
+- 任务结束后（可选）向 callback_url 推送结果，设置了密钥时带 HMAC-SHA256 签名；
+  提交时和推送前都检查回调地址，不允许指向内网（SSRF）
+- 超过截止时间仍未结束的任务（如进程重启导致中断）在读取时标记为失败
+"""
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+from .job_store import GenerationJob, JobStatus, JobStore, finished_before
+from .metrics import GENERATION_JOBS_QUEUE_DEPTH, GENERATION_JOBS_TOTAL
+from .retry_policy import request_deadline
+
+logger = logging.getLogger(__name__)
+
+# (任务, API 密钥, 部分输出回调) -> 任务结果
+JobExecutor = Callable[
+    [GenerationJob, str, Callable[[str], Awaitable[None]]], Awaitable[dict[str, Any]]
+]
+
+
+class JobQueueFullError(Exception):
+    """排队任务已达上限"""
+
+
+class CallbackURLError(ValueError):
+    """回调地址不允许访问"""
+
+
+async def _resolve_host(host: str, port: int) -> list[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_callback_url(url: str, allowed_hosts: list[str] | None = None):
+    """
+    检查回调地址，防止借回调请求访问内网服务（SSRF）
+
+    配置了允许的主机时只接受这些主机及其子域名（由运维指定，不再检查解析地址）；
+    否则主机解析出的所有地址都必须是公网地址（拒绝回环、链路本地、私有网段等）
+
+    Args:
+        url: 回调地址
+        allowed_hosts: 允许的回调主机（为空表示任意公网主机）
+
+    Raises:
+        CallbackURLError: 地址格式错误、主机不在允许列表中、无法解析或指向内网
+    """
+    try:
+        parsed = urlsplit(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError as e:
+        raise CallbackURLError(f"回调地址格式错误: {e}") from e
+    host = (parsed.hostname or "").lower().rstrip(".")
+    if parsed.scheme not in ("http", "https") or not host:
+        raise CallbackURLError("回调地址必须是 http(s) URL")
+
+    if allowed_hosts:
+        allowed = [h.lower().rstrip(".") for h in allowed_hosts]
+        if not any(host == h or host.endswith("." + h) for h in allowed):
+            raise CallbackURLError(f"回调地址的主机 {host} 不在允许列表中")
+        return
+
+    try:
+        addresses = await _resolve_host(host, port)
+    except OSError as e:
+        raise CallbackURLError(f"无法解析回调地址的主机 {host}") from e
+    for address in addresses:
+        if not _is_public_address(address):
+            raise CallbackURLError(f"回调地址不能指向内网地址 {address}")
+
+
+class _PartialOutputWriter:
+    """累积流式输出，按间隔写入任务存储（避免每个数据块都写一次）"""
+
+    def __init__(self, store: JobStore, job_id: str, interval: float):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self.text = ""
+        self._flushed_at = time.monotonic()
+        self._flushed_len = 0
+
+    async def append(self, chunk: str):
+        self.text += chunk
+        if time.monotonic() - self._flushed_at >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        if len(self.text) == self._flushed_len:
+            return
+        await self.store.update(self.job_id, partial_output=self.text)
+        self._flushed_at = time.monotonic()
+        self._flushed_len = len(self.text)
+
+
+class GenerationJobRunner:
+    """进程内 worker 池"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        execute: JobExecutor,
+        workers: int = 4,
+        max_pending: int = 100,
+        deadline_seconds: float = 600.0,
+        ttl_seconds: float = 86400.0,
+        callback_secret: str | None = None,
+        callback_allowed_hosts: list[str] | None = None,
+        partial_flush_interval: float = 0.5,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """
+        Args:
+            store: 任务存储
+            execute: 执行单个任务的函数
+            workers: worker 数量
+            max_pending: 最多排队的任务数
+            deadline_seconds: 单个任务的截止时间
+            ttl_seconds: 已结束任务的保留时间
+            callback_secret: 回调签名密钥（None 表示不签名）
+            callback_allowed_hosts: 允许的回调主机（为空表示任意公网主机）
+            partial_flush_interval: 部分输出写入存储的最小间隔（秒）
+            transport: 回调请求的自定义传输层（测试使用）
+        """
+        self.store = store
+        self.execute = execute
+        self.workers = workers
+        self.max_pending = max_pending
+        self.deadline_seconds = deadline_seconds
+        self.ttl_seconds = ttl_seconds
+        self.callback_secret = callback_secret
+        self.callback_allowed_hosts = callback_allowed_hosts
+        self.partial_flush_interval = partial_flush_interval
+        self._transport = transport
+        self._queue: asyncio.Queue[str] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+        # 用户 API 密钥只保存在内存中，任务开始执行时取出
+        self._api_keys: dict[str, str] = {}
+        # 已通过排队上限检查、正在写入任务存储的任务数（写入期间会让出事件循环）
+        self._reserved = 0
+        self._purged_at = 0.0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        # worker 在空白上下文中运行，不继承提交请求的截止时间、追踪和用量归属
+        self._tasks = [
+            asyncio.create_task(self._worker(), context=contextvars.Context())
+            for _ in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} generation job workers")
+
+    async def submit(self, job: GenerationJob, api_key: str) -> GenerationJob:
+        """
+        提交任务
+
+        Raises:
+            JobQueueFullError: 排队任务已达上限
+        """
+        self._ensure_started()
+        if self._queue.qsize() + self._reserved >= self.max_pending:
+            GENERATION_JOBS_TOTAL.labels("rejected").inc()
+            raise JobQueueFullError("生成任务排队已满，请稍后重试")
+
+        # 先占住队列位置再写入存储，避免并发提交都通过检查后入队失败
+        self._reserved += 1
+        try:
+            await self.store.create(job)
+        finally:
+            self._reserved -= 1
+        self._api_keys[job.id] = api_key
+        self._queue.put_nowait(job.id)
+        GENERATION_JOBS_TOTAL.labels("submitted").inc()
+        GENERATION_JOBS_QUEUE_DEPTH.set(self._queue.qsize())
+        await self._maybe_purge()
+        return job
+
+    async def get(self, job_id: str) -> GenerationJob | None:
+        """读取任务；超过截止时间仍未结束的任务标记为失败"""
+        job = await self.store.get(job_id)
+        if job is None or job.is_finished or job_id in self._api_keys:
+            # 仍在本进程队列中排队的任务不会超时
+            return job
+        stale_after = timedelta(seconds=self.deadline_seconds + 60)
+        if datetime.now(UTC) - job.updated_at > stale_after:
+            logger.warning(f"Generation job {job_id} timed out or was interrupted")
+            job = await self.store.update(
+                job_id,
+                status=JobStatus.FAILED,
+                error="任务超时或服务重启导致中断",
+                finished_at=datetime.now(UTC),
+            )
+            GENERATION_JOBS_TOTAL.labels(JobStatus.FAILED.value).inc()
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            GENERATION_JOBS_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Unexpected error running generation job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        api_key = self._api_keys.pop(job_id, None)
+        job = await self.store.update(
+            job_id, status=JobStatus.RUNNING, started_at=datetime.now(UTC)
+        )
+        if job is None:
+            return
+
+        writer = _PartialOutputWriter(self.store, job_id, self.partial_flush_interval)
+        try:
+            with request_deadline(self.deadline_seconds):
+                result = await self.execute(job, api_key, writer.append)
+        except Exception as e:
+            logger.error(f"Generation job {job_id} failed: {e}")
+            job = await self.store.update(
+                job_id,
+                status=JobStatus.FAILED,
+                partial_output=writer.text,
+                error=str(e),
+                finished_at=datetime.now(UTC),
+            )
+        else:
+            job = await self.store.update(
+                job_id,
+                status=JobStatus.SUCCEEDED,
+                partial_output=writer.text,
+                result=result,
+                finished_at=datetime.now(UTC),
+            )
+        if job is None:
+            return
+        GENERATION_JOBS_TOTAL.labels(job.status.value).inc()
+
+        if job.callback_url:
+            await self._notify(job)
+
+    def sign(self, body: bytes) -> str | None:
+        """回调请求体的 HMAC-SHA256 签名（X-Signature-256 头）"""
+        if not self.callback_secret:
+            return None
+        digest = hmac.new(self.callback_secret.encode(), body, hashlib.sha256).hexdigest()
+        return f"sha256={digest}"
+
+    async def _notify(self, job: GenerationJob, attempts: int = 3):
+        """向 callback_url 推送任务结果（失败时退避重试，最终失败只记录日志）"""
+        # 推送前重新检查：提交后主机可能已解析到其他地址
+        try:
+            await check_callback_url(job.callback_url, self.callback_allowed_hosts)
+        except CallbackURLError as e:
+            logger.warning(f"Callback for job {job.id} skipped: {e}")
+            return
+
+        body = json.dumps(
+            job.model_dump(mode="json", exclude={"request"}), ensure_ascii=False
+        ).encode()
+        headers = {"Content-Type": "application/json"}
+        signature = self.sign(body)
+        if signature:
+            headers["X-Signature-256"] = signature
+
+        async with httpx.AsyncClient(timeout=10.0, transport=self._transport) as client:
+            for attempt in range(1, attempts + 1):
+                try:
+                    response = await client.post(job.callback_url, content=body, headers=headers)
+                    response.raise_for_status()
+                    return
+                except httpx.HTTPError as e:
+                    logger.warning(
+                        f"Callback for job {job.id} failed (attempt {attempt}/{attempts}): {e}"
+                    )
+                    if attempt < attempts:
+                        await asyncio.sleep(2 ** (attempt - 1))
+
+    async def _maybe_purge(self):
+        """每小时清理一次过期的已结束任务"""
+        now = time.monotonic()
+        if now - self._purged_at < 3600:
+            return
+        self._purged_at = now
+        purged = await self.store.purge_finished(finished_before(self.ttl_seconds))
+        if purged:
+            logger.info(f"Purged {purged} finished generation jobs")
+
+    async def join(self):
+        """等待当前排队的任务全部执行完（测试使用）"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self):
+        """停止 worker（应用关闭时调用）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._queue = None
@@ -0,0 +1,267 @@
+"""
+后台生成任务存储
+保存提示词生成任务的状态、部分输出和结果，供轮询接口读取
+
+后端：
+- InMemoryJobStore：进程内存储（单实例部署/测试）
+- SQLiteJobStore：本地 SQLite 文件（进程重启后仍可查询已完成任务）
+
+任务请求中不保存用户的 API 密钥，密钥只在执行任务的进程内存中传递
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime, timedelta
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    """任务状态枚举"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class GenerationJob(BaseModel):
+    """后台生成任务"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    status: JobStatus = JobStatus.QUEUED
+    request: dict[str, Any] = Field(default_factory=dict)  # 不含 api_key
+    partial_output: str = ""
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    callback_url: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+class JobStore(ABC):
+    """后台任务存储的抽象基类"""
+
+    @abstractmethod
+    async def create(self, job: GenerationJob) -> GenerationJob:
+        """保存新任务"""
+        pass
+
+    @abstractmethod
+    async def get(self, job_id: str) -> GenerationJob | None:
+        """读取任务，不存在时返回 None"""
+        pass
+
+    @abstractmethod
+    async def update(self, job_id: str, **fields: Any) -> GenerationJob | None:
+        """
+        更新任务字段（自动刷新 updated_at）
+
+        Args:
+            job_id: 任务 ID
+            **fields: 要更新的字段
+
+        Returns:
+            更新后的任务，不存在时返回 None
+        """
+        pass
+
+    @abstractmethod
+    async def list_unfinished(self) -> list[GenerationJob]:
+        """列出排队中或执行中的任务"""
+        pass
+
+    @abstractmethod
+    async def purge_finished(self, before: datetime) -> int:
+        """删除在 before 之前结束的任务，返回删除数量"""
+        pass
+
+
+class InMemoryJobStore(JobStore):
+    """进程内任务存储"""
+
+    def __init__(self):
+        self._jobs: dict[str, GenerationJob] = {}
+        self._lock = threading.Lock()
+
+    async def create(self, job: GenerationJob) -> GenerationJob:
+        with self._lock:
+            self._jobs[job.id] = job.model_copy(deep=True)
+        return job
+
+    async def get(self, job_id: str) -> GenerationJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    async def update(self, job_id: str, **fields: Any) -> GenerationJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = job.model_copy(update={**fields, "updated_at": datetime.now(UTC)})
+            self._jobs[job_id] = job
+            return job.model_copy(deep=True)
+
+    async def list_unfinished(self) -> list[GenerationJob]:
+        with self._lock:
+            return [j.model_copy(deep=True) for j in self._jobs.values() if not j.is_finished]
+
+    async def purge_finished(self, before: datetime) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite 任务存储
+
+    整个任务以 JSON 保存，状态和结束时间单独成列便于查询；
+    sqlite3 调用在线程池中执行，不阻塞事件循环
+    """
+
+    _SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    finished_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status);
+"""
+
+    def __init__(self, path: str = "jobs.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def _write(self, job: GenerationJob):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO generation_jobs (id, status, finished_at, data) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                job.id,
+                job.status.value,
+                job.finished_at.isoformat() if job.finished_at else None,
+                job.model_dump_json(),
+            ),
+        )
+        self._conn.commit()
+
+    def _read(self, job_id: str) -> GenerationJob | None:
+        row = self._conn.execute(
+            "SELECT data FROM generation_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return GenerationJob.model_validate_json(row[0]) if row else None
+
+    def _create(self, job: GenerationJob) -> GenerationJob:
+        with self._lock:
+            self._write(job)
+        return job
+
+    def _update(self, job_id: str, fields: dict[str, Any]) -> GenerationJob | None:
+        with self._lock:
+            job = self._read(job_id)
+            if job is None:
+                return None
+            job = job.model_copy(update={**fields, "updated_at": datetime.now(UTC)})
+            self._write(job)
+            return job
+
+    def _get(self, job_id: str) -> GenerationJob | None:
+        with self._lock:
+            return self._read(job_id)
+
+    def _list_unfinished(self) -> list[GenerationJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM generation_jobs WHERE status IN (?, ?)",
+                (JobStatus.QUEUED.value, JobStatus.RUNNING.value),
+            ).fetchall()
+        return [GenerationJob.model_validate_json(row[0]) for row in rows]
+
+    def _purge_finished(self, before: datetime) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM generation_jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (before.isoformat(),),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    async def create(self, job: GenerationJob) -> GenerationJob:
+        return await asyncio.to_thread(self._create, job)
+
+    async def get(self, job_id: str) -> GenerationJob | None:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def update(self, job_id: str, **fields: Any) -> GenerationJob | None:
+        return await asyncio.to_thread(self._update, job_id, fields)
+
+    async def list_unfinished(self) -> list[GenerationJob]:
+        return await asyncio.to_thread(self._list_unfinished)
+
+    async def purge_finished(self, before: datetime) -> int:
+        return await asyncio.to_thread(self._purge_finished, before)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store(settings: Settings) -> JobStore:
+    """
+    按配置创建任务存储
+
+    Args:
+        settings: 应用配置（job_store: memory / sqlite）
+
+    Raises:
+        ValueError: 不支持的存储类型
+    """
+    backend = settings.job_store.lower()
+    if backend == "memory":
+        return InMemoryJobStore()
+    if backend == "sqlite":
+        logger.info(f"Using SQLite job store at {settings.job_sqlite_path}")
+        return SQLiteJobStore(settings.job_sqlite_path)
+    raise ValueError(f"不支持的任务存储类型: {settings.job_store}（可选 memory / sqlite）")
+
+
+def finished_before(ttl_seconds: float) -> datetime:
+    """结束时间早于该时刻的任务可以清理"""
+    return datetime.now(UTC) - timedelta(seconds=ttl_seconds)
+
+
+# 全局任务存储实例
+_job_store: JobStore | None = None
+
+
+def get_job_store() -> JobStore:
+    """获取全局任务存储实例"""
+    global _job_store
+    if _job_store is None:
+        _job_store = create_job_store(get_settings())
+    return _job_store
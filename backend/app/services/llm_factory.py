@@ -1,11 +1,13 @@
 """
 LLM 服务工厂
-根据模型类型创建相应的 LLM 服务实例
+根据服务商注册表创建相应的 LLM 服务实例
 """
-from ..config import Settings
+from ..config import Settings, get_settings
 from .base_llm import BaseLLMService
 from .gemini_service import GeminiService
-from .llm_service import DeepSeekService
+from .llm_service import OpenAICompatibleService
+from .model_registry import ProviderSpec, get_model_registry
+from .resilient_llm import ResilientLLMService
 
 
 class LLMFactory:
@@ -14,36 +16,60 @@ class LLMFactory:
     @staticmethod
     def create_service(model: str, settings: Settings) -> BaseLLMService:
         """
-        根据模型类型创建 LLM 服务实例（使用环境变量中的 API 密钥）
+        根据模型类型创建 LLM 服务实例（使用服务端配置的 API 密钥）
+
+        返回的服务带服务商熔断；LLM_FAILOVER_ENABLED 开启时，
+        意图分析可故障转移到其他已配置密钥的服务商
 
         Args:
-            model: 模型标识符 ('deepseek' 或 'gemini')
+            model: 服务商名称（'deepseek'、'gemini' 或 LLM_PROVIDERS_FILE 中声明的名称）
             settings: 应用配置
 
         Returns:
             BaseLLMService 实例
 
         Raises:
-            ValueError: 不支持的模型类型
+            ValueError: 不支持的模型类型或缺少 API 密钥
         """
         model = model.lower()
+        registry = get_model_registry(settings)
+        service = LLMFactory._create_provider_service(registry.get(model))
 
-        if model == 'deepseek':
-            if not settings.deepseek_api_key:
-                raise ValueError("Missing DEEPSEEK_API_KEY (deepseek_api_key) in environment")
-            return DeepSeekService(
-                api_key=settings.deepseek_api_key,
-                base_url=settings.deepseek_base_url
-            )
-        elif model == 'gemini':
-            if not settings.gemini_api_key:
-                raise ValueError("Missing GEMINI_API_KEY (gemini_api_key) in environment")
-            return GeminiService(
-                api_key=settings.gemini_api_key,
-                base_url=settings.gemini_base_url
-            )
-        else:
-            raise ValueError(f"不支持的模型类型: {model}。支持的模型: deepseek, gemini")
+        fallbacks = []
+        if settings.llm_failover_enabled:
+            for other in registry.names():
+                if other == model:
+                    continue
+                try:
+                    fallback = LLMFactory._create_provider_service(registry.get(other))
+                except ValueError:
+                    # 未配置该服务商的密钥，不作为备用
+                    continue
+                fallbacks.append((other, fallback))
+
+        return ResilientLLMService(model, service, fallbacks)
+
+    @staticmethod
+    def _create_provider_service(spec: ProviderSpec, api_key: str | None = None) -> BaseLLMService:
+        """
+        按服务商声明创建服务实例（不带熔断包装）
+
+        Args:
+            spec: 服务商声明
+            api_key: 用户提供的密钥，None 表示使用服务端配置的密钥
+
+        Raises:
+            ValueError: 服务商需要密钥但未配置
+        """
+        api_key = api_key or spec.resolve_api_key()
+        if spec.requires_api_key and not api_key:
+            raise ValueError(f"Missing API key for provider '{spec.name}' in environment")
+
+        if spec.kind == "gemini":
+            return GeminiService(api_key=api_key, base_url=spec.base_url, spec=spec)
+        if spec.kind == "openai":
+            return OpenAICompatibleService(api_key=api_key, spec=spec)
+        raise ValueError(f"服务商 {spec.name} 的类型不受支持: {spec.kind}")
 
     @staticmethod
     def create_service_with_key(model: str, api_key: str, settings: Settings | None = None) -> BaseLLMService:
@@ -51,9 +77,9 @@ class LLMFactory:
         根据模型类型和用户提供的 API 密钥创建 LLM 服务实例
 
         Args:
-            model: 模型标识符 ('deepseek' 或 'gemini')
+            model: 服务商名称
             api_key: 用户提供的 API 密钥
-            settings: 应用配置（可选，用于获取 base_url）
+            settings: 应用配置（可选，默认使用全局配置）
 
         Returns:
             BaseLLMService 实例
@@ -62,26 +88,17 @@ class LLMFactory:
             ValueError: 不支持的模型类型或缺少 API 密钥
         """
         model = model.lower()
+        spec = get_model_registry(settings).get(model)
 
-        if not api_key:
+        if not api_key and spec.requires_api_key:
             raise ValueError("API 密钥不能为空")
 
-        if model == 'deepseek':
-            base_url = settings.deepseek_base_url if settings else "https://api.deepseek.com"
-            return DeepSeekService(
-                api_key=api_key,
-                base_url=base_url
-            )
-        elif model == 'gemini':
-            base_url = settings.gemini_base_url if settings else "https://generativelanguage.googleapis.com"
-            return GeminiService(
-                api_key=api_key,
-                base_url=base_url
-            )
-        else:
-            raise ValueError(f"不支持的模型类型: {model}。支持的模型: deepseek, gemini")
+        service = LLMFactory._create_provider_service(spec, api_key)
+
+        # 用户密钥只对应一个服务商，无法故障转移，但与其他请求共享该服务商的熔断状态
+        return ResilientLLMService(model, service)
 
     @staticmethod
-    def get_supported_models():
-        """获取支持的模型列表"""
-        return ['deepseek', 'gemini']
+    def get_supported_models() -> list[str]:
+        """获取支持的模型列表（注册表中的服务商名称）"""
+        return get_model_registry(get_settings()).names()
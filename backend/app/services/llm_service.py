@@ -1,38 +1,110 @@
 """
-LLM Service for interacting with DeepSeek API
+LLM Service for interacting with OpenAI-compatible APIs (DeepSeek, vLLM, llama.cpp, ...)
 """
+import asyncio
+import json
 import logging
+import time
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
 
 from .base_llm import BaseLLMService
+from .concurrency_limiter import get_concurrency_limiter
+from .intent_output import (
+    INTENT_MAX_OUTPUT_TOKENS,
+    INTENT_OUTPUT_FORMAT,
+    IntentMatch,
+    parse_intent_response,
+)
+from .metrics import LLM_TIME_TO_FIRST_TOKEN
+from .model_registry import ModelSpec, ProviderSpec, get_model_registry
+from .prompt_builder import build_generation_prompt
+from .retry_policy import RetryPolicy, attempt_timeout, get_retry_policy
+from .tracing import traced
+from .usage_tracker import get_usage_tracker, parse_openai_usage
 
 logger = logging.getLogger(__name__)
 
+# 按 base_url 共享的连接池（API 密钥放在请求头中，不同密钥的请求可以复用同一批连接）
+_shared_clients: dict[str, tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
 
-class DeepSeekService(BaseLLMService):
-    """Service for interacting with DeepSeek LLM API"""
 
-    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com"):
-        self.api_key = api_key
-        self.base_url = base_url
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(120.0, connect=10.0),  # 增加超时到 120 秒
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
-        )
-        self.max_retries = 3  # 最大重试次数
+def _create_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(120.0, connect=10.0),  # 增加超时到 120 秒
+        headers={"Content-Type": "application/json"},
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+    )
+
+
+def _get_shared_client(base_url: str) -> httpx.AsyncClient:
+    """按事件循环延迟创建共享客户端（连接池在请求之间复用）"""
+    loop = asyncio.get_running_loop()
+    entry = _shared_clients.get(base_url)
+    if entry is None or entry[1] is not loop or entry[0].is_closed:
+        client = _create_client()
+        _shared_clients[base_url] = (client, loop)
+        return client
+    return entry[0]
 
-    async def _call_api_with_retry(self, payload: dict[str, Any]) -> dict[str, Any]:
+
+async def close_shared_clients():
+    """关闭当前事件循环创建的共享客户端（应用关闭时调用）"""
+    loop = asyncio.get_running_loop()
+    for base_url, (client, client_loop) in list(_shared_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            del _shared_clients[base_url]
+
+
+class OpenAICompatibleService(BaseLLMService):
+    """Service for any OpenAI-compatible chat/completions endpoint declared in the registry"""
+
+    def __init__(
+        self,
+        api_key: str | None,
+        spec: ProviderSpec,
+        retry_policy: RetryPolicy | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """
+        Args:
+            api_key: API 密钥（None 表示服务不需要密钥）
+            spec: 服务商声明
+            retry_policy: 重试策略（默认按配置创建）
+            transport: 自定义传输层（测试/基准测试使用），指定时使用独立客户端而非共享连接池
+        """
+        self.api_key = api_key
+        self.spec = spec
+        self.provider = spec.name
+        self.base_url = spec.base_url.rstrip("/")
+        self.model = spec.default_model
+        # 密钥随每个请求发送，连接池可以在不同用户的服务实例之间共享
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.retry_policy = retry_policy or get_retry_policy(spec.name)
+        self._client = _create_client(transport) if transport else None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or _get_shared_client(self.base_url)
+
+    @traced("OpenAICompatibleService._call_api_with_retry")
+    async def _call_api_with_retry(
+        self,
+        payload: dict[str, Any],
+        operation: str = "chat"
+    ) -> dict[str, Any]:
         """
         带重试机制的 API 调用
 
+        payload 未指定 model 时按调用类型从注册表选择模型，max_tokens 限制在模型输出上限内
+
         Args:
             payload: API 请求负载
+            operation: 调用类型（用于模型选择和用量统计）
 
         Returns:
             API 响应 JSON
@@ -40,47 +112,156 @@ class DeepSeekService(BaseLLMService):
         Raises:
             Exception: API 调用失败
         """
-        last_error = None
-
-        for attempt in range(self.max_retries):
-            try:
-                response = await self.client.post(
-                    f"{self.base_url}/v1/chat/completions",
-                    json=payload
-                )
-                response.raise_for_status()
-                return response.json()
-
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
-                last_error = e
-                logger.warning(
-                    f"API 调用失败 (尝试 {attempt + 1}/{self.max_retries}): {type(e).__name__}: {str(e)}"
-                )
-                if attempt < self.max_retries - 1:
-                    # 等待后重试（指数退避）
-                    import asyncio
-                    await asyncio.sleep(2 ** attempt)
-                continue
-
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTP 状态错误: {e.response.status_code} - {e.response.text}")
-                raise Exception(f"LLM API 返回错误: {e.response.status_code}")
-
-            except Exception as e:
-                logger.error(f"未预期的错误: {type(e).__name__}: {str(e)}")
-                raise Exception(f"LLM API 调用失败: {str(e)}")
-
-        # 所有重试都失败
-        raise Exception(f"LLM API 调用失败（已重试 {self.max_retries} 次）: {str(last_error)}")
+        payload, model = self._prepare_payload(payload, operation)
+
+        start = time.perf_counter()
+        try:
+            async with get_concurrency_limiter(self.provider, model).slot():
+                result = await self._post_with_retry(payload)
+        except Exception:
+            self._record_usage(operation, model, start, None, success=False)
+            raise
+
+        self._record_usage(operation, model, start, result)
+        return result
+
+    def _prepare_payload(
+        self, payload: dict[str, Any], operation: str
+    ) -> tuple[dict[str, Any], ModelSpec]:
+        """按调用类型选择模型（已指定时沿用），并将 max_tokens 限制在模型上限内"""
+        if payload.get("model"):
+            model = self.spec.get_model(payload["model"])
+        else:
+            model = self.select_model(operation)
+        payload = {**payload, "model": model.name}
+        if "max_tokens" in payload:
+            payload["max_tokens"] = model.clamp_output(payload["max_tokens"])
+        return payload, model
+
+    def _record_usage(
+        self,
+        operation: str,
+        model: ModelSpec,
+        start: float,
+        result: dict[str, Any] | None,
+        success: bool = True,
+    ):
+        get_usage_tracker().record(
+            provider=self.provider,
+            model=(result or {}).get("model") or model.name,
+            operation=operation,
+            usage=parse_openai_usage(result) if result else None,
+            latency_ms=(time.perf_counter() - start) * 1000,
+            success=success,
+        )
+
+    async def _stream_chat(
+        self, payload: dict[str, Any], operation: str
+    ) -> AsyncIterator[str]:
+        """
+        以 stream=true 调用 chat/completions 接口（SSE），逐块产出文本
+
+        只在收到首个数据块之前按重试策略重试；服务商支持 include_usage 时
+        最后一个数据块中的 usage 用于记录用量
+
+        Args:
+            payload: API 请求负载
+            operation: 调用类型（用于模型选择和用量统计）
 
+        Yields:
+            生成的文本片段
+        """
+        payload, model = self._prepare_payload({**payload, "stream": True}, operation)
+        if self.spec.stream_usage:
+            payload["stream_options"] = {"include_usage": True}
+
+        async def send(remaining: float | None) -> httpx.Response:
+            request = self.client.build_request(
+                "POST",
+                f"{self.base_url}{self.spec.chat_path}",
+                json=payload,
+                headers=self.headers,
+                timeout=attempt_timeout(remaining, read=120.0),
+            )
+            response = await self.client.send(request, stream=True)
+            if response.is_error:
+                # 读取错误响应体，便于重试策略记录日志，同时释放连接
+                await response.aread()
+            return response
+
+        start = time.perf_counter()
+        usage_chunk: dict[str, Any] | None = None
+        try:
+            async with get_concurrency_limiter(self.provider, model).slot():
+                response = await self.retry_policy.execute(send, provider=self.provider)
+                try:
+                    first = True
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if chunk.get("usage"):
+                            usage_chunk = chunk
+                        for choice in chunk.get("choices") or []:
+                            text = (choice.get("delta") or {}).get("content")
+                            if not text:
+                                continue
+                            if first:
+                                first = False
+                                LLM_TIME_TO_FIRST_TOKEN.labels(
+                                    self.provider, operation
+                                ).observe(time.perf_counter() - start)
+                            yield text
+                finally:
+                    await response.aclose()
+        except Exception:
+            self._record_usage(operation, model, start, None, success=False)
+            raise
+
+        self._record_usage(operation, model, start, usage_chunk)
+
+    async def _post_with_retry(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """按重试策略发送请求（429/5xx/网络错误重试，单次超时不超过请求截止时间）"""
+
+        async def send(remaining: float | None) -> httpx.Response:
+            return await self.client.post(
+                f"{self.base_url}{self.spec.chat_path}",
+                json=payload,
+                headers=self.headers,
+                timeout=attempt_timeout(remaining, read=120.0),
+            )
+
+        response = await self.retry_policy.execute(send, provider=self.provider)
+        return response.json()
+
+    @traced("OpenAICompatibleService.complete")
+    async def complete(
+        self,
+        prompt: str,
+        operation: str,
+        max_tokens: int,
+        temperature: float = 0.3
+    ) -> str:
+        """单轮文本补全"""
+        result = await self._call_api_with_retry({
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }, operation=operation)
+        return result["choices"][0]["message"]["content"].strip()
+
+    @traced("OpenAICompatibleService.analyze_intent")
     async def analyze_intent(
         self,
         user_input: str,
         frameworks_context: str
-    ) -> list[str]:
+    ) -> list[IntentMatch]:
         """
-        分析用户意图并返回推荐的框架 ID
-        
+        分析用户意图并返回推荐的框架
+
         完全按照 SKILL.md 的 Step 2 逻辑执行：
         1. 识别用户场景
         2. 根据复杂度和领域匹配框架
@@ -88,10 +269,10 @@ class DeepSeekService(BaseLLMService):
 
         Args:
             user_input: 用户输入的原始提示词或需求
-            frameworks_context: 框架映射表上下文（Frameworks_Summary.md）
+            frameworks_context: 框架上下文（Frameworks_Summary.md 原文或预先生成的精简变体）
 
         Returns:
-            1-3 个框架 ID 列表
+            1-3 个推荐框架（ID、匹配度和推荐理由）
         """
         try:
             # 按照 SKILL.md Step 2 的完整逻辑构建 Prompt
@@ -106,90 +287,49 @@ class DeepSeekService(BaseLLMService):
 请参考以下框架列表：
 {frameworks_context}
 
-### 框架选择指南（按复杂度）：
-
-**简单任务（≤3个元素）：**
-APE, ERA, TAG, RTF, BAB, PEE, ELI5
-
-**中等任务（4-5个元素）：**
-RACE, CIDI, SPEAR, SPAR, FOCUS, SMART, GOPA, ORID, CARE, ROSE, PAUSE, TRACE, GRADE, TRACI, RODES
-
-**复杂任务（6+个元素）：**
-RACEF, CRISPE, SCAMPER, Six Thinking Hats, ROSES, PROMPT, RISEN, RASCEF, Atomic Prompting
-
-### 框架选择指南（按领域）：
-
-- **营销内容**: BAB, SPEAR, Challenge-Solution-Benefit, BLOG, PROMPT, RHODES
-- **决策分析**: RICE, Pros and Cons, Six Thinking Hats, Tree of Thought, PAUSE, What If
-- **教育培训**: Bloom's Taxonomy, ELI5, Socratic Method, PEE, Hamburger Model
-- **产品开发**: SCAMPER, HMW, CIDI, RELIC, 3Cs Model
-- **AI对话助手**: COAST, ROSES, TRACE, RACE, RASCEF
-- **写作创作**: BLOG, 4S Method, Hamburger Model, Few-shot, RHODES, Chain of Destiny
-- **图像生成**: Atomic Prompting
-- **快速简单任务**: Zero-shot, ERA, TAG, APE, RTF
-- **复杂推理**: Chain of Thought, Tree of Thought
-
 ## 你的任务：
 1. 分析用户需求的复杂度（简单/中等/复杂）
 2. 识别用户需求的领域类别
-3. 根据上述指南，选择 1-3 个最合适的框架
+3. 参考框架列表中的应用场景、复杂度和领域分类，选择 1-3 个最合适的框架
 4. 按匹配度从高到低排序
 
-**输出格式：**
-只返回框架 ID，用逗号分隔，不要包含其他内容。
-例如：RACEF, Chain-of-Thought, BAB"""
+{INTENT_OUTPUT_FORMAT}"""
 
             payload = {
-                "model": "deepseek-chat",
                 "messages": [
                     {
                         "role": "system",
                         "content": (
                             "你是一个 Prompt 工程专家，严格按照 SKILL.md 的框架选择指南工作。"
-                            "你会分析任务复杂度和领域，然后推荐 1-3 个最合适的框架。"
+                            "你会分析任务复杂度和领域，然后推荐 1-3 个最合适的框架，"
+                            "并以 JSON 格式输出。"
                         ),
                     },
                     {"role": "user", "content": prompt},
                 ],
                 "temperature": 0.3,
-                "max_tokens": 150
+                "max_tokens": INTENT_MAX_OUTPUT_TOKENS
             }
+            if self.spec.json_mode:
+                payload["response_format"] = {"type": "json_object"}
 
-            result = await self._call_api_with_retry(payload)
-
-            # 解析返回的框架 ID
-            content = result["choices"][0]["message"]["content"].strip()
-            framework_ids = [fid.strip() for fid in content.split(",")]
-
-            # 清理框架 ID（移除可能的编号、引号等）
-            cleaned_ids = []
-            for fid in framework_ids:
-                # 移除可能的编号（如 "1. RACEF" -> "RACEF"）
-                fid = fid.split(".")[-1].strip()
-                # 移除引号
-                fid = fid.strip('"').strip("'")
-                if fid:
-                    cleaned_ids.append(fid)
-
-            # 确保至少有 1 个，最多 3 个框架
-            if not cleaned_ids:
-                logger.warning("LLM 未返回任何框架，使用默认框架")
-                cleaned_ids = ["RACEF"]
-            
-            # 限制为最多 3 个
-            cleaned_ids = cleaned_ids[:3]
+            result = await self._call_api_with_retry(payload, operation="analyze_intent")
+
+            content = result["choices"][0]["message"]["content"] or ""
+            matches = parse_intent_response(content)
 
             logger.info(
                 "Analyzed intent for input: %s... -> %s",
                 user_input[:50],
-                cleaned_ids,
+                [match.id for match in matches],
             )
-            return cleaned_ids
+            return matches
 
         except Exception as e:
             logger.error(f"Error during intent analysis: {e}")
             raise Exception(f"意图分析失败: {str(e)}")
 
+    @traced("OpenAICompatibleService.generate_prompt")
     async def generate_prompt(
         self,
         user_input: str,
@@ -210,57 +350,10 @@ RACEF, CRISPE, SCAMPER, Six Thinking Hats, ROSES, PROMPT, RISEN, RASCEF, Atomic
             优化后的 Markdown 格式提示词
         """
         try:
-            # 构建系统提示
-            system_prompt = f"""\
-你是一个专业的 Prompt 工程师。请根据以下框架文档和用户提供的信息，生成一个优化后的提示词。
-
-框架文档：
-{framework_doc}
-
-请严格按照框架文档中的结构和最佳实践来生成提示词：
-1. 仔细阅读框架的"框架构成"部分，了解每个组成部分的作用
-2. 参考"最佳实践"中的示例，学习如何应用框架
-3. 确保生成的提示词包含框架的所有必要组成部分
-4. 使用清晰的 Markdown 格式，包含适当的标题和结构
-5. 根据框架特点，生成具体、可执行的提示词
-
-生成的提示词应该：
-- 结构清晰，遵循框架的组成部分
-- 包含所有必要的上下文信息
-- 具体明确，避免模糊表述
-- 易于理解和执行
-- 符合框架的最佳实践"""
-
-            # 构建用户提示
-            user_prompt = f"""用户原始需求：
-{user_input}
-
-追问信息：
-- 目标清晰度：{clarification_answers.get('goalClarity', '未提供')}
-- 目标受众：{clarification_answers.get('targetAudience', '未提供')}
-- 上下文完整性：{clarification_answers.get('contextCompleteness', '未提供')}
-- 格式要求：{clarification_answers.get('formatRequirements', '未提供')}
-- 约束条件：{clarification_answers.get('constraints', '未提供')}"""
-
-            if attachment_content:
-                user_prompt += f"\n\n参考附件内容：\n{attachment_content}"
-
-            user_prompt += (
-                "\n\n请基于上述框架文档和用户信息，生成一个完整的、优化后的提示词"
-                "（使用 Markdown 格式）："
+            payload = self._build_generate_payload(
+                user_input, framework_doc, clarification_answers, attachment_content
             )
-
-            payload = {
-                "model": "deepseek-chat",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 3000
-            }
-
-            result = await self._call_api_with_retry(payload)
+            result = await self._call_api_with_retry(payload, operation="generate_prompt")
 
             generated_prompt = result["choices"][0]["message"]["content"].strip()
 
@@ -271,6 +364,68 @@ RACEF, CRISPE, SCAMPER, Six Thinking Hats, ROSES, PROMPT, RISEN, RASCEF, Atomic
             logger.error(f"Error during prompt generation: {e}")
             raise Exception(f"提示词生成失败: {str(e)}")
 
+    async def generate_prompt_stream(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成优化后的提示词（stream=true）
+
+        Args:
+            user_input: 用户原始输入
+            framework_doc: 完整的框架文档
+            clarification_answers: 追问问题的答案
+            attachment_content: 附件内容（可选）
+
+        Yields:
+            生成的文本片段
+        """
+        payload = self._build_generate_payload(
+            user_input, framework_doc, clarification_answers, attachment_content
+        )
+        async for chunk in self._stream_chat(payload, operation="generate_prompt"):
+            yield chunk
+        logger.info(f"Streamed prompt for input: {user_input[:50]}...")
+
+    def _build_generate_payload(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None,
+    ) -> dict[str, Any]:
+        model = self.select_model("generate_prompt")
+        prompt = build_generation_prompt(
+            user_input, framework_doc, clarification_answers, attachment_content,
+            model=model, provider=self.provider,
+        )
+        return {
+            "model": model.name,
+            "messages": [
+                {"role": "system", "content": prompt.system},
+                {"role": "user", "content": prompt.user}
+            ],
+            "temperature": 0.7,
+            "max_tokens": prompt.max_tokens
+        }
+
     async def close(self):
-        """关闭 HTTP 客户端"""
-        await self.client.aclose()
+        """关闭独立客户端（共享连接池由 close_shared_clients() 在应用关闭时统一关闭）"""
+        if self._client is not None:
+            await self._client.aclose()
+
+
+class DeepSeekService(OpenAICompatibleService):
+    """Service for interacting with DeepSeek LLM API"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.deepseek.com",
+        retry_policy: RetryPolicy | None = None,
+    ):
+        spec = get_model_registry().get("deepseek").model_copy(update={"base_url": base_url})
+        super().__init__(api_key, spec, retry_policy)
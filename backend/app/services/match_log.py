@@ -0,0 +1,130 @@
+"""
+框架匹配反馈日志
+记录 /match 返回的候选框架和随后 /generate 实际使用的框架，供 scripts/fit_framework_priors.py
+离线拟合按领域的框架先验。JSONL 追加写入（按批刷盘），每行一个事件，只保存输入特征不保存原文：
+- match：{"event": "match", "key", "domains", "complexity", "candidates", "scores", "source", "ts"}
+- choice：{"event": "choice", "key", "framework", "ts"}
+两类事件通过 key（规范化输入的哈希）关联
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+from app.config import get_settings
+
+from .framework_scorer import domain_hits, estimate_complexity
+
+logger = logging.getLogger(__name__)
+
+
+def input_key(user_input: str) -> str:
+    """关联 match 和 choice 事件的输入哈希（忽略空白差异）"""
+    normalized = " ".join(user_input.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class MatchLog:
+    """追加写入的匹配反馈日志"""
+
+    def __init__(self, path: str, flush_every: int = 20):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._file = open(path, "a", encoding="utf-8")
+        self._unflushed = 0
+        self._lock = threading.Lock()
+
+    def _append(self, event: dict[str, Any]):
+        line = json.dumps({**event, "ts": round(time.time())}, ensure_ascii=False)
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(line + "\n")
+                self._unflushed += 1
+                if self._unflushed >= self.flush_every:
+                    self._file.flush()
+                    self._unflushed = 0
+            except OSError as e:
+                # 反馈日志只用于离线分析，写入失败不影响请求
+                logger.warning(f"写入匹配反馈日志失败: {e}")
+
+    def record_match(
+        self, user_input: str, candidates: list[tuple[str, float]], source: str
+    ):
+        """
+        记录一次框架匹配
+
+        Args:
+            user_input: 用户输入（只记录哈希、命中的领域和估计的复杂度）
+            candidates: 返回的候选 (框架 ID, 匹配度)，按顺序
+            source: 候选来源（llm / local / default）
+        """
+        self._append({
+            "event": "match",
+            "key": input_key(user_input),
+            "domains": sorted(domain_hits(user_input)),
+            "complexity": estimate_complexity(user_input),
+            "candidates": [framework_id for framework_id, _ in candidates],
+            "scores": [score for _, score in candidates],
+            "source": source,
+        })
+
+    def record_choice(self, user_input: str, framework_id: str):
+        """记录用户为该输入实际使用的框架（/generate）"""
+        self._append({"event": "choice", "key": input_key(user_input), "framework": framework_id})
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._unflushed = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._file.close()
+
+
+def read_events(path: str) -> Iterator[dict[str, Any]]:
+    """按写入顺序读取日志事件（跳过无法解析的行，例如进程退出时写了一半的行）"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(event, dict) and event.get("event") in ("match", "choice"):
+                yield event
+
+
+_match_log: MatchLog | None = None
+
+
+def get_match_log() -> MatchLog | None:
+    """获取全局匹配反馈日志（未配置 MATCH_LOG_PATH 时为 None）"""
+    global _match_log
+    if _match_log is None:
+        path = get_settings().match_log_path
+        if path:
+            try:
+                _match_log = MatchLog(path)
+            except OSError as e:
+                logger.error(f"无法打开匹配反馈日志 {path}: {e}")
+    return _match_log
+
+
+def close_match_log():
+    """关闭全局匹配反馈日志（刷写未落盘的事件）"""
+    global _match_log
+    if _match_log is not None:
+        _match_log.close()
+        _match_log = None
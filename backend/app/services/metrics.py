@@ -0,0 +1,358 @@
+"""
+进程内指标收集（Prometheus 文本格式）
+
+轻量实现，不依赖 prometheus_client：
+- 每组标签值对应一个预先创建的子指标，热路径只做一次字典查找和整数/浮点累加
+- 不加锁：FastAPI 在单个事件循环内运行，累加操作之间不会被其他协程打断
+"""
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+
+import httpx
+
+# 默认延迟分桶（秒），覆盖毫秒级接口到 120 秒的 LLM 调用
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """指标基类：管理标签子指标"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """按标签值获取子指标（首次访问时创建）"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {values}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # 每个分桶的非累计计数，最后一个为 +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        bounds = self.upper_bounds + (float("inf"),)
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP 请求
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP 请求处理耗时", ("method", "route")
+)
+HTTP_REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total", "HTTP 请求数", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "正在处理的 HTTP 请求数", ("method",)
+)
+
+# LLM 调用
+LLM_CALL_DURATION = REGISTRY.histogram(
+    "llm_call_duration_seconds", "LLM 调用耗时（含重试）", ("provider", "operation", "outcome")
+)
+LLM_RETRIES_TOTAL = REGISTRY.counter(
+    "llm_retries_total", "LLM 调用重试次数", ("provider", "reason")
+)
+LLM_MODEL_SELECTIONS_TOTAL = REGISTRY.counter(
+    "llm_model_selections_total",
+    "按调用类型的模型选择",
+    ("provider", "operation", "model", "reason"),
+)
+LLM_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "llm_concurrency_limit", "LLM 出站调用的自适应并发上限", ("provider", "model")
+)
+LLM_CONCURRENCY_IN_FLIGHT = REGISTRY.gauge(
+    "llm_concurrency_in_flight", "正在进行的 LLM 出站调用数", ("provider", "model")
+)
+LLM_CONCURRENCY_QUEUE_DEPTH = REGISTRY.gauge(
+    "llm_concurrency_queue_depth",
+    "按账户等级排队等待并发名额的 LLM 调用数",
+    ("provider", "model", "tier"),
+)
+LLM_CONCURRENCY_QUEUE_WAIT = REGISTRY.histogram(
+    "llm_concurrency_queue_wait_seconds",
+    "LLM 调用排队等待并发名额的耗时",
+    ("provider", "model", "tier"),
+)
+LLM_CONCURRENCY_SHED_TOTAL = REGISTRY.counter(
+    "llm_concurrency_shed_total",
+    "并发已满被拒绝的 LLM 调用（queue_full/queue_timeout/deadline）",
+    ("provider", "model", "tier", "reason"),
+)
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "流式调用首个文本块的耗时", ("provider", "operation")
+)
+LLM_PROMPT_CACHE_TOKENS = REGISTRY.counter(
+    "llm_prompt_cache_tokens_total", "服务商上下文缓存的输入 token 数", ("provider", "result")
+)
+LLM_PROMPT_BUDGET_TOKENS = REGISTRY.histogram(
+    "llm_prompt_budget_tokens",
+    "生成请求的预估 token 预算（input/max_output/framework_doc/attachment）",
+    ("provider", "part"),
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+LLM_PROMPT_TRIMS_TOTAL = REGISTRY.counter(
+    "llm_prompt_trims_total", "超出预算被裁剪的生成请求（framework_doc/attachment）",
+    ("provider", "part"),
+)
+LLM_CIRCUIT_STATE = REGISTRY.gauge(
+    "llm_circuit_state", "LLM 服务商熔断状态（0=closed, 1=half_open, 2=open）", ("provider",)
+)
+LLM_FAILOVER_TOTAL = REGISTRY.counter(
+    "llm_failover_total", "LLM 故障转移成功次数", ("from_provider", "to_provider", "operation")
+)
+LLM_HEDGE_REQUESTS_TOTAL = REGISTRY.counter(
+    "llm_hedge_requests_total",
+    "analyze_intent 对冲结果（not_needed/primary_won/hedge_won/both_failed/budget_exhausted）",
+    ("provider", "outcome"),
+)
+LLM_HEDGE_DELAY_SECONDS = REGISTRY.gauge(
+    "llm_hedge_delay_seconds", "当前对冲延迟阈值", ("provider",)
+)
+
+# 框架匹配
+FRAMEWORK_MATCH_IDS_TOTAL = REGISTRY.counter(
+    "framework_match_ids_total",
+    "意图分析返回的框架 ID 与框架目录的核对结果（exact/alias/fuzzy/unknown）",
+    ("result",),
+)
+FRAMEWORK_BATCH_ITEMS_TOTAL = REGISTRY.counter(
+    "framework_batch_items_total",
+    "批量匹配的条目数（keyword/llm/llm_failed/deadline/invalid）",
+    ("result",),
+)
+
+# 后台生成任务
+GENERATION_JOBS_TOTAL = REGISTRY.counter(
+    "generation_jobs_total", "后台生成任务数（submitted/rejected/succeeded/failed）", ("status",)
+)
+GENERATION_JOBS_QUEUE_DEPTH = REGISTRY.gauge(
+    "generation_jobs_queue_depth", "排队等待执行的后台生成任务数"
+)
+
+# Supabase REST 调用
+SUPABASE_REQUEST_DURATION = REGISTRY.histogram(
+    "supabase_request_duration_seconds", "Supabase REST 调用耗时", ("table", "method")
+)
+
+# 进程内缓存
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "cache_requests_total", "进程内缓存访问次数", ("cache", "result")
+)
+
+
+class SupabaseMetricsTransport(httpx.AsyncBaseTransport):
+    """
+    记录 Supabase REST 调用耗时的 httpx 传输层
+
+    表名取自 /rest/v1/<table> 路径；耗时为发出请求到收到响应头
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _, _, table = request.url.path.partition("/rest/v1/")
+        child = SUPABASE_REQUEST_DURATION.labels(table.split("/", 1)[0] or "-", request.method)
+        start = time.perf_counter()
+        try:
+            return await self._transport.handle_async_request(request)
+        finally:
+            child.observe(time.perf_counter() - start)
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,227 @@
+"""
+LLM 服务商与模型注册表
+内置 deepseek / gemini，另可通过 LLM_PROVIDERS_FILE（JSON）声明任意 OpenAI 兼容服务
+（本地 vLLM / llama.cpp、其他厂商），为每个模型声明上下文长度、输出上限、价格和并发上限
+
+LLM_PROVIDERS_FILE 格式（同名条目覆盖内置服务商）：
+    [
+      {
+        "name": "local-qwen",
+        "kind": "openai",
+        "base_url": "http://127.0.0.1:8000",
+        "requires_api_key": false,
+        "default_model": "qwen2.5-32b-instruct",
+        "small_model": "qwen2.5-7b-instruct",
+        "json_mode": true,
+        "models": [
+          {"name": "qwen2.5-32b-instruct", "context_window": 32768, "max_concurrency": 4},
+          {"name": "qwen2.5-7b-instruct", "context_window": 32768, "max_concurrency": 16}
+        ]
+      }
+    ]
+"""
+import json
+import logging
+import os
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSpec(BaseModel):
+    """单个模型的能力和成本"""
+    name: str
+    context_window: int = 32768
+    max_output_tokens: int = 4096
+    input_price_per_mtok: float = 0.0  # 每百万输入 token 价格（美元）
+    output_price_per_mtok: float = 0.0  # 每百万输出 token 价格（美元）
+    max_concurrency: int | None = None  # 本进程内自适应并发上限的上界，None 表示使用全局配置
+
+    def clamp_output(self, max_tokens: int) -> int:
+        """将请求的输出 token 数限制在模型上限内"""
+        return min(max_tokens, self.max_output_tokens)
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        """按声明的价格估算一次调用的成本（美元）"""
+        return (
+            input_tokens * self.input_price_per_mtok
+            + output_tokens * self.output_price_per_mtok
+        ) / 1_000_000
+
+
+class ProviderSpec(BaseModel):
+    """服务商声明"""
+    name: str
+    kind: str = "openai"  # openai（OpenAI 兼容 chat/completions）/ gemini
+    base_url: str
+    chat_path: str = "/v1/chat/completions"
+    api_key: str | None = None
+    api_key_env: str | None = None  # 从该环境变量读取密钥
+    requires_api_key: bool = True
+    models: list[ModelSpec] = Field(min_length=1)
+    default_model: str | None = None
+    small_model: str | None = None  # 配置为 "small" 的调用使用的模型（低延迟）
+    json_mode: bool = True  # 支持 response_format={"type": "json_object"}（仅 openai 类型）
+    # 流式响应支持 stream_options={"include_usage": true}（仅 openai 类型，最后一个数据块带 usage）
+    stream_usage: bool = True
+
+    @model_validator(mode="after")
+    def _check_models(self) -> "ProviderSpec":
+        names = {m.name for m in self.models}
+        if self.default_model is None:
+            self.default_model = self.models[0].name
+        for field in ("default_model", "small_model"):
+            value = getattr(self, field)
+            if value is not None and value not in names:
+                raise ValueError(f"{self.name}.{field} 未在 models 中声明: {value}")
+        return self
+
+    def get_model(self, name: str | None = None) -> ModelSpec:
+        """按名称获取模型，None 表示默认模型"""
+        name = name or self.default_model
+        for model in self.models:
+            if model.name == name:
+                return model
+        raise ValueError(f"服务商 {self.name} 未声明模型: {name}")
+
+    def cheapest_model(self) -> ModelSpec:
+        """按声明价格（输入 + 输出）最便宜的模型，价格相同时取先声明的"""
+        return min(
+            self.models, key=lambda m: m.input_price_per_mtok + m.output_price_per_mtok
+        )
+
+    def resolve_model(self, choice: str) -> tuple[ModelSpec, str]:
+        """
+        解析模型选择
+
+        Args:
+            choice: default / small（small_model，未声明时取最便宜的）/ cheapest /
+                模型名称（可写成 "服务商:模型"，只对该服务商生效）
+
+        Returns:
+            (模型, 选择原因)
+        """
+        if choice == "default":
+            return self.get_model(), "default"
+        if choice == "small":
+            if self.small_model:
+                return self.get_model(self.small_model), "small"
+            return self.cheapest_model(), "cheapest"
+        if choice == "cheapest":
+            return self.cheapest_model(), "cheapest"
+
+        provider, _, name = choice.rpartition(":")
+        if provider and provider.lower() != self.name.lower():
+            return self.get_model(), "default"
+        if any(m.name == name for m in self.models):
+            return self.get_model(name), "configured"
+        return self.get_model(), "not_declared"
+
+    def resolve_api_key(self) -> str | None:
+        """服务端配置的密钥（api_key 优先，其次 api_key_env）"""
+        if self.api_key:
+            return self.api_key
+        if self.api_key_env:
+            return os.getenv(self.api_key_env) or None
+        return None
+
+
+def _builtin_providers(settings: Settings) -> list[ProviderSpec]:
+    return [
+        ProviderSpec(
+            name="deepseek",
+            kind="openai",
+            base_url=settings.deepseek_base_url,
+            api_key=settings.deepseek_api_key,
+            models=[
+                ModelSpec(
+                    name="deepseek-chat",
+                    context_window=65536,
+                    max_output_tokens=8192,
+                    input_price_per_mtok=0.27,
+                    output_price_per_mtok=1.10,
+                ),
+            ],
+        ),
+        ProviderSpec(
+            name="gemini",
+            kind="gemini",
+            base_url=settings.gemini_base_url,
+            api_key=settings.gemini_api_key,
+            default_model="gemini-3-pro-preview",
+            small_model="gemini-2.5-flash",
+            models=[
+                ModelSpec(
+                    name="gemini-3-pro-preview",
+                    context_window=1048576,
+                    max_output_tokens=65536,
+                    input_price_per_mtok=2.0,
+                    output_price_per_mtok=12.0,
+                ),
+                ModelSpec(
+                    name="gemini-2.5-flash",
+                    context_window=1048576,
+                    max_output_tokens=65536,
+                    input_price_per_mtok=0.30,
+                    output_price_per_mtok=2.50,
+                ),
+            ],
+        ),
+    ]
+
+
+class ModelRegistry:
+    """服务商注册表（按名称查找，保持声明顺序）"""
+
+    def __init__(self, providers: list[ProviderSpec] | None = None):
+        self._providers: dict[str, ProviderSpec] = {}
+        for provider in providers or []:
+            self.register(provider)
+
+    def register(self, provider: ProviderSpec):
+        """注册服务商（同名覆盖）"""
+        self._providers[provider.name.lower()] = provider
+
+    def get(self, name: str) -> ProviderSpec:
+        """
+        获取服务商声明
+
+        Raises:
+            ValueError: 未注册的服务商
+        """
+        provider = self._providers.get(name.lower())
+        if provider is None:
+            raise ValueError(
+                f"不支持的模型类型: {name}。支持的模型: {', '.join(self.names())}"
+            )
+        return provider
+
+    def names(self) -> list[str]:
+        return list(self._providers)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ModelRegistry":
+        """内置服务商 + LLM_PROVIDERS_FILE 中声明的服务商"""
+        registry = cls(_builtin_providers(settings))
+        if settings.llm_providers_file:
+            with open(settings.llm_providers_file, encoding="utf-8") as f:
+                for item in json.load(f):
+                    registry.register(ProviderSpec.model_validate(item))
+            logger.info(f"Loaded LLM providers from {settings.llm_providers_file}")
+        return registry
+
+
+# 全局注册表（随 Settings 实例重建）
+_registry: tuple[Settings, ModelRegistry] | None = None
+
+
+def get_model_registry(settings: Settings | None = None) -> ModelRegistry:
+    """获取全局服务商注册表"""
+    global _registry
+    settings = settings or get_settings()
+    if _registry is None or _registry[0] is not settings:
+        _registry = (settings, ModelRegistry.from_settings(settings))
+    return _registry[1]
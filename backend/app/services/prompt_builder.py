@@ -0,0 +1,223 @@
+"""
+generate_prompt 的提示构建与 token 预算
+各服务商共用同一套系统提示和用户提示模板，构建时按模型的上下文窗口规划预算：
+1. 附件不超过 ATTACHMENT_GENERATE_BUDGET_TOKENS
+2. 输入超出预算时，框架文档只保留生成所需的章节（概述、框架构成、最佳实践），
+   仍超出时最佳实践只保留一个示例
+3. 仍超出时依次截断附件和框架文档
+4. max_tokens 取期望输出、模型输出上限和剩余上下文中的最小值
+"""
+import logging
+
+from pydantic import BaseModel
+
+from app.config import get_settings
+
+from .framework_docs import COMPACT_SECTIONS, parse_framework_doc
+from .metrics import LLM_PROMPT_BUDGET_TOKENS, LLM_PROMPT_TRIMS_TOTAL
+from .model_registry import ModelSpec
+from .token_estimator import estimate_messages_tokens, estimate_tokens, truncate_to_tokens
+from .tracing import get_current_span
+
+logger = logging.getLogger(__name__)
+
+
+class PromptBudgetError(ValueError):
+    """输入过长，剩余上下文不足以生成输出"""
+
+
+class PromptBudget(BaseModel):
+    """单次生成请求的 token 预算（估算值）"""
+    model: str
+    context_window: int
+    input_tokens: int
+    max_tokens: int
+    framework_doc_tokens: int
+    attachment_tokens: int
+    framework_doc_trimmed: bool = False
+    attachment_trimmed: bool = False
+
+
+class GenerationPrompt(BaseModel):
+    """构建好的生成请求"""
+    system: str
+    user: str
+    max_tokens: int
+    budget: PromptBudget
+
+
+def render_system_prompt(framework_doc: str) -> str:
+    """生成提示词的系统提示"""
+    return f"""\
+你是一个专业的 Prompt 工程师。请根据以下框架文档和用户提供的信息，生成一个优化后的提示词。
+
+框架文档：
+{framework_doc}
+
+请严格按照框架文档中的结构和最佳实践来生成提示词：
+1. 仔细阅读框架的"框架构成"部分，了解每个组成部分的作用
+2. 参考"最佳实践"中的示例，学习如何应用框架
+3. 确保生成的提示词包含框架的所有必要组成部分
+4. 使用清晰的 Markdown 格式，包含适当的标题和结构
+5. 根据框架特点，生成具体、可执行的提示词
+
+生成的提示词应该：
+- 结构清晰，遵循框架的组成部分
+- 包含所有必要的上下文信息
+- 具体明确，避免模糊表述
+- 易于理解和执行
+- 符合框架的最佳实践"""
+
+
+def render_user_prompt(
+    user_input: str,
+    clarification_answers: dict[str, str],
+    attachment_content: str | None = None
+) -> str:
+    """生成提示词的用户提示"""
+    user_prompt = f"""用户原始需求：
+{user_input}
+
+追问信息：
+- 目标清晰度：{clarification_answers.get('goalClarity', '未提供')}
+- 目标受众：{clarification_answers.get('targetAudience', '未提供')}
+- 上下文完整性：{clarification_answers.get('contextCompleteness', '未提供')}
+- 格式要求：{clarification_answers.get('formatRequirements', '未提供')}
+- 约束条件：{clarification_answers.get('constraints', '未提供')}"""
+
+    if attachment_content:
+        user_prompt += f"\n\n参考附件内容：\n{attachment_content}"
+
+    user_prompt += (
+        "\n\n请基于上述框架文档和用户信息，生成一个完整的、优化后的提示词"
+        "（使用 Markdown 格式）："
+    )
+    return user_prompt
+
+
+def trim_framework_doc(doc: str, max_examples: int | None = None) -> str:
+    """
+    只保留框架文档中生成所需的章节（概述、框架构成、最佳实践）
+
+    Args:
+        doc: 框架文档（Markdown，以 "## " 划分章节）
+        max_examples: 最佳实践最多保留的示例数（None 表示全部）
+
+    Returns:
+        裁剪后的文档；没有匹配到任何所需章节时返回原文
+    """
+    parsed = parse_framework_doc(doc)
+    if not any(section.kind in COMPACT_SECTIONS for section in parsed.sections):
+        return doc
+    return parsed.render_sections(COMPACT_SECTIONS, max_examples)
+
+
+def build_generation_prompt(
+    user_input: str,
+    framework_doc: str,
+    clarification_answers: dict[str, str],
+    attachment_content: str | None,
+    model: ModelSpec,
+    provider: str = "",
+) -> GenerationPrompt:
+    """
+    构建生成请求并规划 token 预算
+
+    Args:
+        user_input: 用户原始输入
+        framework_doc: 完整的框架文档
+        clarification_answers: 追问问题的答案
+        attachment_content: 附件内容（可选）
+        model: 本次调用使用的模型
+        provider: 服务商名称（用于指标标签）
+
+    Returns:
+        系统提示、用户提示、max_tokens 和预算明细
+
+    Raises:
+        PromptBudgetError: 用户输入本身过长，剩余上下文不足以生成输出
+    """
+    settings = get_settings()
+    desired_output = model.clamp_output(settings.prompt_max_output_tokens)
+    margin = int(model.context_window * settings.prompt_context_margin_ratio)
+    input_budget = model.context_window - desired_output - margin
+
+    def measure(doc: str, attachment: str) -> int:
+        return estimate_messages_tokens(
+            render_system_prompt(doc),
+            render_user_prompt(user_input, clarification_answers, attachment),
+        )
+
+    doc = framework_doc
+    attachment = attachment_content or ""
+    attachment_trimmed = False
+    if estimate_tokens(attachment) > settings.attachment_generate_budget_tokens:
+        attachment = truncate_to_tokens(attachment, settings.attachment_generate_budget_tokens)
+        attachment_trimmed = True
+
+    for max_examples in (None, 1):
+        if measure(doc, attachment) <= input_budget:
+            break
+        doc = trim_framework_doc(framework_doc, max_examples)
+
+    overflow = measure(doc, attachment) - input_budget
+    if overflow > 0 and attachment:
+        attachment = truncate_to_tokens(
+            attachment, max(0, estimate_tokens(attachment) - overflow)
+        )
+        attachment_trimmed = True
+        overflow = measure(doc, attachment) - input_budget
+    if overflow > 0:
+        doc = truncate_to_tokens(doc, max(0, estimate_tokens(doc) - overflow))
+
+    system_prompt = render_system_prompt(doc)
+    user_prompt = render_user_prompt(user_input, clarification_answers, attachment or None)
+    input_tokens = estimate_messages_tokens(system_prompt, user_prompt)
+    max_tokens = min(desired_output, model.context_window - input_tokens - margin)
+    if max_tokens < settings.prompt_min_output_tokens:
+        raise PromptBudgetError(
+            f"输入内容过长（约 {input_tokens} tokens），"
+            f"超出 {model.name} 的上下文窗口，请精简需求描述"
+        )
+
+    budget = PromptBudget(
+        model=model.name,
+        context_window=model.context_window,
+        input_tokens=input_tokens,
+        max_tokens=max_tokens,
+        framework_doc_tokens=estimate_tokens(doc),
+        attachment_tokens=estimate_tokens(attachment),
+        framework_doc_trimmed=doc != framework_doc,
+        attachment_trimmed=attachment_trimmed,
+    )
+    _report(budget, provider)
+    return GenerationPrompt(
+        system=system_prompt, user=user_prompt, max_tokens=max_tokens, budget=budget
+    )
+
+
+def _report(budget: PromptBudget, provider: str):
+    """记录预算明细（日志、指标、当前 span）"""
+    for part, tokens in (
+        ("input", budget.input_tokens),
+        ("max_output", budget.max_tokens),
+        ("framework_doc", budget.framework_doc_tokens),
+        ("attachment", budget.attachment_tokens),
+    ):
+        LLM_PROMPT_BUDGET_TOKENS.labels(provider, part).observe(tokens)
+    if budget.framework_doc_trimmed:
+        LLM_PROMPT_TRIMS_TOTAL.labels(provider, "framework_doc").inc()
+    if budget.attachment_trimmed:
+        LLM_PROMPT_TRIMS_TOTAL.labels(provider, "attachment").inc()
+
+    get_current_span().set_attributes(
+        {f"prompt_budget.{key}": value for key, value in budget.model_dump().items()}
+    )
+    logger.info(
+        f"prompt_budget provider={provider} model={budget.model} "
+        f"input_tokens={budget.input_tokens} max_tokens={budget.max_tokens} "
+        f"framework_doc_tokens={budget.framework_doc_tokens} "
+        f"attachment_tokens={budget.attachment_tokens} "
+        f"framework_doc_trimmed={budget.framework_doc_trimmed} "
+        f"attachment_trimmed={budget.attachment_trimmed}"
+    )
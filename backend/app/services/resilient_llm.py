@@ -0,0 +1,177 @@
+"""
+带熔断、故障转移和请求对冲的 LLM 服务
+包装具体服务商的服务：调用前检查熔断器，调用后记录结果；
+启用故障转移时，analyze_intent 在主服务商故障或熔断时改用其他健康的服务商；
+启用对冲时，analyze_intent 超过 p95 延迟未返回会再发出一个对冲请求
+"""
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from typing import Any
+
+from .base_llm import BaseLLMService
+from .circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    get_circuit_breaker,
+    is_provider_failure,
+)
+from .hedging import get_request_hedger
+from .intent_output import IntentMatch
+from .metrics import LLM_FAILOVER_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class ResilientLLMService(BaseLLMService):
+    """熔断 + 故障转移包装（其他属性透传给主服务）"""
+
+    def __init__(
+        self,
+        provider: str,
+        service: BaseLLMService,
+        fallbacks: list[tuple[str, BaseLLMService]] | None = None,
+    ):
+        self.provider = provider
+        self.service = service
+        self.fallbacks = fallbacks or []
+
+    def __getattr__(self, name: str) -> Any:
+        # 只有在实例上找不到时才会调用，用于透传 model、_call_api_with_retry 等
+        if name == "service":
+            raise AttributeError(name)
+        return getattr(self.service, name)
+
+    async def _call(self, provider: str, service: BaseLLMService, method: str, **kwargs) -> Any:
+        breaker = get_circuit_breaker(provider)
+        if not breaker.allow_request():
+            raise CircuitOpenError(provider)
+        try:
+            result = await getattr(service, method)(**kwargs)
+        except asyncio.CancelledError:
+            breaker.record_ignored()
+            raise
+        except Exception as e:
+            if is_provider_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_ignored()
+            raise
+        breaker.record_success()
+        return result
+
+    async def analyze_intent(
+        self,
+        user_input: str,
+        frameworks_context: str
+    ) -> list[IntentMatch]:
+        kwargs = {"user_input": user_input, "frameworks_context": frameworks_context}
+        try:
+            return await self._analyze_intent_hedged(kwargs)
+        except Exception as e:
+            if not self.fallbacks or not is_provider_failure(e):
+                raise
+            primary_error = e
+
+        for provider, service in self.fallbacks:
+            logger.warning(f"{self.provider} 意图分析失败，故障转移到 {provider}: {primary_error}")
+            try:
+                result = await self._call(provider, service, "analyze_intent", **kwargs)
+            except Exception as e:
+                logger.warning(f"故障转移到 {provider} 失败: {e}")
+                continue
+            LLM_FAILOVER_TOTAL.labels(self.provider, provider, "analyze_intent").inc()
+            return result
+
+        raise primary_error
+
+    async def _analyze_intent_hedged(self, kwargs: dict[str, Any]) -> list[IntentMatch]:
+        """调用主服务商的 analyze_intent，启用对冲时在超过延迟阈值后发出对冲请求"""
+        hedger = get_request_hedger()
+        if hedger is None:
+            return await self._call(self.provider, self.service, "analyze_intent", **kwargs)
+
+        hedge_provider, hedge_service = self.provider, self.service
+        if hedger.target == "alternate":
+            for provider, service in self.fallbacks:
+                if get_circuit_breaker(provider).state == CircuitBreaker.CLOSED:
+                    hedge_provider, hedge_service = provider, service
+                    break
+
+        return await hedger.run(
+            (self.provider, lambda: self._call(
+                self.provider, self.service, "analyze_intent", **kwargs
+            )),
+            (hedge_provider, lambda: self._call(
+                hedge_provider, hedge_service, "analyze_intent", **kwargs
+            )),
+        )
+
+    async def generate_prompt(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None = None
+    ) -> str:
+        return await self._call(
+            self.provider,
+            self.service,
+            "generate_prompt",
+            user_input=user_input,
+            framework_doc=framework_doc,
+            clarification_answers=clarification_answers,
+            attachment_content=attachment_content,
+        )
+
+    async def complete(
+        self,
+        prompt: str,
+        operation: str,
+        max_tokens: int,
+        temperature: float = 0.3
+    ) -> str:
+        return await self._call(
+            self.provider,
+            self.service,
+            "complete",
+            prompt=prompt,
+            operation=operation,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+
+    async def generate_prompt_stream(
+        self,
+        user_input: str,
+        framework_doc: str,
+        clarification_answers: dict[str, str],
+        attachment_content: str | None = None
+    ) -> AsyncIterator[str]:
+        breaker = get_circuit_breaker(self.provider)
+        if not breaker.allow_request():
+            raise CircuitOpenError(self.provider)
+        try:
+            async for chunk in self.service.generate_prompt_stream(
+                user_input=user_input,
+                framework_doc=framework_doc,
+                clarification_answers=clarification_answers,
+                attachment_content=attachment_content,
+            ):
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开，不计入服务商健康度
+            breaker.record_ignored()
+            raise
+        except Exception as e:
+            if is_provider_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_ignored()
+            raise
+        breaker.record_success()
+
+    async def close(self):
+        await self.service.close()
+        for _, service in self.fallbacks:
+            await service.close()
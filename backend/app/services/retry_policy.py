@@ -0,0 +1,291 @@
+"""
+LLM 调用重试策略
+所有服务商共用：全抖动指数退避、按状态码分类、Retry-After、请求截止时间和全局重试预算
+"""
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.config import get_settings
+
+from .metrics import LLM_RETRIES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的截止时间（time.monotonic()），由 DeadlineMiddleware 设置
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+@contextmanager
+def request_deadline(seconds: float | None, replace: bool = False) -> Iterator[None]:
+    """
+    为当前请求设置截止时间（已有更早的截止时间时保留更早的）
+
+    Args:
+        seconds: 从现在起的剩余秒数，None 或 <= 0 表示不限制
+        replace: 忽略已有的截止时间（自行管理总时长的长请求，如批量匹配的单条调用）
+    """
+    deadline = None if replace else _deadline.get()
+    if seconds and seconds > 0:
+        new_deadline = time.monotonic() + seconds
+        deadline = new_deadline if deadline is None else min(deadline, new_deadline)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    """当前请求剩余的秒数，没有截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def iter_exception_chain(error: BaseException) -> Iterator[BaseException]:
+    """
+    沿 __cause__ / __context__ 遍历异常链
+
+    服务层会把底层异常包装成通用 Exception，判断错误类型时需要查看整条链
+    """
+    seen = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+class LLMCallError(Exception):
+    """LLM 调用失败"""
+
+    def __init__(self, message: str, status_code: int | None = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶）
+
+    每个原始请求存入 ratio 个令牌，每次重试取出 1 个；另按 min_retries_per_second
+    持续补充，保证低流量时也能重试。服务商大面积故障时重试总量被限制在
+    原始流量的 ratio 倍左右，避免重试风暴。
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        max_tokens: float = 20.0,
+    ):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens,
+            self._tokens + (now - self._updated) * self.min_retries_per_second,
+        )
+        self._updated = now
+
+    def deposit(self):
+        """记录一次原始请求"""
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """申请一次重试，预算不足时返回 False"""
+        self._refill()
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """解析 Retry-After 头（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class RetryPolicy:
+    """LLM 调用重试策略"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 30.0,
+        budget: RetryBudget | None = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = budget or RetryBudget()
+
+    def backoff(self, retry_number: int) -> float:
+        """全抖动退避：在 [0, min(max_delay, base * 2^n)] 内均匀取值"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_number)))
+
+    @staticmethod
+    def classify(error: Exception) -> tuple[bool, str, float | None]:
+        """
+        判断错误是否可重试
+
+        Returns:
+            (是否可重试, 原因标签, 服务端要求的等待秒数)
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            retry_after = parse_retry_after(error.response.headers.get("retry-after"))
+            return status in RETRYABLE_STATUS_CODES, f"http_{status}", retry_after
+        if isinstance(error, RETRYABLE_ERRORS):
+            return True, type(error).__name__, None
+        return False, type(error).__name__, None
+
+    async def execute(
+        self,
+        send: Callable[[float | None], Awaitable[httpx.Response]],
+        provider: str,
+    ) -> httpx.Response:
+        """
+        按策略发送请求
+
+        Args:
+            send: 发送一次请求的函数，参数为本次尝试可用的超时秒数（None 表示使用客户端默认值）
+            provider: 服务商名称（用于日志和指标）
+
+        Returns:
+            状态码为 2xx 的响应
+
+        Raises:
+            LLMCallError: 不可重试的错误、重试次数/预算/截止时间耗尽
+        """
+        self.budget.deposit()
+        attempt = 0
+
+        while True:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                raise LLMCallError("LLM API 调用超过请求截止时间", retryable=False)
+
+            attempt += 1
+            try:
+                response = await send(remaining)
+                response.raise_for_status()
+                return response
+            except Exception as e:
+                retryable, reason, retry_after = self.classify(e)
+                error = self._to_error(e, attempt, retryable)
+
+                if not retryable or attempt >= self.max_attempts:
+                    raise error from e
+
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    logger.warning(f"{provider} 要求 {retry_after:.1f}s 后重试，超过上限，放弃重试")
+                    raise error from e
+                delay = retry_after if retry_after is not None else self.backoff(attempt - 1)
+
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    logger.warning(f"{provider} 重试等待 {delay:.1f}s 将超过请求截止时间，放弃重试")
+                    raise error from e
+
+                if not self.budget.try_withdraw():
+                    logger.warning(f"{provider} 重试预算已耗尽，放弃重试")
+                    raise error from e
+
+                LLM_RETRIES_TOTAL.labels(provider, reason).inc()
+                logger.warning(
+                    f"{provider} API 调用失败 (尝试 {attempt}/{self.max_attempts}): {reason}，"
+                    f"{delay:.2f}s 后重试"
+                )
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _to_error(error: Exception, attempt: int, retryable: bool) -> LLMCallError:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            logger.error(f"HTTP 状态错误: {status} - {error.response.text[:500]}")
+            return LLMCallError(
+                f"LLM API 返回错误: {status}", status_code=status, retryable=retryable
+            )
+        if retryable:
+            return LLMCallError(
+                f"LLM API 调用失败（已重试 {attempt} 次）: {type(error).__name__}: {error}",
+                retryable=True,
+            )
+        logger.error(f"未预期的错误: {type(error).__name__}: {error}")
+        return LLMCallError(f"LLM API 调用失败: {error}")
+
+
+# 每个服务商一个进程级重试预算
+_retry_budgets: dict[str, RetryBudget] = {}
+
+
+def get_retry_policy(provider: str) -> RetryPolicy:
+    """按配置创建重试策略（同一服务商共享重试预算）"""
+    settings = get_settings()
+    if provider not in _retry_budgets:
+        _retry_budgets[provider] = RetryBudget(
+            ratio=settings.llm_retry_budget_ratio,
+            min_retries_per_second=settings.llm_retry_budget_min_per_second,
+        )
+    return RetryPolicy(
+        max_attempts=settings.llm_retry_max_attempts,
+        base_delay=settings.llm_retry_base_delay,
+        max_delay=settings.llm_retry_max_delay,
+        budget=_retry_budgets[provider],
+    )
+
+
+def attempt_timeout(remaining: float | None, read: float, connect: float = 10.0):
+    """
+    计算单次尝试的 httpx 超时，不超过请求剩余时间
+
+    Args:
+        remaining: 请求剩余秒数（None 表示无截止时间）
+        read: 默认读取超时
+        connect: 默认连接超时
+    """
+    if remaining is None:
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(min(read, remaining), connect=min(connect, remaining))
@@ -0,0 +1,95 @@
+"""
+本地 token 数估算
+不依赖服务商的分词器，按字符类别近似 BPE 分词结果（宁可略微高估）：
+- 中日韩字符：约 1 个 token/字
+- 英文单词：约 4 个字母 1 个 token（至少 1 个）
+- 数字：约 3 位 1 个 token
+- 标点和其他符号：1 个 token/个；空白不计
+"""
+import re
+from collections.abc import Iterator
+
+_TOKEN_RE = re.compile(
+    r"(?P<cjk>[㐀-鿿豈-﫿])|(?P<word>[A-Za-z]+)|(?P<digits>\d+)|(?P<other>\S)"
+)
+
+# 每条消息（system / user）的角色标记等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+TRUNCATION_MARKER = "\n……（内容过长，已截断）"
+
+
+def _piece_tokens(match: re.Match) -> int:
+    kind = match.lastgroup
+    length = match.end() - match.start()
+    if kind == "word":
+        return max(1, (length + 2) // 4)
+    if kind == "digits":
+        return max(1, (length + 2) // 3)
+    return 1
+
+
+def estimate_tokens(text: str | None) -> int:
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    return sum(_piece_tokens(match) for match in _TOKEN_RE.finditer(text))
+
+
+def estimate_messages_tokens(*messages: str) -> int:
+    """估算一组消息（含每条消息固定开销）的输入 token 数"""
+    return sum(estimate_tokens(message) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+    """
+    截断文本使其（连同截断标记）不超过 max_tokens
+
+    Args:
+        text: 原文
+        max_tokens: token 上限
+        marker: 截断后追加的标记
+
+    Returns:
+        未超出上限时返回原文，否则返回截断后的文本
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(marker)
+    if budget <= 0:
+        return ""
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        used += _piece_tokens(match)
+        if used > budget:
+            return text[:match.start()].rstrip() + marker
+    return text
+
+
+def split_by_tokens(text: str, max_tokens: int) -> Iterator[str]:
+    """
+    按 token 上限把文本依次切成连续的片段（只分词一遍，代价与文本长度成线性）
+
+    Args:
+        text: 原文
+        max_tokens: 每个片段的 token 上限
+
+    Yields:
+        拼接起来等于原文的片段；单个超长的单词或数字串按字符数切开
+    """
+    start = used = 0
+    for match in _TOKEN_RE.finditer(text):
+        tokens = _piece_tokens(match)
+        if used and used + tokens > max_tokens:
+            yield text[start:match.start()]
+            start, used = match.start(), 0
+        if tokens <= max_tokens:
+            used += tokens
+            continue
+        step = max(1, (match.end() - match.start()) * max_tokens // tokens)
+        while match.end() - start > step:
+            yield text[start:start + step]
+            start += step
+        used = estimate_tokens(text[start:match.end()])
+    if start < len(text):
+        yield text[start:]
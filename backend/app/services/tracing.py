@@ -0,0 +1,329 @@
+"""
+轻量请求链路追踪
+
+- Span 字段与 OpenTelemetry 导出格式保持一致（trace_id / span_id / parent_id /
+  start_time / end_time / attributes / status / events），便于离线分析或转换导入
+- 默认不导出（no-op），此时不创建任何 Span 对象
+- 请求 ID 与当前 Span 通过 contextvars 在协程之间传递
+- 导出器：console（打印 JSON）/ file（JSONL 文件）
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from typing import Any
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+def get_request_id() -> str | None:
+    """获取当前请求 ID"""
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: str | None = None) -> Iterator[str]:
+    """
+    设置当前请求 ID（未提供时自动生成）
+
+    使用示例：
+        with request_context(headers.get("x-request-id")) as request_id:
+            ...
+    """
+    request_id = request_id or uuid.uuid4().hex
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def _iso(ns: int) -> str:
+    return datetime.fromtimestamp(ns / 1e9, UTC).isoformat()
+
+
+class Span:
+    """一次被追踪的操作"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "events", "status_code", "status_description",
+    )
+
+    is_recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes: dict[str, Any] = {}
+        self.events: list[dict[str, Any]] = []
+        self.status_code = "UNSET"
+        self.status_description: str | None = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: dict[str, Any] | None = None):
+        self.events.append({
+            "name": name,
+            "timestamp": _iso(time.time_ns()),
+            "attributes": attributes or {},
+        })
+
+    def record_exception(self, exc: BaseException):
+        self.add_event("exception", {
+            "exception.type": type(exc).__name__,
+            "exception.message": str(exc),
+        })
+
+    def set_status(self, code: str, description: str | None = None):
+        self.status_code = code
+        self.status_description = description
+
+    def update_name(self, name: str):
+        self.name = name
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        """OpenTelemetry ConsoleSpanExporter 风格的字典"""
+        return {
+            "name": self.name,
+            "context": {"trace_id": f"0x{self.trace_id}", "span_id": f"0x{self.span_id}"},
+            "parent_id": f"0x{self.parent_id}" if self.parent_id else None,
+            "start_time": _iso(self.start_ns),
+            "end_time": _iso(self.end_ns) if self.end_ns else None,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": {"status_code": self.status_code, "description": self.status_description},
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class NoopSpan:
+    """未启用追踪时使用的空 Span（全局共享，不产生任何开销）"""
+
+    is_recording = False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: dict[str, Any]):
+        pass
+
+    def add_event(self, name: str, attributes: dict[str, Any] | None = None):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def set_status(self, code: str, description: str | None = None):
+        pass
+
+    def update_name(self, name: str):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class SpanExporter:
+    """Span 导出器基类"""
+
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    """把 Span 以 JSON 打印到标准输出"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class FileSpanExporter(SpanExporter):
+    """把 Span 以 JSONL 追加写入本地文件（按批刷盘）"""
+
+    def __init__(self, path: str, flush_every: int = 50):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._file = open(path, "a", encoding="utf-8")
+        self._unflushed = 0
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+
+    def shutdown(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._file.close()
+
+
+class Tracer:
+    """创建 Span 并在结束时交给导出器"""
+
+    def __init__(self, exporter: SpanExporter | None = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: dict[str, Any] | None = None):
+        """
+        开始一个 Span 并设为当前 Span
+
+        Args:
+            name: Span 名称（如 VersionManager.get_versions）
+            attributes: 初始属性
+        """
+        if self.exporter is None:
+            yield NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id)
+        else:
+            span = Span(name, secrets.token_hex(16))
+
+        request_id = _request_id.get()
+        if request_id:
+            span.attributes["request.id"] = request_id
+        if attributes:
+            span.attributes.update(attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status("ERROR", str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.warning(f"导出 Span 失败: {e}")
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def get_current_span() -> Span | NoopSpan:
+    """获取当前 Span（未启用或不在 Span 内时返回空 Span）"""
+    return _current_span.get() or NOOP_SPAN
+
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """获取全局 Tracer（由 TRACING_EXPORTER 配置导出器）"""
+    global _tracer
+    if _tracer is None:
+        settings = get_settings()
+        exporter_name = settings.tracing_exporter.lower()
+        if exporter_name == "console":
+            exporter: SpanExporter | None = ConsoleSpanExporter()
+        elif exporter_name == "file":
+            exporter = FileSpanExporter(settings.tracing_file_path)
+        else:
+            exporter = None
+        _tracer = Tracer(exporter)
+        if exporter is not None:
+            logger.info(f"Tracing enabled with {exporter_name} exporter")
+    return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """替换全局 Tracer（测试或离线分析脚本使用）"""
+    global _tracer
+    _tracer = tracer
+
+
+def traced(name: str | None = None) -> Callable:
+    """
+    为函数创建 Span 的装饰器（支持同步和异步函数）
+
+    使用示例：
+        @traced("VersionManager.get_versions")
+        async def get_versions(self, user_id: str): ...
+    """
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().start_as_current_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().start_as_current_span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
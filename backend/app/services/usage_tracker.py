@@ -0,0 +1,328 @@
+"""
+LLM 用量统计服务
+记录每次 LLM 调用的 token 用量和延迟，按 (用户, 模型, 框架) 聚合，
+并定期刷写到 Supabase 表或本地 JSONL 文件
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.config import get_settings
+from app.services.metrics import LLM_CALL_DURATION, LLM_PROMPT_CACHE_TOKENS
+from app.services.tracing import get_current_span
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的用量归属信息（user_id / framework_id），由 API 层设置
+_usage_context: ContextVar[dict[str, str | None]] = ContextVar("usage_context", default={})
+
+
+@contextmanager
+def usage_context(user_id: str | None = None, framework_id: str | None = None):
+    """
+    在当前请求上下文中设置用量归属信息
+
+    使用示例：
+        with usage_context(user_id=request.user_id, framework_id=request.framework_id):
+            await llm_service.generate_prompt(...)
+    """
+    token = _usage_context.set({"user_id": user_id, "framework_id": framework_id})
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+class UsageRecord(BaseModel):
+    """单次 LLM 调用的用量记录"""
+    provider: str
+    model: str
+    operation: str
+    user_id: str | None = None
+    framework_id: str | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_hit_tokens: int = 0
+    cache_miss_tokens: int = 0
+    latency_ms: float = 0.0
+    success: bool = True
+    created_at: datetime
+
+
+class UsageAggregate(BaseModel):
+    """按 (用户, 模型, 框架) 聚合的用量"""
+    user_id: str | None = None
+    model: str
+    framework_id: str | None = None
+    calls: int = 0
+    errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_hit_tokens: int = 0
+    cache_miss_tokens: int = 0
+    latency_ms_total: float = 0.0
+    latency_ms_max: float = 0.0
+
+    def add(self, record: UsageRecord):
+        """累加一条调用记录"""
+        self.calls += 1
+        self.errors += 0 if record.success else 1
+        self.input_tokens += record.input_tokens
+        self.output_tokens += record.output_tokens
+        self.cache_hit_tokens += record.cache_hit_tokens
+        self.cache_miss_tokens += record.cache_miss_tokens
+        self.latency_ms_total += record.latency_ms
+        self.latency_ms_max = max(self.latency_ms_max, record.latency_ms)
+
+    def merge(self, other: "UsageAggregate"):
+        """合并另一份同键的聚合数据"""
+        self.calls += other.calls
+        self.errors += other.errors
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_hit_tokens += other.cache_hit_tokens
+        self.cache_miss_tokens += other.cache_miss_tokens
+        self.latency_ms_total += other.latency_ms_total
+        self.latency_ms_max = max(self.latency_ms_max, other.latency_ms_max)
+
+
+def parse_openai_usage(result: dict[str, Any]) -> dict[str, int]:
+    """解析 OpenAI 兼容接口（DeepSeek）响应中的 usage 字段"""
+    usage = result.get("usage") or {}
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "cache_hit_tokens": usage.get("prompt_cache_hit_tokens", 0),
+        "cache_miss_tokens": usage.get("prompt_cache_miss_tokens", 0),
+    }
+
+
+def parse_gemini_usage(result: dict[str, Any]) -> dict[str, int]:
+    """解析 Gemini 响应中的 usageMetadata 字段"""
+    usage = result.get("usageMetadata") or {}
+    input_tokens = usage.get("promptTokenCount", 0)
+    cache_hit_tokens = usage.get("cachedContentTokenCount", 0)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": usage.get("candidatesTokenCount", 0),
+        "cache_hit_tokens": cache_hit_tokens,
+        "cache_miss_tokens": max(0, input_tokens - cache_hit_tokens),
+    }
+
+
+class UsageTracker:
+    """LLM 用量统计（进程内聚合 + 定期刷写）"""
+
+    RECENT_LIMIT = 200  # 保留最近的调用记录数
+    TOTALS_LIMIT = 1000  # 累计聚合最多保留的 (用户, 模型, 框架) 键数，超出时淘汰最久未更新的
+
+    def __init__(
+        self,
+        flush_target: str = "none",
+        flush_interval: float = 60.0,
+        flush_path: str = "usage_records.jsonl",
+    ):
+        self.flush_target = flush_target.lower()
+        self.flush_interval = flush_interval
+        self.flush_path = flush_path
+        self._lock = threading.Lock()
+        self._totals: OrderedDict[tuple, UsageAggregate] = OrderedDict()
+        self._pending: dict[tuple, UsageAggregate] = {}
+        self._recent: deque[UsageRecord] = deque(maxlen=self.RECENT_LIMIT)
+        self._last_flush = time.monotonic()
+        self._flush_task: asyncio.Task | None = None
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        operation: str,
+        usage: dict[str, int] | None,
+        latency_ms: float,
+        success: bool = True,
+    ) -> UsageRecord:
+        """
+        记录一次 LLM 调用
+
+        Args:
+            provider: 服务商（deepseek/gemini）
+            model: 模型名称
+            operation: 调用类型（analyze_intent/generate_prompt/generate_summary）
+            usage: parse_*_usage 解析出的 token 用量
+            latency_ms: 服务商响应耗时（毫秒）
+            success: 调用是否成功
+
+        Returns:
+            生成的用量记录
+        """
+        context = _usage_context.get()
+        record = UsageRecord(
+            provider=provider,
+            model=model,
+            operation=operation,
+            user_id=context.get("user_id"),
+            framework_id=context.get("framework_id"),
+            latency_ms=round(latency_ms, 2),
+            success=success,
+            created_at=datetime.now(UTC),
+            **(usage or {}),
+        )
+
+        key = (record.user_id, record.model, record.framework_id)
+        with self._lock:
+            # 不刷写时不需要保留增量
+            buckets = [self._totals]
+            if self.flush_target != "none":
+                buckets.append(self._pending)
+            for bucket in buckets:
+                if key not in bucket:
+                    bucket[key] = UsageAggregate(
+                        user_id=record.user_id, model=record.model, framework_id=record.framework_id
+                    )
+                bucket[key].add(record)
+            # 累计聚合只用于进程内查看，按最近更新淘汰；完整数据以刷写的增量为准
+            self._totals.move_to_end(key)
+            while len(self._totals) > self.TOTALS_LIMIT:
+                self._totals.popitem(last=False)
+            self._recent.append(record)
+
+        LLM_CALL_DURATION.labels(
+            provider, operation, "success" if success else "error"
+        ).observe(latency_ms / 1000)
+        if record.cache_hit_tokens:
+            LLM_PROMPT_CACHE_TOKENS.labels(provider, "hit").inc(record.cache_hit_tokens)
+        if record.cache_miss_tokens:
+            LLM_PROMPT_CACHE_TOKENS.labels(provider, "miss").inc(record.cache_miss_tokens)
+
+        span = get_current_span()
+        if span.is_recording:
+            span.set_attributes({
+                "llm.provider": provider,
+                "llm.model": model,
+                "llm.operation": operation,
+                "llm.input_tokens": record.input_tokens,
+                "llm.output_tokens": record.output_tokens,
+                "llm.cache_hit_tokens": record.cache_hit_tokens,
+            })
+
+        self._maybe_schedule_flush()
+        return record
+
+    def snapshot(self) -> dict[str, Any]:
+        """返回累计聚合数据和最近的调用记录"""
+        with self._lock:
+            return {
+                "aggregates": [agg.model_dump() for agg in self._totals.values()],
+                "recent": [r.model_dump(mode="json") for r in self._recent],
+                "pending_flush": len(self._pending),
+                "flush_target": self.flush_target,
+            }
+
+    def _maybe_schedule_flush(self):
+        """距离上次刷写超过间隔时，在后台刷写一次"""
+        if self.flush_target == "none":
+            return
+        if time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        if self._flush_task and not self._flush_task.done():
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            # 不在事件循环中（例如同步脚本），等待下次调用或关闭时刷写
+            pass
+
+    async def flush(self) -> int:
+        """
+        把上次刷写以来的增量聚合写出
+
+        Returns:
+            写出的聚合行数
+        """
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+            self._last_flush = time.monotonic()
+
+        if not pending or self.flush_target == "none":
+            return 0
+
+        flushed_at = datetime.now(UTC).isoformat()
+        rows = [{**agg.model_dump(), "flushed_at": flushed_at} for agg in pending]
+
+        try:
+            if self.flush_target == "file":
+                await asyncio.to_thread(self._write_file, rows)
+            elif self.flush_target == "supabase":
+                await self._write_supabase(rows)
+            else:
+                logger.warning(f"未知的用量刷写目标: {self.flush_target}")
+                return 0
+        except Exception as e:
+            logger.error(f"用量数据刷写失败: {e}")
+            # 写回待刷写数据，下次重试
+            with self._lock:
+                for agg in pending:
+                    key = (agg.user_id, agg.model, agg.framework_id)
+                    if key in self._pending:
+                        self._pending[key].merge(agg)
+                    else:
+                        self._pending[key] = agg
+            return 0
+
+        logger.info(f"Flushed {len(rows)} usage aggregates to {self.flush_target}")
+        return len(rows)
+
+    def _write_file(self, rows: list[dict[str, Any]]):
+        directory = os.path.dirname(self.flush_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.flush_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    async def _write_supabase(self, rows: list[dict[str, Any]]):
+        import httpx
+
+        settings = get_settings()
+        if not settings.supabase_url or not settings.supabase_key:
+            raise RuntimeError("Supabase 配置不完整，无法刷写用量数据")
+
+        async with httpx.AsyncClient(
+            base_url=f"{settings.supabase_url}/rest/v1",
+            headers={
+                "apikey": settings.supabase_key,
+                "Authorization": f"Bearer {settings.supabase_key}",
+                "Content-Type": "application/json",
+                "Prefer": "return=minimal",
+            },
+            timeout=10.0,
+        ) as client:
+            response = await client.post("/llm_usage", json=rows)
+            response.raise_for_status()
+
+
+_usage_tracker: UsageTracker | None = None
+
+
+def get_usage_tracker() -> UsageTracker:
+    """获取全局用量统计实例"""
+    global _usage_tracker
+    if _usage_tracker is None:
+        settings = get_settings()
+        _usage_tracker = UsageTracker(
+            flush_target=settings.usage_flush_target,
+            flush_interval=settings.usage_flush_interval,
+            flush_path=settings.usage_flush_path,
+        )
+    return _usage_tracker
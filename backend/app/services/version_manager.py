@@ -8,8 +8,11 @@ from datetime import UTC, datetime
 from enum import Enum
 from typing import Optional
 
+import httpx
 from pydantic import BaseModel
 from app.config import get_settings
+from app.services.metrics import SupabaseMetricsTransport
+from app.services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -52,11 +55,17 @@ class Version(BaseModel):
 class VersionManager:
     """管理提示词版本"""
 
-    def __init__(self):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        """
+        Args:
+            transport: 自定义 httpx 传输层（如进程内 PostgREST 替身），
+                提供时总是走 Supabase REST 代码路径
+        """
         settings = get_settings()
         self.settings = settings
         self.MAX_VERSIONS = 20
-        self.dev_mode = settings.dev_mode
+        self.dev_mode = settings.dev_mode and transport is None
+        self._transport = transport
         self._http_client = None
         
         # 开发模式使用内存存储
@@ -70,10 +79,11 @@ class VersionManager:
         """延迟初始化 HTTP 客户端（使用 Supabase REST API）"""
         if self._http_client is None and not self.dev_mode:
             try:
-                import httpx
-                
                 supabase_url = self.settings.supabase_url
                 supabase_key = self.settings.supabase_key
+                if self._transport is not None:
+                    supabase_url = supabase_url or "http://supabase.local"
+                    supabase_key = supabase_key or "local"
                 
                 if supabase_url and supabase_key:
                     self._http_client = httpx.AsyncClient(
@@ -84,7 +94,8 @@ class VersionManager:
                             "Content-Type": "application/json",
                             "Prefer": "return=representation"
                         },
-                        timeout=30.0
+                        timeout=30.0,
+                        transport=SupabaseMetricsTransport(self._transport)
                     )
                     logger.info("✅ Supabase REST API client initialized (VersionManager)")
                 else:
@@ -99,6 +110,7 @@ class VersionManager:
         
         return self._http_client
 
+    @traced("VersionManager.save_version")
     async def save_version(
         self,
         user_id: str,
@@ -225,6 +237,7 @@ class VersionManager:
             logger.error(f"Error saving version: {e}")
             raise
 
+    @traced("VersionManager.get_versions")
     async def get_versions(
         self,
         user_id: str,
@@ -296,6 +309,7 @@ class VersionManager:
             logger.error(f"Error getting versions for user {user_id}: {e}")
             return []
 
+    @traced("VersionManager.get_version")
     async def get_version(
         self,
         version_id: str
@@ -364,6 +378,7 @@ class VersionManager:
             logger.error(f"Error getting version {version_id}: {e}")
             raise
 
+    @traced("VersionManager.delete_version")
     async def delete_version(
         self,
         user_id: str,
@@ -421,6 +436,7 @@ class VersionManager:
             logger.error(f"Error deleting version {version_id}: {e}")
             raise
 
+    @traced("VersionManager.get_version_count")
     async def get_version_count(self, user_id: str) -> int:
         """
         获取用户的版本数量
@@ -460,6 +476,7 @@ class VersionManager:
             logger.error(f"Error getting version count for user {user_id}: {e}")
             return 0
 
+    @traced("VersionManager.rollback_version")
     async def rollback_version(
         self,
         user_id: str,
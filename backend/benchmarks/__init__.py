@@ -0,0 +1 @@
+"""基准测试和离线评估脚本（postgrest_sqlite 也作为测试替身使用）"""
@@ -0,0 +1,186 @@
+"""
+框架文档 full / compact 模式离线评估
+
+1. 静态统计：全部框架文档在两种模式下的文档 / 系统提示估算 token 数，
+   以及 compact 保留的章节和示例数
+2. 延迟：启动本地假 LLM（首包延迟随输入长度增加，见 --prefill-tokens-per-second），
+   用 OpenAICompatibleService.generate_prompt 对每个框架分别以两种模式生成，
+   比较延迟和假 LLM 统计的输入 token
+
+运行方式（在 backend 目录下）:
+    python benchmarks/eval_framework_docs.py
+    python benchmarks/eval_framework_docs.py --prefill-tokens-per-second 2000 --rounds 3
+    python benchmarks/eval_framework_docs.py --static-only --output docs_eval.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import UTC, datetime
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("USAGE_FLUSH_TARGET", "none")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from fake_llm import FakeLLMConfig, create_fake_llm_app  # noqa: E402
+from run_benchmarks import _free_port, _percentile, _serve  # noqa: E402
+
+from app.services.framework_docs import (  # noqa: E402
+    COMPACT_SECTIONS,
+    DocMode,
+    FrameworkDoc,
+    SectionKind,
+    get_framework_doc_store,
+)
+from app.services.prompt_builder import render_system_prompt  # noqa: E402
+from app.services.token_estimator import estimate_tokens  # noqa: E402
+
+EVAL_INPUT = "帮我写一篇新产品发布的营销文案，突出三个核心功能，面向中小企业主"
+EVAL_ANSWERS = {
+    "goalClarity": "明确",
+    "targetAudience": "中小企业主",
+    "formatRequirements": "Markdown",
+}
+
+
+def _summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "total": round(sum(values), 1),
+        "mean": round(statistics.mean(values), 1),
+        "p50": round(_percentile(values, 50), 1),
+        "p95": round(_percentile(values, 95), 1),
+        "max": round(values[-1], 1),
+    }
+
+
+def static_report(docs: list[FrameworkDoc]) -> dict:
+    """两种模式下的 token 数和 compact 保留的内容"""
+    report = {}
+    for mode in DocMode:
+        rendered = [doc.render(mode) for doc in docs]
+        report[mode.value] = {
+            "doc_tokens": _summary([estimate_tokens(text) for text in rendered]),
+            "system_prompt_tokens": _summary(
+                [estimate_tokens(render_system_prompt(text)) for text in rendered]
+            ),
+        }
+
+    full = report[DocMode.FULL.value]["system_prompt_tokens"]["total"]
+    compact = report[DocMode.COMPACT.value]["system_prompt_tokens"]["total"]
+    best_practices = [doc.section(SectionKind.BEST_PRACTICES) for doc in docs]
+    report["compact_reduction"] = round(1 - compact / full, 3) if full else 0.0
+    report["compact_coverage"] = {
+        "docs_with_all_sections": sum(
+            all(doc.section(kind) for kind in COMPACT_SECTIONS) for doc in docs
+        ),
+        "examples_full": sum(len(s.examples) for s in best_practices if s),
+        "examples_compact": sum(min(1, len(s.examples)) for s in best_practices if s),
+    }
+    return report
+
+
+async def latency_report(docs: list[FrameworkDoc], args: argparse.Namespace) -> dict:
+    """通过假 LLM 测量两种模式的生成延迟"""
+    from app.services.llm_service import OpenAICompatibleService
+    from app.services.model_registry import get_model_registry
+
+    llm_config = FakeLLMConfig(
+        latency_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_jitter_ms,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        seed=args.seed,
+    )
+    llm_app = create_fake_llm_app(llm_config)
+    port = _free_port()
+    server, task = await _serve(llm_app, port)
+
+    spec = get_model_registry().get("deepseek").model_copy(
+        update={"base_url": f"http://127.0.0.1:{port}"}
+    )
+    service = OpenAICompatibleService("eval-key", spec)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    report = {}
+    try:
+        for mode in DocMode:
+            latencies: list[float] = []
+            requests_before = llm_app.state.stats.requests
+
+            async def generate(doc: FrameworkDoc, mode: DocMode = mode):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await service.generate_prompt(
+                        user_input=EVAL_INPUT,
+                        framework_doc=doc.render(mode),
+                        clarification_answers=EVAL_ANSWERS,
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            await asyncio.gather(*(
+                generate(doc) for _ in range(args.rounds) for doc in docs
+            ))
+            report[mode.value] = {
+                "requests": llm_app.state.stats.requests - requests_before,
+                "latency_ms": _summary(latencies),
+            }
+    finally:
+        await service.close()
+        server.should_exit = True
+        await task
+
+    full = report[DocMode.FULL.value]["latency_ms"]["p50"]
+    compact = report[DocMode.COMPACT.value]["latency_ms"]["p50"]
+    report["compact_p50_speedup"] = round(full / compact, 2) if compact else 0.0
+    report["fake_llm"] = llm_config.model_dump()
+    return report
+
+
+async def main(args: argparse.Namespace) -> dict:
+    store = get_framework_doc_store()
+    docs = store.all()
+    if not docs:
+        raise SystemExit(f"未找到框架文档: {store.frameworks_dir!r}")
+
+    report = {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "frameworks": len(docs),
+        "tokens": static_report(docs),
+    }
+    if not args.static_only:
+        report["latency"] = await latency_report(docs, args)
+    return report
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="框架文档 full / compact 模式离线评估")
+    parser.add_argument("--static-only", action="store_true", help="只统计 token，不测延迟")
+    parser.add_argument("--rounds", type=int, default=1, help="每个框架每种模式的生成次数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发数")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0,
+                        help="假 LLM 输入处理速率（首包延迟随输入长度增加）")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="假 LLM 输出速率，0 表示瞬间输出")
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果 JSON 写入的文件（默认打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
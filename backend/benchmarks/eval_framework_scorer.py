@@ -0,0 +1,194 @@
+"""
+本地框架相似度打分（FrameworkScorer）评估与校准
+
+基于带标注的数据集（benchmarks/data/intent_eval.jsonl），不调用 LLM，报告：
+1. 准确率：hit@1（得分最高的框架可接受）、hit@3（前三个中有可接受的框架）
+2. 延迟：单条输入对全部框架打分的耗时（微秒）
+3. 校准：match_score 与"框架可接受"的 Brier 分数和分箱可靠性
+4. 置信度阈值：最高得分达到阈值（可不调用 LLM）的输入比例及其 hit@3
+
+--fit 在数据集上用逻辑回归（牛顿法）拟合校准参数 (slope, intercept)，
+按拟合结果报告，并打印可写入 DEFAULT_CALIBRATION 的值
+
+运行方式（在 backend 目录下）:
+    python benchmarks/eval_framework_scorer.py
+    python benchmarks/eval_framework_scorer.py --fit
+    python benchmarks/eval_framework_scorer.py --thresholds 0.4 0.5 0.6 --output scorer_eval.json
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from datetime import UTC, datetime
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("USAGE_FLUSH_TARGET", "none")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from run_benchmarks import _percentile  # noqa: E402
+
+from app.services.framework_matcher import FrameworkMatcher  # noqa: E402
+from app.services.framework_scorer import COMPLEXITY_WEIGHT, FrameworkScorer  # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_eval.jsonl")
+
+# 可靠性分箱数
+CALIBRATION_BINS = 5
+
+
+def load_dataset(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def fit_calibration(pairs: list[tuple[float, int]], iterations: int = 50) -> tuple[float, float]:
+    """
+    逻辑回归拟合 P(可接受 | 原始得分) = sigmoid(slope * 原始得分 + intercept)
+
+    Args:
+        pairs: (原始得分, 是否可接受 0/1)，只包含有场景或领域证据的框架
+
+    Returns:
+        (slope, intercept)
+    """
+    slope, intercept = 1.0, 0.0
+    for _ in range(iterations):
+        # 梯度和 Hessian（带很小的 L2 正则，避免可分数据上发散）
+        g_slope = g_intercept = 0.0
+        h_ss, h_si, h_ii = 1e-3, 0.0, 1e-3
+        for x, y in pairs:
+            p = 1 / (1 + math.exp(-(slope * x + intercept)))
+            w = p * (1 - p)
+            g_slope += (p - y) * x
+            g_intercept += p - y
+            h_ss += w * x * x
+            h_si += w * x
+            h_ii += w
+        g_slope += 1e-3 * slope
+        g_intercept += 1e-3 * intercept
+        det = h_ss * h_ii - h_si * h_si
+        step_slope = (h_ii * g_slope - h_si * g_intercept) / det
+        step_intercept = (h_ss * g_intercept - h_si * g_slope) / det
+        slope -= step_slope
+        intercept -= step_intercept
+        if abs(step_slope) + abs(step_intercept) < 1e-8:
+            break
+    return round(slope, 2), round(intercept, 2)
+
+
+def evaluate(scorer: FrameworkScorer, items: list[dict], args: argparse.Namespace) -> dict:
+    latencies_us: list[float] = []
+    hits_at_1 = hits_at_3 = 0
+    predictions: list[tuple[float, int]] = []
+    top_scores: list[tuple[float, bool]] = []
+    misses = []
+
+    for item in items:
+        expected = set(item["expected"])
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            ranked = scorer.score(item["input"])
+            latencies_us.append((time.perf_counter() - start) * 1e6)
+        top3 = [entry.id for entry, _ in ranked[:3]]
+        hits_at_1 += top3[0] in expected
+        hit = bool(expected & set(top3))
+        hits_at_3 += hit
+        top_scores.append((ranked[0][1], hit))
+        if not hit:
+            misses.append({"input": item["input"], "predicted": top3})
+        predictions.extend((score, entry.id in expected) for entry, score in ranked)
+
+    bins = []
+    for b in range(CALIBRATION_BINS):
+        low, high = b / CALIBRATION_BINS, (b + 1) / CALIBRATION_BINS
+        members = [
+            (score, label) for score, label in predictions
+            if low < score <= high or (b == 0 and score == 0)
+        ]
+        if members:
+            bins.append({
+                "range": f"{low:.1f}-{high:.1f}",
+                "count": len(members),
+                "mean_score": round(statistics.mean(score for score, _ in members), 3),
+                "accept_rate": round(statistics.mean(label for _, label in members), 3),
+            })
+
+    latencies_us.sort()
+    return {
+        "hit@1": round(hits_at_1 / len(items), 3),
+        "hit@3": round(hits_at_3 / len(items), 3),
+        "latency_us": {
+            "mean": round(statistics.mean(latencies_us), 1),
+            "p50": round(_percentile(latencies_us, 50), 1),
+            "p95": round(_percentile(latencies_us, 95), 1),
+            "max": round(latencies_us[-1], 1),
+        },
+        "brier": round(statistics.mean((score - label) ** 2 for score, label in predictions), 4),
+        "reliability": bins,
+        "thresholds": {
+            str(threshold): {
+                "coverage": round(
+                    sum(top >= threshold for top, _ in top_scores) / len(items), 3
+                ),
+                "hit@3": round(
+                    statistics.mean(hit for top, hit in top_scores if top >= threshold), 3
+                ) if any(top >= threshold for top, _ in top_scores) else None,
+            }
+            for threshold in args.thresholds
+        },
+        "misses": misses[:args.show_misses],
+    }
+
+
+def main(args: argparse.Namespace) -> dict:
+    items = load_dataset(args.dataset)
+    # 只用到框架目录，不调用 LLM
+    matcher = FrameworkMatcher(llm_service=None)
+    scorer = matcher.scorer
+    report = {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "dataset": os.path.relpath(args.dataset),
+        "items": len(items),
+        "frameworks": len(scorer.entries),
+    }
+    if args.fit:
+        pairs = [
+            (raw, int(entry.id in item["expected"]))
+            for item in items
+            for entry, raw in zip(scorer.entries, scorer.raw_scores(item["input"]), strict=True)
+            if raw > COMPLEXITY_WEIGHT
+        ]
+        calibration = fit_calibration(pairs)
+        scorer = FrameworkScorer(matcher.catalog, calibration=calibration)
+        report["fitted_pairs"] = len(pairs)
+    report["calibration"] = [scorer.slope, scorer.intercept]
+    report.update(evaluate(scorer, items, args))
+    return report
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="本地框架相似度打分评估与校准")
+    parser.add_argument("--dataset", default=DATASET, help="标注数据集（JSONL）")
+    parser.add_argument("--fit", action="store_true", help="在数据集上拟合校准参数")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.3, 0.5, 0.7],
+                        help="统计覆盖率的置信度阈值")
+    parser.add_argument("--rounds", type=int, default=20, help="每条样本的打分次数（统计延迟）")
+    parser.add_argument("--show-misses", type=int, default=10, help="报告中列出的未命中样本数")
+    parser.add_argument("--output", help="结果 JSON 写入的文件（默认打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = main(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,234 @@
+"""
+analyze_intent 框架上下文变体评估（full / compact / domain / top_n）
+
+基于带标注的数据集（benchmarks/data/intent_eval.jsonl，每行一个输入和可接受的框架 ID），
+对每种变体报告：
+1. 上下文 / 完整提示的估算 token 数
+2. 上下文召回率：可接受的框架至少有一个出现在上下文中的比例（top_n 会筛掉部分框架）
+3. 延迟：默认请求本地假 LLM（首包延迟随输入长度增加，见 --prefill-tokens-per-second）；
+   指定 --provider 时请求真实服务商
+4. 准确率（仅 --provider）：hit@1（第一个推荐可接受）、hit@3（任一推荐可接受）
+
+运行方式（在 backend 目录下）:
+    python benchmarks/eval_intent_context.py
+    python benchmarks/eval_intent_context.py --variants compact top_n --top-n 10
+    DEEPSEEK_API_KEY=sk-... python benchmarks/eval_intent_context.py --provider deepseek
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import UTC, datetime
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("USAGE_FLUSH_TARGET", "none")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from fake_llm import FakeLLMConfig, create_fake_llm_app  # noqa: E402
+from run_benchmarks import _free_port, _percentile, _serve  # noqa: E402
+
+from app.services.base_llm import BaseLLMService  # noqa: E402
+from app.services.framework_catalog import ContextVariant  # noqa: E402
+from app.services.framework_matcher import FrameworkMatcher  # noqa: E402
+from app.services.intent_output import IntentMatch  # noqa: E402
+from app.services.token_estimator import estimate_tokens  # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_eval.jsonl")
+
+# analyze_intent 提示中除框架上下文外的固定部分（估算完整输入 token 用）
+PROMPT_OVERHEAD_TOKENS = 250
+
+
+def load_dataset(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "mean": round(statistics.mean(values), 1),
+        "p50": round(_percentile(values, 50), 1),
+        "p95": round(_percentile(values, 95), 1),
+        "max": round(values[-1], 1),
+    }
+
+
+def _resolve(matcher: FrameworkMatcher, matches: list[IntentMatch]) -> list[str]:
+    """LLM 返回的 ID 解析为目录中的框架 ID（无法识别的原样保留）"""
+    resolved = []
+    for match in matches:
+        entry, _ = matcher.catalog.resolve(match.id)
+        resolved.append(entry.id if entry else match.id)
+    return resolved
+
+
+def static_report(matcher: FrameworkMatcher, variant: ContextVariant, items: list[dict]) -> dict:
+    """token 数和上下文召回率（不调用 LLM）"""
+    tokens, recalled = [], 0
+    for item in items:
+        tokens.append(estimate_tokens(matcher.intent_context(item["input"])))
+        if variant == ContextVariant.TOP_N:
+            ranked = matcher.catalog.rank(item["input"])[:matcher.context_top_n]
+            listed = {entry.id for entry, _ in ranked}
+        else:
+            listed = {entry.id for entry in matcher.catalog.entries}
+        recalled += bool(listed & set(item["expected"]))
+    return {
+        "context_tokens": _summary(tokens),
+        "prompt_tokens_mean": round(statistics.mean(tokens) + PROMPT_OVERHEAD_TOKENS, 1),
+        "context_recall": round(recalled / len(items), 3),
+    }
+
+
+async def llm_report(
+    matcher: FrameworkMatcher,
+    items: list[dict],
+    args: argparse.Namespace,
+    score: bool,
+) -> dict:
+    """逐条调用 analyze_intent，统计延迟（score 为 True 时同时统计准确率）"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    hits_at_1 = hits_at_3 = errors = 0
+    mistakes = []
+
+    async def run(item: dict):
+        nonlocal hits_at_1, hits_at_3, errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                answer = await matcher.llm_service.analyze_intent(
+                    user_input=item["input"],
+                    frameworks_context=matcher.intent_context(item["input"]),
+                )
+            except Exception as e:
+                errors += 1
+                mistakes.append({"input": item["input"], "error": str(e)})
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+        predicted = _resolve(matcher, answer)
+        expected = set(item["expected"])
+        hits_at_1 += bool(predicted[:1] and predicted[0] in expected)
+        hit = bool(expected & set(predicted[:3]))
+        hits_at_3 += hit
+        if not hit:
+            mistakes.append({"input": item["input"], "predicted": predicted})
+
+    await asyncio.gather(*(run(item) for _ in range(args.rounds) for item in items))
+    total = len(items) * args.rounds
+    report = {
+        "requests": total,
+        "errors": errors,
+        "latency_ms": _summary(latencies) if latencies else None,
+    }
+    if score:
+        report["hit@1"] = round(hits_at_1 / total, 3)
+        report["hit@3"] = round(hits_at_3 / total, 3)
+        report["misses"] = mistakes[:args.show_misses]
+    return report
+
+
+def _create_service(args: argparse.Namespace, fake_port: int | None) -> BaseLLMService:
+    from app.services.llm_factory import LLMFactory
+    from app.services.llm_service import OpenAICompatibleService
+    from app.services.model_registry import get_model_registry
+
+    if not args.provider:
+        # 假 LLM（--static-only 时不会发出请求）
+        spec = get_model_registry().get("deepseek")
+        if fake_port is not None:
+            spec = spec.model_copy(update={"base_url": f"http://127.0.0.1:{fake_port}"})
+        return OpenAICompatibleService("eval-key", spec)
+    api_key = args.api_key or os.environ.get(f"{args.provider.upper()}_API_KEY", "")
+    return LLMFactory.create_service_with_key(args.provider, api_key)
+
+
+async def main(args: argparse.Namespace) -> dict:
+    items = load_dataset(args.dataset)
+    variants = [ContextVariant(v) for v in args.variants]
+
+    server = task = None
+    fake_port = None
+    if not args.provider and not args.static_only:
+        llm_config = FakeLLMConfig(
+            latency_ms=args.llm_latency_ms,
+            jitter_ms=args.llm_jitter_ms,
+            prefill_tokens_per_second=args.prefill_tokens_per_second,
+            seed=args.seed,
+        )
+        llm_app = create_fake_llm_app(llm_config)
+        fake_port = _free_port()
+        server, task = await _serve(llm_app, fake_port)
+
+    service = _create_service(args, fake_port)
+    report = {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "dataset": os.path.relpath(args.dataset),
+        "items": len(items),
+        "llm": args.provider or ("none" if args.static_only else "fake"),
+        "top_n": args.top_n,
+        "variants": {},
+    }
+    try:
+        for variant in variants:
+            matcher = FrameworkMatcher(service, context_variant=variant)
+            matcher.context_top_n = args.top_n
+            result = static_report(matcher, variant, items)
+            if not args.static_only:
+                result.update(await llm_report(matcher, items, args, score=bool(args.provider)))
+            report["variants"][variant.value] = result
+    finally:
+        await service.close()
+        if server is not None:
+            server.should_exit = True
+            await task
+
+    full = report["variants"].get(ContextVariant.FULL.value)
+    if full:
+        for result in report["variants"].values():
+            result["token_reduction_vs_full"] = round(
+                1 - result["prompt_tokens_mean"] / full["prompt_tokens_mean"], 3
+            )
+            if result.get("latency_ms") and full.get("latency_ms"):
+                result["p50_speedup_vs_full"] = round(
+                    full["latency_ms"]["p50"] / result["latency_ms"]["p50"], 2
+                )
+    return report
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="analyze_intent 框架上下文变体评估")
+    parser.add_argument("--dataset", default=DATASET, help="标注数据集（JSONL）")
+    parser.add_argument("--variants", nargs="+", default=[v.value for v in ContextVariant],
+                        choices=[v.value for v in ContextVariant])
+    parser.add_argument("--top-n", type=int, default=15, help="top_n 变体保留的框架数")
+    parser.add_argument("--static-only", action="store_true", help="只统计 token 和召回率")
+    parser.add_argument("--provider", help="请求真实服务商（例如 deepseek）并统计准确率")
+    parser.add_argument("--api-key", help="服务商 API 密钥（默认读取 <PROVIDER>_API_KEY）")
+    parser.add_argument("--rounds", type=int, default=1, help="每条样本的请求次数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发数")
+    parser.add_argument("--show-misses", type=int, default=10, help="报告中列出的未命中样本数")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0,
+                        help="假 LLM 输入处理速率（首包延迟随输入长度增加）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果 JSON 写入的文件（默认打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
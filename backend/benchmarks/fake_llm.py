@@ -0,0 +1,203 @@
+"""
+本地假 LLM 服务（基准测试用）
+
+同时提供两种接口：
+- OpenAI 兼容（DeepSeek）：POST /v1/chat/completions，支持 stream=true（SSE）
+- Gemini 兼容：POST /v1beta/models/{model}:generateContent / :streamGenerateContent
+
+可配置首包延迟、抖动、输入处理速率和输出速率（token/秒）、慢请求和错误注入，
+响应中带 usage / usageMetadata，便于验证用量统计
+"""
+import asyncio
+import json
+import random
+import time
+
+from pydantic import BaseModel
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# analyze_intent（要求 JSON 输出的请求）固定返回的框架
+INTENT_ANSWER = json.dumps({"frameworks": [
+    {"id": "RACEF", "score": 0.9, "reasoning": "需求涉及创意和策略规划"},
+    {"id": "BAB", "score": 0.8, "reasoning": "适合突出前后对比的营销内容"},
+    {"id": "Chain of Thought", "score": 0.6, "reasoning": "需要逐步推理"},
+]}, ensure_ascii=False)
+FILLER_TOKEN = "优化"
+
+
+class FakeLLMConfig(BaseModel):
+    """假 LLM 服务的行为配置"""
+    latency_ms: float = 200.0  # 首包延迟
+    jitter_ms: float = 50.0  # 首包延迟的均匀抖动
+    tokens_per_second: float = 0.0  # 输出速率，0 表示瞬间输出
+    prefill_tokens_per_second: float = 0.0  # 输入处理速率，0 表示首包延迟与输入长度无关
+    output_tokens: int = 400  # generate_prompt 类请求的输出 token 数
+    slow_rate: float = 0.0  # 慢请求比例（模拟长尾）
+    slow_ms: float = 3000.0  # 慢请求额外延迟
+    error_rate: float = 0.0  # 错误注入比例
+    error_status: int = 503
+    retry_after: float | None = None  # 错误响应的 Retry-After（秒）
+    seed: int = 42
+
+
+class FakeLLMStats(BaseModel):
+    """假 LLM 服务收到的请求统计"""
+    requests: int = 0
+    streamed: int = 0
+    errors: int = 0
+    slow: int = 0
+
+
+def create_fake_llm_app(config: FakeLLMConfig | None = None) -> Starlette:
+    """创建假 LLM 服务（app.state.stats 记录请求统计）"""
+    config = config or FakeLLMConfig()
+    rng = random.Random(config.seed)
+    stats = FakeLLMStats()
+
+    def _output_text(max_tokens: int | None, json_mode: bool = False) -> tuple[str, int]:
+        if json_mode:
+            return INTENT_ANSWER, len(INTENT_ANSWER) // 2
+        tokens = min(config.output_tokens, max_tokens or config.output_tokens)
+        return FILLER_TOKEN * tokens, tokens
+
+    async def _before_response(prompt_tokens: int = 0) -> Response | None:
+        """模拟首包延迟（含输入处理耗时），按配置注入错误"""
+        stats.requests += 1
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        if config.prefill_tokens_per_second > 0:
+            delay += prompt_tokens / config.prefill_tokens_per_second * 1000
+        if config.slow_rate and rng.random() < config.slow_rate:
+            stats.slow += 1
+            delay += config.slow_ms
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        if config.error_rate and rng.random() < config.error_rate:
+            stats.errors += 1
+            headers = {}
+            if config.retry_after is not None:
+                headers["retry-after"] = str(config.retry_after)
+            return JSONResponse(
+                {"error": {"message": "injected error", "code": config.error_status}},
+                status_code=config.error_status,
+                headers=headers,
+            )
+        return None
+
+    async def _generation_delay(tokens: int):
+        if config.tokens_per_second > 0:
+            await asyncio.sleep(tokens / config.tokens_per_second)
+
+    async def _token_chunks(text: str, tokens: int, chunk_tokens: int = 8):
+        """按输出速率逐块产出文本"""
+        step = max(1, len(text) // max(1, tokens)) * chunk_tokens
+        for offset in range(0, len(text), step):
+            await _generation_delay(chunk_tokens)
+            yield text[offset:offset + step]
+
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 2
+        error = await _before_response(prompt_tokens)
+        if error is not None:
+            return error
+
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        text, tokens = _output_text(body.get("max_tokens"), json_mode)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": tokens,
+            "total_tokens": prompt_tokens + tokens,
+            "prompt_cache_hit_tokens": 0,
+            "prompt_cache_miss_tokens": prompt_tokens,
+        }
+        model = body.get("model", "fake-model")
+        created = int(time.time())
+
+        if body.get("stream"):
+            stats.streamed += 1
+
+            async def events():
+                async for piece in _token_chunks(text, tokens):
+                    chunk = {
+                        "id": "fake", "object": "chat.completion.chunk", "created": created,
+                        "model": model,
+                        "choices": [
+                            {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                        ],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                final = {
+                    "id": "fake", "object": "chat.completion.chunk", "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    final["usage"] = usage
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await _generation_delay(tokens)
+        return JSONResponse({
+            "id": "fake",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def gemini(request: Request) -> Response:
+        model, _, action = request.path_params["model_action"].partition(":")
+        body = await request.json()
+        prompt_tokens = len(json.dumps(
+            [body.get("system_instruction"), body.get("contents", [])], ensure_ascii=False
+        )) // 2
+        error = await _before_response(prompt_tokens)
+        if error is not None:
+            return error
+
+        generation_config = body.get("generationConfig") or {}
+        text, tokens = _output_text(
+            generation_config.get("maxOutputTokens"),
+            generation_config.get("responseMimeType") == "application/json",
+        )
+
+        def _payload(piece: str, candidates_tokens: int) -> dict:
+            return {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": candidates_tokens,
+                    "totalTokenCount": prompt_tokens + candidates_tokens,
+                },
+                "modelVersion": model,
+            }
+
+        if action == "streamGenerateContent":
+            stats.streamed += 1
+
+            async def events():
+                async for piece in _token_chunks(text, tokens):
+                    yield f"data: {json.dumps(_payload(piece, 0), ensure_ascii=False)}\n\n"
+                yield f"data: {json.dumps(_payload('', tokens))}\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await _generation_delay(tokens)
+        return JSONResponse(_payload(text, tokens))
+
+    app = Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1beta/models/{model_action}", gemini, methods=["POST"]),
+    ])
+    app.state.stats = stats
+    return app
@@ -0,0 +1,353 @@
+"""
+基于 SQLite 的进程内 PostgREST 替身
+
+实现 VersionManager / FeedbackService 使用的 Supabase /rest/v1 子集：
+- 过滤：列=eq./neq./gt./gte./lt./lte./is./in.(...)
+- order=列[.asc|.desc][.nullsfirst|.nullslast]（可多列，逗号分隔）、limit、offset
+- select=列1,列2（不支持嵌套资源）
+- Prefer：return=representation|minimal、count=exact（Content-Range 头）
+- GET / POST（单行或多行）/ PATCH / DELETE
+- 错误响应使用 PostgREST 的 JSON 格式（code / message / details / hint）
+
+既可以作为 ASGI 应用用 uvicorn 提供服务，也可以直接挂到
+httpx.ASGITransport 上供 VersionManager(transport=...) 使用，不经过网络。
+
+使用示例：
+    stub = PostgrestStub()
+    manager = VersionManager(transport=stub.transport())
+"""
+import asyncio
+import json
+import sqlite3
+import uuid
+from datetime import UTC, datetime
+from typing import Any
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# 表结构与 backend/migrations 保持一致（类型换成 SQLite 等价类型）
+DEFAULT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+  id UUID PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  version_number TEXT NOT NULL,
+  content TEXT NOT NULL,
+  type TEXT NOT NULL CHECK (type IN ('save', 'optimize')),
+  description TEXT,
+  topic TEXT,
+  framework_id TEXT,
+  framework_name TEXT,
+  original_input TEXT,
+  created_at TIMESTAMP,
+  updated_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_versions_user_id ON versions(user_id);
+CREATE INDEX IF NOT EXISTS idx_versions_created_at ON versions(created_at DESC);
+
+CREATE TABLE IF NOT EXISTS feature_options (
+  id UUID PRIMARY KEY,
+  name TEXT NOT NULL,
+  description TEXT,
+  display_order INT NOT NULL,
+  is_active BOOLEAN DEFAULT 1,
+  created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_votes (
+  id UUID PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  option_id UUID NOT NULL,
+  created_at TIMESTAMP,
+  UNIQUE(user_id, option_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_votes_user_id ON user_votes(user_id);
+
+CREATE TABLE IF NOT EXISTS user_feedback (
+  id UUID PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  content TEXT NOT NULL,
+  created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS llm_usage (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id TEXT,
+  model TEXT NOT NULL,
+  framework_id TEXT,
+  calls INTEGER NOT NULL DEFAULT 0,
+  errors INTEGER NOT NULL DEFAULT 0,
+  input_tokens INTEGER NOT NULL DEFAULT 0,
+  output_tokens INTEGER NOT NULL DEFAULT 0,
+  cache_hit_tokens INTEGER NOT NULL DEFAULT 0,
+  cache_miss_tokens INTEGER NOT NULL DEFAULT 0,
+  latency_ms_total REAL NOT NULL DEFAULT 0,
+  latency_ms_max REAL NOT NULL DEFAULT 0,
+  flushed_at TIMESTAMP
+);
+"""
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset"}
+COMPARISON_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class PostgrestError(Exception):
+    """转换为 PostgREST 格式错误响应的异常"""
+
+    def __init__(self, status_code: int, code: str, message: str, details: str | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.details = details
+
+    def to_response(self) -> JSONResponse:
+        return JSONResponse(
+            {"code": self.code, "message": self.message, "details": self.details, "hint": None},
+            status_code=self.status_code,
+        )
+
+
+class _Table:
+    """表的列信息（用于校验列名和转换 UUID/BOOLEAN/TIMESTAMP 列）"""
+
+    def __init__(self, name: str, columns: list[tuple[str, str]]):
+        self.name = name
+        self.columns = [column for column, _ in columns]
+        self.uuid_columns = {c for c, t in columns if t == "UUID"}
+        self.bool_columns = {c for c, t in columns if t == "BOOLEAN"}
+        self.timestamp_columns = {c for c, t in columns if t == "TIMESTAMP"}
+
+    def check(self, column: str) -> str:
+        if column not in self.columns:
+            raise PostgrestError(
+                400, "42703", f'column {self.name}.{column} does not exist'
+            )
+        return f'"{column}"'
+
+    def to_db(self, column: str, value: Any) -> Any:
+        if column in self.bool_columns:
+            if isinstance(value, str):
+                return 1 if value.lower() == "true" else 0
+            return None if value is None else int(bool(value))
+        if isinstance(value, dict | list):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    def from_db(self, row: sqlite3.Row) -> dict[str, Any]:
+        data = dict(row)
+        for column in self.bool_columns & data.keys():
+            if data[column] is not None:
+                data[column] = bool(data[column])
+        return data
+
+
+class PostgrestStub:
+    """SQLite 上的 PostgREST 子集（ASGI 应用）"""
+
+    def __init__(
+        self,
+        database: str = ":memory:",
+        schema: str = DEFAULT_SCHEMA,
+        latency_ms: float = 0.0,
+    ):
+        """
+        Args:
+            database: SQLite 数据库路径，默认内存数据库
+            schema: 建表 SQL
+            latency_ms: 每次请求的固定延迟（模拟到 Supabase 的网络往返）
+        """
+        self.latency_ms = latency_ms
+        # 请求都在同一个事件循环内同步执行，单连接即可
+        self.conn = sqlite3.connect(database, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(schema)
+        self.tables = self._load_tables()
+        self.requests = 0
+        self.app = Starlette(routes=[
+            Route("/rest/v1/{table}", self._endpoint, methods=["GET", "POST", "PATCH", "DELETE"]),
+        ])
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+    def transport(self) -> httpx.ASGITransport:
+        """返回可直接传给 httpx.AsyncClient 的传输层"""
+        return httpx.ASGITransport(app=self)
+
+    def _load_tables(self) -> dict[str, _Table]:
+        tables = {}
+        names = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        for (name,) in names:
+            info = self.conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+            tables[name] = _Table(name, [(col["name"], col["type"].upper()) for col in info])
+        return tables
+
+    def insert(self, table: str, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """直接插入数据（预置测试数据用），返回插入后的行"""
+        return self._insert(self._table(table), rows, representation=True)
+
+    # ---- 请求处理 ----
+
+    def _table(self, name: str) -> _Table:
+        table = self.tables.get(name)
+        if table is None:
+            raise PostgrestError(404, "42P01", f'relation "public.{name}" does not exist')
+        return table
+
+    @staticmethod
+    def _prefer(request: Request) -> dict[str, str]:
+        prefer = {}
+        for header in request.headers.getlist("prefer"):
+            for item in header.split(","):
+                key, _, value = item.strip().partition("=")
+                if key:
+                    prefer[key] = value
+        return prefer
+
+    def _where(self, table: _Table, request: Request) -> tuple[str, list[Any]]:
+        clauses, params = [], []
+        for key, value in request.query_params.multi_items():
+            if key in RESERVED_PARAMS:
+                continue
+            column = table.check(key)
+            operator, _, operand = value.partition(".")
+            if operator in COMPARISON_OPERATORS:
+                clauses.append(f"{column} {COMPARISON_OPERATORS[operator]} ?")
+                params.append(table.to_db(key, operand))
+            elif operator == "is":
+                literal = {"null": "NULL", "true": "1", "false": "0"}.get(operand.lower())
+                if literal is None:
+                    raise PostgrestError(400, "PGRST100", f'"{value}" 不是合法的 is 过滤值')
+                clauses.append(f"{column} IS {literal}")
+            elif operator == "in" and operand.startswith("(") and operand.endswith(")"):
+                items = [item.strip().strip('"') for item in operand[1:-1].split(",") if item]
+                clauses.append(f"{column} IN ({', '.join('?' * len(items))})")
+                params.extend(table.to_db(key, item) for item in items)
+            else:
+                raise PostgrestError(400, "PGRST100", f'不支持的过滤条件: {key}={value}')
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _order(self, table: _Table, request: Request) -> str:
+        order = request.query_params.get("order")
+        if not order:
+            return ""
+        terms = []
+        for term in order.split(","):
+            column, *modifiers = term.strip().split(".")
+            sql = f"{table.check(column)} {'DESC' if 'desc' in modifiers else 'ASC'}"
+            # PostgREST 默认：升序 NULLS LAST，降序 NULLS FIRST
+            nulls_first = "nullsfirst" in modifiers or (
+                "desc" in modifiers and "nullslast" not in modifiers
+            )
+            sql += " NULLS FIRST" if nulls_first else " NULLS LAST"
+            terms.append(sql)
+        return " ORDER BY " + ", ".join(terms)
+
+    def _select(self, table: _Table, request: Request) -> str:
+        select = request.query_params.get("select", "*").strip()
+        if select in ("", "*"):
+            return "*"
+        return ", ".join(table.check(column.strip()) for column in select.split(","))
+
+    def _insert(
+        self, table: _Table, rows: list[dict[str, Any]], representation: bool
+    ) -> list[dict[str, Any]]:
+        now = datetime.now(UTC).isoformat().replace("+00:00", "Z")
+        inserted = []
+        with self.conn:
+            for row in rows:
+                row = dict(row)
+                for column in table.uuid_columns:
+                    if column == "id" and row.get(column) is None:
+                        row[column] = str(uuid.uuid4())
+                for column in table.timestamp_columns:
+                    if column in ("created_at", "updated_at", "flushed_at"):
+                        row.setdefault(column, now)
+                columns = [table.check(column) for column in row]
+                values = [table.to_db(column, value) for column, value in row.items()]
+                sql = (
+                    f'INSERT INTO "{table.name}" ({", ".join(columns)}) '
+                    f'VALUES ({", ".join("?" * len(values))})'
+                )
+                if representation:
+                    sql += " RETURNING *"
+                try:
+                    cursor = self.conn.execute(sql, values)
+                except sqlite3.IntegrityError as e:
+                    code = "23505" if "UNIQUE" in str(e) else "23502"
+                    raise PostgrestError(409, code, str(e)) from e
+                if representation:
+                    inserted.append(table.from_db(cursor.fetchone()))
+        return inserted
+
+    async def _endpoint(self, request: Request) -> Response:
+        self.requests += 1
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+        try:
+            return await self._handle(request)
+        except PostgrestError as e:
+            return e.to_response()
+
+    async def _handle(self, request: Request) -> Response:
+        table = self._table(request.path_params["table"])
+        prefer = self._prefer(request)
+        representation = prefer.get("return") == "representation"
+        where, params = self._where(table, request)
+
+        if request.method == "GET":
+            sql = f'SELECT {self._select(table, request)} FROM "{table.name}"{where}'
+            sql += self._order(table, request)
+            limit = request.query_params.get("limit")
+            offset = int(request.query_params.get("offset", 0))
+            if limit is not None or offset:
+                sql += f" LIMIT {int(limit) if limit is not None else -1} OFFSET {offset}"
+            rows = [table.from_db(row) for row in self.conn.execute(sql, params).fetchall()]
+
+            headers = {}
+            if prefer.get("count") in ("exact", "planned", "estimated"):
+                total = self.conn.execute(
+                    f'SELECT COUNT(*) FROM "{table.name}"{where}', params
+                ).fetchone()[0]
+                end = offset + len(rows) - 1
+                headers["content-range"] = f"{offset}-{end}/{total}" if rows else f"*/{total}"
+            return JSONResponse(rows, headers=headers)
+
+        if request.method == "POST":
+            payload = await request.json()
+            rows = payload if isinstance(payload, list) else [payload]
+            inserted = self._insert(table, rows, representation)
+            if representation:
+                return JSONResponse(inserted, status_code=201)
+            return Response(status_code=201)
+
+        if request.method == "PATCH":
+            if not where:
+                raise PostgrestError(400, "21000", "UPDATE requires a WHERE clause")
+            payload = await request.json()
+            assignments = ", ".join(f"{table.check(column)} = ?" for column in payload)
+            values = [table.to_db(column, value) for column, value in payload.items()]
+            sql = f'UPDATE "{table.name}" SET {assignments}{where}'
+            return self._write(table, sql + (" RETURNING *" if representation else ""),
+                               values + params, representation)
+
+        # DELETE
+        if not where:
+            raise PostgrestError(400, "21000", "DELETE requires a WHERE clause")
+        sql = f'DELETE FROM "{table.name}"{where}'
+        return self._write(table, sql + (" RETURNING *" if representation else ""),
+                           params, representation)
+
+    def _write(self, table: _Table, sql: str, params: list[Any], representation: bool) -> Response:
+        with self.conn:
+            cursor = self.conn.execute(sql, params)
+            rows = [table.from_db(row) for row in cursor.fetchall()] if representation else []
+        if representation:
+            return JSONResponse(rows)
+        return Response(status_code=204)
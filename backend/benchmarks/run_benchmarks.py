@@ -0,0 +1,314 @@
+"""
+离线接口基准测试
+
+在本地启动假 LLM 服务（DeepSeek/Gemini 兼容）和 SQLite 版 PostgREST 替身，
+让 FastAPI 应用走生产代码路径（非 dev_mode），在固定并发下压测：
+- POST /api/v1/frameworks/match
+- POST /api/v1/prompts/generate
+- GET  /api/v1/versions
+
+输出每个接口的吞吐量和 p50/p95/p99 延迟（JSON），用于回归对比。
+应用通过 httpx.ASGITransport 在进程内调用，假 LLM 服务走本地真实 HTTP 连接；
+Supabase 替身默认以 ASGITransport 挂到 VersionManager 上（--supabase-mode http 时走本地 HTTP）。
+
+运行方式（在 backend 目录下）:
+    python benchmarks/run_benchmarks.py --concurrency 16 --requests 200 --llm-latency-ms 300
+    python benchmarks/run_benchmarks.py --error-rate 0.05 --output bench.json
+    LLM_CONCURRENCY_MAX=4 python benchmarks/run_benchmarks.py --endpoints generate --pro-ratio 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import sys
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import httpx
+import uvicorn
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_llm import FakeLLMConfig, create_fake_llm_app  # noqa: E402
+from postgrest_sqlite import PostgrestStub  # noqa: E402
+
+ENDPOINTS = ("match", "generate", "versions")
+SEED_USERS = 10
+MATCH_INPUT = "帮我写一篇新产品发布的营销文案，突出三个核心功能，面向中小企业主"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _serve(app, port: int) -> tuple[uvicorn.Server, asyncio.Task]:
+    """在当前事件循环中启动 uvicorn 服务，等待其开始监听"""
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off",
+    ))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+def _seed_versions() -> list[dict]:
+    """为 /versions 读取压测预置数据：每个用户 20 个版本"""
+    now = datetime.now(UTC)
+    rows = []
+    for user in range(SEED_USERS):
+        for i in range(20):
+            created = (now - timedelta(minutes=i)).isoformat()
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "user_id": f"bench-seed-{user}",
+                "content": "# 角色\n你是一名资深营销文案专家。\n" * 20,
+                "type": "optimize",
+                "version_number": f"1.{i}",
+                "description": "优化生成",
+                "topic": "营销文案",
+                "framework_id": "RACEF",
+                "framework_name": "RACEF",
+                "original_input": MATCH_INPUT,
+                "created_at": created,
+                "updated_at": created,
+            })
+    return rows
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    """最近秩法分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _build_request(
+    endpoint: str, i: int, model: str, tier: str, doc_mode: str | None = None
+) -> tuple[str, str, dict]:
+    if endpoint == "match":
+        return "POST", "/api/v1/frameworks/match", {"json": {
+            "input": MATCH_INPUT, "model": model, "user_type": tier,
+        }}
+    if endpoint == "generate":
+        return "POST", "/api/v1/prompts/generate", {"json": {
+            "input": MATCH_INPUT,
+            "framework_id": "RACEF",
+            "clarification_answers": {"targetAudience": "中小企业主"},
+            # 每个请求使用独立用户，避免触发 20 个版本的上限
+            "user_id": f"bench-gen-{uuid.uuid4().hex[:12]}",
+            "model": model,
+            "account_type": tier,
+            "doc_mode": doc_mode,
+            "api_key": "bench-key",
+        }}
+    return "GET", "/api/v1/versions", {
+        "params": {"user_id": f"bench-seed-{i % SEED_USERS}", "limit": 20}
+    }
+
+
+async def bench_endpoint(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    model: str,
+    pro_ratio: float = 0.0,
+    doc_mode: str | None = None,
+) -> dict:
+    """以固定并发压测一个接口（pro_ratio 比例的请求以 Pro 账户发出，分别统计延迟）"""
+    for i in range(warmup):
+        method, url, kwargs = _build_request(endpoint, i, model, "free", doc_mode)
+        await client.request(method, url, **kwargs)
+
+    latencies: list[float] = []
+    tier_latencies: dict[str, list[float]] = {"pro": [], "free": []}
+    statuses: dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            # 按比例均匀穿插 Pro 请求
+            tier = "pro" if int((i + 1) * pro_ratio) > int(i * pro_ratio) else "free"
+            method, url, kwargs = _build_request(endpoint, i, model, tier, doc_mode)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            latencies.append(elapsed_ms)
+            tier_latencies[tier].append(elapsed_ms)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": requests - statuses.get("200", 0),
+        "status_counts": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "by_tier": {
+            tier: {
+                "requests": len(values),
+                "p50_ms": round(_percentile(sorted(values), 50), 2),
+                "p95_ms": round(_percentile(sorted(values), 95), 2),
+            }
+            for tier, values in tier_latencies.items() if values
+        },
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    llm_config = FakeLLMConfig(
+        latency_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        output_tokens=args.output_tokens,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    llm_app = create_fake_llm_app(llm_config)
+    postgrest = PostgrestStub(latency_ms=args.supabase_latency_ms)
+    postgrest.insert("versions", _seed_versions())
+
+    llm_port, supabase_port = _free_port(), _free_port()
+    servers = [await _serve(llm_app, llm_port)]
+    if args.supabase_mode == "http":
+        servers.append(await _serve(postgrest, supabase_port))
+
+    # 应用在导入时读取配置，必须在导入前设置环境变量
+    os.environ.update({
+        "DEV_MODE": "false",
+        "DEEPSEEK_API_KEY": "bench-key",
+        "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "GEMINI_API_KEY": "bench-key",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "SUPABASE_URL": f"http://127.0.0.1:{supabase_port}",
+        "SUPABASE_KEY": "bench-key",
+        "USAGE_FLUSH_TARGET": "none",
+        "TRACING_EXPORTER": "none",
+    })
+    from app.config import get_settings
+
+    get_settings.cache_clear()
+    from app.main import app
+
+    if args.supabase_mode == "asgi":
+        from app.api import feedback, prompts, versions
+        from app.services.feedback_service import FeedbackService
+        from app.services.version_manager import VersionManager
+
+        prompts.version_manager = VersionManager(transport=postgrest.transport())
+        versions.version_manager = VersionManager(transport=postgrest.transport())
+        feedback.feedback_service = FeedbackService(transport=postgrest.transport())
+
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=args.timeout
+    ) as client:
+        for endpoint in args.endpoints:
+            results[endpoint] = await bench_endpoint(
+                client, endpoint, args.requests, args.concurrency, args.warmup, args.model,
+                args.pro_ratio, args.doc_mode,
+            )
+
+    for server, task in servers:
+        server.should_exit = True
+        await task
+
+    return {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "model": args.model,
+        "doc_mode": args.doc_mode,
+        "fake_llm": {
+            **llm_config.model_dump(),
+            "stats": llm_app.state.stats.model_dump(),
+        },
+        "supabase": {
+            "mode": args.supabase_mode,
+            "latency_ms": args.supabase_latency_ms,
+            "requests": postgrest.requests,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="离线接口基准测试")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        type=lambda s: [e for e in s.split(",") if e],
+                        help="要压测的接口（逗号分隔）：match,generate,versions")
+    parser.add_argument("--requests", type=int, default=100, help="每个接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发数")
+    parser.add_argument("--warmup", type=int, default=5, help="预热请求数（不计入结果）")
+    parser.add_argument("--model", default="deepseek", choices=["deepseek", "gemini"])
+    parser.add_argument("--pro-ratio", type=float, default=0.0,
+                        help="以 Pro 账户发出的请求比例（结果按账户等级分别统计延迟）")
+    parser.add_argument("--timeout", type=float, default=180.0, help="客户端超时（秒）")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="假 LLM 输出速率，0 表示瞬间输出")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0,
+                        help="假 LLM 输入处理速率，0 表示首包延迟与输入长度无关")
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--doc-mode", choices=["full", "compact"], default=None,
+                        help="generate 请求的框架文档模式（默认使用服务端配置）")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢请求比例")
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误注入比例")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--supabase-mode", default="asgi", choices=["asgi", "http"],
+                        help="Supabase 替身接入方式：进程内 ASGITransport 或本地 HTTP")
+    parser.add_argument("--supabase-latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果 JSON 写入的文件（默认打印到标准输出）")
+    parser.add_argument("--verbose", action="store_true", help="输出应用日志")
+    args = parser.parse_args(argv)
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"未知接口: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
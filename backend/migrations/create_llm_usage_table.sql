@@ -0,0 +1,28 @@
+-- 创建 LLM 用量统计表（USAGE_FLUSH_TARGET=supabase 时写入）
+CREATE TABLE IF NOT EXISTS llm_usage (
+  id BIGSERIAL PRIMARY KEY,
+  user_id TEXT,
+  model TEXT NOT NULL,
+  framework_id TEXT,
+  calls INTEGER NOT NULL DEFAULT 0,
+  errors INTEGER NOT NULL DEFAULT 0,
+  input_tokens BIGINT NOT NULL DEFAULT 0,
+  output_tokens BIGINT NOT NULL DEFAULT 0,
+  cache_hit_tokens BIGINT NOT NULL DEFAULT 0,
+  cache_miss_tokens BIGINT NOT NULL DEFAULT 0,
+  latency_ms_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+  latency_ms_max DOUBLE PRECISION NOT NULL DEFAULT 0,
+  flushed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- 创建索引
+CREATE INDEX IF NOT EXISTS idx_llm_usage_user_id ON llm_usage(user_id);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_model_framework ON llm_usage(model, framework_id);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_flushed_at ON llm_usage(flushed_at DESC);
+
+-- 启用 RLS（仅服务端使用 service role 写入）
+ALTER TABLE llm_usage ENABLE ROW LEVEL SECURITY;
+
+-- 添加注释
+COMMENT ON TABLE llm_usage IS 'LLM 调用用量聚合（每次刷写一行增量）';
+COMMENT ON COLUMN llm_usage.cache_hit_tokens IS '服务商上下文缓存命中的输入 token 数';
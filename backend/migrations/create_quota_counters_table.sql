@@ -0,0 +1,16 @@
+-- 创建配额计数表（QUOTA_STORE=postgres 时使用）
+CREATE TABLE IF NOT EXISTS quota_counters (
+  key TEXT PRIMARY KEY,
+  value INTEGER NOT NULL DEFAULT 0,
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- 创建索引（用于清理过期记录）
+CREATE INDEX IF NOT EXISTS idx_quota_counters_expires_at ON quota_counters(expires_at);
+
+-- 启用 RLS（仅服务端使用 service role 访问）
+ALTER TABLE quota_counters ENABLE ROW LEVEL SECURITY;
+
+-- 添加注释
+COMMENT ON TABLE quota_counters IS '每日配额与重试计数，键格式：用户ID:用户时区日期 / retry:用户ID:请求ID';
+COMMENT ON COLUMN quota_counters.expires_at IS '过期时间，过期后计数视为 0（用户时区次日 00:00）';
@@ -0,0 +1,110 @@
+"""
+由匹配反馈日志拟合按领域的框架先验（离线任务）
+
+读取 MATCH_LOG_PATH 指向的 JSONL 日志，把每次 /generate 使用的框架与同一输入最近一次 /match
+返回的候选配对，拟合各领域的框架提升系数，写入 FRAMEWORK_PRIORS_PATH 指向的 JSON 文件
+（FrameworkMatcher 启动时加载）。
+
+--holdout 按时间顺序留出最后一部分选用记录评估：用前面的记录拟合，统计留出记录中
+用户所选框架排在候选第一位的比例（按先验重新排序前后对比）
+
+运行方式（在 backend 目录下）:
+    python scripts/fit_framework_priors.py --log match_log.jsonl --output framework_priors.json
+    python scripts/fit_framework_priors.py --log match_log.jsonl --holdout 0.2
+"""
+import argparse
+import json
+import os
+import sys
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.framework_priors import (  # noqa: E402
+    DEFAULT_SMOOTHING,
+    FrameworkPriors,
+    adjust_score,
+    fit_priors,
+)
+from app.services.match_log import read_events  # noqa: E402
+
+
+def holdout_report(priors: FrameworkPriors, events: list[dict], start: int) -> dict:
+    """events[start:] 中的选用记录，所选框架排在第一位的比例（原始顺序 / 按先验重新排序）"""
+    latest_match: dict[str, dict] = {}
+    total = top1_before = top1_after = 0
+    for i, event in enumerate(events):
+        if event["event"] == "match":
+            latest_match[event.get("key")] = event
+            continue
+        match = latest_match.pop(event.get("key"), None)
+        candidates = match.get("candidates") if match else None
+        if i < start or not candidates or event.get("framework") not in candidates:
+            continue
+        domains = dict.fromkeys(match.get("domains") or [], 1.0)
+        scores = match.get("scores") or [1.0] * len(candidates)
+        # 与 FrameworkMatcher.apply_priors 相同：调整匹配度后按匹配度重新排序（相同时保持原顺序）
+        reranked = sorted(
+            zip(candidates, scores, strict=False),
+            key=lambda item: -adjust_score(item[1], priors.lift(item[0], domains)),
+        )
+        total += 1
+        top1_before += candidates[0] == event["framework"]
+        top1_after += reranked[0][0] == event["framework"]
+    return {
+        "choices": total,
+        "top1_before": round(top1_before / total, 3) if total else None,
+        "top1_after": round(top1_after / total, 3) if total else None,
+    }
+
+
+def main(args: argparse.Namespace) -> dict:
+    events = list(read_events(args.log))
+    report = {"log": args.log, "events": len(events)}
+
+    if args.holdout > 0:
+        choice_positions = [i for i, event in enumerate(events) if event["event"] == "choice"]
+        cut = len(events)
+        if choice_positions:
+            cut = choice_positions[int(len(choice_positions) * (1 - args.holdout))]
+        priors = fit_priors(events[:cut], smoothing=args.smoothing)
+        report["holdout"] = holdout_report(priors, events, cut)
+
+    priors = fit_priors(events, smoothing=args.smoothing)
+    report.update({
+        "samples": priors.samples,
+        "base_rate": priors.base_rate,
+        "top_lifts": {
+            domain: dict(sorted(lifts.items(), key=lambda item: -item[1])[:args.show_top])
+            for domain, lifts in sorted(priors.lifts.items())
+        },
+    })
+
+    if args.output:
+        if priors.samples < args.min_samples:
+            report["written"] = False
+            report["reason"] = f"samples {priors.samples} < --min-samples {args.min_samples}"
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(priors.model_dump_json(indent=2) + "\n")
+            report["written"] = True
+            report["output"] = args.output
+    return report
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="由匹配反馈日志拟合按领域的框架先验")
+    parser.add_argument("--log", required=True, help="匹配反馈日志（MATCH_LOG_PATH）")
+    parser.add_argument("--output", help="先验文件（FRAMEWORK_PRIORS_PATH），不指定时只打印报告")
+    parser.add_argument("--smoothing", type=float, default=DEFAULT_SMOOTHING,
+                        help="选用率平滑的伪计数")
+    parser.add_argument("--min-samples", type=int, default=50,
+                        help="配对记录少于该值时不写出先验文件")
+    parser.add_argument("--holdout", type=float, default=0.0,
+                        help="留出评估的选用记录比例（按时间顺序取最后一部分）")
+    parser.add_argument("--show-top", type=int, default=5, help="报告中每个领域列出的框架数")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(parse_args()), ensure_ascii=False, indent=2))
@@ -0,0 +1,101 @@
+import base64
+import io
+import time
+
+import pytest
+from docx import Document
+
+from app.services.attachment_processor import (
+    CHUNK_SEPARATOR,
+    AttachmentError,
+    AttachmentProcessor,
+    decode_base64,
+    iter_chunks,
+)
+from app.services.token_estimator import estimate_tokens
+
+
+def _docx_base64() -> str:
+    document = Document()
+    document.add_paragraph("产品发布计划")
+    document.add_paragraph("新款咖啡机将于十月上市，主打家庭用户。")
+    table = document.add_table(rows=1, cols=2)
+    table.rows[0].cells[0].text = "价格"
+    table.rows[0].cells[1].text = "1999 元"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_docx_attachment_is_extracted_and_cached():
+    processor = AttachmentProcessor()
+    data = _docx_base64()
+
+    first = processor.process("写一段咖啡机的发布文案", budget_tokens=1000, data=data)
+    second = processor.process("写一段咖啡机的发布文案", budget_tokens=1000, data=data)
+
+    assert "新款咖啡机将于十月上市" in first.text
+    assert "价格 | 1999 元" in first.text
+    assert not first.truncated
+    assert second == first
+    assert len(processor._cache) == 1
+
+
+def test_data_url_and_invalid_attachments():
+    text = "会议纪要：讨论预算".encode()
+    encoded = base64.b64encode(text).decode()
+    assert decode_base64(f"data:text/plain;base64,{encoded}") == text
+
+    processor = AttachmentProcessor(max_bytes=1024)
+    with pytest.raises(AttachmentError):
+        processor.process("q", 100, data="不是base64!")
+    with pytest.raises(AttachmentError):
+        processor.process("q", 100, data=base64.b64encode(b"%PDF-1.7 ...").decode())
+    with pytest.raises(AttachmentError):
+        processor.process("q", 100, data="A" * 4096)
+    assert processor.process("q", 100) is None
+
+
+def test_relevant_chunks_are_selected_under_budget():
+    filler = "公司年会的场地布置、餐饮安排和节目彩排都已经确认完毕。" * 8
+    paragraphs = [
+        "季度报告",
+        filler,
+        "退款政策：客户在收货七天内可以无理由申请退款，退款将在三个工作日内原路返回。",
+        filler,
+    ]
+    processor = AttachmentProcessor(chunk_tokens=120)
+
+    result = processor.process(
+        "帮我写一封回复客户退款申请的邮件", budget_tokens=80, text="\n\n".join(paragraphs)
+    )
+
+    assert result.truncated
+    assert "退款政策" in result.text
+    assert filler not in result.text
+    assert result.selected_tokens <= 80
+
+
+def test_long_paragraphs_are_split_and_gaps_marked():
+    text = "。".join(f"第{i}句话讲的是项目进度" for i in range(200))
+    chunks = list(iter_chunks(text, chunk_tokens=50))
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+
+    processor = AttachmentProcessor(chunk_tokens=50)
+    result = processor.process("第150句话", budget_tokens=100, text=text)
+    assert "第150句话" in result.text
+    assert CHUNK_SEPARATOR in result.text
+
+
+def test_unpunctuated_text_is_split_in_linear_time():
+    text = "项目进度" * 50_000 + " " + "a" * 2_000
+
+    start = time.perf_counter()
+    chunks = list(iter_chunks(text, chunk_tokens=300))
+    elapsed = time.perf_counter() - start
+
+    # 逐次重新分词时约 80 秒
+    assert elapsed < 3
+    assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks) == text.replace(" ", "")
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api import frameworks
+from app.main import app
+from app.services.batch_matcher import BatchMatcher, BatchMatchSource, keyword_confidence
+from app.services.framework_catalog import ContextVariant
+from app.services.framework_matcher import FrameworkMatcher
+from app.services.intent_output import IntentMatch
+
+SUMMARY = """# AI 提示词框架摘要
+
+| 序号 | 框架名称 | 应用场景 |
+|:---:|----------|----------|
+| 1 | RACEF Framework | 头脑风暴和创意生成、数据分析和市场研究 |
+| 3 | BAB Framework | 订阅服务推广、健身应用营销、在线学习平台推广 |
+| 23 | ELI5 Framework | 复杂概念解释、儿童教育、科普写作 |
+"""
+
+CONFIDENT = "健身应用营销推广：订阅服务推广文案，在线学习平台推广"
+UNCERTAIN = "帮我想想这件事情应该怎么做比较好"
+
+
+class SlowLLMService:
+    """记录并发数的假 LLM；输入中含"失败"时抛出异常"""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def analyze_intent(self, user_input: str, frameworks_context: str):
+        self.calls.append(user_input)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if "失败" in user_input:
+            raise Exception("意图分析失败: upstream error")
+        return [IntentMatch(id="ELI5", score=0.7, reasoning="通俗解释")]
+
+
+def _matcher(monkeypatch, llm: SlowLLMService) -> FrameworkMatcher:
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    return FrameworkMatcher(llm, context_variant=ContextVariant.COMPACT)
+
+
+def test_confident_items_skip_llm_and_llm_calls_are_bounded(monkeypatch):
+    llm = SlowLLMService()
+    batch = BatchMatcher(_matcher(monkeypatch, llm), confidence_threshold=0.5, llm_concurrency=2)
+    inputs = [CONFIDENT, "太短", UNCERTAIN, UNCERTAIN + "失败", UNCERTAIN + "一", UNCERTAIN + "二"]
+
+    async def main():
+        return [result async for result in batch.run(inputs, [f"p{i}" for i in range(6)])]
+
+    results = asyncio.run(main())
+    by_index = {result.index: result for result in results}
+
+    assert sorted(by_index) == list(range(6))
+    # 关键词结果和无效输入先于 LLM 结果返回
+    assert [r.index for r in results[:2]] == [0, 1]
+    assert by_index[0].source == BatchMatchSource.KEYWORD
+    assert by_index[0].frameworks[0].id == "BAB"
+    assert by_index[0].confidence >= 0.5
+    assert by_index[1].source == BatchMatchSource.ERROR
+    assert by_index[2].source == BatchMatchSource.LLM
+    assert by_index[2].frameworks[0].id == "ELI5"
+    assert by_index[2].id == "p2"
+    # LLM 失败时返回关键词结果（没有命中时为默认框架）并带上错误
+    assert by_index[3].source == BatchMatchSource.KEYWORD
+    assert "upstream error" in by_index[3].error
+    assert by_index[3].frameworks[0].id == "RACEF"
+
+    assert len(llm.calls) == 4
+    assert llm.max_active == 2
+
+
+def test_items_after_batch_deadline_use_keyword_results(monkeypatch):
+    llm = SlowLLMService(delay=0.05)
+    batch = BatchMatcher(
+        _matcher(monkeypatch, llm),
+        confidence_threshold=1.1,
+        llm_concurrency=1,
+        deadline_seconds=0.02,
+    )
+
+    async def main():
+        return [result async for result in batch.run([CONFIDENT, UNCERTAIN, UNCERTAIN])]
+
+    results = asyncio.run(main())
+
+    assert len(llm.calls) == 1
+    skipped = [r for r in results if r.error]
+    assert len(skipped) == 2
+    assert all(r.source == BatchMatchSource.KEYWORD for r in skipped)
+
+
+def test_keyword_confidence_is_top_local_score(monkeypatch):
+    matcher = _matcher(monkeypatch, SlowLLMService())
+
+    assert keyword_confidence([]) == 0.0
+    assert keyword_confidence(matcher.local_candidates(CONFIDENT)) >= 0.5
+    assert keyword_confidence(matcher.local_candidates(UNCERTAIN)) < 0.5
+
+
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    llm = SlowLLMService()
+    monkeypatch.setitem(frameworks._framework_matchers, "deepseek", _matcher(monkeypatch, llm))
+    client = TestClient(app)
+
+    resp = client.post("/api/v1/frameworks/match/batch", json={
+        "items": [{"id": "a", "input": CONFIDENT}, {"id": "b", "input": UNCERTAIN}],
+    })
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert {line["id"]: line["source"] for line in lines[:2]} == {"a": "keyword", "b": "llm"}
+    assert lines[-1] == {**lines[-1], "done": True, "total": 2, "keyword": 1, "llm": 1}
+
+    resp = client.post("/api/v1/frameworks/match/batch", json={"items": [], "model": "deepseek"})
+    assert resp.status_code == 422
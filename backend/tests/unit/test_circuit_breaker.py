@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app.services import circuit_breaker as cb
+from app.services.base_llm import BaseLLMService
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.resilient_llm import ResilientLLMService
+from app.services.retry_policy import LLMCallError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeService(BaseLLMService):
+    def __init__(self, fail: bool = False, status_code: int | None = 503):
+        self.fail = fail
+        self.status_code = status_code
+        self.calls = 0
+
+    async def analyze_intent(self, user_input, frameworks_context):
+        self.calls += 1
+        if self.fail:
+            try:
+                raise LLMCallError("boom", status_code=self.status_code)
+            except LLMCallError as e:
+                raise Exception(f"意图分析失败: {e}")
+        return ["RACEF"]
+
+    async def generate_prompt(self, user_input, framework_doc, clarification_answers,
+                              attachment_content=None):
+        return "ok"
+
+    async def close(self):
+        pass
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("p", window_seconds=10, min_requests=4,
+                             failure_rate_threshold=0.5, open_seconds=5, clock=clock)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow_request() is False
+
+    clock.now += 5
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False  # 只放行一个试探请求
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.window_counts() == (0, 0)
+
+
+def test_old_failures_leave_the_window():
+    clock = FakeClock()
+    breaker = CircuitBreaker("p", window_seconds=10, min_requests=2, clock=clock)
+    breaker.record_failure()
+    clock.now += 11
+    breaker.record_success()
+    assert breaker.window_counts() == (1, 0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failover_routes_analyze_intent_to_healthy_provider(monkeypatch):
+    breakers = {
+        "primary": CircuitBreaker("primary", min_requests=2, failure_rate_threshold=0.5),
+        "backup": CircuitBreaker("backup"),
+    }
+    monkeypatch.setattr(cb, "_circuit_breakers", breakers)
+    primary, backup = FakeService(fail=True), FakeService()
+    service = ResilientLLMService("primary", primary, [("backup", backup)])
+
+    for _ in range(3):
+        assert asyncio.run(service.analyze_intent("x" * 20, "")) == ["RACEF"]
+
+    assert breakers["primary"].state == CircuitBreaker.OPEN
+    assert primary.calls == 2  # 熔断后不再请求主服务商
+    assert backup.calls == 3
+
+
+def test_client_errors_do_not_trip_breaker(monkeypatch):
+    monkeypatch.setattr(cb, "_circuit_breakers", {
+        "primary": CircuitBreaker("primary", min_requests=1),
+    })
+    service = ResilientLLMService("primary", FakeService(fail=True, status_code=401))
+    with pytest.raises(Exception):
+        asyncio.run(service.analyze_intent("x" * 20, ""))
+    assert cb.get_circuit_breaker("primary").state == CircuitBreaker.CLOSED
+
+
+def test_open_circuit_fails_fast_without_fallback(monkeypatch):
+    breaker = CircuitBreaker("primary", min_requests=1)
+    breaker.record_failure()
+    monkeypatch.setattr(cb, "_circuit_breakers", {"primary": breaker})
+    inner = FakeService()
+    service = ResilientLLMService("primary", inner)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(service.generate_prompt("x", "doc", {}))
@@ -0,0 +1,234 @@
+import asyncio
+
+import pytest
+
+from app.services.circuit_breaker import is_provider_failure
+from app.services.concurrency_limiter import (
+    AdaptiveLimiter,
+    ConcurrencyLimitError,
+    current_tier,
+    priority_context,
+)
+from app.services.retry_policy import LLMCallError, request_deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_success_grows_limit_additively():
+    limiter = AdaptiveLimiter("p:m", initial_limit=2, max_limit=4)
+
+    async def main():
+        for _ in range(4):
+            async with limiter.slot():
+                pass
+
+    asyncio.run(main())
+    assert limiter.limit == 3
+    assert limiter.in_flight == 0
+
+
+def test_429_shrinks_limit_once_per_cooldown():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("p:m", initial_limit=8, decrease_cooldown=1.0, clock=clock)
+
+    async def fail():
+        async with limiter.slot():
+            raise LLMCallError("LLM API 返回错误: 429", status_code=429, retryable=True)
+
+    async def main():
+        for _ in range(3):
+            with pytest.raises(LLMCallError):
+                await fail()
+        assert limiter.limit == 4
+        clock.now = 2.0
+        with pytest.raises(LLMCallError):
+            await fail()
+        assert limiter.limit == 2
+
+    asyncio.run(main())
+
+
+def test_client_errors_do_not_change_limit():
+    limiter = AdaptiveLimiter("p:m", initial_limit=4)
+
+    async def main():
+        with pytest.raises(LLMCallError):
+            async with limiter.slot():
+                raise LLMCallError("LLM API 返回错误: 400", status_code=400)
+
+    asyncio.run(main())
+    assert limiter.limit == 4
+
+
+def test_queued_request_runs_when_slot_frees():
+    limiter = AdaptiveLimiter("p:m", initial_limit=1, max_limit=1, max_wait=1.0)
+    order = []
+
+    async def call(name: str, hold: float):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def main():
+        await asyncio.gather(call("first", 0.05), call("second", 0))
+
+    asyncio.run(main())
+    assert order == ["first", "second"]
+    assert limiter.in_flight == 0 and limiter.queued == 0
+
+
+def test_sheds_when_queue_full_or_wait_expires():
+    limiter = AdaptiveLimiter("p:m", initial_limit=1, max_limit=1, max_queue=1, max_wait=0.05)
+
+    async def hold():
+        async with limiter.slot():
+            await asyncio.sleep(0.2)
+
+    async def main():
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(ConcurrencyLimitError) as full:
+            await limiter.acquire()
+        with pytest.raises(ConcurrencyLimitError) as timeout:
+            await waiter
+        await holder
+        return full.value.reason, timeout.value.reason
+
+    assert asyncio.run(main()) == ("queue_full", "queue_timeout")
+    assert limiter.in_flight == 0
+
+
+def test_expired_deadline_sheds_without_waiting():
+    limiter = AdaptiveLimiter("p:m", initial_limit=1, max_limit=1, max_wait=5.0)
+
+    async def main():
+        await limiter.acquire()
+        with request_deadline(0.01):
+            await asyncio.sleep(0.02)
+            with pytest.raises(ConcurrencyLimitError) as exc_info:
+                await limiter.acquire()
+        limiter.release()
+        return exc_info.value
+
+    error = asyncio.run(main())
+    assert error.reason == "deadline"
+    assert is_provider_failure(error) is False
+
+
+def _dispatch_order(limiter: AdaptiveLimiter, tiers: list[str]) -> list[str]:
+    """占住唯一名额后按 tiers 顺序排队，返回获得名额的顺序"""
+    order = []
+
+    async def call(name: str, tier: str):
+        async with limiter.slot(tier):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def main():
+        await limiter.acquire("free")
+        tasks = []
+        for i, tier in enumerate(tiers):
+            tasks.append(asyncio.create_task(call(f"{tier}{i}", tier)))
+            await asyncio.sleep(0)
+        limiter.release(tier="free")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return [name.rstrip("0123456789") for name in order]
+
+
+def test_weighted_fair_queuing_favours_pro():
+    limiter = AdaptiveLimiter(
+        "p:m", initial_limit=1, max_limit=1, weights={"pro": 2.0, "free": 1.0}
+    )
+    order = _dispatch_order(limiter, ["free", "free", "free", "pro", "pro", "pro"])
+    assert order == ["free", "pro", "pro", "free", "pro", "free"]
+
+
+def test_starved_requests_are_served_first():
+    limiter = AdaptiveLimiter(
+        "p:m", initial_limit=1, max_limit=1,
+        weights={"pro": 100.0, "free": 1.0}, starvation_seconds=0.0,
+    )
+    order = _dispatch_order(limiter, ["free", "free", "pro", "pro"])
+    assert order == ["free", "free", "pro", "pro"]
+
+
+def test_tier_share_reserves_capacity_for_pro():
+    limiter = AdaptiveLimiter(
+        "p:m", initial_limit=4, max_limit=4, max_share={"free": 0.5}, max_wait=0.01
+    )
+
+    async def main():
+        await limiter.acquire("free")
+        await limiter.acquire("free")
+        with pytest.raises(ConcurrencyLimitError):
+            await limiter.acquire("free")
+        await limiter.acquire("pro")
+        return limiter.in_flight
+
+    assert asyncio.run(main()) == 3
+
+
+def test_unknown_tier_is_treated_as_default_and_queue_is_shared():
+    limiter = AdaptiveLimiter(
+        "p:m", initial_limit=2, max_limit=2, max_queue=1, max_wait=0.05,
+        weights={"pro": 4.0, "free": 1.0}, max_share={"pro": 1.0, "free": 0.5},
+    )
+
+    async def main():
+        with priority_context("X-Unknown"):
+            assert current_tier() == "free"
+            await limiter.acquire()
+        # 直接传入的未知等级同样受 free 的名额上限约束
+        waiter = asyncio.create_task(limiter.acquire("x"))
+        await asyncio.sleep(0)
+        # 排队上限是所有等级的总数，换一个等级名也不能多排
+        with pytest.raises(ConcurrencyLimitError) as full:
+            await limiter.acquire("y")
+        with pytest.raises(ConcurrencyLimitError):
+            await waiter
+        return full.value.reason
+
+    assert asyncio.run(main()) == "queue_full"
+    assert set(limiter._waiters) == {"free"}
+    assert limiter.in_flight == 1
+
+
+def test_pro_request_evicts_newest_free_waiter_when_queue_is_full():
+    limiter = AdaptiveLimiter(
+        "p:m", initial_limit=1, max_limit=1, max_queue=2, max_wait=1.0,
+        weights={"pro": 4.0, "free": 1.0},
+    )
+
+    async def main():
+        await limiter.acquire("free")
+        first = asyncio.create_task(limiter.acquire("free"))
+        second = asyncio.create_task(limiter.acquire("free"))
+        await asyncio.sleep(0)
+        # Free 的突发占满了队列，Pro 请求仍能排上，挤掉最新排队的 Free 请求
+        pro = asyncio.create_task(limiter.acquire("pro"))
+        await asyncio.sleep(0)
+        with pytest.raises(ConcurrencyLimitError) as evicted:
+            await second
+        # 同等级之间不互相挤占
+        with pytest.raises(ConcurrencyLimitError) as full:
+            await limiter.acquire("free")
+
+        limiter.release(tier="free")
+        await asyncio.sleep(0)
+        limiter.release(tier="pro" if pro.done() else "free")
+        await asyncio.gather(pro, first)
+        return evicted.value.reason, full.value.reason
+
+    assert asyncio.run(main()) == ("evicted", "queue_full")
+    assert limiter.queued == 0
+    assert limiter.in_flight == 1
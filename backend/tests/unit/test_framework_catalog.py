@@ -0,0 +1,153 @@
+import asyncio
+
+from app.services.framework_catalog import ContextVariant, FrameworkCatalog
+from app.services.framework_matcher import FrameworkMatcher
+from app.services.intent_output import IntentMatch
+
+SUMMARY = """# AI 提示词框架摘要
+
+| 序号 | 框架名称 | 应用场景 |
+|:---:|----------|----------|
+| 1 | RACEF Framework | 头脑风暴和创意生成、数据分析和市场研究、问题解决和战略规划、产品开发策略 |
+| 3 | BAB Framework | 订阅服务推广、健身应用营销、在线学习平台推广 |
+| 12 | Few-shot Prompting Framework | 文本分类、风格模仿、格式化输出 |
+| 23 | ELI5 Framework | 复杂概念解释、儿童教育、科普写作 |
+| 33 | HMW (How Might We) Framework | 产品创新、用户体验改进 |
+
+---
+
+## 框架分类参考
+
+### 按复杂度分类
+
+| 复杂度 | 框架 |
+|--------|------|
+| **简单（3要素以内）** | BAB、ELI5 |
+| **复杂（6+要素）** | RACEF |
+
+### 按应用领域分类
+
+| 领域 | 推荐框架 |
+|------|----------|
+| **营销内容** | BAB |
+| **教育培训** | ELI5 |
+| **写作创作** | Few-shot、ROSE |
+"""
+
+
+class DummyLLMService:
+    """只记录 analyze_intent 收到的上下文"""
+
+    def __init__(self, answer: list[IntentMatch] | None = None):
+        self.contexts = []
+        self.answer = answer or [IntentMatch(id="BAB", score=0.9, reasoning="营销推广")]
+
+    async def analyze_intent(
+        self, user_input: str, frameworks_context: str
+    ) -> list[IntentMatch]:
+        self.contexts.append(frameworks_context)
+        return self.answer
+
+
+def test_parse_entries_and_classifications():
+    catalog = FrameworkCatalog(SUMMARY)
+
+    assert [e.id for e in catalog.entries] == ["RACEF", "BAB", "Few-shot", "ELI5", "HMW"]
+    bab = catalog.get("BAB Framework")
+    assert bab.complexity == "简单"
+    assert bab.domains == ["营销内容"]
+    assert bab.description == "适用场景：订阅服务推广、健身应用营销、在线学习平台推广"
+    assert catalog.get("few-shot prompting").id == "Few-shot"
+    assert catalog.get("HMW (How Might We) Framework").id == "HMW"
+    assert catalog.get("ROSE") is None
+
+
+def test_render_variants():
+    catalog = FrameworkCatalog(SUMMARY)
+
+    assert catalog.render(ContextVariant.FULL) == SUMMARY
+    compact = catalog.render(ContextVariant.COMPACT)
+    assert "- RACEF：头脑风暴和创意生成、数据分析和市场研究、问题解决和战略规划［复杂］" in compact
+    assert "产品开发策略" not in compact
+    assert "- BAB：订阅服务推广、健身应用营销、在线学习平台推广［简单；营销内容］" in compact
+
+    domain = catalog.render(ContextVariant.DOMAIN)
+    assert "- 写作创作：Few-shot" in domain  # 分类表中不存在的 ROSE 被忽略
+    assert "- 简单：BAB、ELI5" in domain
+    assert "- HMW：产品创新、用户体验改进" in domain.split("### 其他框架")[1]
+
+
+def test_top_n_keeps_most_relevant_frameworks():
+    catalog = FrameworkCatalog(SUMMARY)
+
+    ranked = catalog.rank("给小朋友解释一个复杂概念")
+    assert ranked[0][0].id == "ELI5"
+    assert ranked[0][1] > 0
+
+    context = catalog.render(ContextVariant.TOP_N, "给小朋友解释一个复杂概念", top_n=2)
+    assert "ELI5" in context
+    assert len(context.splitlines()) == 3  # 说明行 + 2 个框架
+    # 没有命中任何关键词时按摘要顺序补齐
+    assert "RACEF" in catalog.render_top_n("zzz", 1)
+
+
+def test_matcher_precomputes_configured_variant(monkeypatch):
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    llm = DummyLLMService()
+    matcher = FrameworkMatcher(llm, context_variant=ContextVariant.COMPACT)
+
+    assert set(matcher.intent_contexts) == {
+        ContextVariant.FULL, ContextVariant.COMPACT, ContextVariant.DOMAIN
+    }
+    candidates = asyncio.run(matcher.match_frameworks("帮我写一段健身应用的推广文案"))
+    assert candidates[0].id == "BAB"
+    assert llm.contexts == [matcher.intent_contexts[ContextVariant.COMPACT]]
+
+
+def test_resolve_aliases_and_fuzzy_ids():
+    catalog = FrameworkCatalog(SUMMARY)
+
+    assert catalog.resolve("BAB Framework")[1] == "exact"
+    assert catalog.resolve("Few-shot Prompting")[0].id == "Few-shot"
+    entry, result = catalog.resolve("How Might We")
+    assert (entry.id, result) == ("HMW", "alias")
+    entry, result = catalog.resolve("RACEFF")
+    assert (entry.id, result) == ("RACEF", "fuzzy")
+    assert catalog.resolve("PASTOR") == (None, "unknown")
+    assert catalog.resolve("BA") == (None, "unknown")  # 太短，不做相似度匹配
+
+
+def test_matcher_validates_llm_ids_and_keeps_llm_scores(monkeypatch):
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    llm = DummyLLMService([
+        IntentMatch(id="PASTOR", score=0.95, reasoning="不存在的框架"),
+        IntentMatch(id="Eli5 Framework", score=0.8, reasoning="需要通俗解释"),
+        IntentMatch(id="ELI5", score=0.7),
+        IntentMatch(id="How Might We"),
+    ])
+    matcher = FrameworkMatcher(llm, context_variant=ContextVariant.COMPACT)
+
+    candidates = asyncio.run(matcher.match_frameworks("给小朋友解释一个复杂概念"))
+
+    assert [(c.id, c.match_score, c.reasoning) for c in candidates] == [
+        ("ELI5", 0.8, "需要通俗解释"),
+        # 模型没有给出匹配度时使用本地打分（与输入没有共同特征）
+        ("HMW", 0.0, "基于用户输入分析，HMW 最适合此场景"),
+    ]
+    assert candidates[1].name == "HMW (How Might We) Framework"
+    assert candidates[0].description == "适用场景：复杂概念解释、儿童教育、科普写作"
+
+
+def test_matcher_falls_back_to_keywords_when_no_valid_ids(monkeypatch):
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    matcher = FrameworkMatcher(
+        DummyLLMService([IntentMatch(id="PASTOR")]), context_variant=ContextVariant.COMPACT
+    )
+
+    candidates = asyncio.run(matcher.match_frameworks("给小朋友解释一个复杂概念"))
+    assert candidates[0].id == "ELI5"
+    assert candidates[0].reasoning == "按应用场景和领域相似度匹配"
+    assert 0 < candidates[0].match_score <= 1
+
+    candidates = asyncio.run(matcher.match_frameworks("zzz zzz zzz"))
+    assert [c.id for c in candidates] == ["RACEF"]
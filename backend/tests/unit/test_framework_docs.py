@@ -0,0 +1,68 @@
+from app.services.framework_docs import (
+    DocMode,
+    FrameworkDocStore,
+    SectionKind,
+    parse_framework_doc,
+)
+
+DOC = """# Chain of Thought Framework
+
+## 网址
+https://example.com/cot
+
+## 概述
+逐步推理。
+
+## 框架构成
+| 步骤 | Step |
+
+## 详细说明
+很长的说明。
+
+## 最佳实践
+先拆解问题。
+
+### 示例1：数学题
+```
+## 这一行在代码块里，不是章节
+第一步……
+```
+
+### 示例2：市场分析
+第二个示例。
+"""
+
+
+def test_parse_sections_and_examples():
+    doc = parse_framework_doc(DOC, "Chain of Thought")
+
+    assert doc.title == "Chain of Thought Framework"
+    assert [s.kind for s in doc.sections] == [
+        SectionKind.URL, SectionKind.OVERVIEW, SectionKind.COMPONENTS,
+        SectionKind.DETAILS, SectionKind.BEST_PRACTICES,
+    ]
+    best = doc.section(SectionKind.BEST_PRACTICES)
+    assert best.intro == "先拆解问题。"
+    assert len(best.examples) == 2
+    assert "不是章节" in best.examples[0]
+
+
+def test_compact_mode_keeps_needed_sections_and_first_example():
+    doc = parse_framework_doc(DOC, "Chain of Thought")
+
+    assert doc.render(DocMode.FULL) == DOC
+    compact = doc.render(DocMode.COMPACT)
+    assert compact.startswith("# Chain of Thought Framework")
+    assert "## 框架构成" in compact and "示例1" in compact
+    assert "示例2" not in compact
+    assert "## 详细说明" not in compact and "## 网址" not in compact
+
+
+def test_store_resolves_ids_and_falls_back(tmp_path):
+    (tmp_path / "48_Chain_of_Thought_Framework.md").write_text(DOC, encoding="utf-8")
+    store = FrameworkDocStore(str(tmp_path))
+
+    for framework_id in ("Chain of Thought", "chain_of_thought", "Chain of Thought Framework"):
+        assert store.get(framework_id).title == "Chain of Thought Framework"
+    assert "示例2" not in store.render("Chain of Thought", DocMode.COMPACT)
+    assert store.render("Unknown").startswith("# Unknown Framework")
@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+from app.services import framework_matcher as framework_matcher_module
+from app.services.framework_catalog import ContextVariant
+from app.services.framework_matcher import FrameworkMatcher
+from app.services.framework_priors import (
+    FrameworkPriors,
+    adjust_score,
+    fit_priors,
+    load_priors,
+)
+from app.services.intent_output import IntentMatch
+from app.services.match_log import MatchLog, input_key, read_events
+
+SUMMARY = """# AI 提示词框架摘要
+
+| 序号 | 框架名称 | 应用场景 |
+|:---:|----------|----------|
+| 1 | RACEF Framework | 头脑风暴和创意生成、数据分析和市场研究 |
+| 3 | BAB Framework | 订阅服务推广、健身应用营销、在线学习平台推广 |
+| 4 | SPEAR Framework | 产品推广营销、健身应用营销 |
+| 23 | ELI5 Framework | 复杂概念解释、儿童教育、科普写作 |
+
+### 按应用领域分类
+
+| 领域 | 推荐框架 |
+|------|----------|
+| **营销内容** | BAB、SPEAR |
+| **教育培训** | ELI5 |
+"""
+
+MARKETING = "帮我写一段健身应用的营销推广文案"
+
+
+class FixedLLMService:
+    async def analyze_intent(self, user_input: str, frameworks_context: str):
+        return [IntentMatch(id="SPEAR", score=0.8), IntentMatch(id="BAB", score=0.7)]
+
+
+def _matcher(monkeypatch) -> FrameworkMatcher:
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    return FrameworkMatcher(FixedLLMService(), context_variant=ContextVariant.COMPACT)
+
+
+def test_match_log_records_features_not_text(tmp_path):
+    log = MatchLog(str(tmp_path / "logs" / "match.jsonl"), flush_every=100)
+    log.record_match(MARKETING, [("SPEAR", 0.8), ("BAB", 0.7)], "llm")
+    log.record_choice(f"  {MARKETING} ", "BAB")
+    log.close()
+    log.record_choice(MARKETING, "BAB")  # 关闭后忽略
+
+    with open(log.path, "a", encoding="utf-8") as f:
+        f.write('{"event": "match", "key"')  # 写了一半的行
+
+    events = list(read_events(log.path))
+    assert [e["event"] for e in events] == ["match", "choice"]
+    assert events[0]["key"] == events[1]["key"] == input_key(MARKETING)
+    assert events[0]["domains"] == ["营销内容"]
+    assert events[0]["candidates"] == ["SPEAR", "BAB"]
+    assert events[0]["scores"] == [0.8, 0.7]
+    assert MARKETING not in (tmp_path / "logs" / "match.jsonl").read_text(encoding="utf-8")
+
+
+def test_fit_priors_prefers_frameworks_users_choose():
+    events = []
+    for i in range(30):
+        events.append({
+            "event": "match", "key": f"m{i}", "domains": ["营销内容"],
+            "candidates": ["SPEAR", "BAB"],
+        })
+        events.append({"event": "choice", "key": f"m{i}", "framework": "BAB"})
+    # 没有对应匹配记录的选用不参与拟合
+    events.append({"event": "choice", "key": "unknown", "framework": "ELI5"})
+
+    priors = fit_priors(events)
+
+    assert priors.samples == 30
+    assert priors.base_rate == 0.5
+    assert priors.lifts["营销内容"]["BAB"] > 1 > priors.lifts["营销内容"]["SPEAR"]
+    assert priors.lift("BAB", {"营销内容": 1.0}) > 1
+    assert priors.lift("ELI5", {"营销内容": 1.0}) == 1.0
+    # 没有命中领域时使用全局先验
+    assert priors.lift("BAB", {}) == priors.lifts["*"]["BAB"]
+
+
+def test_adjust_score_updates_odds():
+    assert adjust_score(0.5, 3.0) == 0.75
+    assert adjust_score(0.5, 1.0) == 0.5
+    assert adjust_score(0.0, 3.0) == 0.0
+    assert adjust_score(0.5, 3.0, weight=0.0) == 0.5
+
+
+def test_load_priors_ignores_missing_or_invalid_files(tmp_path):
+    assert load_priors("") is None
+    assert load_priors(str(tmp_path / "missing.json")) is None
+    bad = tmp_path / "bad.json"
+    bad.write_text("{}", encoding="utf-8")
+    assert load_priors(str(bad)) is None
+
+    good = tmp_path / "priors.json"
+    good.write_text(json.dumps({
+        "generated_at": "2026-01-01T00:00:00+00:00", "samples": 1, "base_rate": 0.5,
+        "lifts": {"营销内容": {"BAB": 2.0}},
+    }), encoding="utf-8")
+    assert load_priors(str(good)).lifts == {"营销内容": {"BAB": 2.0}}
+
+
+def test_matcher_reranks_with_priors_and_logs_matches(monkeypatch, tmp_path):
+    log = MatchLog(str(tmp_path / "match.jsonl"))
+    monkeypatch.setattr(framework_matcher_module, "get_match_log", lambda: log)
+    matcher = _matcher(monkeypatch)
+
+    candidates = asyncio.run(matcher.match_frameworks(MARKETING))
+    assert [c.id for c in candidates] == ["SPEAR", "BAB"]
+
+    matcher.priors = FrameworkPriors(
+        generated_at="", samples=30, base_rate=0.5,
+        lifts={"营销内容": {"BAB": 4.0, "SPEAR": 0.25}},
+    )
+    candidates = asyncio.run(matcher.match_frameworks(MARKETING))
+    assert [(c.id, c.match_score) for c in candidates] == [("BAB", 0.903), ("SPEAR", 0.5)]
+
+    # 本地候选同样按先验调整，先验足够强时可以不调用 LLM
+    local = matcher.local_candidates(MARKETING)
+    assert local[0].id == "BAB"
+    matcher.local_confidence_threshold = local[0].match_score
+    asyncio.run(matcher.match_frameworks(MARKETING))
+
+    log.flush()
+    events = list(read_events(log.path))
+    assert [e["source"] for e in events] == ["llm", "llm", "local"]
+    assert events[1]["candidates"] == ["BAB", "SPEAR"]
@@ -0,0 +1,109 @@
+import asyncio
+
+from app.services.framework_catalog import ContextVariant, FrameworkCatalog
+from app.services.framework_matcher import FrameworkMatcher
+from app.services.framework_scorer import FrameworkScorer, estimate_complexity
+from app.services.intent_output import IntentMatch, IntentParseError
+
+SUMMARY = """# AI 提示词框架摘要
+
+| 序号 | 框架名称 | 应用场景 |
+|:---:|----------|----------|
+| 1 | RACEF Framework | 头脑风暴和创意生成、数据分析和市场研究 |
+| 3 | BAB Framework | 订阅服务推广、健身应用营销、在线学习平台推广 |
+| 23 | ELI5 Framework | 复杂概念解释、儿童教育、科普写作 |
+| 44 | Atomic Prompting Framework | AI图像生成、视觉艺术创作 |
+
+### 按复杂度分类
+
+| 复杂度 | 框架 |
+|--------|------|
+| **简单（3要素以内）** | BAB、ELI5 |
+| **复杂（6+要素）** | RACEF、Atomic Prompting |
+
+### 按应用领域分类
+
+| 领域 | 推荐框架 |
+|------|----------|
+| **营销内容** | BAB |
+| **教育培训** | ELI5 |
+| **图像生成** | Atomic Prompting |
+"""
+
+
+class CountingLLMService:
+    def __init__(self):
+        self.calls = 0
+
+    async def analyze_intent(self, user_input: str, frameworks_context: str):
+        self.calls += 1
+        return [IntentMatch(id="RACEF")]
+
+
+def test_scores_are_calibrated_and_ranked():
+    scorer = FrameworkScorer(FrameworkCatalog(SUMMARY))
+
+    ranked = scorer.score("用小学生能听懂的话解释一个复杂概念")
+    assert ranked[0][0].id == "ELI5"
+    assert len(ranked) == 4
+    assert all(0 <= score <= 1 for _, score in ranked)
+    assert ranked[0][1] > ranked[1][1]
+
+    # 只命中领域关键词（与应用场景没有共同的词）也有匹配度
+    ranked = scorer.score("设计一张海报的画面")
+    assert ranked[0][0].id == "Atomic Prompting"
+    assert ranked[0][1] > 0
+
+    # 没有任何场景或领域证据时全部为 0，按序号排列
+    ranked = scorer.score("zzz")
+    assert [score for _, score in ranked] == [0.0] * 4
+    assert ranked[0][0].id == "RACEF"
+
+
+def test_calibration_is_monotonic():
+    scorer = FrameworkScorer(FrameworkCatalog(SUMMARY), calibration=(10.0, -4.0))
+
+    assert scorer.calibrate(0.05) == 0.0
+    assert 0 < scorer.calibrate(0.3) < scorer.calibrate(0.6) < 1
+
+
+def test_estimate_complexity():
+    assert estimate_complexity("翻译这句话") == "简单"
+    assert estimate_complexity("写一篇文章，介绍新产品，面向年轻人") == "中等"
+    assert estimate_complexity("帮我全面分析一下") == "复杂"
+
+
+def test_matcher_skips_llm_when_local_score_is_confident(monkeypatch):
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    llm = CountingLLMService()
+    matcher = FrameworkMatcher(llm, context_variant=ContextVariant.COMPACT)
+    text = "健身应用营销推广：订阅服务推广文案"
+
+    candidates = asyncio.run(matcher.match_frameworks(text))
+    assert llm.calls == 1
+    assert candidates[0].id == "RACEF"
+
+    matcher.local_confidence_threshold = 0.5
+    candidates = asyncio.run(matcher.match_frameworks(text))
+    assert llm.calls == 1
+    assert candidates[0].id == "BAB"
+    assert candidates[0].match_score == matcher.scorer.score(text)[0][1]
+
+
+def test_matcher_falls_back_to_local_candidates_when_llm_fails(monkeypatch):
+    class FailingLLMService:
+        async def analyze_intent(self, user_input: str, frameworks_context: str):
+            raise IntentParseError("意图分析输出为空")
+
+    monkeypatch.setattr(FrameworkMatcher, "_load_frameworks_summary", lambda self: SUMMARY)
+    matcher = FrameworkMatcher(FailingLLMService(), context_variant=ContextVariant.COMPACT)
+    text = "健身应用营销推广：订阅服务推广文案"
+
+    candidates = asyncio.run(matcher.match_frameworks(text))
+    assert [c.id for c in candidates] == [c.id for c in matcher.local_candidates(text)]
+    assert candidates[0].id == "BAB"
+    assert candidates[0].match_score < 1.0
+
+    # 本地打分也没有候选时才使用默认框架
+    candidates = asyncio.run(matcher.match_frameworks("zzz"))
+    assert [(c.id, c.match_score) for c in candidates] == [("RACEF", 1.0)]
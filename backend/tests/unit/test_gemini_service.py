@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.gemini_service import GeminiService
+from app.services.retry_policy import LLMCallError, RetryPolicy
+
+ANSWERS = {"targetAudience": "中小企业主"}
+
+
+def _sse(*chunks: dict) -> bytes:
+    return "".join(f"data: {json.dumps(c, ensure_ascii=False)}\r\n\r\n" for c in chunks).encode()
+
+
+def _chunk(text: str, usage: dict | None = None) -> dict:
+    chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+    if usage:
+        chunk["usageMetadata"] = usage
+    return chunk
+
+
+def _service(handler) -> GeminiService:
+    return GeminiService(
+        api_key="secret-key",
+        base_url="https://gemini.test",
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001),
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def test_api_key_sent_in_header_not_url():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=_chunk(
+            '{"frameworks": [{"id": "RACEF", "score": 0.9, "reasoning": "策略"}, '
+            '{"id": "BAB", "score": 0.7, "reasoning": "营销"}]}'
+        ))
+
+    async def main():
+        service = _service(handler)
+        try:
+            return await service.analyze_intent("写一篇营销文案", "框架列表")
+        finally:
+            await service.close()
+
+    matches = asyncio.run(main())
+    assert [(m.id, m.score) for m in matches] == [("RACEF", 0.9), ("BAB", 0.7)]
+    assert requests[0].headers["x-goog-api-key"] == "secret-key"
+    config = json.loads(requests[0].content)["generationConfig"]
+    assert config["responseMimeType"] == "application/json"
+    assert "key=" not in str(requests[0].url)
+
+
+def test_stream_yields_chunks_and_retries_before_first_byte():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(503, json={"error": {"message": "overloaded"}})
+        body = _sse(
+            _chunk("# 角色\n"),
+            _chunk("你是一名文案专家"),
+            _chunk("", {"promptTokenCount": 12, "candidatesTokenCount": 8}),
+        )
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+    async def main():
+        service = _service(handler)
+        try:
+            return [
+                chunk async for chunk in service.generate_prompt_stream(
+                    "写一篇营销文案", "# RACEF", ANSWERS
+                )
+            ]
+        finally:
+            await service.close()
+
+    assert asyncio.run(main()) == ["# 角色\n", "你是一名文案专家"]
+    assert len(calls) == 2
+    assert calls[1].url.path.endswith(":streamGenerateContent")
+    assert calls[1].url.params["alt"] == "sse"
+
+
+def test_stream_client_error_is_not_retried():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"message": "bad request"}})
+
+    async def main():
+        service = _service(handler)
+        try:
+            async for _ in service.generate_prompt_stream("写一篇营销文案", "# RACEF", ANSWERS):
+                pass
+        finally:
+            await service.close()
+
+    with pytest.raises(LLMCallError) as exc_info:
+        asyncio.run(main())
+    assert exc_info.value.status_code == 400
+    assert len(calls) == 1
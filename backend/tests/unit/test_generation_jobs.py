@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import UTC, datetime, timedelta
+
+import httpx
+import pytest
+
+from app.api import prompts
+from app.services import job_runner as job_runner_module
+from app.services import llm_service as llm_service_module
+from app.services.job_runner import (
+    CallbackURLError,
+    GenerationJobRunner,
+    JobQueueFullError,
+    check_callback_url,
+)
+from app.services.job_store import GenerationJob, InMemoryJobStore, JobStatus, SQLiteJobStore
+from app.services.llm_service import OpenAICompatibleService
+from app.services.model_registry import get_model_registry
+from app.services.usage_tracker import UsageTracker
+
+
+def test_runner_records_partial_output_and_result():
+    store = InMemoryJobStore()
+    seen_keys = []
+
+    async def execute(job, api_key, on_chunk):
+        seen_keys.append(api_key)
+        for chunk in ["你是", "一名", "文案专家"]:
+            await on_chunk(chunk)
+        return {"output": "你是一名文案专家", "version_id": "v1"}
+
+    async def main():
+        runner = GenerationJobRunner(store, execute, workers=1, partial_flush_interval=0)
+        job = await runner.submit(GenerationJob(user_id="u1", request={"input": "写文案"}), "sk-1")
+        await runner.join()
+        await runner.stop()
+        return await store.get(job.id)
+
+    job = asyncio.run(main())
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.partial_output == "你是一名文案专家"
+    assert job.result["version_id"] == "v1"
+    assert job.started_at and job.finished_at
+    assert seen_keys == ["sk-1"]
+    assert "sk-1" not in job.model_dump_json()
+
+
+def test_openai_compatible_job_streams_partial_output(monkeypatch):
+    tracker = UsageTracker()
+    monkeypatch.setattr(llm_service_module, "get_usage_tracker", lambda: tracker)
+    payloads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        events = [
+            {"model": "deepseek-chat", "choices": [{"delta": {"content": text}}]}
+            for text in ["你是", "一名", "文案专家"]
+        ]
+        events.append({
+            "model": "deepseek-chat", "choices": [],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 3},
+        })
+        body = "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events)
+        return httpx.Response(
+            200, text=body + "data: [DONE]\n\n", headers={"Content-Type": "text/event-stream"}
+        )
+
+    store = InMemoryJobStore()
+    partial_outputs = []
+
+    async def main():
+        service = OpenAICompatibleService(
+            "sk-1", get_model_registry().get("deepseek"), transport=httpx.MockTransport(handler)
+        )
+
+        async def execute(job, api_key, on_chunk):
+            chunks = []
+            async for chunk in service.generate_prompt_stream(job.request["input"], "# BAB", {}):
+                chunks.append(chunk)
+                await on_chunk(chunk)
+                partial_outputs.append((await store.get(job.id)).partial_output)
+            return {"output": "".join(chunks)}
+
+        runner = GenerationJobRunner(store, execute, workers=1, partial_flush_interval=0)
+        job = await runner.submit(GenerationJob(user_id="u1", request={"input": "写文案"}), "sk-1")
+        await runner.join()
+        await runner.stop()
+        await service.close()
+        return await store.get(job.id)
+
+    job = asyncio.run(main())
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.result["output"] == "你是一名文案专家"
+    assert partial_outputs == ["你是", "你是一名", "你是一名文案专家"]
+    assert payloads[0]["stream"] is True
+    assert payloads[0]["stream_options"] == {"include_usage": True}
+    aggregate = tracker.snapshot()["aggregates"][0]
+    assert (aggregate["input_tokens"], aggregate["output_tokens"]) == (120, 3)
+
+
+def test_failed_job_keeps_error_and_rejects_when_queue_full():
+    store = InMemoryJobStore()
+
+    async def execute(job, api_key, on_chunk):
+        raise RuntimeError("LLM API 返回错误: 500")
+
+    async def main():
+        runner = GenerationJobRunner(store, execute, workers=1, max_pending=1)
+        first = await runner.submit(GenerationJob(user_id="u1"), "sk")
+        try:
+            await runner.submit(GenerationJob(user_id="u1"), "sk")
+            rejected = False
+        except JobQueueFullError:
+            rejected = True
+        await runner.join()
+        await runner.stop()
+        return rejected, await store.get(first.id)
+
+    rejected, job = asyncio.run(main())
+    assert rejected
+    assert job.status == JobStatus.FAILED
+    assert "500" in job.error
+
+
+def test_concurrent_submits_do_not_overfill_queue():
+    class SlowStore(InMemoryJobStore):
+        async def create(self, job):
+            await asyncio.sleep(0.01)
+            return await super().create(job)
+
+    store = SlowStore()
+    async def execute(job, api_key, on_chunk):
+        return {"output": "ok"}
+
+    async def main():
+        runner = GenerationJobRunner(store, execute, workers=1, max_pending=2)
+        results = await asyncio.gather(
+            *(runner.submit(GenerationJob(user_id="u1"), "sk") for _ in range(5)),
+            return_exceptions=True,
+        )
+        await runner.join()
+        await runner.stop()
+        jobs = [await store.get(r.id) for r in results if isinstance(r, GenerationJob)]
+        return results, jobs, runner._api_keys
+
+    results, jobs, api_keys = asyncio.run(main())
+    assert len(jobs) == 2
+    assert sum(isinstance(r, JobQueueFullError) for r in results) == 3
+    assert all(job.status == JobStatus.SUCCEEDED for job in jobs)
+    assert api_keys == {}
+
+
+def test_stale_unfinished_job_is_marked_failed():
+    store = InMemoryJobStore()
+    runner = GenerationJobRunner(store, execute=None, deadline_seconds=1)
+
+    async def main():
+        job = GenerationJob(user_id="u1", status=JobStatus.RUNNING)
+        job.updated_at = datetime.now(UTC) - timedelta(minutes=5)
+        await store.create(job)
+        return await runner.get(job.id)
+
+    job = asyncio.run(main())
+    assert job.status == JobStatus.FAILED
+    assert job.finished_at is not None
+
+
+async def _public_host(host, port):
+    return ["93.184.216.34"]
+
+
+def test_callback_is_signed(monkeypatch):
+    monkeypatch.setattr(job_runner_module, "_resolve_host", _public_host)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200)
+
+    async def execute(job, api_key, on_chunk):
+        return {"output": "ok"}
+
+    async def main():
+        runner = GenerationJobRunner(
+            InMemoryJobStore(), execute, workers=1, callback_secret="secret",
+            transport=httpx.MockTransport(handler),
+        )
+        await runner.submit(
+            GenerationJob(
+                user_id="u1", request={"input": "写文案"}, callback_url="http://hook.test/done"
+            ),
+            "sk",
+        )
+        await runner.join()
+        await runner.stop()
+
+    asyncio.run(main())
+    assert len(requests) == 1
+    body = requests[0].content
+    expected = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert requests[0].headers["X-Signature-256"] == f"sha256={expected}"
+    payload = json.loads(body)
+    assert payload["status"] == "succeeded"
+    assert "request" not in payload
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:192.168.1.1]/hook",
+    "ftp://example.com/hook",
+    "http://example.com:99999/hook",
+])
+def test_callback_url_rejects_internal_addresses(url):
+    with pytest.raises(CallbackURLError):
+        asyncio.run(check_callback_url(url))
+
+
+def test_callback_url_allowlist(monkeypatch):
+    monkeypatch.setattr(job_runner_module, "_resolve_host", _public_host)
+    asyncio.run(check_callback_url("https://hooks.example.com/done"))
+
+    allowed = ["example.com"]
+    asyncio.run(check_callback_url("https://hooks.example.com/done", allowed))
+    with pytest.raises(CallbackURLError):
+        asyncio.run(check_callback_url("https://example.com.evil.test/done", allowed))
+
+
+def test_callback_to_internal_address_is_not_sent(monkeypatch):
+    async def rebound_host(host, port):
+        return ["127.0.0.1"]
+
+    monkeypatch.setattr(job_runner_module, "_resolve_host", rebound_host)
+    requests = []
+
+    async def execute(job, api_key, on_chunk):
+        return {"output": "ok"}
+
+    async def main():
+        runner = GenerationJobRunner(
+            InMemoryJobStore(), execute, workers=1,
+            transport=httpx.MockTransport(lambda r: requests.append(r) or httpx.Response(200)),
+        )
+        job = await runner.submit(
+            GenerationJob(user_id="u1", callback_url="http://hook.test/done"), "sk"
+        )
+        await runner.join()
+        await runner.stop()
+        return await runner.store.get(job.id)
+
+    job = asyncio.run(main())
+    assert job.status == JobStatus.SUCCEEDED
+    assert requests == []
+
+
+def test_sqlite_store_roundtrip_and_purge(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def main():
+        job = await store.create(GenerationJob(user_id="u1", request={"input": "写文案"}))
+        await store.update(job.id, status=JobStatus.RUNNING, partial_output="你是")
+        unfinished = await store.list_unfinished()
+        finished_at = datetime.now(UTC) - timedelta(days=2)
+        await store.update(job.id, status=JobStatus.SUCCEEDED, finished_at=finished_at)
+        loaded = await store.get(job.id)
+        purged = await store.purge_finished(datetime.now(UTC) - timedelta(days=1))
+        return unfinished, loaded, purged, await store.get(job.id)
+
+    try:
+        unfinished, loaded, purged, missing = asyncio.run(main())
+    finally:
+        store.close()
+    assert [j.partial_output for j in unfinished] == ["你是"]
+    assert loaded.status == JobStatus.SUCCEEDED
+    assert loaded.request == {"input": "写文案"}
+    assert purged == 1 and missing is None
+
+
+def test_generation_does_not_create_llm_service_when_framework_doc_fails(monkeypatch):
+    created = []
+
+    def fail_doc(framework_id, mode):
+        raise FileNotFoundError(framework_id)
+
+    monkeypatch.setattr(prompts, "_load_framework_doc", fail_doc)
+    monkeypatch.setattr(
+        prompts.LLMFactory, "create_service_with_key",
+        lambda **kwargs: created.append(kwargs),
+    )
+    request = prompts.GenerateRequest(
+        input="写一段健身应用推广文案", framework_id="Missing",
+        clarification_answers={}, api_key="sk",
+    )
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(prompts._run_generation(request))
+    assert created == []
@@ -0,0 +1,116 @@
+import asyncio
+
+from app.services.hedging import RequestHedger
+
+
+def _attempt(provider: str, delay: float, result, log: list):
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"{provider}:cancelled")
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return provider, call
+
+
+def test_fast_primary_does_not_hedge():
+    hedger = RequestHedger(default_delay=0.2)
+    log = []
+    result = asyncio.run(hedger.run(
+        _attempt("a", 0.0, "primary", log), _attempt("b", 0.0, "hedge", log)
+    ))
+    assert result == "primary"
+    assert log == []
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    hedger = RequestHedger(default_delay=0.01)
+    log = []
+    result = asyncio.run(hedger.run(
+        _attempt("a", 1.0, "primary", log), _attempt("b", 0.0, "hedge", log)
+    ))
+    assert result == "hedge"
+    assert log == ["a:cancelled"]
+
+
+def test_cancelling_caller_cancels_outstanding_requests():
+    async def cancel_after(hedger, wait: float) -> list:
+        log = []
+        task = asyncio.ensure_future(hedger.run(
+            _attempt("a", 1.0, "primary", log), _attempt("b", 1.0, "hedge", log)
+        ))
+        await asyncio.sleep(wait)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0)
+        # 在事件循环关闭（会取消所有剩余任务）之前检查
+        return list(log)
+
+    # 等待对冲延迟期间被取消
+    log = asyncio.run(cancel_after(RequestHedger(default_delay=0.5), 0.02))
+    assert log == ["a:cancelled"]
+
+    # 已发出对冲请求后被取消
+    log = asyncio.run(cancel_after(RequestHedger(default_delay=0.01), 0.05))
+    assert sorted(log) == ["a:cancelled", "b:cancelled"]
+
+
+def test_failed_hedge_waits_for_primary():
+    hedger = RequestHedger(default_delay=0.01)
+    log = []
+    result = asyncio.run(hedger.run(
+        _attempt("a", 0.05, "primary", log), _attempt("b", 0.0, RuntimeError("x"), log)
+    ))
+    assert result == "primary"
+
+
+def test_delay_tracks_observed_quantile():
+    hedger = RequestHedger(quantile=0.9, default_delay=5.0, min_samples=10)
+    assert hedger.delay("a") == 5.0
+    for i in range(1, 11):
+        hedger.observe("a", i / 10)
+    assert hedger.delay("a") == 1.0
+
+
+def test_delay_stays_stable_under_fixed_latency_distribution():
+    # 每 20 次调用：16 次 1~16ms，4 次 50~80ms（慢尾部占 20%，p80 为 50ms）
+    latencies = [
+        x for i in range(4) for x in [0.05 + i * 0.01] + [(4 * i + j) * 0.001 for j in range(1, 5)]
+    ]
+    hedger = RequestHedger(
+        quantile=0.8, default_delay=1.0, min_samples=10, window=20, max_ratio=1.0
+    )
+    log = []
+
+    async def main():
+        delays = []
+        for i in range(40):
+            hedger.budget._tokens = 5.0
+            await hedger.run(
+                _attempt("a", latencies[i % 20], "primary", log),
+                _attempt("a", latencies[(i + 7) % 20], "hedge", log),
+            )
+            delays.append(hedger.delay("a"))
+        return delays
+
+    delays = asyncio.run(main())
+    # 被对冲请求取消的慢请求也计入样本，对冲延迟不会逐渐缩小到快请求的耗时
+    assert "a:cancelled" in log
+    assert min(delays[10:]) >= 0.045
+
+
+def test_budget_caps_hedge_rate():
+    hedger = RequestHedger(default_delay=0.0, max_ratio=0.0)
+    hedger.budget._tokens = 0.0
+    log = []
+    result = asyncio.run(hedger.run(
+        _attempt("a", 0.01, "primary", log), _attempt("b", 0.0, "hedge", log)
+    ))
+    assert result == "primary"
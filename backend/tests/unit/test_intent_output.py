@@ -0,0 +1,40 @@
+import pytest
+
+from app.services.intent_output import IntentParseError, parse_intent_response
+
+
+def test_parse_json_with_scores_and_reasoning():
+    content = (
+        '```json\n{"frameworks": [{"id": "BAB", "score": 0.92, "reasoning": "营销前后对比"}, '
+        '{"id": "SPEAR", "score": 75}, {"id": "bab", "score": 0.5}]}\n```'
+    )
+
+    matches = parse_intent_response(content)
+
+    assert [(m.id, m.score, m.reasoning) for m in matches] == [
+        ("BAB", 0.92, "营销前后对比"),
+        ("SPEAR", 0.75, ""),  # 百分制换算，重复的 bab 被去掉
+    ]
+
+
+def test_parse_json_embedded_in_text_and_plain_lists():
+    content = '推荐如下：[{"name": "Chain of Thought", "score": "0.8"}, "RACEF"] 以上。'
+    matches = parse_intent_response(content)
+    assert [(m.id, m.score) for m in matches] == [("Chain of Thought", 0.8), ("RACEF", None)]
+
+
+def test_parse_legacy_comma_separated_output():
+    content = "1. **RACEF**\n2. \"Bloom's Taxonomy\"、Chain-of-Thought, Six Thinking Hats"
+
+    matches = parse_intent_response(content)
+
+    # 只保留前 3 个；带点号的名称不再被截断
+    assert [m.id for m in matches] == ["RACEF", "Bloom's Taxonomy", "Chain-of-Thought"]
+    assert all(m.score is None for m in matches)
+
+
+def test_parse_error_when_no_framework():
+    with pytest.raises(IntentParseError):
+        parse_intent_response('{"frameworks": []}')
+    with pytest.raises(IntentParseError):
+        parse_intent_response("  ")
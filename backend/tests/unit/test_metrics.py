@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+    child = latency.labels("/a")
+    child.observe(0.05)
+    child.observe(0.1)
+    child.observe(5.0)
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+
+
+def test_metrics_endpoint_reports_route_templates():
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/no-such-path")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in resp.text
+    assert 'route="unmatched",status="404"' in resp.text
+    assert 'http_requests_in_flight{method="GET"} 1' in resp.text
@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.services.llm_factory import LLMFactory
+from app.services.llm_service import OpenAICompatibleService
+from app.services.model_registry import ModelRegistry, ModelSpec, ProviderSpec
+
+LOCAL_PROVIDER = {
+    "name": "local-qwen",
+    "base_url": "http://127.0.0.1:8000",
+    "requires_api_key": False,
+    "default_model": "qwen-32b",
+    "small_model": "qwen-7b",
+    "models": [
+        {"name": "qwen-32b", "context_window": 32768, "max_output_tokens": 2048},
+        {"name": "qwen-7b", "context_window": 32768, "max_output_tokens": 512},
+    ],
+}
+
+
+def test_providers_file_extends_builtin_registry(tmp_path):
+    path = tmp_path / "providers.json"
+    path.write_text(json.dumps([LOCAL_PROVIDER]), encoding="utf-8")
+
+    registry = ModelRegistry.from_settings(Settings(llm_providers_file=str(path)))
+
+    assert registry.names() == ["deepseek", "gemini", "local-qwen"]
+    spec = registry.get("LOCAL-QWEN")
+    assert spec.resolve_model("small") == (spec.get_model("qwen-7b"), "small")
+    assert spec.resolve_model("default") == (spec.get_model("qwen-32b"), "default")
+    with pytest.raises(ValueError):
+        registry.get("unknown")
+
+
+def test_small_model_must_be_declared():
+    with pytest.raises(ValueError):
+        ProviderSpec(
+            name="bad", base_url="http://x", small_model="missing",
+            models=[ModelSpec(name="only")],
+        )
+
+
+def test_resolve_model_choices():
+    spec = ProviderSpec(
+        name="vendor", base_url="http://x",
+        models=[
+            ModelSpec(name="large", input_price_per_mtok=2.0, output_price_per_mtok=8.0),
+            ModelSpec(name="mini", input_price_per_mtok=0.1, output_price_per_mtok=0.4),
+        ],
+    )
+    assert spec.resolve_model("small")[0].name == "mini"
+    assert spec.resolve_model("cheapest") == (spec.get_model("mini"), "cheapest")
+    assert spec.resolve_model("vendor:mini") == (spec.get_model("mini"), "configured")
+    assert spec.resolve_model("other:mini") == (spec.get_model("large"), "default")
+    assert spec.resolve_model("missing") == (spec.get_model("large"), "not_declared")
+
+
+def test_model_cost_uses_declared_prices():
+    model = ModelSpec(name="m", input_price_per_mtok=1.0, output_price_per_mtok=4.0)
+    assert model.cost(1_000_000, 500_000) == pytest.approx(3.0)
+
+
+def test_openai_compatible_service_routes_cheap_calls_to_small_model():
+    payloads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "新品发布文案"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+        })
+
+    async def main():
+        service = LLMFactory._create_provider_service(ProviderSpec.model_validate(LOCAL_PROVIDER))
+        assert isinstance(service, OpenAICompatibleService)
+        service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await service.complete(
+                "总结这段内容", operation="generate_summary", max_tokens=5000
+            )
+        finally:
+            await service.close()
+
+    assert asyncio.run(main()) == "新品发布文案"
+    assert payloads[0]["model"] == "qwen-7b"
+    assert payloads[0]["max_tokens"] == 512
+    assert "authorization" not in {k.lower() for k in payloads[0]}
+
+
+def test_openai_compatible_analyze_intent_uses_json_mode_when_declared():
+    payloads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        content = '{"frameworks": [{"id": "BAB", "score": 0.9, "reasoning": "营销推广"}]}'
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    async def main(json_mode: bool):
+        spec = ProviderSpec.model_validate({**LOCAL_PROVIDER, "json_mode": json_mode})
+        service = LLMFactory._create_provider_service(spec)
+        service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await service.analyze_intent("写一段健身应用推广文案", "框架列表")
+        finally:
+            await service.close()
+
+    matches = asyncio.run(main(json_mode=True))
+    assert [(m.id, m.score, m.reasoning) for m in matches] == [("BAB", 0.9, "营销推广")]
+    assert payloads[0]["response_format"] == {"type": "json_object"}
+
+    asyncio.run(main(json_mode=False))
+    assert "response_format" not in payloads[1]
+
+
+def test_openai_compatible_services_share_pooled_client_per_base_url(monkeypatch):
+    from app.services import llm_service
+
+    auth_headers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        auth_headers.append(request.headers.get("authorization"))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    monkeypatch.setattr(llm_service, "_shared_clients", {})
+    monkeypatch.setattr(
+        llm_service, "_create_client",
+        lambda transport=None: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    spec = ProviderSpec.model_validate(LOCAL_PROVIDER)
+
+    async def main():
+        first = OpenAICompatibleService("sk-a", spec)
+        second = OpenAICompatibleService("sk-b", spec)
+        assert first.client is second.client
+        await first.complete("你好", operation="generate_summary", max_tokens=64)
+        await first.close()
+        await second.complete("你好", operation="generate_summary", max_tokens=64)
+        assert not second.client.is_closed
+        await llm_service.close_shared_clients()
+        assert llm_service._shared_clients == {}
+
+    asyncio.run(main())
+    assert auth_headers == ["Bearer sk-a", "Bearer sk-b"]
@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+
+import httpx
+
+from app.services.feedback_service import FeedbackService
+from app.services.version_manager import VersionManager, VersionType
+from benchmarks.postgrest_sqlite import PostgrestStub
+
+
+def test_version_manager_production_path():
+    stub = PostgrestStub()
+    manager = VersionManager(transport=stub.transport())
+
+    async def scenario():
+        first = await manager.save_version("u1", "v1", VersionType.SAVE, "1.0", topic="t")
+        await manager.save_version("u1", "v2", VersionType.OPTIMIZE, "1.1", topic="t")
+        await manager.save_version("u2", "other", VersionType.SAVE)
+        versions = await manager.get_versions("u1", limit=10)
+        count = await manager.get_version_count("u1")
+        deleted = await manager.delete_version("u1", first.id)
+        return first, versions, count, deleted, await manager.get_version(first.id)
+
+    first, versions, count, deleted, missing = asyncio.run(scenario())
+    assert manager.dev_mode is False
+    assert [v.content for v in versions] == ["v2", "v1"]
+    assert count == 2
+    assert deleted is True
+    assert missing is None
+
+
+def test_feedback_votes_replace_previous_votes():
+    stub = PostgrestStub()
+    options = stub.insert("feature_options", [
+        {"name": "A", "display_order": 1},
+        {"name": "B", "display_order": 2},
+        {"name": "hidden", "display_order": 3, "is_active": False},
+    ])
+    service = FeedbackService(transport=stub.transport())
+
+    async def scenario():
+        await service.submit_vote("u1", [uuid.UUID(options[0]["id"])])
+        await service.submit_vote("u1", [uuid.UUID(options[1]["id"])])
+        return await service.get_feature_options("u1")
+
+    result = asyncio.run(scenario())
+    assert [o["name"] for o in result] == ["A", "B"]
+    assert [(o["vote_count"], o["is_voted"]) for o in result] == [(0, False), (1, True)]
+
+
+def test_postgrest_filters_count_and_errors():
+    stub = PostgrestStub()
+    stub.insert("user_feedback", [
+        {"user_id": f"u{i % 2}", "content": f"c{i}"} for i in range(5)
+    ])
+
+    async def scenario():
+        async with httpx.AsyncClient(
+            transport=stub.transport(), base_url="http://stub/rest/v1"
+        ) as client:
+            counted = await client.get(
+                "/user_feedback",
+                params={"user_id": "eq.u0", "order": "content.desc", "limit": "2",
+                        "select": "content"},
+                headers={"Prefer": "count=exact"},
+            )
+            in_filter = await client.get(
+                "/user_feedback", params={"content": "in.(c1,c3)", "select": "content"}
+            )
+            missing = await client.get("/no_such_table")
+            bad_column = await client.get("/user_feedback", params={"nope": "eq.1"})
+            return counted, in_filter, missing, bad_column
+
+    counted, in_filter, missing, bad_column = asyncio.run(scenario())
+    assert counted.json() == [{"content": "c4"}, {"content": "c2"}]
+    assert counted.headers["content-range"] == "0-1/3"
+    assert sorted(r["content"] for r in in_filter.json()) == ["c1", "c3"]
+    assert missing.status_code == 404 and "does not exist" in missing.json()["message"]
+    assert bad_column.status_code == 400 and bad_column.json()["code"] == "42703"
@@ -0,0 +1,80 @@
+import pytest
+
+from app.services.circuit_breaker import is_provider_failure
+from app.services.model_registry import ModelSpec
+from app.services.prompt_builder import (
+    PromptBudgetError,
+    build_generation_prompt,
+    trim_framework_doc,
+)
+from app.services.token_estimator import estimate_tokens, truncate_to_tokens
+
+ANSWERS = {"goalClarity": "明确", "targetAudience": "新用户"}
+
+FRAMEWORK_DOC = "\n".join([
+    "# RACEF Framework",
+    "## 网址",
+    "https://example.com/racef",
+    "## 概述",
+    "RACEF 强调迭代优化。",
+    "## 框架构成",
+    "| 重述 | Rephrase |",
+    "## 详细说明",
+    "很长的说明。" * 400,
+    "## 最佳实践",
+    "示例：市场研究报告",
+    "## 优点",
+    "- 灵活",
+])
+
+
+def test_estimate_and_truncate_tokens():
+    assert estimate_tokens("你好，世界") == 5
+    assert estimate_tokens("hello world 2024") == 2 + 2
+    text = "一二三四五六七八九十" * 10
+    truncated = truncate_to_tokens(text, 30)
+    assert estimate_tokens(truncated) <= 30
+    assert truncated.endswith("已截断）")
+    assert truncate_to_tokens("短文本", 30) == "短文本"
+
+
+def test_trim_keeps_required_sections():
+    trimmed = trim_framework_doc(FRAMEWORK_DOC)
+    assert trimmed.startswith("# RACEF Framework")
+    assert "## 框架构成" in trimmed and "## 最佳实践" in trimmed
+    assert "## 详细说明" not in trimmed and "## 网址" not in trimmed
+
+
+def test_large_model_sends_everything():
+    model = ModelSpec(name="big", context_window=65536, max_output_tokens=8192)
+    prompt = build_generation_prompt("写一份市场分析", FRAMEWORK_DOC, ANSWERS, "附件内容", model)
+
+    assert "## 详细说明" in prompt.system
+    assert prompt.max_tokens == 3000
+    assert not prompt.budget.framework_doc_trimmed
+    assert prompt.budget.input_tokens > prompt.budget.framework_doc_tokens
+
+
+def test_small_context_trims_doc_then_attachment_and_shrinks_output():
+    model = ModelSpec(name="small", context_window=4096, max_output_tokens=4096)
+    attachment = "附件里的背景资料。" * 300
+
+    prompt = build_generation_prompt("写一份市场分析", FRAMEWORK_DOC, ANSWERS, attachment, model)
+    budget = prompt.budget
+
+    assert budget.framework_doc_trimmed and budget.attachment_trimmed
+    assert "## 详细说明" not in prompt.system
+    assert "## 框架构成" in prompt.system
+    assert budget.input_tokens + budget.max_tokens <= model.context_window
+    assert 1024 <= prompt.max_tokens <= 3000
+
+
+def test_oversized_input_is_rejected_without_tripping_breaker():
+    model = ModelSpec(name="tiny", context_window=2048, max_output_tokens=1024)
+    with pytest.raises(PromptBudgetError) as exc_info:
+        build_generation_prompt("需求" * 2000, FRAMEWORK_DOC, ANSWERS, None, model)
+
+    try:
+        raise Exception(f"提示词生成失败: {exc_info.value}") from exc_info.value
+    except Exception as wrapped:
+        assert is_provider_failure(wrapped) is False
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.retry_policy import (
+    LLMCallError,
+    RetryBudget,
+    RetryPolicy,
+    parse_retry_after,
+    request_deadline,
+)
+
+
+def _run(policy: RetryPolicy, statuses: list[int], headers: dict | None = None):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(status)
+        return httpx.Response(status, headers=headers or {}, json={"ok": status == 200})
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            async def send(remaining):
+                return await client.post("https://llm.test/v1/chat/completions")
+            return await policy.execute(send, provider="test")
+
+    return asyncio.run(main()), calls
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001)
+    response, calls = _run(policy, [429, 503, 200])
+    assert response.status_code == 200
+    assert calls == [429, 503, 200]
+
+
+def test_client_error_is_not_retried():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    with pytest.raises(LLMCallError) as exc_info:
+        _run(policy, [400, 200])
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.retryable is False
+
+
+def test_retry_after_beyond_cap_gives_up():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_retry_after=1.0)
+    with pytest.raises(LLMCallError) as exc_info:
+        _run(policy, [429, 200], headers={"retry-after": "120"})
+    assert exc_info.value.status_code == 429
+
+
+def test_exhausted_budget_stops_retries():
+    budget = RetryBudget(ratio=0.0, min_retries_per_second=0.0, max_tokens=1.0)
+    policy = RetryPolicy(max_attempts=5, base_delay=0.001, max_delay=0.001, budget=budget)
+    with pytest.raises(LLMCallError):
+        _run(policy, [503, 503, 503, 200])
+    assert budget.tokens < 1.0
+
+
+def test_deadline_prevents_long_backoff():
+    policy = RetryPolicy(max_attempts=3, base_delay=5.0, max_delay=5.0)
+    policy.backoff = lambda retry_number: 5.0
+
+    with request_deadline(0.5):
+        with pytest.raises(LLMCallError):
+            _run(policy, [503, 200])
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
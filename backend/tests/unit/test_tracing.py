@@ -0,0 +1,63 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.tracing import (
+    NOOP_SPAN,
+    SpanExporter,
+    Tracer,
+    get_tracer,
+    request_context,
+    set_tracer,
+    traced,
+)
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@traced("demo.inner")
+async def _inner():
+    return "ok"
+
+
+@traced("demo.outer")
+async def _outer():
+    return await _inner()
+
+
+def test_nested_spans_share_trace_and_request_id():
+    exporter = MemoryExporter()
+    previous = get_tracer()
+    set_tracer(Tracer(exporter))
+    try:
+        with request_context("req-1"):
+            assert asyncio.run(_outer()) == "ok"
+    finally:
+        set_tracer(previous)
+
+    inner, outer = exporter.spans
+    assert (inner.name, outer.name) == ("demo.inner", "demo.outer")
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id is None
+    assert inner.attributes["request.id"] == "req-1"
+    assert outer.to_dict()["context"]["trace_id"] == f"0x{outer.trace_id}"
+
+
+def test_disabled_tracer_yields_noop_span():
+    with Tracer().start_as_current_span("noop") as span:
+        assert span is NOOP_SPAN
+
+
+def test_request_id_header_is_propagated():
+    client = TestClient(app)
+    resp = client.get("/health", headers={"x-request-id": "abc123"})
+    assert resp.headers["x-request-id"] == "abc123"
+    assert client.get("/health").headers["x-request-id"]
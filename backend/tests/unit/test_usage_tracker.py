@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+from app.services.usage_tracker import (
+    UsageTracker,
+    parse_gemini_usage,
+    parse_openai_usage,
+    usage_context,
+)
+
+
+def test_parse_provider_usage():
+    deepseek = parse_openai_usage({
+        "usage": {
+            "prompt_tokens": 120,
+            "completion_tokens": 30,
+            "prompt_cache_hit_tokens": 100,
+            "prompt_cache_miss_tokens": 20,
+        }
+    })
+    assert deepseek == {
+        "input_tokens": 120,
+        "output_tokens": 30,
+        "cache_hit_tokens": 100,
+        "cache_miss_tokens": 20,
+    }
+
+    gemini = parse_gemini_usage({
+        "usageMetadata": {"promptTokenCount": 50, "candidatesTokenCount": 10}
+    })
+    assert gemini["input_tokens"] == 50
+    assert gemini["cache_miss_tokens"] == 50
+
+
+def test_records_aggregate_per_user_model_framework():
+    tracker = UsageTracker()
+    usage = {"input_tokens": 10, "output_tokens": 5}
+
+    with usage_context(user_id="u1", framework_id="RACEF"):
+        tracker.record("deepseek", "deepseek-chat", "generate_prompt", usage, 100.0)
+        tracker.record("deepseek", "deepseek-chat", "generate_prompt", usage, 300.0)
+    tracker.record("deepseek", "deepseek-chat", "analyze_intent", None, 50.0, success=False)
+
+    aggregates = {
+        (a["user_id"], a["framework_id"]): a for a in tracker.snapshot()["aggregates"]
+    }
+    assert aggregates[("u1", "RACEF")]["calls"] == 2
+    assert aggregates[("u1", "RACEF")]["input_tokens"] == 20
+    assert aggregates[("u1", "RACEF")]["latency_ms_max"] == 300.0
+    assert aggregates[(None, None)]["errors"] == 1
+
+
+def test_flush_to_file_writes_only_new_deltas(tmp_path):
+    path = tmp_path / "usage.jsonl"
+    tracker = UsageTracker(flush_target="file", flush_interval=3600, flush_path=str(path))
+    tracker.record("gemini", "gemini-pro", "generate_prompt", {"input_tokens": 7}, 10.0)
+
+    assert asyncio.run(tracker.flush()) == 1
+    assert asyncio.run(tracker.flush()) == 0
+
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["input_tokens"] == 7
+
+
+def test_totals_are_bounded_by_least_recently_updated(monkeypatch):
+    monkeypatch.setattr(UsageTracker, "TOTALS_LIMIT", 2)
+    tracker = UsageTracker()
+
+    for user_id in ["u1", "u2", "u1", "u3"]:
+        with usage_context(user_id=user_id):
+            tracker.record("deepseek", "deepseek-chat", "generate_prompt", None, 10.0)
+
+    snapshot = tracker.snapshot()
+    assert [a["user_id"] for a in snapshot["aggregates"]] == ["u1", "u3"]
+    assert snapshot["aggregates"][0]["calls"] == 2
+    # 不刷写时不保留增量
+    assert snapshot["pending_flush"] == 0
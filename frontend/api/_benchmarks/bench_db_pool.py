@@ -0,0 +1,123 @@
+"""
+数据库连接池基准测试
+
+对比两种会话获取方式的单次请求延迟：
+- legacy：旧实现，每次请求重新创建引擎 + NullPool（每次都新建连接）
+- pooled：当前实现，热实例内缓存引擎和小容量连接池
+
+默认使用临时 SQLite 文件作为替身，并通过 --connect-latency-ms 模拟
+Postgres 建连 + TLS 握手的耗时；设置 --database-url 可直接连本地 Postgres。
+
+运行方式:
+    python frontend/api/_benchmarks/bench_db_pool.py --requests 200 --connect-latency-ms 30
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+# 添加 api 目录到 Python 路径（与 Serverless 处理器一致）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _db import build_engine  # noqa: E402
+
+
+def _inject_connect_latency(engine, latency_ms: float):
+    """在每次新建 DBAPI 连接时增加固定延迟，模拟网络握手"""
+    if latency_ms <= 0:
+        return
+
+    @event.listens_for(engine, "do_connect")
+    def _slow_connect(dialect, conn_rec, cargs, cparams):
+        time.sleep(latency_ms / 1000)
+
+
+def _run_query(session_factory):
+    session = session_factory()
+    try:
+        session.execute(text("SELECT 1"))
+        session.commit()
+    finally:
+        session.close()
+
+
+def bench_legacy(database_url: str, requests: int, latency_ms: float) -> list[float]:
+    """旧实现：每次请求都重建引擎和 sessionmaker"""
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        engine = create_engine(database_url, poolclass=NullPool, echo=False)
+        _inject_connect_latency(engine, latency_ms)
+        _run_query(sessionmaker(bind=engine, autocommit=False, autoflush=False))
+        timings.append((time.perf_counter() - start) * 1000)
+        engine.dispose()
+    return timings
+
+
+def bench_pooled(database_url: str, requests: int, latency_ms: float) -> list[float]:
+    """新实现：引擎和连接池在实例内复用"""
+    engine = build_engine(database_url, pool_mode="pooled")
+    _inject_connect_latency(engine, latency_ms)
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        _run_query(session_factory)
+        timings.append((time.perf_counter() - start) * 1000)
+    engine.dispose()
+    return timings
+
+
+def summarize(timings: list[float]) -> dict:
+    """计算延迟分位数（毫秒）"""
+    ordered = sorted(timings)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3)
+
+    return {
+        "requests": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 legacy 与 pooled 的数据库会话延迟")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--connect-latency-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+
+    try:
+        result = {
+            "database": database_url.split("@")[-1],
+            "connect_latency_ms": args.connect_latency_ms,
+            "legacy": summarize(bench_legacy(database_url, args.requests, args.connect_latency_ms)),
+            "pooled": summarize(bench_pooled(database_url, args.requests, args.connect_latency_ms)),
+        }
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,12 @@ class Settings(BaseSettings):
     """应用配置"""
     # Database
     database_url: str
+    # 连接池模式：pooled（实例内缓存小连接池）/ pgbouncer（交给 PgBouncer 池化）/ null（每次新建连接）
+    db_pool_mode: str = "pooled"
+    db_pool_size: int = 2
+    db_max_overflow: int = 2
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 300  # 秒，空闲连接超过该时间后回收，避免被服务端断开
     
     # DeepSeek API
     deepseek_api_key: str
@@ -1,36 +1,109 @@
 """
 数据库连接模块
 为 Serverless 环境优化的数据库连接管理
+
+同一个热实例（warm instance）内复用同一个引擎和连接池，
+避免每次数据库操作都重新建立 Postgres 连接（含 TLS 握手）。
 """
+from functools import lru_cache
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 from contextlib import contextmanager
-from ._config import get_settings
+from _config import get_settings
+
+
+POOL_MODE_POOLED = "pooled"
+POOL_MODE_PGBOUNCER = "pgbouncer"
+POOL_MODE_NULL = "null"
+
+
+def build_engine(
+    database_url: str,
+    pool_mode: str = POOL_MODE_POOLED,
+    pool_size: int = 2,
+    max_overflow: int = 2,
+    pool_timeout: float = 10.0,
+    pool_recycle: int = 300,
+) -> Engine:
+    """
+    按连接池模式创建数据库引擎
+
+    Args:
+        database_url: 数据库连接串
+        pool_mode: pooled（小容量 QueuePool）/ pgbouncer（NullPool + 关闭预编译语句）/ null
+        pool_size: 常驻连接数（pooled 模式）
+        max_overflow: 允许临时超出的连接数（pooled 模式）
+        pool_timeout: 等待空闲连接的超时时间（秒）
+        pool_recycle: 连接最长复用时间（秒）
+
+    Returns:
+        SQLAlchemy Engine
+    """
+    pool_mode = pool_mode.lower()
+    url = make_url(database_url)
+
+    if pool_mode == POOL_MODE_POOLED:
+        kwargs = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": True,  # 复用前探活，丢弃被服务端关闭的空闲连接
+        }
+        if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+            # 内存 SQLite 使用 SingletonThreadPool，不支持队列池参数
+            kwargs = {"pool_pre_ping": True}
+        return create_engine(url, echo=False, **kwargs)
+
+    if pool_mode == POOL_MODE_PGBOUNCER:
+        # 连接池交给 PgBouncer（事务模式），客户端不持有连接，也不能使用服务端预编译语句
+        connect_args = {}
+        if url.get_backend_name() == "postgresql" and url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        return create_engine(url, poolclass=NullPool, connect_args=connect_args, echo=False)
+
+    if pool_mode == POOL_MODE_NULL:
+        return create_engine(url, poolclass=NullPool, echo=False)
 
+    raise ValueError(f"不支持的连接池模式: {pool_mode}。支持的模式: pooled, pgbouncer, null")
 
-# 使用 NullPool 避免连接池问题（Serverless 环境不需要连接池）
-def get_engine():
-    """创建数据库引擎"""
+
+@lru_cache()
+def get_engine() -> Engine:
+    """获取数据库引擎（每个热实例只创建一次）"""
     settings = get_settings()
-    return create_engine(
+    return build_engine(
         settings.database_url,
-        poolclass=NullPool,  # 不使用连接池
-        echo=False
+        pool_mode=settings.db_pool_mode,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
     )
 
 
-def get_session_factory():
-    """创建 Session 工厂"""
+@lru_cache()
+def get_session_factory() -> sessionmaker:
+    """获取 Session 工厂（与引擎一同缓存）"""
     engine = get_engine()
     return sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
+def dispose_engine():
+    """释放连接池并清空缓存（配置变更或进程 fork 后调用）"""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    get_session_factory.cache_clear()
+    get_engine.cache_clear()
+
+
 @contextmanager
 def get_db_session() -> Session:
     """
     获取数据库会话（上下文管理器）
-    
+
     使用示例：
         with get_db_session() as db:
             # 使用 db 进行数据库操作
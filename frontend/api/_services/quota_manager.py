@@ -1,13 +1,17 @@
 """
 Quota Manager Service for managing user quotas
 支持失败退回和重试机制
+
+配额计数保存在共享的 QuotaStore 中（见 quota_store.py），
+每个 (用户, 用户时区日期) 一个键，键在用户时区次日 00:00 自动过期。
 """
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict
+from typing import Optional, Tuple
 from pydantic import BaseModel
 import logging
 import os
-import asyncio
+
+from .quota_store import QuotaStore, create_quota_store
 
 logger = logging.getLogger(__name__)
 
@@ -22,11 +26,25 @@ class QuotaStatus(BaseModel):
 
 
 class QuotaTransaction:
-    """配额事务，支持回滚"""
-    def __init__(self, user_id: str, quota_key: str, manager: 'QuotaManager'):
+    """
+    配额事务，支持回滚
+    
+    由 QuotaManager.reserve 创建时名额已在共享存储中原子占用；
+    commit 确认占用，rollback 在共享存储中退回名额（只会生效一次）。
+    """
+    def __init__(
+        self,
+        user_id: str,
+        quota_key: str,
+        manager: 'QuotaManager',
+        expire_at: Optional[datetime] = None,
+        status: Optional[QuotaStatus] = None
+    ):
         self.user_id = user_id
         self.quota_key = quota_key
         self.manager = manager
+        self.expire_at = expire_at
+        self.status = status  # 占用后的配额状态
         self.consumed = False
         self.can_rollback = True
     
@@ -39,10 +57,14 @@ class QuotaTransaction:
     async def rollback(self):
         """回滚事务（生成失败，退回配额）"""
         if self.can_rollback and self.consumed:
-            self.manager.quotas[self.quota_key] = max(
-                0,
-                self.manager.quotas.get(self.quota_key, 0) - 1
-            )
+            # 先标记，避免并发重复回滚
+            self.can_rollback = False
+            if self.expire_at is not None:
+                used = await self.manager.store.incr(self.quota_key, -1, self.expire_at)
+                if self.status is not None:
+                    self.status = self.status.model_copy(
+                        update={"used": used, "can_generate": used < self.status.total}
+                    )
             logger.info(f"Quota transaction rolled back for user {self.user_id}")
             self.can_rollback = False
 
@@ -50,10 +72,10 @@ class QuotaTransaction:
 class QuotaManager:
     """管理用户配额"""
     
-    def __init__(self):
-        # 使用内存存储（生产环境应使用数据库）
-        self.quotas: Dict[str, int] = {}
-        self.retry_counts: Dict[str, int] = {}  # 记录重试次数
+    def __init__(self, store: Optional[QuotaStore] = None):
+        # 配额和重试次数都存放在共享存储中（QUOTA_STORE=memory/redis/postgres）
+        self.store = store or create_quota_store()
+        self.RETRY_WINDOW = timedelta(hours=1)  # 重试计数的有效期
         self.FREE_QUOTA = 10  # 免费用户每天10次
         self.PRO_QUOTA = 100
         self.MAX_RETRIES = 1  # 允许的最大重试次数
@@ -108,6 +130,10 @@ class QuotaManager:
         date = self._get_user_date(user_timezone_offset)
         return f"{user_id}:{date}"
     
+    def _get_total(self, account_type: str) -> int:
+        """获取账户类型对应的每日配额"""
+        return self.PRO_QUOTA if account_type == "pro" else self.FREE_QUOTA
+    
     def _get_retry_key(self, user_id: str, request_id: str) -> str:
         """生成重试计数键"""
         return f"retry:{user_id}:{request_id}"
@@ -133,10 +159,10 @@ class QuotaManager:
             quota_key = self._get_user_quota_key(user_id, user_timezone_offset)
             
             # 获取配额限制
-            total = self.PRO_QUOTA if account_type == "pro" else self.FREE_QUOTA
+            total = self._get_total(account_type)
             
-            # 获取已使用配额
-            used = self.quotas.get(quota_key, 0)
+            # 获取已使用配额（一次存储往返）
+            used = await self.store.get(quota_key)
             
             # 开发/测试环境跳过配额检查
             if self.skip_quota_check:
@@ -187,45 +213,82 @@ class QuotaManager:
             # 检查是否为重试请求
             if request_id:
                 retry_key = self._get_retry_key(user_id, request_id)
-                retry_count = self.retry_counts.get(retry_key, 0)
+                retry_count = await self.store.incr(
+                    retry_key, 1, datetime.now(timezone.utc) + self.RETRY_WINDOW
+                )
                 
-                if retry_count >= self.MAX_RETRIES:
+                if retry_count > self.MAX_RETRIES:
                     logger.warning(f"User {user_id} exceeded max retries for request {request_id}")
                     return None
                 
-                # 记录重试
-                self.retry_counts[retry_key] = retry_count + 1
-                logger.info(f"Retry {retry_count + 1}/{self.MAX_RETRIES} for user {user_id}, request {request_id}")
-            
-            # 开发/测试环境直接返回事务
-            if self.skip_quota_check:
-                quota_key = self._get_user_quota_key(user_id, user_timezone_offset)
-                transaction = QuotaTransaction(user_id, quota_key, self)
-                transaction.consumed = True
-                return transaction
-            
-            # 先检查配额
-            status = await self.check_quota(user_id, account_type, user_timezone_offset)
-            
-            if not status.can_generate:
-                logger.warning(f"User {user_id} quota exceeded: {status.used}/{status.total}")
-                return None
-            
-            # 预扣配额
-            quota_key = self._get_user_quota_key(user_id, user_timezone_offset)
-            self.quotas[quota_key] = self.quotas.get(quota_key, 0) + 1
-            
-            # 创建事务
-            transaction = QuotaTransaction(user_id, quota_key, self)
-            transaction.consumed = True
+                logger.info(f"Retry {retry_count}/{self.MAX_RETRIES} for user {user_id}, request {request_id}")
             
-            logger.info(f"Started generation for user {user_id}: {self.quotas[quota_key]}/{status.total}")
+            _, transaction = await self.reserve(user_id, account_type, user_timezone_offset)
             return transaction
             
         except Exception as e:
             logger.error(f"Error starting generation for user {user_id}: {e}")
             raise
     
+    async def reserve(
+        self,
+        user_id: str,
+        account_type: str = "free",
+        user_timezone_offset: int = 0
+    ) -> Tuple[QuotaStatus, Optional[QuotaTransaction]]:
+        """
+        原子地检查并预扣一次配额
+        
+        检查和扣减在共享存储中一步完成，同一用户的并发请求不会同时通过检查；
+        成功路径只需一次存储往返。
+        
+        Args:
+            user_id: 用户 ID
+            account_type: 账户类型（free/pro）
+            user_timezone_offset: 用户时区偏移量（分钟）
+        
+        Returns:
+            (占用后的配额状态, QuotaTransaction)；配额不足时事务为 None
+        """
+        quota_key = self._get_user_quota_key(user_id, user_timezone_offset)
+        total = self._get_total(account_type)
+        reset_time = self._get_next_reset_time(user_timezone_offset)
+        
+        # 开发/测试环境不扣减配额
+        if self.skip_quota_check:
+            status = QuotaStatus(
+                user_id=user_id,
+                used=await self.store.get(quota_key),
+                total=total,
+                reset_time=reset_time,
+                can_generate=True
+            )
+            transaction = QuotaTransaction(user_id, quota_key, self, status=status)
+            transaction.consumed = True
+            return status, transaction
+        
+        # 预扣配额（计数在用户时区次日 00:00 过期）
+        reserved, used = await self.store.reserve(quota_key, total, reset_time)
+        status = QuotaStatus(
+            user_id=user_id,
+            used=used,
+            total=total,
+            reset_time=reset_time,
+            can_generate=used < total
+        )
+        
+        if not reserved:
+            logger.warning(f"User {user_id} quota exceeded: {used}/{total}")
+            return status, None
+        
+        transaction = QuotaTransaction(
+            user_id, quota_key, self, expire_at=reset_time, status=status
+        )
+        transaction.consumed = True
+        
+        logger.info(f"Started generation for user {user_id}: {used}/{total}")
+        return status, transaction
+    
     async def consume_quota(
         self,
         user_id: str,
@@ -251,40 +314,22 @@ class QuotaManager:
     
     async def reset_daily_quotas(self):
         """
-        重置所有用户的每日配额（定时任务调用）
+        重置每日配额（兼容旧的定时任务入口）
         
-        这个方法应该在每日 UTC 00:00 被定时任务调用
+        配额键按用户时区次日 00:00 自动过期，无需逐个扫描删除；
+        这里只让不支持自动过期的存储清理已过期的记录。
         """
         try:
-            # 获取昨天的日期
-            yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
-            
-            # 删除昨天的配额记录
-            keys_to_delete = [key for key in self.quotas.keys() if yesterday in key]
-            for key in keys_to_delete:
-                del self.quotas[key]
-            
-            # 清理过期的重试记录（超过 1 小时）
-            retry_keys_to_delete = []
-            for key in list(self.retry_counts.keys()):
-                # 简单策略：每日重置时清理所有重试记录
-                retry_keys_to_delete.append(key)
-            
-            for key in retry_keys_to_delete:
-                del self.retry_counts[key]
-            
-            logger.info(
-                f"Reset daily quotas: removed {len(keys_to_delete)} quota records "
-                f"and {len(retry_keys_to_delete)} retry records"
-            )
+            purged = await self.store.purge_expired()
+            logger.info(f"Reset daily quotas: purged {purged} expired records")
             
         except Exception as e:
             logger.error(f"Error resetting daily quotas: {e}")
             raise
     
-    def get_quota_info(self, user_id: str, account_type: str = "free", user_timezone_offset: int = 0) -> dict:
+    async def get_quota_info(self, user_id: str, account_type: str = "free", user_timezone_offset: int = 0) -> dict:
         """
-        获取用户配额信息（同步方法，用于快速查询）
+        获取用户配额信息
         
         Args:
             user_id: 用户 ID
@@ -295,8 +340,8 @@ class QuotaManager:
             包含配额信息的字典
         """
         quota_key = self._get_user_quota_key(user_id, user_timezone_offset)
-        total = self.PRO_QUOTA if account_type == "pro" else self.FREE_QUOTA
-        used = self.quotas.get(quota_key, 0)
+        total = self._get_total(account_type)
+        used = await self.store.get(quota_key)
         reset_time = self._get_next_reset_time(user_timezone_offset)
         
         return {
@@ -0,0 +1,300 @@
+"""
+配额计数存储
+提供带过期时间的原子自增计数器，供 QuotaManager 在多个 Serverless 实例间共享配额
+
+后端：
+- InMemoryQuotaStore：进程内存储（开发/测试替身）
+- RedisQuotaStore：Redis 协议（INCRBY + EXPIREAT 事务）
+- PostgresQuotaStore：Postgres（INSERT ... ON CONFLICT DO UPDATE ... RETURNING）
+
+每个键在写入时就带上过期时间（用户时区的次日 00:00），
+过期后计数自动归零，因此每日重置不再需要扫描全部键。
+"""
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaStore(ABC):
+    """配额计数存储的抽象基类"""
+
+    @abstractmethod
+    async def get(self, key: str) -> int:
+        """
+        读取计数（已过期或不存在时返回 0）
+
+        Args:
+            key: 计数键
+
+        Returns:
+            当前计数
+        """
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int, expire_at: datetime) -> int:
+        """
+        原子地增加计数并设置过期时间
+
+        键不存在或已过期时从 0 开始计数。amount 可以为负数（用于退回配额），
+        结果不会小于 0。
+
+        Args:
+            key: 计数键
+            amount: 增量
+            expire_at: 过期时间（UTC）
+
+        Returns:
+            增加后的计数
+        """
+        pass
+
+    @abstractmethod
+    async def reserve(self, key: str, limit: int, expire_at: datetime) -> Tuple[bool, int]:
+        """
+        原子地"检查并占用"一个名额：计数小于 limit 时加 1，否则保持不变
+
+        Args:
+            key: 计数键
+            limit: 计数上限
+            expire_at: 过期时间（UTC）
+
+        Returns:
+            (是否占用成功, 操作后的计数)
+        """
+        pass
+
+    async def purge_expired(self) -> int:
+        """清理已过期的键（可选，后端自身支持过期时无需调用）"""
+        return 0
+
+
+class InMemoryQuotaStore(QuotaStore):
+    """进程内配额存储（仅适用于单实例开发/测试）"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, key: str, now: datetime) -> int:
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= now:
+            return 0
+        return entry[0]
+
+    async def get(self, key: str) -> int:
+        with self._lock:
+            return self._read(key, datetime.now(timezone.utc))
+
+    async def incr(self, key: str, amount: int, expire_at: datetime) -> int:
+        with self._lock:
+            value = max(0, self._read(key, datetime.now(timezone.utc)) + amount)
+            self._data[key] = (value, expire_at)
+            return value
+
+    async def reserve(self, key: str, limit: int, expire_at: datetime) -> Tuple[bool, int]:
+        with self._lock:
+            value = self._read(key, datetime.now(timezone.utc))
+            if value >= limit:
+                return False, value
+            self._data[key] = (value + 1, expire_at)
+            return True, value + 1
+
+    async def purge_expired(self) -> int:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            expired = [key for key, (_, expire_at) in self._data.items() if expire_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+class RedisQuotaStore(QuotaStore):
+    """
+    Redis 协议配额存储（Redis / Upstash / KeyDB 等）
+
+    需要安装 redis 包（redis>=5.0.1，提供 aclose）
+    """
+
+    # 负数增量时保证结果不小于 0，整个脚本在服务端原子执行
+    _INCR_SCRIPT = """
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('SET', KEYS[1], 0)
+    value = 0
+end
+redis.call('EXPIREAT', KEYS[1], ARGV[2])
+return value
+"""
+
+    # 未达上限才自增，返回 {是否占用, 计数}
+    _RESERVE_SCRIPT = """
+local value = tonumber(redis.call('GET', KEYS[1]) or '0')
+if value >= tonumber(ARGV[1]) then
+    return {0, value}
+end
+value = redis.call('INCR', KEYS[1])
+redis.call('EXPIREAT', KEYS[1], ARGV[2])
+return {1, value}
+"""
+
+    def __init__(self, url: str, key_prefix: str = "quota:"):
+        self.url = url
+        self.key_prefix = key_prefix
+
+    @asynccontextmanager
+    async def _connect(self) -> AsyncIterator:
+        """
+        每次操作使用独立的客户端，结束时在同一事件循环内关闭
+
+        Serverless 处理器每次请求都会新建事件循环，客户端的连接不能跨循环复用，
+        缓存下来只会在循环关闭后遗留无法正常关闭的连接
+        """
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("使用 Redis 配额存储需要安装 redis 包") from e
+        client = redis_asyncio.from_url(self.url, decode_responses=True)
+        try:
+            yield client
+        finally:
+            await client.aclose()
+
+    async def get(self, key: str) -> int:
+        async with self._connect() as client:
+            value = await client.get(self.key_prefix + key)
+        return int(value) if value else 0
+
+    async def incr(self, key: str, amount: int, expire_at: datetime) -> int:
+        async with self._connect() as client:
+            value = await client.eval(
+                self._INCR_SCRIPT,
+                1,
+                self.key_prefix + key,
+                amount,
+                int(expire_at.timestamp()),
+            )
+        return int(value)
+
+    async def reserve(self, key: str, limit: int, expire_at: datetime) -> Tuple[bool, int]:
+        async with self._connect() as client:
+            reserved, value = await client.eval(
+                self._RESERVE_SCRIPT,
+                1,
+                self.key_prefix + key,
+                limit,
+                int(expire_at.timestamp()),
+            )
+        return bool(reserved), int(value)
+
+
+class PostgresQuotaStore(QuotaStore):
+    """
+    Postgres 配额存储
+
+    使用单条 upsert 语句完成"过期判断 + 自增 + 返回新值"，一次往返且原子。
+    表结构见 backend/migrations/create_quota_counters_table.sql
+    """
+
+    _GET_SQL = """
+SELECT value FROM quota_counters
+WHERE key = :key AND expires_at > now()
+"""
+
+    _INCR_SQL = """
+INSERT INTO quota_counters (key, value, expires_at)
+VALUES (:key, GREATEST(:amount, 0), :expire_at)
+ON CONFLICT (key) DO UPDATE SET
+    value = GREATEST(
+        CASE WHEN quota_counters.expires_at <= now() THEN 0 ELSE quota_counters.value END
+        + :amount,
+        0
+    ),
+    expires_at = EXCLUDED.expires_at
+RETURNING value
+"""
+
+    # 冲突行只有在已过期或未达上限时才更新；未更新则不返回行（占用失败）
+    _RESERVE_SQL = """
+INSERT INTO quota_counters (key, value, expires_at)
+VALUES (:key, 1, :expire_at)
+ON CONFLICT (key) DO UPDATE SET
+    value = CASE WHEN quota_counters.expires_at <= now() THEN 1 ELSE quota_counters.value + 1 END,
+    expires_at = EXCLUDED.expires_at
+WHERE quota_counters.expires_at <= now() OR quota_counters.value < :limit
+RETURNING value
+"""
+
+    _PURGE_SQL = "DELETE FROM quota_counters WHERE expires_at <= now()"
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def _execute(self, sql: str, params: dict, scalar: bool = True):
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            result = conn.execute(text(sql), params)
+            return result.scalar() if scalar else result.rowcount
+
+    async def get(self, key: str) -> int:
+        value = await asyncio.to_thread(self._execute, self._GET_SQL, {"key": key})
+        return int(value) if value else 0
+
+    async def incr(self, key: str, amount: int, expire_at: datetime) -> int:
+        value = await asyncio.to_thread(
+            self._execute,
+            self._INCR_SQL,
+            {"key": key, "amount": amount, "expire_at": expire_at},
+        )
+        return int(value)
+
+    async def reserve(self, key: str, limit: int, expire_at: datetime) -> Tuple[bool, int]:
+        value = await asyncio.to_thread(
+            self._execute,
+            self._RESERVE_SQL,
+            {"key": key, "limit": limit, "expire_at": expire_at},
+        )
+        if value is None:
+            # 已达上限：只在拒绝路径上多读一次当前计数
+            return False, await self.get(key)
+        return True, int(value)
+
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self._execute, self._PURGE_SQL, {}, False)
+
+
+def create_quota_store(backend: Optional[str] = None) -> QuotaStore:
+    """
+    根据环境变量创建配额存储
+
+    Args:
+        backend: memory / redis / postgres，默认读取 QUOTA_STORE 环境变量
+
+    Returns:
+        QuotaStore 实例
+    """
+    backend = (backend or os.getenv("QUOTA_STORE", "memory")).lower()
+
+    if backend == "memory":
+        return InMemoryQuotaStore()
+
+    if backend == "redis":
+        url = os.getenv("REDIS_URL")
+        if not url:
+            raise ValueError("QUOTA_STORE=redis 需要配置 REDIS_URL")
+        return RedisQuotaStore(url)
+
+    if backend == "postgres":
+        from _db import get_engine
+
+        return PostgresQuotaStore(get_engine())
+
+    raise ValueError(f"不支持的配额存储类型: {backend}。支持的类型: memory, redis, postgres")
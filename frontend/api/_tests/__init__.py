@@ -0,0 +1 @@
+# Serverless API tests（在 frontend/api 目录下运行: python -m pytest _tests）
@@ -0,0 +1,169 @@
+import asyncio
+import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from _services.quota_manager import QuotaManager
+from _services.quota_store import InMemoryQuotaStore, RedisQuotaStore, create_quota_store
+
+
+def _expire_in(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "production")
+    return QuotaManager(InMemoryQuotaStore())
+
+
+def test_reserve_stops_at_limit():
+    store = InMemoryQuotaStore()
+    expire_at = _expire_in(60)
+
+    async def scenario():
+        return [await store.reserve("u1", 2, expire_at) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [(True, 1), (True, 2), (False, 2)]
+    assert asyncio.run(store.get("u1")) == 2
+
+
+def test_incr_never_goes_below_zero():
+    store = InMemoryQuotaStore()
+    expire_at = _expire_in(60)
+
+    async def scenario():
+        await store.incr("u1", 1, expire_at)
+        return await store.incr("u1", -3, expire_at)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_expired_counter_resets():
+    store = InMemoryQuotaStore()
+
+    async def scenario():
+        await store.incr("u1", 5, _expire_in(-1))
+        before = await store.get("u1")
+        purged = await store.purge_expired()
+        reserved = await store.reserve("u1", 1, _expire_in(60))
+        return before, purged, reserved
+
+    assert asyncio.run(scenario()) == (0, 1, (True, 1))
+
+
+def test_concurrent_reserves_do_not_exceed_limit(manager):
+    async def one_request():
+        _, transaction = await manager.reserve("u1", "free", 480)
+        return transaction is not None
+
+    # 每个 Serverless 请求在各自的线程和事件循环中执行
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: asyncio.run(one_request()), range(30)))
+
+    assert sum(results) == manager.FREE_QUOTA
+    info = asyncio.run(manager.get_quota_info("u1", "free", 480))
+    assert info["used"] == manager.FREE_QUOTA
+    assert info["can_generate"] is False
+
+
+def test_rollback_is_applied_once(manager):
+    async def scenario():
+        await manager.reserve("u1")
+        _, transaction = await manager.reserve("u1")
+        await asyncio.gather(transaction.rollback(), transaction.rollback())
+        await transaction.rollback()
+        return transaction, await manager.store.get(manager._get_user_quota_key("u1"))
+
+    transaction, used = asyncio.run(scenario())
+    assert used == 1
+    assert transaction.status.used == 1
+    assert transaction.status.can_generate is True
+
+
+def test_committed_transaction_is_not_rolled_back(manager):
+    async def scenario():
+        _, transaction = await manager.reserve("u1")
+        await transaction.commit()
+        await transaction.rollback()
+        return await manager.store.get(manager._get_user_quota_key("u1"))
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_quota_key_expires_at_next_local_midnight(manager):
+    reset_time = manager._get_next_reset_time(480)
+    local = reset_time + timedelta(minutes=480)
+
+    assert (local.hour, local.minute) == (0, 0)
+    assert timedelta(0) < reset_time - datetime.now(timezone.utc) <= timedelta(days=1)
+
+
+def test_start_generation_limits_retries(manager):
+    async def scenario():
+        first = await manager.start_generation("u1", request_id="r1")
+        retry = await manager.start_generation("u1", request_id="r1")
+        return first, retry
+
+    first, retry = asyncio.run(scenario())
+    assert first is not None
+    assert retry is None
+
+
+def test_development_environment_skips_quota(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "development")
+    manager = QuotaManager(InMemoryQuotaStore())
+    manager.FREE_QUOTA = 0
+
+    status, transaction = asyncio.run(manager.reserve("u1"))
+    assert transaction is not None
+    assert status.can_generate is True
+
+
+def test_redis_store_closes_client_after_each_call(monkeypatch):
+    clients = []
+
+    class FakeRedis:
+        def __init__(self):
+            self.loop = asyncio.get_running_loop()
+            self.closed = False
+            clients.append(self)
+
+        async def eval(self, script, numkeys, key, limit, expire_at):
+            assert asyncio.get_running_loop() is self.loop
+            return [1, 1]
+
+        async def aclose(self):
+            self.closed = True
+
+    redis_asyncio = types.SimpleNamespace(from_url=lambda url, **kwargs: FakeRedis())
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(asyncio=redis_asyncio))
+    monkeypatch.setitem(sys.modules, "redis.asyncio", redis_asyncio)
+
+    store = RedisQuotaStore("redis://localhost:6379/0")
+    # 模拟 Serverless 处理器：每次请求新建事件循环
+    for _ in range(3):
+        assert asyncio.run(store.reserve("u1", 10, _expire_in(60))) == (True, 1)
+
+    assert len(clients) == 3
+    assert all(client.closed for client in clients)
+
+
+def test_create_quota_store(monkeypatch):
+    monkeypatch.delenv("QUOTA_STORE", raising=False)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+
+    assert isinstance(create_quota_store(), InMemoryQuotaStore)
+    with pytest.raises(ValueError):
+        create_quota_store("redis")
+    with pytest.raises(ValueError):
+        create_quota_store("dynamodb")
+
+    monkeypatch.setenv("QUOTA_STORE", "Redis")
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    store = create_quota_store()
+    assert isinstance(store, RedisQuotaStore)
+    assert store.url == "redis://localhost:6379/0"
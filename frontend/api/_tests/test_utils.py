@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+import quota
+from _utils import parse_timezone_offset
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 0), ("", 0), (480, 480), ("-300", -300), (330.0, 330), (-720, -720), (840, 840),
+])
+def test_parse_timezone_offset(value, expected):
+    assert parse_timezone_offset(value) == expected
+
+
+@pytest.mark.parametrize("value", ["abc", "5.5", 5.5, True, [480], float("inf"), 841, -721])
+def test_parse_timezone_offset_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_timezone_offset(value)
+
+
+def _get(handler_class, path: str) -> tuple[int, dict]:
+    handler = handler_class.__new__(handler_class)
+    handler.path = path
+    handler.command = "GET"
+    handler.requestline = f"GET {path} HTTP/1.1"
+    handler.request_version = "HTTP/1.1"
+    handler.client_address = ("127.0.0.1", 0)
+    handler.wfile = io.BytesIO()
+    handler.log_message = lambda *args: None
+    handler.do_GET()
+    head, _, body = handler.wfile.getvalue().partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_quota_handler_rejects_invalid_timezone_offset():
+    status, body = _get(quota.handler, "/api/quota?user_id=u1&timezone_offset=abc")
+    assert status == 400
+    assert "timezone_offset" in body["error"]
+
+    status, body = _get(quota.handler, "/api/quota?user_id=u1&timezone_offset=480")
+    assert status == 200
+    assert body["used"] == 0
@@ -5,6 +5,10 @@ from http.server import BaseHTTPRequestHandler
 import json
 from typing import Any, Dict
 
+# 时区偏移量范围（分钟）：UTC-12:00 ~ UTC+14:00 之外的值都视为无效
+MIN_TIMEZONE_OFFSET = -12 * 60
+MAX_TIMEZONE_OFFSET = 14 * 60
+
 
 def json_response(handler: BaseHTTPRequestHandler, data: Any, status: int = 200):
     """
@@ -56,6 +60,34 @@ def parse_json_body(handler: BaseHTTPRequestHandler) -> Dict:
     return json.loads(body.decode("utf-8"))
 
 
+def parse_timezone_offset(value: Any) -> int:
+    """
+    解析用户时区偏移量
+    
+    Args:
+        value: 请求中的 timezone_offset（分钟，例如 480 表示 UTC+8），缺省或 null 时为 0
+    
+    Returns:
+        时区偏移量（分钟）
+    
+    Raises:
+        ValueError: 不是整数分钟或超出有效范围
+    """
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"timezone_offset 必须是整数（分钟）: {value!r}")
+    try:
+        offset = int(value)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(f"timezone_offset 必须是整数（分钟）: {value!r}") from e
+    if not MIN_TIMEZONE_OFFSET <= offset <= MAX_TIMEZONE_OFFSET:
+        raise ValueError(
+            f"timezone_offset 超出范围 [{MIN_TIMEZONE_OFFSET}, {MAX_TIMEZONE_OFFSET}]: {offset}"
+        )
+    return offset
+
+
 def handle_cors(handler: BaseHTTPRequestHandler):
     """
     处理 CORS 预检请求
@@ -11,6 +11,7 @@ import glob
 sys.path.insert(0, os.path.dirname(__file__))
 
 from _config import get_settings, get_cached_service
+from _utils import parse_timezone_offset
 from _services.llm_factory import LLMFactory
 from _services.quota_manager import QuotaManager
 from _services.version_manager import VersionManager, VersionType
@@ -96,6 +97,11 @@ class handler(BaseHTTPRequestHandler):
             user_id = data.get("user_id", "test_user")
             account_type = data.get("account_type", "free")
             model = data.get("model", "deepseek")
+            try:
+                timezone_offset = parse_timezone_offset(data.get("timezone_offset"))
+            except ValueError as e:
+                self._error_response(str(e), 400)
+                return
             
             # 验证模型类型
             if model not in LLMFactory.get_supported_models():
@@ -111,16 +117,13 @@ class handler(BaseHTTPRequestHandler):
                 lambda: LLMFactory.create_service(model, settings)
             )
             
-            # 检查配额
+            # 原子地检查并预扣配额（一次存储往返）
             import asyncio
-            can_generate = asyncio.run(
-                quota_manager.consume_quota(user_id, account_type)
+            quota_status, transaction = asyncio.run(
+                quota_manager.reserve(user_id, account_type, timezone_offset)
             )
             
-            if not can_generate:
-                quota_status = asyncio.run(
-                    quota_manager.check_quota(user_id, account_type)
-                )
+            if transaction is None:
                 self._json_response({
                     "code": "QUOTA_EXCEEDED",
                     "message": f"您已达到每日配额限制（{quota_status.total}次）",
@@ -135,24 +138,31 @@ class handler(BaseHTTPRequestHandler):
             # 加载框架文档
             framework_doc = _load_framework_doc(framework_id)
             
-            # 生成提示词
-            generated_output = asyncio.run(
-                llm_service.generate_prompt(
-                    user_input=user_input,
-                    framework_doc=framework_doc,
-                    clarification_answers=clarification_answers,
-                    attachment_content=attachment_content
+            try:
+                # 生成提示词
+                generated_output = asyncio.run(
+                    llm_service.generate_prompt(
+                        user_input=user_input,
+                        framework_doc=framework_doc,
+                        clarification_answers=clarification_answers,
+                        attachment_content=attachment_content
+                    )
                 )
-            )
-            
-            # 保存版本
-            version = asyncio.run(
-                version_manager.save_version(
-                    user_id=user_id,
-                    content=generated_output,
-                    version_type=VersionType.OPTIMIZE
+                
+                # 保存版本
+                version = asyncio.run(
+                    version_manager.save_version(
+                        user_id=user_id,
+                        content=generated_output,
+                        version_type=VersionType.OPTIMIZE
+                    )
                 )
-            )
+            except Exception:
+                # 生成失败，退回配额
+                asyncio.run(transaction.rollback())
+                raise
+            
+            asyncio.run(transaction.commit())
             
             # 返回结果
             self._json_response({
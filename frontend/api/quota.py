@@ -11,6 +11,7 @@ from urllib.parse import parse_qs, urlparse
 sys.path.insert(0, os.path.dirname(__file__))
 
 from _config import get_cached_service
+from _utils import parse_timezone_offset
 from _services.quota_manager import QuotaManager
 
 
@@ -34,7 +35,11 @@ class handler(BaseHTTPRequestHandler):
             
             user_id = params.get("user_id", ["test_user"])[0]
             account_type = params.get("account_type", ["free"])[0]
-            timezone_offset = int(params.get("timezone_offset", ["0"])[0])
+            try:
+                timezone_offset = parse_timezone_offset(params.get("timezone_offset", [None])[0])
+            except ValueError as e:
+                self._error_response(str(e), 400)
+                return
             
             # 获取配额管理器
             quota_manager = get_cached_service("quota_manager", QuotaManager)